@@ -0,0 +1,182 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+
+def level_payment(principal, annual_rate, amortization_months):
+    """Monthly payment fully amortizing `principal` over `amortization_months`
+
+    Arguments broadcast, so one call sizes payments for a whole set of loans or scenarios.
+    """
+    principal = np.asarray(principal, dtype=np.float64)
+    rate = np.asarray(annual_rate, dtype=np.float64) / 12
+    months = np.asarray(amortization_months, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(rate > 0, principal * rate / (1 - (1 + rate) ** -months), principal / months)
+
+
+def amortization_schedule(principal, annual_rate, amortization_months, term_months: int) -> Dict[str, np.ndarray]:
+    """Monthly schedule of level-payment loans, one row per loan, months 1..term_months
+
+    Balances come from the closed form rather than a month-by-month loop. Returns
+    'payment', 'interest', 'principal' and 'balance' (after each payment), each shaped
+    (loans, term_months), and 'balloon', the balance due at the end of the term.
+    """
+    principal = np.atleast_1d(np.asarray(principal, dtype=np.float64))
+    rate = np.broadcast_to(np.asarray(annual_rate, dtype=np.float64) / 12, principal.shape)
+    payment = np.broadcast_to(level_payment(principal, annual_rate, amortization_months), principal.shape)
+
+    months = np.arange(term_months + 1)
+    growth = (1 + rate[:, np.newaxis]) ** months
+    with np.errstate(divide='ignore', invalid='ignore'):
+        paid_down = np.where(rate[:, np.newaxis] > 0, payment[:, np.newaxis] * (growth - 1) / rate[:, np.newaxis],
+                             payment[:, np.newaxis] * months)
+    balances = np.maximum(principal[:, np.newaxis] * growth - paid_down, 0)
+
+    interest = balances[:, :-1] * rate[:, np.newaxis]
+    principal_paid = balances[:, :-1] - balances[:, 1:]
+    return {
+        'payment': interest + principal_paid,
+        'interest': interest,
+        'principal': principal_paid,
+        'balance': balances[:, 1:],
+        'balloon': balances[:, -1],
+    }
+
+
+# Floating-rate indices available from the market data feed, quoted in percent
+RATE_INDICES = ('fed_funds_rate', '10_year_treasury')
+
+
+def index_rate(real_time_data: Dict[str, Dict], index: str) -> float:
+    """Current value of a market data rate index as a decimal"""
+    if index not in RATE_INDICES:
+        raise ValueError(f"Unknown rate index {index!r}; expected one of {', '.join(RATE_INDICES)}")
+    return real_time_data[index]['value'] / 100
+
+
+def rate_paths(loans: int, months: int, fixed_rate=None, index_path=None, spread=0.0,
+               floor=None, cap=None) -> np.ndarray:
+    """Annual note rate for every loan and month, shaped (loans, months)
+
+    Fixed loans pass `fixed_rate` (scalar or per loan). Floating loans pass `index_path`
+    (a current index value, a forward curve of length `months`, or one path per loan)
+    plus `spread`, optionally bounded by a `floor` and `cap`.
+    """
+    if (fixed_rate is None) == (index_path is None):
+        raise ValueError("Pass either fixed_rate or index_path")
+    if fixed_rate is not None:
+        rates = np.broadcast_to(np.asarray(fixed_rate, dtype=np.float64).reshape(-1, 1), (loans, months))
+        return np.array(rates)
+
+    index_path = np.asarray(index_path, dtype=np.float64)
+    if index_path.ndim == 1:
+        index_path = index_path[np.newaxis, :]
+    spread = np.asarray(spread, dtype=np.float64).reshape(-1, 1)
+    rates = np.broadcast_to(index_path + spread, (loans, months)).copy()
+    if floor is not None:
+        np.maximum(rates, np.asarray(floor, dtype=np.float64).reshape(-1, 1), out=rates)
+    if cap is not None:
+        np.minimum(rates, np.asarray(cap, dtype=np.float64).reshape(-1, 1), out=rates)
+    return rates
+
+
+def debt_service_schedule(principal, annual_rates: np.ndarray, term_months, amortization_months=360,
+                          interest_only_months=0) -> Dict[str, np.ndarray]:
+    """Monthly debt service of many loans at once, one row per loan
+
+    `annual_rates` is (loans, months) from `rate_paths`; the schedule runs for as many
+    months as it has columns. Each loan pays interest only for `interest_only_months`
+    (or its whole term when `amortization_months` is 0), then a level payment over the
+    remaining amortization, re-sized each month so floating-rate loans re-amortize as
+    their rate resets. Whatever is unpaid at `term_months` is due as a balloon.
+
+    Returns (loans, months) arrays 'payment', 'interest', 'principal',
+    'beginning_balance' and 'balance', and per-loan 'balloon' and 'maturity_month'.
+    Months after maturity are zero.
+    """
+    rates = np.asarray(annual_rates, dtype=np.float64)
+    loans, months = rates.shape
+    balance = np.broadcast_to(np.asarray(principal, dtype=np.float64), (loans,)).copy()
+    term = np.broadcast_to(np.asarray(term_months), (loans,))
+    amortization = np.broadcast_to(np.asarray(amortization_months), (loans,))
+    interest_only = np.broadcast_to(np.asarray(interest_only_months), (loans,))
+    if np.any(term > months):
+        raise ValueError(f"Loan terms run past the {months} months of rates supplied")
+
+    schedule = {name: np.zeros((loans, months)) for name in ('payment', 'interest', 'principal',
+                                                             'beginning_balance', 'balance')}
+    balloon = np.zeros(loans)
+    for month in range(months):
+        outstanding = month < term
+        schedule['beginning_balance'][:, month] = balance
+        interest = balance * rates[:, month] / 12
+
+        amortizing = (amortization > 0) & (month >= interest_only)
+        remaining = np.maximum(amortization - (month - interest_only), 1)
+        level = level_payment(balance, rates[:, month], remaining)
+        principal_paid = np.where(amortizing, np.clip(level - interest, 0, balance), 0.0)
+
+        interest = np.where(outstanding, interest, 0.0)
+        principal_paid = np.where(outstanding, principal_paid, 0.0)
+        balance = balance - principal_paid
+
+        maturing = month == term - 1
+        balloon = np.where(maturing, balance, balloon)
+        balance = np.where(maturing, 0.0, balance)
+
+        schedule['interest'][:, month] = interest
+        schedule['principal'][:, month] = principal_paid
+        schedule['payment'][:, month] = interest + principal_paid
+        schedule['balance'][:, month] = balance
+
+    schedule['balloon'] = balloon
+    schedule['maturity_month'] = np.array(term)
+    return schedule
+
+
+def noi_path(annual_noi, months: int, growth=0.0) -> np.ndarray:
+    """Monthly NOI per loan, (loans, months), growing at `growth` a year"""
+    annual_noi = np.atleast_1d(np.asarray(annual_noi, dtype=np.float64)).reshape(-1, 1)
+    growth = np.asarray(growth, dtype=np.float64).reshape(-1, 1)
+    return annual_noi / 12 * (1 + growth) ** (np.arange(months) / 12)
+
+
+def _trailing(values: np.ndarray, window: int) -> np.ndarray:
+    totals = np.cumsum(values, axis=1)
+    totals[:, window:] -= totals[:, :-window].copy()
+    return totals
+
+
+def coverage_metrics(schedule: Dict[str, np.ndarray], monthly_noi: np.ndarray, window: int = 12) -> Dict[str, np.ndarray]:
+    """DSCR and debt yield time series per loan on trailing `window`-month totals
+
+    DSCR is trailing NOI over trailing debt service; debt yield is trailing NOI,
+    annualized, over the balance at the start of the month. Both are NaN once the
+    loan has matured.
+    """
+    months = schedule['payment'].shape[1]
+    observed = np.minimum(np.arange(1, months + 1), window)
+    noi = _trailing(np.broadcast_to(monthly_noi, schedule['payment'].shape), window)
+    debt_service = _trailing(schedule['payment'], window)
+    outstanding = np.arange(months) < schedule['maturity_month'][:, np.newaxis]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dscr = np.where(outstanding & (debt_service > 0), noi / debt_service, np.nan)
+        debt_yield = np.where(outstanding & (schedule['beginning_balance'] > 0),
+                              noi * 12 / observed / schedule['beginning_balance'], np.nan)
+    return {'dscr': dscr, 'debt_yield': debt_yield}
+
+
+def covenant_breaches(metrics: Dict[str, np.ndarray], min_dscr: float = 1.25,
+                      min_debt_yield: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """Months each loan is out of covenant, and the first such month (1-based, 0 if never)"""
+    breach = metrics['dscr'] < min_dscr
+    if min_debt_yield is not None:
+        breach |= metrics['debt_yield'] < min_debt_yield
+    breached = breach.any(axis=1)
+    return {
+        'breach': breach,
+        'breached': breached,
+        'breach_months': breach.sum(axis=1),
+        'first_breach_month': np.where(breached, breach.argmax(axis=1) + 1, 0),
+    }
@@ -0,0 +1,168 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+from compression import ContentCodec, CODEC_ZLIB
+from metrics import CACHE_REQUESTS
+
+# Sections are split on blank lines. Most paragraphs are static prose shared by every deck;
+# only the few embedding live values or timestamps differ, so deduplicating per paragraph
+# rather than per section keeps those from defeating the whole section.
+CHUNK_SEPARATOR = '\n\n'
+
+
+def content_hash(text: str) -> str:
+    """Content address of a chunk: 128-bit BLAKE2b of its UTF-8 bytes"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SectionBlobStore:
+    """Content-addressed store for section bodies, shared across documents and versions
+
+    Section content is split into paragraph chunks; each unique chunk is stored once in
+    the blob collection (hash -> compressed body) and documents keep only the ordered
+    list of chunk hashes in `content_chunks`. Blobs are immutable, so a process-local
+    LRU of known hashes and decompressed bodies is always safe to serve from, and a blob
+    is only decompressed when a read actually needs its text.
+    """
+
+    def __init__(self, collection, codec: Optional[ContentCodec] = None, cache_size: int = 20000):
+        self.collection = collection
+        self.codec = codec or ContentCodec()
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    # --- blob level -----------------------------------------------------------------
+
+    def _remember(self, digest: str, text: str):
+        with self._lock:
+            self._cache[digest] = text
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _lookup(self, digests: Iterable[str]) -> Dict[str, str]:
+        """Return the cached subset of `digests`, recording hits and misses once per batch"""
+        found: Dict[str, str] = {}
+        requested = 0
+        with self._lock:
+            for digest in digests:
+                requested += 1
+                text = self._cache.get(digest)
+                if text is not None:
+                    self._cache.move_to_end(digest)
+                    found[digest] = text
+        if found:
+            CACHE_REQUESTS.inc(len(found), cache='section_blobs', result='hit')
+        if requested > len(found):
+            CACHE_REQUESTS.inc(requested - len(found), cache='section_blobs', result='miss')
+        return found
+
+    def put_many(self, chunks: Iterable[str]) -> List[str]:
+        """Store chunks that are not stored yet and return their hashes in order"""
+        by_digest: Dict[str, str] = {}
+        digests = []
+        for text in chunks:
+            digest = content_hash(text)
+            digests.append(digest)
+            by_digest[digest] = text
+        known = self._lookup(by_digest)
+        pending = {digest: text for digest, text in by_digest.items() if digest not in known}
+
+        if pending:
+            existing = {doc['_id'] for doc in self.collection.find({'_id': {'$in': list(pending)}}, {'_id': 1})}
+            missing = []
+            for digest, text in pending.items():
+                if digest not in existing:
+                    codec, body = self.codec.encode(text)
+                    missing.append({'_id': digest, 'codec': codec, 'body': body, 'size': len(text)})
+            if missing:
+                try:
+                    self.collection.insert_many(missing, ordered=False)
+                except BulkWriteError as e:
+                    # A concurrent writer stored the same blob first; content addressing makes that harmless
+                    if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                        raise
+            for digest, text in pending.items():
+                self._remember(digest, text)
+
+        return digests
+
+    def get_many(self, digests: Iterable[str]) -> Dict[str, str]:
+        """Resolve hashes to chunk text, reading only uncached blobs from MongoDB"""
+        unique = list(dict.fromkeys(digests))
+        resolved = self._lookup(unique)
+        missing = [digest for digest in unique if digest not in resolved]
+
+        if missing:
+            for doc in self.collection.find({'_id': {'$in': missing}}):
+                # Blobs written before codecs were recorded are zlib
+                text = self.codec.decode(doc.get('codec', CODEC_ZLIB), doc['body'])
+                resolved[doc['_id']] = text
+                self._remember(doc['_id'], text)
+
+        absent = [digest for digest in missing if digest not in resolved]
+        if absent:
+            raise KeyError(f"Missing section blobs: {absent[:5]}")
+        return resolved
+
+    def sample_content(self, limit: int = 5000) -> List[str]:
+        """Decoded chunk bodies for training a compression dictionary"""
+        return [
+            self.codec.decode(doc.get('codec', CODEC_ZLIB), doc['body'])
+            for doc in self.collection.find({}, {'codec': 1, 'body': 1}, limit=limit)
+        ]
+
+    # --- document level -------------------------------------------------------------
+
+    def dehydrate(self, doc_dict: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace section content with chunk hashes before a document is written"""
+        sections = doc_dict.get('sections', [])
+        return {**doc_dict, 'sections': [self._dehydrate_section(section) for section in sections]}
+
+    def _dehydrate_section(self, section: Dict[str, Any]) -> Dict[str, Any]:
+        if 'content' not in section:
+            return section
+        result = {}
+        for key, value in section.items():
+            if key == 'content':
+                result['content_chunks'] = self.put_many(value.split(CHUNK_SEPARATOR))
+            elif key == 'subsections':
+                result[key] = [self._dehydrate_section(sub) for sub in value]
+            else:
+                result[key] = value
+        return result
+
+    def hydrate(self, doc_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Restore section content from chunk hashes after a document is read"""
+        digests = []
+        for section in doc_data.get('sections', []):
+            self._collect(section, digests)
+        if not digests:
+            return doc_data
+
+        blobs = self.get_many(digests)
+        doc_data['sections'] = [self._hydrate_section(section, blobs) for section in doc_data['sections']]
+        return doc_data
+
+    def _collect(self, section: Dict[str, Any], digests: List[str]):
+        digests.extend(section.get('content_chunks', []))
+        for sub in section.get('subsections', []):
+            self._collect(sub, digests)
+
+    def _hydrate_section(self, section: Dict[str, Any], blobs: Dict[str, str]) -> Dict[str, Any]:
+        if 'content_chunks' not in section and not section.get('subsections'):
+            return section
+        result = {}
+        for key, value in section.items():
+            if key == 'content_chunks':
+                result['content'] = CHUNK_SEPARATOR.join(blobs[digest] for digest in value)
+            elif key == 'subsections':
+                result[key] = [self._hydrate_section(sub, blobs) for sub in value]
+            else:
+                result[key] = value
+        return result
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from contextlib import suppress
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from starlette.requests import Request
+
+from metrics import CANCELLED_REQUESTS
+
+T = TypeVar('T')
+
+REASON_DISCONNECTED = 'client_disconnected'
+REASON_DEADLINE = 'deadline_exceeded'
+
+
+class RequestCancelled(Exception):
+    """Raised when work is abandoned because its client went away or its deadline passed"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Request cancelled: {reason}")
+        self.reason = reason
+
+
+class CancellationToken:
+    """Cooperative cancellation signal with an optional deadline
+
+    Async code is cancelled outright by `run_cancellable`; synchronous stages (rendering,
+    export, MongoDB writes) block the event loop, so they call `check()` between steps
+    instead. The deadline is read from the clock, so it fires even while the loop is busy.
+    A token bound to a request also notices a disconnected client at `poll()`.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, request: Optional[Request] = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.request = request
+        self._reason: Optional[str] = None
+
+    def cancel(self, reason: str):
+        if self._reason is None:
+            self._reason = reason
+
+    @property
+    def reason(self) -> Optional[str]:
+        if self._reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self._reason = REASON_DEADLINE
+        return self._reason
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None without one"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        if self.cancelled:
+            raise RequestCancelled(self.reason)
+
+    async def poll(self):
+        """`check()`, first asking the bound request whether its client has gone"""
+        if self._reason is None and self.request is not None and await self.request.is_disconnected():
+            self.cancel(REASON_DISCONNECTED)
+        self.check()
+
+
+async def _wait_for_disconnect(request: Request):
+    while True:
+        message = await request.receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def run_checkpointed(request: Request, work: Callable[[CancellationToken], Awaitable[T]],
+                           timeout: Optional[float], operation: str) -> T:
+    """Run `work(token)` in the calling task, cancelling only at the checkpoints it polls
+
+    For short operations, where a disconnect watcher and a separate task per request
+    cost more than the work they could save: the client is checked once up front and
+    again wherever the work calls `token.poll()`, and the deadline wherever it checks.
+    """
+    token = CancellationToken(timeout, request)
+    try:
+        await token.poll()
+        return await work(token)
+    except RequestCancelled as e:
+        CANCELLED_REQUESTS.inc(operation=operation, reason=e.reason)
+        raise
+
+
+async def run_cancellable(request: Request, work: Callable[[CancellationToken], Awaitable[T]],
+                          timeout: Optional[float], operation: str) -> T:
+    """Run `work(token)` until it finishes, the client disconnects or `timeout` passes
+
+    For long-running operations: the work runs as its own task beside a watcher on the
+    receive channel. On disconnect or deadline the token is cancelled and the work task is cancelled at
+    its next await, so upstream fetches and sockets are released immediately, then
+    RequestCancelled is raised.
+    """
+    token = CancellationToken(timeout)
+    task = asyncio.ensure_future(work(token))
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait({task, watcher}, timeout=token.remaining(),
+                                     return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        watcher.cancel()
+        raise
+
+    if task in done:
+        watcher.cancel()
+        try:
+            return task.result()
+        except RequestCancelled as e:
+            CANCELLED_REQUESTS.inc(operation=operation, reason=e.reason)
+            raise
+
+    token.cancel(REASON_DISCONNECTED if watcher in done else REASON_DEADLINE)
+    watcher.cancel()
+    task.cancel()
+    # Let the work run its cleanup (releasing claims, closing sessions) before returning
+    with suppress(asyncio.CancelledError, Exception):
+        await task
+    CANCELLED_REQUESTS.inc(operation=operation, reason=token.reason)
+    raise RequestCancelled(token.reason)
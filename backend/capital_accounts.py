@@ -0,0 +1,315 @@
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from models import EVENT_TYPES, MAX_QUARTER, SIGNED_EVENT_TYPES
+
+logger = logging.getLogger(__name__)
+
+# How each event type (models.EVENT_TYPES) moves the capital account: contributions in,
+# distributions, fees and carry out, and allocations of fund gains and losses either way.
+# Commitments only set what an LP may be called for.
+ACCOUNT_SIGNS = {'contribution': 1.0, 'distribution': -1.0, 'management_fee': -1.0, 'carried_interest': -1.0,
+                 'allocation': 1.0}
+
+# Management fee terms from the fund documents
+COMMITMENT_PERIOD_QUARTERS = 20
+COMMITTED_FEE_RATE = 0.02
+INVESTED_FEE_RATE = 0.015
+
+
+def type_codes(types: Sequence[str]) -> np.ndarray:
+    """Index of each event type in EVENT_TYPES"""
+    lookup = {name: code for code, name in enumerate(EVENT_TYPES)}
+    try:
+        return np.array([lookup[name] for name in types], dtype=np.int64)
+    except KeyError as e:
+        raise ValueError(f"Unknown ledger event type {e.args[0]!r}; expected one of {', '.join(EVENT_TYPES)}")
+
+
+def event_totals(lp_index: np.ndarray, quarters: np.ndarray, codes: np.ndarray, amounts: np.ndarray,
+                 lp_count: int, quarter_count: int, base: Optional[np.ndarray] = None) -> np.ndarray:
+    """Cumulative totals per event type, LP and quarter, shaped (types, lps, quarters)
+
+    Events are scattered into quarter buckets in one pass and accumulated along the
+    quarter axis, so the cost is one pass over the events plus one over the grid.
+    `base` (types, lps) carries totals brought forward from a snapshot.
+    """
+    totals = np.zeros((len(EVENT_TYPES), lp_count, quarter_count))
+    np.add.at(totals, (codes, lp_index, quarters), amounts)
+    np.cumsum(totals, axis=2, out=totals)
+    if base is not None:
+        totals += base[:, :, np.newaxis]
+    return totals
+
+
+def account_metrics(totals: np.ndarray) -> Dict[str, np.ndarray]:
+    """Capital account balances and multiples from cumulative event totals
+
+    Works on any trailing shape: (types, lps, quarters) grids or (types, lps) snapshots.
+    Paid-in is contributions; the capital account (NAV) is contributions less
+    distributions, fees and carry plus allocations. DPI, RVPI and TVPI are NaN until
+    capital is paid in.
+    """
+    by_type = dict(zip(EVENT_TYPES, totals))
+    balance = sum(sign * by_type[name] for name, sign in ACCOUNT_SIGNS.items())
+    paid_in = by_type['contribution']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dpi = np.where(paid_in > 0, by_type['distribution'] / paid_in, np.nan)
+        rvpi = np.where(paid_in > 0, balance / paid_in, np.nan)
+    return {
+        'committed': by_type['commitment'],
+        'paid_in': paid_in,
+        'unfunded': by_type['commitment'] - paid_in,
+        'distributions': by_type['distribution'],
+        'management_fees': by_type['management_fee'],
+        'carried_interest': by_type['carried_interest'],
+        'allocations': by_type['allocation'],
+        'capital_account': balance,
+        'dpi': dpi,
+        'rvpi': rvpi,
+        'tvpi': dpi + rvpi,
+    }
+
+
+def management_fees(committed, invested, quarters, commitment_period_quarters: int = COMMITMENT_PERIOD_QUARTERS,
+                    committed_rate: float = COMMITTED_FEE_RATE, invested_rate: float = INVESTED_FEE_RATE) -> np.ndarray:
+    """Quarterly management fee: `committed_rate` a year on committed capital through the
+    commitment period, then `invested_rate` on invested capital (paid-in less
+    distributions, floored at zero)
+
+    Arguments broadcast, so (lps, quarters) balance grids with `quarters` as
+    np.arange(quarter_count) price a whole fund history in one call.
+    """
+    committed = np.asarray(committed, dtype=np.float64)
+    invested = np.asarray(invested, dtype=np.float64)
+    return np.where(np.asarray(quarters) < commitment_period_quarters, committed * committed_rate,
+                    np.maximum(invested, 0) * invested_rate) / 4
+
+
+def check_quarter(quarter: int):
+    """Reject quarters outside 0..MAX_QUARTER; replays allocate a column per quarter"""
+    if quarter < 0:
+        raise ValueError("Quarters are numbered from 0")
+    if quarter > MAX_QUARTER:
+        raise ValueError(f"Quarters run to at most {MAX_QUARTER}")
+
+
+def check_events(events: Sequence[Dict[str, Any]]):
+    """Reject unknown event types, out of range quarters and negative amounts on unsigned types"""
+    type_codes([event['type'] for event in events])
+    for event in events:
+        check_quarter(event['quarter'])
+        if event['amount'] < 0 and event['type'] not in SIGNED_EVENT_TYPES:
+            raise ValueError(f"{event['type']} amounts cannot be negative; got {event['amount']} for LP {event['lp_id']!r}")
+
+
+class CapitalLedger:
+    """Event-sourced LP capital accounts with quarterly snapshots
+
+    Events are appended, numbered per fund from a counter in `heads_collection`, and
+    never rewritten. Closing a quarter stores a snapshot of every LP's cumulative
+    totals, so balances as of a closed quarter are one document read; later quarters
+    replay only the events since the latest snapshot. Closed quarters are locked
+    against new events.
+
+    Writes to a fund (appends, fee accruals and closes) hold a lease on the fund's head
+    document, so checking the closed quarter and inserting events cannot interleave
+    with a close, from this process or another. A writer that dies keeps the lease for
+    at most `lock_seconds`.
+    """
+
+    def __init__(self, events_collection, snapshots_collection, heads_collection, lock_seconds: int = 30,
+                 lock_timeout: float = 10.0):
+        self.events = events_collection
+        self.snapshots = snapshots_collection
+        self.heads = heads_collection
+        self.lock_seconds = lock_seconds
+        self.lock_timeout = lock_timeout
+
+    def ensure_indexes(self):
+        self.events.create_index([('fund_id', 1), ('sequence', 1)], unique=True)
+        self.events.create_index([('fund_id', 1), ('quarter', 1)])
+        self.snapshots.create_index([('fund_id', 1), ('quarter', 1)], unique=True)
+
+    def head_sequence(self, fund_id: str) -> int:
+        head = self.heads.find_one({'_id': fund_id})
+        return head['sequence'] if head else 0
+
+    def closed_quarter(self, fund_id: str) -> int:
+        """Latest closed quarter, or -1 if none is"""
+        latest = self.snapshots.find_one({'fund_id': fund_id}, {'quarter': 1}, sort=[('quarter', -1)])
+        return latest['quarter'] if latest else -1
+
+    @contextmanager
+    def _writing(self, fund_id: str):
+        """Hold the fund's write lease; raises TimeoutError if another writer keeps it past `lock_timeout`"""
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            now = datetime.now()
+            try:
+                acquired = self.heads.find_one_and_update(
+                    {'_id': fund_id, '$or': [{'lock': None}, {'lock.expires_at': {'$lt': now}}]},
+                    {'$set': {'lock': {'token': token, 'expires_at': now + timedelta(seconds=self.lock_seconds)}}},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                # The head exists and its lease is held: the upsert lost
+                acquired = False
+            if acquired is not False:
+                break
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Ledger for fund {fund_id} is busy; retry shortly")
+            time.sleep(0.05)
+        try:
+            yield
+        finally:
+            self.heads.update_one({'_id': fund_id, 'lock.token': token}, {'$unset': {'lock': ''}})
+
+    def append(self, fund_id: str, events: List[Dict[str, Any]]) -> List[int]:
+        """Append events (lp_id, quarter, type, amount) and return their sequence numbers"""
+        if not events:
+            return []
+        check_events(events)
+        with self._writing(fund_id):
+            return self._append(fund_id, events)
+
+    def _append(self, fund_id: str, events: List[Dict[str, Any]]) -> List[int]:
+        closed = self.closed_quarter(fund_id)
+        locked = [event for event in events if event['quarter'] <= closed]
+        if locked:
+            raise ValueError(f"Quarter {locked[0]['quarter']} is closed; post an adjusting event in an open quarter")
+
+        # Reserve a block of sequence numbers atomically so concurrent writers never collide
+        head = self.heads.find_one_and_update(
+            {'_id': fund_id}, {'$inc': {'sequence': len(events)}}, upsert=True, return_document=ReturnDocument.AFTER
+        )['sequence'] - len(events)
+        now = datetime.now()
+        entries = [{
+            '_id': f"{fund_id}:{head + offset}",
+            'fund_id': fund_id,
+            'sequence': head + offset,
+            'lp_id': event['lp_id'],
+            'quarter': int(event['quarter']),
+            'type': event['type'],
+            'amount': float(event['amount']),
+            'created_at': now,
+        } for offset, event in enumerate(events, start=1)]
+        self.events.insert_many(entries)
+        return [entry['sequence'] for entry in entries]
+
+    def _snapshot_before(self, fund_id: str, quarter: int) -> Optional[Dict[str, Any]]:
+        return self.snapshots.find_one({'fund_id': fund_id, 'quarter': {'$lte': quarter}}, sort=[('quarter', -1)])
+
+    def _replay(self, fund_id: str, snapshot: Optional[Dict[str, Any]], through_quarter: int):
+        """LP ids and (types, lps, quarters) totals from `snapshot` through `through_quarter`"""
+        start = snapshot['quarter'] + 1 if snapshot else 0
+        events = list(self.events.find(
+            {'fund_id': fund_id, 'quarter': {'$gte': start, '$lte': through_quarter}},
+            {'_id': 0, 'lp_id': 1, 'quarter': 1, 'type': 1, 'amount': 1}
+        ))
+        lp_ids = list(snapshot['lp_ids']) if snapshot else []
+        known = set(lp_ids)
+        for event in events:
+            if event['lp_id'] not in known:
+                known.add(event['lp_id'])
+                lp_ids.append(event['lp_id'])
+        positions = {lp_id: index for index, lp_id in enumerate(lp_ids)}
+
+        base = np.zeros((len(EVENT_TYPES), len(lp_ids)))
+        if snapshot:
+            for code, name in enumerate(EVENT_TYPES):
+                base[code, :len(snapshot['lp_ids'])] = snapshot['totals'][name]
+        totals = event_totals(
+            np.array([positions[event['lp_id']] for event in events], dtype=np.int64),
+            np.array([event['quarter'] - start for event in events], dtype=np.int64),
+            type_codes([event['type'] for event in events]),
+            np.array([event['amount'] for event in events], dtype=np.float64),
+            len(lp_ids), through_quarter - start + 1, base
+        )
+        return lp_ids, start, totals
+
+    def close_quarter(self, fund_id: str, quarter: int) -> int:
+        """Snapshot every quarter from the last closed one through `quarter`; returns how many were written"""
+        check_quarter(quarter)
+        with self._writing(fund_id):
+            return self._close_quarter(fund_id, quarter)
+
+    def _close_quarter(self, fund_id: str, quarter: int) -> int:
+        snapshot = self._snapshot_before(fund_id, quarter)
+        if snapshot and snapshot['quarter'] == quarter:
+            return 0
+        if self.closed_quarter(fund_id) > quarter:
+            raise ValueError(f"Quarter {quarter} precedes the latest closed quarter")
+        lp_ids, start, totals = self._replay(fund_id, snapshot, quarter)
+        now = datetime.now()
+        self.snapshots.insert_many([{
+            '_id': f"{fund_id}:{start + offset}",
+            'fund_id': fund_id,
+            'quarter': start + offset,
+            'lp_ids': lp_ids,
+            'totals': {name: totals[code, :, offset].tolist() for code, name in enumerate(EVENT_TYPES)},
+            'created_at': now,
+        } for offset in range(totals.shape[2])])
+        logger.info(f"Closed quarters {start}-{quarter} of fund {fund_id} for {len(lp_ids)} LPs")
+        return totals.shape[2]
+
+    def balances(self, fund_id: str, quarter: int, lp_ids: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Every LP's (or the given LPs') capital account as of the end of `quarter`"""
+        check_quarter(quarter)
+        snapshot = self._snapshot_before(fund_id, quarter)
+        if snapshot and snapshot['quarter'] == quarter:
+            ids = snapshot['lp_ids']
+            totals = np.array([snapshot['totals'][name] for name in EVENT_TYPES], dtype=np.float64).reshape(
+                len(EVENT_TYPES), len(ids))
+        else:
+            ids, _, grid = self._replay(fund_id, snapshot, quarter)
+            totals = grid[:, :, -1]
+        if lp_ids is not None:
+            positions = {lp_id: index for index, lp_id in enumerate(ids)}
+            missing = [lp_id for lp_id in lp_ids if lp_id not in positions]
+            if missing:
+                raise KeyError(f"No ledger events for LP {missing[0]!r} through quarter {quarter}")
+            totals = totals[:, [positions[lp_id] for lp_id in lp_ids]]
+            ids = list(lp_ids)
+        return {'lp_ids': list(ids), 'quarter': quarter, 'metrics': account_metrics(totals)}
+
+    def history(self, fund_id: str, through_quarter: int) -> Dict[str, Any]:
+        """Every LP's capital account at the end of every quarter, (lps, quarters) per metric"""
+        check_quarter(through_quarter)
+        lp_ids, _, totals = self._replay(fund_id, None, through_quarter)
+        return {'lp_ids': lp_ids, 'quarters': through_quarter + 1, 'metrics': account_metrics(totals)}
+
+    def accrue_management_fees(self, fund_id: str, quarter: int,
+                               commitment_period_quarters: int = COMMITMENT_PERIOD_QUARTERS,
+                               committed_rate: float = COMMITTED_FEE_RATE,
+                               invested_rate: float = INVESTED_FEE_RATE) -> Dict[str, float]:
+        """Post every LP's management fee for `quarter`, on balances at the end of the prior quarter
+
+        A quarter is charged once: if it already has management fee events, nothing is
+        posted and a ValueError is raised, so a retried request cannot double-charge.
+        """
+        if quarter < 1:
+            raise ValueError("Fees accrue from quarter 1, on balances at the end of quarter 0")
+        check_quarter(quarter)
+        with self._writing(fund_id):
+            if self.events.find_one({'fund_id': fund_id, 'quarter': quarter, 'type': 'management_fee'}, {'_id': 1}):
+                raise ValueError(f"Management fees for quarter {quarter} of fund {fund_id} are already posted")
+            accounts = self.balances(fund_id, quarter - 1)
+            metrics = accounts['metrics']
+            invested = metrics['paid_in'] - metrics['distributions']
+            fees = management_fees(metrics['committed'], invested, quarter, commitment_period_quarters,
+                                   committed_rate, invested_rate)
+            charged = {lp_id: round(float(fee), 2) for lp_id, fee in zip(accounts['lp_ids'], fees) if fee > 0}
+            if charged:
+                self._append(fund_id, [{'lp_id': lp_id, 'quarter': quarter, 'type': 'management_fee', 'amount': fee}
+                                       for lp_id, fee in charged.items()])
+            return charged
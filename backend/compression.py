@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is optional, zlib is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+CODEC_ZLIB = 'zlib'
+CODEC_ZSTD = 'zstd'
+# Dictionary codecs are named 'zstd-dict:<dictionary id>'
+CODEC_ZSTD_DICT_PREFIX = 'zstd-dict:'
+
+
+class ContentCodec:
+    """Compresses stored section content with zstd and an optional trained dictionary
+
+    Section chunks are short paragraphs of highly repetitive deck prose, which is where
+    a dictionary trained on our own corpus pays off most: plain compressors have too
+    little input per chunk to learn from. Dictionaries are persisted in MongoDB so every
+    worker can decode what any other worker wrote; each stored body records the codec it
+    was written with, so older zlib blobs keep decoding after a dictionary is introduced.
+    A dictionary trained by another worker is adopted for writing within
+    `reload_interval` seconds, or as soon as this worker reads a body written with it.
+    Without the zstandard package everything falls back to zlib.
+    """
+
+    def __init__(self, dictionary_collection=None, level: int = 6, use_zstd: bool = True,
+                 reload_interval: float = 60.0):
+        self.dictionary_collection = dictionary_collection
+        self.level = level
+        self.use_zstd = use_zstd
+        self.reload_interval = reload_interval
+        self.active_dictionary_id: Optional[int] = None
+        self._loaded_at = time.monotonic()
+        self._dictionaries: Dict[int, 'zstandard.ZstdCompressionDict'] = {}
+        self._compressors: Dict[Tuple[int, Optional[int]], 'zstandard.ZstdCompressor'] = {}
+        self._decompressors: Dict[Tuple[int, Optional[int]], 'zstandard.ZstdDecompressor'] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return zstandard is not None
+
+    # --- dictionaries ---------------------------------------------------------------
+
+    def load_active_dictionary(self) -> Optional[int]:
+        """Adopt the most recently trained dictionary from MongoDB, if any"""
+        if not self.available or self.dictionary_collection is None:
+            return None
+        self._loaded_at = time.monotonic()
+        latest = self.dictionary_collection.find_one({}, sort=[('created_at', -1)])
+        if latest:
+            self._register(zstandard.ZstdCompressionDict(latest['data']))
+            self.active_dictionary_id = latest['_id']
+        return self.active_dictionary_id
+
+    def _reload_active_dictionary(self):
+        try:
+            previous = self.active_dictionary_id
+            if self.load_active_dictionary() != previous:
+                logger.info(f"Switched to zstd content dictionary {self.active_dictionary_id}")
+        except Exception as e:
+            logger.error(f"Error reloading content compression dictionary: {e}")
+
+    def train(self, samples: Iterable[str], dict_size: int = 16384) -> Dict:
+        """Train a dictionary on content samples, persist it and make it active"""
+        if not self.available:
+            raise RuntimeError("zstandard is not installed")
+        encoded = [sample.encode('utf-8') for sample in samples if sample]
+        dictionary = zstandard.train_dictionary(dict_size, encoded, level=self.level)
+        dictionary_id = dictionary.dict_id()
+        self._register(dictionary)
+        self._loaded_at = time.monotonic()
+
+        if self.dictionary_collection is not None:
+            self.dictionary_collection.replace_one(
+                {'_id': dictionary_id},
+                {
+                    '_id': dictionary_id,
+                    'data': dictionary.as_bytes(),
+                    'size': len(dictionary.as_bytes()),
+                    'samples': len(encoded),
+                    'created_at': datetime.now(),
+                },
+                upsert=True
+            )
+        self.active_dictionary_id = dictionary_id
+        logger.info(f"Trained zstd dictionary {dictionary_id} on {len(encoded)} samples")
+        return {'dictionary_id': dictionary_id, 'size': len(dictionary.as_bytes()), 'samples': len(encoded)}
+
+    def _register(self, dictionary: 'zstandard.ZstdCompressionDict'):
+        with self._lock:
+            self._dictionaries[dictionary.dict_id()] = dictionary
+
+    def _dictionary(self, dictionary_id: int) -> 'zstandard.ZstdCompressionDict':
+        with self._lock:
+            dictionary = self._dictionaries.get(dictionary_id)
+        if dictionary is None and self.dictionary_collection is not None:
+            stored = self.dictionary_collection.find_one({'_id': dictionary_id})
+            if stored:
+                dictionary = zstandard.ZstdCompressionDict(stored['data'])
+                self._register(dictionary)
+                # Another worker trained it, so it may be newer than the one we write with
+                self._reload_active_dictionary()
+        if dictionary is None:
+            raise KeyError(f"Unknown zstd dictionary {dictionary_id}")
+        return dictionary
+
+    # zstd (de)compressor objects are not thread-safe, so one per thread and dictionary
+    def _compressor(self, dictionary_id: Optional[int]) -> 'zstandard.ZstdCompressor':
+        key = (threading.get_ident(), dictionary_id)
+        compressor = self._compressors.get(key)
+        if compressor is None:
+            dictionary = self._dictionary(dictionary_id) if dictionary_id is not None else None
+            compressor = zstandard.ZstdCompressor(level=self.level, dict_data=dictionary, write_content_size=True)
+            self._compressors[key] = compressor
+        return compressor
+
+    def _decompressor(self, dictionary_id: Optional[int]) -> 'zstandard.ZstdDecompressor':
+        key = (threading.get_ident(), dictionary_id)
+        decompressor = self._decompressors.get(key)
+        if decompressor is None:
+            dictionary = self._dictionary(dictionary_id) if dictionary_id is not None else None
+            decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+            self._decompressors[key] = decompressor
+        return decompressor
+
+    # --- codec ----------------------------------------------------------------------
+
+    def encode(self, text: str) -> Tuple[str, bytes]:
+        """Compress text, returning the codec name to store alongside the body"""
+        data = text.encode('utf-8')
+        if not (self.available and self.use_zstd):
+            return CODEC_ZLIB, zlib.compress(data, self.level)
+        if self.dictionary_collection is not None and time.monotonic() - self._loaded_at > self.reload_interval:
+            self._reload_active_dictionary()
+        if self.active_dictionary_id is not None:
+            codec = f"{CODEC_ZSTD_DICT_PREFIX}{self.active_dictionary_id}"
+            return codec, self._compressor(self.active_dictionary_id).compress(data)
+        return CODEC_ZSTD, self._compressor(None).compress(data)
+
+    def decode(self, codec: str, body: bytes) -> str:
+        if codec == CODEC_ZLIB:
+            return zlib.decompress(body).decode('utf-8')
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to decode {codec} content")
+        if codec == CODEC_ZSTD:
+            return self._decompressor(None).decompress(body).decode('utf-8')
+        if codec.startswith(CODEC_ZSTD_DICT_PREFIX):
+            dictionary_id = int(codec[len(CODEC_ZSTD_DICT_PREFIX):])
+            return self._decompressor(dictionary_id).decompress(body).decode('utf-8')
+        raise ValueError(f"Unknown content codec {codec!r}")
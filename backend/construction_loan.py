@@ -0,0 +1,181 @@
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from amortization import amortization_schedule, level_payment
+from models import ConstructionBudgetLine
+
+logger = logging.getLogger(__name__)
+
+# The Development Pro Forma cost breakdown; interest during construction is not a budget
+# line because the engine computes it
+DEFAULT_BUDGET = [
+    ConstructionBudgetLine(name='Land/Acquisition Cost', amount=15000000, start_month=0, duration_months=1),
+    ConstructionBudgetLine(name='Data Center Conversion', amount=18000000, start_month=2, duration_months=14,
+                           curve='s_curve'),
+    ConstructionBudgetLine(name='EV Charging Infrastructure', amount=4500000, start_month=10, duration_months=8,
+                           curve='s_curve'),
+    ConstructionBudgetLine(name='Soft Costs', amount=2975000, start_month=0, duration_months=18),
+    ConstructionBudgetLine(name='Contingency', amount=1600000, start_month=4, duration_months=14, curve='s_curve'),
+]
+STABILIZATION_MONTHS = 12
+
+CURVES = ('straight', 's_curve')
+
+
+def _curve_weights(curve: str, duration: int) -> np.ndarray:
+    if curve == 'straight':
+        return np.full(duration, 1 / duration)
+    if curve == 's_curve':
+        # Spending follows (1 - cos(pi x)) / 2: slow mobilization, peak mid-build, slow close-out
+        cumulative = (1 - np.cos(np.pi * np.arange(duration + 1) / duration)) / 2
+        return np.diff(cumulative)
+    raise ValueError(f"Unknown draw curve {curve!r}; expected one of {', '.join(CURVES)}")
+
+
+def completion_month(budget: Sequence[ConstructionBudgetLine]) -> int:
+    """Last month with a draw"""
+    return max(line.start_month + line.duration_months - 1 for line in budget)
+
+
+def draw_schedule(budget: Sequence[ConstructionBudgetLine], months: Optional[int] = None) -> np.ndarray:
+    """Monthly cost draws per budget line, shaped (lines, months); month 0 is loan closing"""
+    months = months or completion_month(budget) + 1
+    schedule = np.zeros((len(budget), months))
+    for index, line in enumerate(budget):
+        end = line.start_month + line.duration_months
+        if end > months:
+            raise ValueError(f"Budget line {line.name!r} draws past month {months - 1}")
+        schedule[index, line.start_month:end] = line.amount * _curve_weights(line.curve, line.duration_months)
+    return schedule
+
+
+def _compound(draws: np.ndarray, monthly_rate: np.ndarray) -> np.ndarray:
+    """Balances of loans whose interest capitalizes: b[t] = b[t-1] * (1 + r) + draws[t]"""
+    growth = (1 + monthly_rate[:, np.newaxis]) ** np.arange(draws.shape[1])
+    return growth * np.cumsum(draws / growth, axis=1)
+
+
+def run_construction_scenarios(budget: Sequence[ConstructionBudgetLine] = DEFAULT_BUDGET,
+                               cost_factors=1.0, construction_rates=0.085, loan_to_cost: float = 0.75,
+                               origination_fee: float = 0.01, conversion_month: Optional[int] = None,
+                               permanent_rate: float = 0.065, permanent_amortization_months: int = 360,
+                               permanent_max_ltv: float = 0.65, permanent_min_dscr: float = 1.25,
+                               stabilized_noi: float = 15789147, valuation_cap_rate: float = 0.065,
+                               iterations: int = 20) -> Dict[str, Any]:
+    """Fund the budget month by month for every (cost factor, construction rate) pair
+
+    `cost_factors` and `construction_rates` broadcast against each other; each resulting
+    scenario is one row of every monthly array. Equity funds draws first; the construction
+    loan (`loan_to_cost` of total cost including fees and interest) funds the rest and
+    capitalizes its interest, so the interest reserve is the interest accrued until
+    `conversion_month`. Because fees and interest are themselves part of total cost, the
+    sizing is solved by fixed-point iteration, all scenarios at once.
+
+    At conversion the balance is refinanced by a permanent loan sized to the lesser of the
+    payoff, `permanent_max_ltv` of stabilized value and the `permanent_min_dscr` constraint;
+    any gap is an equity paydown.
+    """
+    factors, rates = np.broadcast_arrays(np.atleast_1d(np.asarray(cost_factors, dtype=np.float64)),
+                                         np.atleast_1d(np.asarray(construction_rates, dtype=np.float64)))
+    completion = completion_month(budget)
+    conversion_month = conversion_month or completion + STABILIZATION_MONTHS
+    if conversion_month < completion:
+        raise ValueError(f"Conversion month {conversion_month} is before completion in month {completion}")
+
+    months = conversion_month + 1
+    line_draws = draw_schedule(budget, months).sum(axis=0)
+    costs = factors[:, np.newaxis] * line_draws
+    monthly_rate = rates / 12
+
+    interest_total = np.zeros_like(factors)
+    for _ in range(iterations):
+        total_cost = costs.sum(axis=1) + interest_total
+        commitment = loan_to_cost * total_cost / (1 - loan_to_cost * origination_fee)
+        fee = commitment * origination_fee
+        total_cost = total_cost + fee
+        equity = total_cost - commitment
+
+        # Fee is paid at closing; equity covers draws until its commitment is exhausted
+        cash_draws = costs.copy()
+        cash_draws[:, 0] += fee
+        cumulative = np.cumsum(cash_draws, axis=1)
+        loan_draws = np.diff(np.maximum(cumulative - equity[:, np.newaxis], 0), axis=1, prepend=0)
+        balance = _compound(loan_draws, monthly_rate)
+        interest = np.diff(balance - np.cumsum(loan_draws, axis=1), axis=1, prepend=0)
+
+        accrued = interest.sum(axis=1)
+        converged = np.all(np.abs(accrued - interest_total) < 0.01)
+        interest_total = accrued
+        if converged:
+            break
+
+    equity_draws = cash_draws - loan_draws
+    payoff = balance[:, -1]
+
+    stabilized_value = stabilized_noi / valuation_cap_rate
+    dscr_sized = stabilized_noi / permanent_min_dscr / 12 / level_payment(1.0, permanent_rate,
+                                                                          permanent_amortization_months)
+    permanent_loan = np.minimum(payoff, min(permanent_max_ltv * stabilized_value, float(dscr_sized)))
+    monthly_debt_service = level_payment(permanent_loan, permanent_rate, permanent_amortization_months)
+
+    return {
+        'months': months,
+        'completion_month': completion,
+        'conversion_month': conversion_month,
+        'cost_factor': factors,
+        'construction_rate': rates,
+        'cost_draws': cash_draws,
+        'equity_draws': equity_draws,
+        'loan_draws': loan_draws,
+        'interest': interest,
+        'balance': balance,
+        'total_cost': total_cost,
+        'construction_equity': equity,
+        'equity': equity + (payoff - permanent_loan),
+        'loan_commitment': commitment,
+        'origination_fee': fee,
+        'interest_reserve': interest_total,
+        'construction_payoff': payoff,
+        'permanent_loan': permanent_loan,
+        'conversion_paydown': payoff - permanent_loan,
+        'permanent_monthly_debt_service': monthly_debt_service,
+        'permanent_annual_debt_service': monthly_debt_service * 12,
+        'stabilized_dscr': stabilized_noi / (monthly_debt_service * 12),
+        'stabilized_value': stabilized_value,
+    }
+
+
+def permanent_schedule(result: Dict[str, Any], permanent_rate: float = 0.065,
+                       permanent_amortization_months: int = 360, term_months: int = 120) -> Dict[str, np.ndarray]:
+    """Monthly amortization of each scenario's permanent loan from conversion"""
+    return amortization_schedule(result['permanent_loan'], permanent_rate, permanent_amortization_months,
+                                 term_months)
+
+
+def annual_totals(monthly: np.ndarray, years: int) -> np.ndarray:
+    """Sum monthly columns into project years; closing (month 0) falls in year 1"""
+    padded = np.zeros((monthly.shape[0], years * 12 + 1))
+    width = min(monthly.shape[1], padded.shape[1])
+    padded[:, :width] = monthly[:, :width]
+    padded[:, 1] += padded[:, 0]
+    return padded[:, 1:].reshape(monthly.shape[0], years, 12).sum(axis=2)
+
+
+SUMMARY_FIELDS = (
+    'cost_factor', 'construction_rate', 'total_cost', 'construction_equity', 'equity', 'loan_commitment', 'origination_fee',
+    'interest_reserve', 'construction_payoff', 'permanent_loan', 'conversion_paydown',
+    'permanent_annual_debt_service', 'stabilized_dscr',
+)
+
+
+def scenario_table(result: Dict[str, Any]) -> List[Dict[str, float]]:
+    """One JSON-ready summary row per scenario"""
+    peak = result['balance'].max(axis=1)
+    rows = []
+    for index in range(len(result['cost_factor'])):
+        row = {field: round(float(result[field][index]), 6) for field in SUMMARY_FIELDS}
+        row['peak_balance'] = round(float(peak[index]), 2)
+        rows.append(row)
+    return rows
@@ -0,0 +1,124 @@
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+HOURS_PER_MONTH = 8760 / 12
+
+# Drivers of one case; every one broadcasts, so a call covers many sites and scenarios
+DEFAULTS = {
+    'it_capacity_mw': 8.5,              # Leasable critical IT load
+    'pue': 1.35,                        # Facility power / IT power
+    'load_factor': 0.70,                # Average draw of leased kW
+    'stabilized_occupancy': 0.85,
+    'lease_up_months': 12,
+    'start_month': 0,                   # Month the hall is delivered and lease-up begins
+    'colocation_rate': 175.0,           # $/kW/month of leased capacity
+    'power_services_rate': 25.0,        # $/kW/month markup on leased capacity
+    'grid_services_rate': 100.0,        # $/kW/year of installed capacity (demand response)
+    'electricity_rate': 18.5,           # cents/kWh, as commercial_electricity_rate is quoted
+    'energy_recovery': 1.0,             # Share of facility energy cost billed through to tenants
+    'rate_escalation': 0.03,            # Annual escalation of $/kW pricing
+}
+
+
+def electricity_rate(real_time_data: Dict[str, Dict]) -> float:
+    """Commercial electricity rate in cents/kWh from the market data feed"""
+    return real_time_data['commercial_electricity_rate']['value']
+
+
+def lease_up_curve(months: int, start_month, lease_up_months, stabilized_occupancy) -> np.ndarray:
+    """Occupancy by month, shaped (cases, months): zero before delivery, an S-curve to stabilization"""
+    start_month = np.atleast_1d(np.asarray(start_month, dtype=np.float64))[:, np.newaxis]
+    lease_up_months = np.maximum(np.atleast_1d(np.asarray(lease_up_months, dtype=np.float64)), 1)[:, np.newaxis]
+    stabilized_occupancy = np.atleast_1d(np.asarray(stabilized_occupancy, dtype=np.float64))[:, np.newaxis]
+    progress = np.clip((np.arange(months) + 1 - start_month) / lease_up_months, 0, 1)
+    return stabilized_occupancy * (1 - np.cos(np.pi * progress)) / 2
+
+
+def run_data_center_model(months: int = 120, **drivers) -> Dict[str, Any]:
+    """Monthly capacity, energy, revenue and energy cost for every case
+
+    Keyword arguments override DEFAULTS and broadcast against each other; each resulting
+    case is one row of every (cases, months) array. Leased kW follows the lease-up
+    curve; IT energy is leased kW at the load factor, facility energy adds the PUE
+    overhead. Colocation and power services bill on leased kW at escalating rates,
+    grid services on installed capacity, and `energy_recovery` of the energy bill is
+    passed through to tenants.
+    """
+    unknown = set(drivers) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown data center drivers: {', '.join(sorted(unknown))}")
+    values = {name: np.atleast_1d(np.asarray(drivers.get(name, default), dtype=np.float64))
+              for name, default in DEFAULTS.items()}
+    names = list(values)
+    broadcast = np.broadcast_arrays(*(values[name] for name in names))
+    case = dict(zip(names, broadcast))
+
+    def column(name: str) -> np.ndarray:
+        return case[name][:, np.newaxis]
+
+    capacity_kw = column('it_capacity_mw') * 1000
+    occupancy = lease_up_curve(months, case['start_month'], case['lease_up_months'], case['stabilized_occupancy'])
+    leased_kw = capacity_kw * occupancy
+    escalation = (1 + column('rate_escalation')) ** (np.arange(months) // 12)
+
+    it_energy_kwh = leased_kw * column('load_factor') * HOURS_PER_MONTH
+    facility_energy_kwh = it_energy_kwh * column('pue')
+    energy_cost = facility_energy_kwh * column('electricity_rate') / 100
+
+    colocation = leased_kw * column('colocation_rate') * escalation
+    power_services = leased_kw * column('power_services_rate') * escalation
+    delivered = np.arange(months) + 1 > column('start_month')
+    grid_services = np.where(delivered, capacity_kw * column('grid_services_rate') / 12, 0.0)
+    energy_recovery = energy_cost * column('energy_recovery')
+    revenue = colocation + power_services + grid_services + energy_recovery
+
+    # Run-rate at stabilized occupancy and base pricing, as the pro forma quotes it
+    stabilized_kw = case['it_capacity_mw'] * 1000 * case['stabilized_occupancy']
+    stabilized_energy_cost = (stabilized_kw * case['load_factor'] * 8760 * case['pue']
+                              * case['electricity_rate'] / 100)
+    stabilized = {
+        'leased_kw': stabilized_kw,
+        'colocation_revenue': stabilized_kw * case['colocation_rate'] * 12,
+        'power_services_revenue': stabilized_kw * case['power_services_rate'] * 12,
+        'grid_services_revenue': case['it_capacity_mw'] * 1000 * case['grid_services_rate'],
+        'energy_cost': stabilized_energy_cost,
+        'energy_recovery': stabilized_energy_cost * case['energy_recovery'],
+    }
+    stabilized['total_revenue'] = (stabilized['colocation_revenue'] + stabilized['power_services_revenue']
+                                   + stabilized['grid_services_revenue'] + stabilized['energy_recovery'])
+    stabilized['net_of_energy'] = stabilized['total_revenue'] - stabilized_energy_cost
+
+    return {
+        'months': months,
+        'drivers': case,
+        'occupancy': occupancy,
+        'leased_kw': leased_kw,
+        'it_energy_kwh': it_energy_kwh,
+        'facility_energy_kwh': facility_energy_kwh,
+        'energy_cost': energy_cost,
+        'colocation_revenue': colocation,
+        'power_services_revenue': power_services,
+        'grid_services_revenue': grid_services,
+        'energy_recovery': energy_recovery,
+        'revenue': revenue,
+        'net_of_energy': revenue - energy_cost,
+        'stabilized': stabilized,
+    }
+
+
+def case_table(result: Dict[str, Any], labels: Optional[list] = None) -> list:
+    """One JSON-ready row per case: its drivers, stabilized run-rate and first-year totals"""
+    rows = []
+    first_year = slice(0, min(12, result['months']))
+    for index in range(len(result['revenue'])):
+        row = {'case': labels[index] if labels else index}
+        row.update({name: float(values[index]) for name, values in result['drivers'].items()})
+        row.update({f"stabilized_{name}": round(float(values[index]), 2)
+                    for name, values in result['stabilized'].items()})
+        row['year_1_revenue'] = round(float(result['revenue'][index, first_year].sum()), 2)
+        row['year_1_energy_cost'] = round(float(result['energy_cost'][index, first_year].sum()), 2)
+        row['total_revenue'] = round(float(result['revenue'][index].sum()), 2)
+        row['total_net_of_energy'] = round(float(result['net_of_energy'][index].sum()), 2)
+        rows.append(row)
+    return rows
@@ -4,6 +4,9 @@ import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import logging
+import time
+from metrics import UPSTREAM_FETCH_LATENCY, FALLBACK_DATA
+from cancellation import CancellationToken
 
 logger = logging.getLogger(__name__)
 
@@ -71,18 +74,24 @@ class DataSourceManager:
             }
         }
 
-    async def fetch_all_data(self) -> Dict[str, Dict]:
-        """Fetch all real-time data sources"""
+    async def fetch_all_data(self, cancellation: Optional[CancellationToken] = None) -> Dict[str, Dict]:
+        """Fetch all real-time data sources, giving up on FRED when the request deadline passes"""
         results = {}
+        if cancellation:
+            cancellation.check()
         
         # Fetch real data from FRED if API key is available
         if self.fred_api_key:
-            async with aiohttp.ClientSession() as session:
+            remaining = cancellation.remaining() if cancellation else None
+            timeout = aiohttp.ClientTimeout(total=remaining) if remaining is not None else aiohttp.ClientTimeout(total=300)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
                 tasks = []
                 for source_name, config in self.sources.items():
                     tasks.append(self._fetch_source_data(session, source_name, config))
                 
                 fred_results = await asyncio.gather(*tasks, return_exceptions=True)
+                if cancellation:
+                    cancellation.check()
                 
                 for i, (source_name, config) in enumerate(self.sources.items()):
                     if isinstance(fred_results[i], Exception):
@@ -112,11 +121,13 @@ class DataSourceManager:
 
     async def _fetch_source_data(self, session: aiohttp.ClientSession, source_name: str, config: Dict) -> Dict:
         """Fetch data from a specific source"""
+        started = time.perf_counter()
         try:
             async with session.get(config['url'], params=config['params']) as response:
                 if response.status == 200:
                     data = await response.json()
                     parsed_value = config['parser'](data)
+                    UPSTREAM_FETCH_LATENCY.observe(time.perf_counter() - started, series=source_name, outcome='success')
                     return {
                         'value': parsed_value,
                         'unit': config['unit'],
@@ -128,6 +139,7 @@ class DataSourceManager:
                 else:
                     raise Exception(f"HTTP {response.status}")
         except Exception as e:
+            UPSTREAM_FETCH_LATENCY.observe(time.perf_counter() - started, series=source_name, outcome='error')
             logger.error(f"Error fetching {source_name}: {e}")
             raise
 
@@ -159,6 +171,7 @@ class DataSourceManager:
 
     def _get_fallback_data(self, source_name: str) -> Dict:
         """Get fallback data when API is unavailable"""
+        FALLBACK_DATA.inc(series=source_name)
         fallback_data = {
             'fed_funds_rate': {'value': 5.25, 'unit': 'percent'},
             '10_year_treasury': {'value': 4.15, 'unit': 'percent'},
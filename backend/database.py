@@ -0,0 +1,153 @@
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import bson
+
+from metrics import MONGO_OPERATION_LATENCY, DOCUMENT_SIZE
+
+
+class InstrumentedCursor:
+    """Cursor wrapper that records the time spent fetching results as one `find` observation
+
+    Only time inside the driver counts, not the caller's work between documents, and
+    it is observed when the cursor is exhausted or closed. `sort`, `skip` and `limit`
+    chain like pymongo's and are applied by the server.
+    """
+
+    def __init__(self, cursor, collection_name: str):
+        self._cursor = cursor
+        self._collection_name = collection_name
+        self._elapsed = 0.0
+        self._observed = False
+
+    def sort(self, *args, **kwargs) -> 'InstrumentedCursor':
+        self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, count: int) -> 'InstrumentedCursor':
+        self._cursor.skip(count)
+        return self
+
+    def limit(self, count: int) -> 'InstrumentedCursor':
+        self._cursor.limit(count)
+        return self
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self
+
+    def __next__(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            document = next(self._cursor)
+        except StopIteration:
+            self._elapsed += time.perf_counter() - started
+            self._observe()
+            raise
+        self._elapsed += time.perf_counter() - started
+        return document
+
+    def _observe(self):
+        if not self._observed:
+            self._observed = True
+            MONGO_OPERATION_LATENCY.observe(self._elapsed, collection=self._collection_name, operation='find')
+
+    def close(self):
+        self._cursor.close()
+        self._observe()
+
+    def __enter__(self) -> 'InstrumentedCursor':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedCollection:
+    """MongoDB collection wrapper that records round trip latency and written document sizes"""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.name = collection.name
+
+    def _timer(self, operation: str):
+        return MONGO_OPERATION_LATENCY.time(collection=self.name, operation=operation)
+
+    def _observe_size(self, document: Dict[str, Any]):
+        DOCUMENT_SIZE.observe(len(bson.encode(document)), collection=self.name)
+
+    def find_one(self, *args, **kwargs) -> Optional[Dict[str, Any]]:
+        with self._timer('find_one'):
+            return self._collection.find_one(*args, **kwargs)
+
+    def find(self, *args, **kwargs) -> InstrumentedCursor:
+        """Run a query; results stream from the returned cursor, which times the fetches"""
+        return InstrumentedCursor(self._collection.find(*args, **kwargs), self.name)
+
+    def insert_one(self, document: Dict[str, Any], *args, **kwargs):
+        self._observe_size(document)
+        with self._timer('insert_one'):
+            return self._collection.insert_one(document, *args, **kwargs)
+
+    def insert_many(self, documents: List[Dict[str, Any]], *args, **kwargs):
+        for document in documents:
+            self._observe_size(document)
+        with self._timer('insert_many'):
+            return self._collection.insert_many(documents, *args, **kwargs)
+
+    def replace_one(self, filter: Dict[str, Any], replacement: Dict[str, Any], *args, **kwargs):
+        self._observe_size(replacement)
+        with self._timer('replace_one'):
+            return self._collection.replace_one(filter, replacement, *args, **kwargs)
+
+    def update_one(self, *args, **kwargs):
+        with self._timer('update_one'):
+            return self._collection.update_one(*args, **kwargs)
+
+    def update_many(self, *args, **kwargs):
+        with self._timer('update_many'):
+            return self._collection.update_many(*args, **kwargs)
+
+    def find_one_and_update(self, *args, **kwargs) -> Optional[Dict[str, Any]]:
+        with self._timer('find_one_and_update'):
+            return self._collection.find_one_and_update(*args, **kwargs)
+
+    def delete_one(self, *args, **kwargs):
+        with self._timer('delete_one'):
+            return self._collection.delete_one(*args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        with self._timer('delete_many'):
+            return self._collection.delete_many(*args, **kwargs)
+
+    def count_documents(self, *args, **kwargs) -> int:
+        with self._timer('count_documents'):
+            return self._collection.count_documents(*args, **kwargs)
+
+    def __getattr__(self, name: str):
+        # Anything not instrumented above (indexes, aggregation, ...) passes straight through
+        return getattr(self._collection, name)
+
+
+class InstrumentedDatabase:
+    """MongoDB database wrapper handing out instrumented collections"""
+
+    def __init__(self, database):
+        self._database = database
+        self._collections: Dict[str, InstrumentedCollection] = {}
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name: str) -> InstrumentedCollection:
+        if name not in self._collections:
+            self._collections[name] = InstrumentedCollection(self._database[name])
+        return self._collections[name]
+
+    def command(self, *args, **kwargs):
+        with MONGO_OPERATION_LATENCY.time(collection='$cmd', operation='command'):
+            return self._database.command(*args, **kwargs)
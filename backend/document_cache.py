@@ -0,0 +1,171 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from metrics import CACHE_REQUESTS
+from models import LiveDocument
+
+logger = logging.getLogger(__name__)
+
+
+class CachedDocument:
+    """A hydrated document as served, its rendered GET response body and its version"""
+
+    __slots__ = ('document_id', 'version', 'data', 'body', 'size', 'checked_at', '_model')
+
+    def __init__(self, document_id: str, version: Any, data: Dict[str, Any], body: bytes):
+        self.document_id = document_id
+        self.version = version
+        self.data = data
+        self.body = body
+        # Rough footprint: the encoded body plus the decoded dict it came from
+        self.size = 2 * len(body)
+        self.checked_at = time.monotonic()
+        self._model: Optional[LiveDocument] = None
+
+    def model(self) -> LiveDocument:
+        """Validated model of the document, built on first use; treat it as read-only"""
+        if self._model is None:
+            self._model = LiveDocument(**self.data)
+        return self._model
+
+
+class DocumentCache:
+    """Size-bounded read-through LRU of hydrated documents and their response bytes
+
+    Local writes invalidate entries directly. Writes by other workers are picked up from
+    a MongoDB change stream when the deployment supports one (replica sets); then
+    cached reads never touch the database. On a standalone server, an entry older than
+    `revalidate_after` seconds is checked against the stored `last_updated` with a
+    projected read before it is served again.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, revalidate_after: float = 1.0):
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.change_streams = False
+        self._entries: 'OrderedDict[str, CachedDocument]' = OrderedDict()
+        self._bytes = 0
+        # Invalidation sequence numbers, so a read that raced a write cannot cache stale data
+        self._sequence = 0
+        self._invalidated: 'OrderedDict[str, int]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    # --- reads ----------------------------------------------------------------------
+
+    def ticket(self) -> int:
+        """Take before reading a document from MongoDB and hand back to `put`"""
+        with self._lock:
+            return self._sequence
+
+    def get(self, document_id: str, collection) -> Optional[CachedDocument]:
+        with self._lock:
+            entry = self._entries.get(document_id)
+            if entry is not None:
+                self._entries.move_to_end(document_id)
+        if entry is None:
+            CACHE_REQUESTS.inc(cache='documents', result='miss')
+            return None
+
+        if not self.change_streams and time.monotonic() - entry.checked_at >= self.revalidate_after:
+            stored = collection.find_one({'_id': document_id}, {'last_updated': 1})
+            if stored is None or stored.get('last_updated') != entry.version:
+                self.invalidate(document_id)
+                CACHE_REQUESTS.inc(cache='documents', result='stale')
+                return None
+            entry.checked_at = time.monotonic()
+
+        CACHE_REQUESTS.inc(cache='documents', result='hit')
+        return entry
+
+    def put(self, document_id: str, data: Dict[str, Any], body: bytes, ticket: int) -> Optional[CachedDocument]:
+        entry = CachedDocument(document_id, data.get('last_updated'), data, body)
+        if entry.size > self.max_bytes:
+            return None
+        with self._lock:
+            if self._invalidated.get(document_id, -1) > ticket:
+                # Written since the caller read it; what it read may already be stale
+                return None
+            self._discard(document_id)
+            self._entries[document_id] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+        return entry
+
+    # --- invalidation ---------------------------------------------------------------
+
+    def _discard(self, document_id: str):
+        entry = self._entries.pop(document_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def invalidate(self, document_id: str):
+        with self._lock:
+            self._sequence += 1
+            self._invalidated[document_id] = self._sequence
+            self._invalidated.move_to_end(document_id)
+            while len(self._invalidated) > 10000:
+                self._invalidated.popitem(last=False)
+            self._discard(document_id)
+
+    def clear(self):
+        with self._lock:
+            self._sequence += 1
+            for document_id in list(self._entries):
+                self._invalidated[document_id] = self._sequence
+            self._entries.clear()
+            self._bytes = 0
+
+    def watch(self, collection):
+        """Start following the collection's change stream in a background thread"""
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._follow, args=(collection,), name='document-cache-watch',
+                                         daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        self.change_streams = False
+
+    def _follow(self, collection):
+        while not self._stop.is_set():
+            try:
+                with collection.watch(max_await_time_ms=1000) as stream:
+                    # Anything written before the stream opened must be revalidated
+                    self.clear()
+                    self.change_streams = True
+                    logger.info("Document cache following the documents change stream")
+                    while not self._stop.is_set():
+                        change = stream.try_next()
+                        if change is not None and 'documentKey' in change:
+                            self.invalidate(change['documentKey']['_id'])
+            except OperationFailure as e:
+                # Standalone servers have no change streams
+                logger.info(f"Change streams unavailable, document cache revalidates by version: {e}")
+                self.change_streams = False
+                return
+            except PyMongoError as e:
+                logger.error(f"Document cache change stream failed, revalidating by version: {e}")
+                self.change_streams = False
+                self._stop.wait(5)
+            except Exception as e:
+                logger.info(f"Change streams unsupported, document cache revalidates by version: {e}")
+                self.change_streams = False
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'documents': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'change_streams': self.change_streams,
+            }
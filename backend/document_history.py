@@ -0,0 +1,324 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Stored documents carry the history version they were written as; writes compare-and-swap on it
+VERSION_FIELD = 'history_version'
+STRUCTURED_FIELDS = ('_id', VERSION_FIELD, 'sections', 'data_sources')
+# Key of a changed entry listing the fields it no longer has
+REMOVED = '_removed'
+
+
+class VersionConflict(Exception):
+    """The stored document was replaced since the writer read it"""
+
+
+def _diff_entries(old: Dict[str, Dict], new: Dict[str, Dict]) -> Dict[str, Optional[Dict]]:
+    """Field-level changes between two keyed collections of dicts; None marks a removed entry
+    and REMOVED the fields a changed entry dropped"""
+    changes: Dict[str, Optional[Dict]] = {}
+    for key, value in new.items():
+        previous = old.get(key)
+        if previous is None:
+            changes[key] = dict(value)
+            continue
+        changed = {field: field_value for field, field_value in value.items() if previous.get(field) != field_value}
+        removed = [field for field in previous if field not in value]
+        if removed:
+            changed[REMOVED] = removed
+        if changed:
+            changes[key] = changed
+    for key in old:
+        if key not in new:
+            changes[key] = None
+    return changes
+
+
+def _apply_entries(base: Dict[str, Dict], changes: Dict[str, Optional[Dict]]) -> Dict[str, Dict]:
+    result = dict(base)
+    for key, change in changes.items():
+        if change is None:
+            result.pop(key, None)
+            continue
+        entry = {**result.get(key, {}), **change}
+        for field in entry.pop(REMOVED, ()):
+            entry.pop(field, None)
+        result[key] = entry
+    return result
+
+
+def compute_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact description of how stored document `old` became `new`
+
+    Documents are compared in their stored (dehydrated) form, so a changed section body
+    costs only its list of chunk hashes.
+    """
+    delta: Dict[str, Any] = {}
+
+    fields = {
+        key: value for key, value in new.items()
+        if key not in STRUCTURED_FIELDS and old.get(key) != value
+    }
+    if fields:
+        delta['fields'] = fields
+    removed = [key for key in old if key not in STRUCTURED_FIELDS and key not in new]
+    if removed:
+        delta['removed_fields'] = removed
+
+    data_sources = _diff_entries(old.get('data_sources', {}), new.get('data_sources', {}))
+    if data_sources:
+        delta['data_sources'] = data_sources
+
+    old_sections = {section['id']: section for section in old.get('sections', [])}
+    new_sections = {section['id']: section for section in new.get('sections', [])}
+    sections = _diff_entries(old_sections, new_sections)
+    if sections:
+        delta['sections'] = sections
+    if list(old_sections) != list(new_sections):
+        delta['section_order'] = list(new_sections)
+
+    return delta
+
+
+def apply_delta(document: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """Return `document` with `delta` applied; the input is not modified"""
+    result = {**document, **delta.get('fields', {})}
+    for key in delta.get('removed_fields', ()):
+        result.pop(key, None)
+
+    if 'data_sources' in delta:
+        result['data_sources'] = _apply_entries(document.get('data_sources', {}), delta['data_sources'])
+
+    if 'sections' in delta or 'section_order' in delta:
+        sections = {section['id']: section for section in document.get('sections', [])}
+        sections = _apply_entries(sections, delta.get('sections', {}))
+        order = delta.get('section_order', list(sections))
+        result['sections'] = [sections[section_id] for section_id in order]
+
+    return result
+
+
+def _unversioned(document: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in document.items() if key not in ('_id', VERSION_FIELD)}
+
+
+class DocumentHistory:
+    """Append-only version history of stored documents
+
+    Every write appends a version: a full snapshot every `snapshot_interval` versions
+    and a delta against the previous version otherwise, so any version is rebuilt from
+    its nearest snapshot with at most `snapshot_interval - 1` deltas. Snapshots hold the
+    stored form of the document, whose section bodies are blob hashes, so they stay
+    small too.
+    """
+
+    def __init__(self, collection, snapshot_interval: int = 10):
+        if snapshot_interval < 1:
+            raise ValueError("snapshot_interval must be at least 1")
+        self.collection = collection
+        self.snapshot_interval = snapshot_interval
+
+    def ensure_indexes(self):
+        self.collection.create_index([('document_id', 1), ('version', 1)], unique=True)
+
+    def head_version(self, document_id: str) -> int:
+        head = self.collection.find_one(
+            {'document_id': document_id}, {'version': 1}, sort=[('version', -1)]
+        )
+        return head['version'] if head else 0
+
+    def _insert(self, document_id: str, version: int, kind: str, payload: Dict[str, Any]):
+        self.collection.insert_one({
+            '_id': f"{document_id}:{version}",
+            'document_id': document_id,
+            'version': version,
+            'kind': kind,
+            'created_at': datetime.now(),
+            'payload': payload,
+        })
+
+    def record(self, document_id: str, current: Dict[str, Any], previous: Optional[Dict[str, Any]] = None,
+               version: Optional[int] = None) -> int:
+        """Append `current` (stored form) as version `version`, by default the next, and return its number
+
+        Deltas are taken against the recorded version before it rather than the document
+        the caller read, which a concurrent writer may already have replaced. `previous`
+        is only used for documents created before history existed: it is recorded as
+        their first version.
+        """
+        current = _unversioned(current)
+        head = self.head_version(document_id)
+
+        if head == 0 and previous is not None:
+            self._insert(document_id, 1, 'snapshot', _unversioned(previous))
+            head = 1
+
+        version = version or head + 1
+        base = None
+        if version > 1 and (version - 1) % self.snapshot_interval != 0:
+            base = self.get_version(document_id, version - 1)
+        try:
+            if base is None:
+                self._insert(document_id, version, 'snapshot', current)
+            else:
+                self._insert(document_id, version, 'delta', compute_delta(base, current))
+        except DuplicateKeyError:
+            # A concurrent writer took this version number; our delta base is stale, so
+            # fall back to a self-contained snapshot at the next free version
+            version = self.head_version(document_id) + 1
+            self._insert(document_id, version, 'snapshot', current)
+        return version
+
+    def save(self, documents, current: Dict[str, Any], read: Optional[Dict[str, Any]] = None) -> int:
+        """Write stored document `current` to `documents` and record it; returns its version
+
+        `read` is the stored document the write started from, or None for a new one. The
+        replace only lands while the document is still at the version `read` was, so of
+        two writers that read the same version the second gets VersionConflict and
+        nothing of it is stored or recorded. Documents written before they carried
+        VERSION_FIELD are matched by its absence.
+        """
+        document_id = current['_id']
+        if read is None:
+            try:
+                documents.insert_one({**current, VERSION_FIELD: 1})
+            except DuplicateKeyError:
+                raise VersionConflict(f"Document {document_id} already exists")
+            return self.record(document_id, current, version=1)
+
+        expected = read.get(VERSION_FIELD)
+        if expected is None:
+            expected = self.head_version(document_id)
+            if expected == 0:
+                try:
+                    self._insert(document_id, 1, 'snapshot', _unversioned(read))
+                except DuplicateKeyError:
+                    pass
+                expected = 1
+        version = expected + 1
+        matched = documents.replace_one(
+            {'_id': document_id, VERSION_FIELD: read.get(VERSION_FIELD, {'$exists': False})},
+            {**current, VERSION_FIELD: version}
+        ).matched_count
+        if not matched:
+            raise VersionConflict(f"Document {document_id} was changed by another writer")
+        return self.record(document_id, current, version=version)
+
+    def version_at(self, document_id: str, timestamp: datetime) -> int:
+        """Latest version recorded at or before `timestamp`, or 0 if none was"""
+        entry = self.collection.find_one(
+            {'document_id': document_id, 'created_at': {'$lte': timestamp}},
+            {'version': 1}, sort=[('version', -1)]
+        )
+        return entry['version'] if entry else 0
+
+    def list_versions(self, document_id: str) -> List[Dict[str, Any]]:
+        return list(self.collection.find(
+            {'document_id': document_id},
+            {'_id': 0, 'version': 1, 'kind': 1, 'created_at': 1},
+            sort=[('version', 1)]
+        ))
+
+    def get_version(self, document_id: str, version: int) -> Optional[Dict[str, Any]]:
+        """Rebuild the stored form of `version` from its nearest snapshot, or None"""
+        snapshot = self.collection.find_one(
+            {'document_id': document_id, 'kind': 'snapshot', 'version': {'$lte': version}},
+            sort=[('version', -1)]
+        )
+        if not snapshot:
+            return None
+
+        deltas = list(self.collection.find(
+            {'document_id': document_id, 'version': {'$gt': snapshot['version'], '$lte': version}},
+            sort=[('version', 1)]
+        ))
+        if len(deltas) != version - snapshot['version']:
+            return None
+
+        document = snapshot['payload']
+        for entry in deltas:
+            if entry['kind'] == 'snapshot':
+                document = entry['payload']
+            else:
+                document = apply_delta(document, entry['payload'])
+        return document
+
+    def diff(self, document_id: str, from_version: int, to_version: int) -> Optional[Dict[str, Any]]:
+        """Summarize what changed between two versions, or None if either is missing"""
+        old = self.get_version(document_id, from_version)
+        new = self.get_version(document_id, to_version)
+        if old is None or new is None:
+            return None
+
+        delta = compute_delta(old, new)
+        old_sources = old.get('data_sources', {})
+        new_sources = new.get('data_sources', {})
+        old_sections = {section['id']: section for section in old.get('sections', [])}
+        new_sections = {section['id']: section for section in new.get('sections', [])}
+
+        sections = {}
+        for section_id, change in delta.get('sections', {}).items():
+            if change is None:
+                sections[section_id] = {'change': 'removed', 'title': old_sections[section_id]['title']}
+            elif section_id not in old_sections:
+                sections[section_id] = {'change': 'added', 'title': new_sections[section_id]['title']}
+            else:
+                fields = [field for field in change if field != REMOVED] + change.get(REMOVED, [])
+                changed = sorted({'content' if field == 'content_chunks' else field for field in fields})
+                sections[section_id] = {
+                    'change': 'modified',
+                    'title': new_sections[section_id]['title'],
+                    'changed_fields': changed,
+                }
+
+        return {
+            'fields': {
+                **{key: {'from': old.get(key), 'to': value} for key, value in delta.get('fields', {}).items()},
+                **{key: {'from': old[key], 'to': None} for key in delta.get('removed_fields', [])},
+            },
+            'data_sources': {
+                key: {'from': old_sources.get(key), 'to': new_sources.get(key)}
+                for key in delta.get('data_sources', {})
+            },
+            'sections': sections,
+            'section_order_changed': 'section_order' in delta,
+        }
+
+    def changes_since(self, document_id: str, current: Dict[str, Any], version: int) -> Optional[Dict[str, Any]]:
+        """What changed in stored document `current` since `version`, as a patch
+
+        Added data sources and sections are returned whole; changed ones carry only
+        the fields that changed (sections also their `id`), so an unchanged section body
+        is not sent again, plus `deleted_fields` when they lost any. Version 0 stands for
+        an empty document, so everything is reported as added. Returns None if `version`
+        cannot be rebuilt.
+        """
+        base = self.get_version(document_id, version) if version > 0 else {}
+        if base is None:
+            return None
+
+        delta = compute_delta(base, current)
+        data_sources = delta.get('data_sources', {})
+        sections = delta.get('sections', {})
+
+        def patch(change: Dict[str, Any]) -> Dict[str, Any]:
+            patched = {field: value for field, value in change.items() if field != REMOVED}
+            if REMOVED in change:
+                patched['deleted_fields'] = change[REMOVED]
+            return patched
+
+        return {
+            'fields': delta.get('fields', {}),
+            'deleted_fields': delta.get('removed_fields', []),
+            'data_sources': {key: patch(change) for key, change in data_sources.items() if change is not None},
+            'deleted_data_sources': [key for key, change in data_sources.items() if change is None],
+            'sections': [
+                {'id': section_id, **patch(change)} for section_id, change in sections.items() if change is not None
+            ],
+            'deleted_sections': [section_id for section_id, change in sections.items() if change is None],
+            'section_order': delta.get('section_order'),
+        }
@@ -1,8 +1,10 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 from datetime import datetime
 import logging
 from models import LiveDocument, DocumentSection, DataSource, FinancialModel
 from data_sources import DataSourceManager, FinancialCalculator
+from cancellation import CancellationToken
+from metrics import timed, DOCUMENT_RENDER_LATENCY
 import json
 import re
 
@@ -14,11 +16,16 @@ class EnhancedDocumentService:
         self.data_manager = DataSourceManager()
         self.calculator = FinancialCalculator()
         
-    async def create_comprehensive_master_deck(self) -> LiveDocument:
+    @timed(DOCUMENT_RENDER_LATENCY, operation='create')
+    async def create_comprehensive_master_deck(self, real_time_data: Optional[Dict] = None,
+                                               cancellation: Optional[CancellationToken] = None) -> LiveDocument:
         """Create the finalized comprehensive Coastal Oak Capital master deck with all integrated content"""
         
-        # Fetch real-time data
-        real_time_data = await self.data_manager.fetch_all_data()
+        # Fetch real-time data unless the caller already holds a snapshot
+        if real_time_data is None:
+            real_time_data = await self.data_manager.fetch_all_data(cancellation)
+        if cancellation:
+            cancellation.check()
         
         # Create data sources from real-time data
         data_sources = {}
@@ -45,6 +52,7 @@ class EnhancedDocumentService:
         
         return document
     
+    @timed(DOCUMENT_RENDER_LATENCY, operation='render_sections')
     def _create_comprehensive_sections(self, real_time_data: Dict) -> List[DocumentSection]:
         """Create all comprehensive document sections with integrated real-time data and new insights"""
         
@@ -1153,11 +1161,15 @@ Current market conditions ({real_time_data['cap_rates_office']['value']:.2f}% ca
         
         return sections
     
-    async def update_document(self, document: LiveDocument, force_refresh: bool = False) -> LiveDocument:
+    @timed(DOCUMENT_RENDER_LATENCY, operation='update')
+    async def update_document(self, document: LiveDocument, force_refresh: bool = False,
+                              cancellation: Optional[CancellationToken] = None) -> LiveDocument:
         """Update document with latest real-time data"""
         
         # Fetch latest data
-        real_time_data = await self.data_manager.fetch_all_data()
+        real_time_data = await self.data_manager.fetch_all_data(cancellation)
+        if cancellation:
+            cancellation.check()
         
         # Update data sources
         for key, data in real_time_data.items():
@@ -1175,7 +1187,8 @@ Current market conditions ({real_time_data['cap_rates_office']['value']:.2f}% ca
         document.last_updated = datetime.now()
         return document
     
-    def export_to_markdown(self, document: LiveDocument) -> str:
+    @timed(DOCUMENT_RENDER_LATENCY, operation='export_markdown')
+    def export_to_markdown(self, document: LiveDocument, cancellation: Optional[CancellationToken] = None) -> str:
         """Export document to comprehensive markdown format"""
         markdown_content = f"""# {document.title}
 
@@ -1206,6 +1219,8 @@ Current market conditions ({real_time_data['cap_rates_office']['value']:.2f}% ca
         
         # Add sections
         for section in document.sections:
+            if cancellation:
+                cancellation.check()
             markdown_content += f"## Section {section.order}: {section.title} {{#section-{section.order}}}\n\n"
             markdown_content += section.content + "\n\n"
             
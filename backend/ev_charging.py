@@ -0,0 +1,218 @@
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+HOURS_PER_YEAR = 8760
+DAYS_PER_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+SUMMER_MONTHS = (5, 6, 7, 8)        # June - September, zero-based
+PEAK_HOURS = (16, 21)               # 4-9 pm on-peak window
+SUPER_OFF_PEAK_HOURS = (9, 14)      # Midday solar hours
+CHARGER_TYPES = ('dcfc', 'mcs')
+
+# Share of a charger's average daily draw in each hour; weekday and weekend shapes.
+# Passenger DC fast charging peaks at commutes and midday; megawatt truck charging is
+# flatter, with driver breaks midday and overnight staging.
+HOURLY_PROFILES = {
+    'dcfc': {
+        'weekday': [0.25, 0.15, 0.10, 0.10, 0.15, 0.35, 0.70, 1.10, 1.30, 1.20, 1.15, 1.25,
+                    1.40, 1.35, 1.30, 1.45, 1.70, 1.85, 1.75, 1.50, 1.25, 0.95, 0.65, 0.40],
+        'weekend': [0.35, 0.25, 0.15, 0.10, 0.10, 0.20, 0.40, 0.70, 1.00, 1.30, 1.55, 1.70,
+                    1.80, 1.80, 1.70, 1.60, 1.55, 1.50, 1.40, 1.25, 1.05, 0.85, 0.60, 0.45],
+    },
+    'mcs': {
+        'weekday': [0.80, 0.75, 0.70, 0.70, 0.80, 0.95, 1.05, 1.10, 1.10, 1.05, 1.10, 1.25,
+                    1.35, 1.30, 1.15, 1.05, 1.00, 1.00, 1.05, 1.10, 1.05, 0.95, 0.90, 0.85],
+        'weekend': [0.60, 0.55, 0.50, 0.50, 0.55, 0.60, 0.65, 0.70, 0.75, 0.80, 0.85, 0.90,
+                    0.90, 0.85, 0.80, 0.75, 0.75, 0.80, 0.85, 0.85, 0.80, 0.75, 0.70, 0.65],
+    },
+}
+
+# Drivers of one case; every one broadcasts, so a call covers many sites and scenarios.
+# Utilization is average draw as a share of nameplate; the defaults reproduce the
+# annual charging kWh behind the Development Pro Forma revenue lines.
+DEFAULTS = {
+    'dcfc_ports': 40,
+    'dcfc_power_kw': 150.0,
+    'dcfc_utilization': 0.111,
+    'dcfc_price': 0.45,                 # $/kWh charged to drivers
+    'mcs_ports': 20,
+    'mcs_power_kw': 1000.0,
+    'mcs_utilization': 0.0357,
+    'mcs_price': 0.35,                  # $/kWh charged to fleets
+    'electricity_rate': 18.5,           # cents/kWh off-peak, as commercial_electricity_rate is quoted
+    'peak_multiplier': 1.6,             # On-peak energy price over off-peak
+    'super_off_peak_multiplier': 0.6,
+    'summer_multiplier': 1.15,          # Seasonal uplift on every period June - September
+    'demand_charge': 18.0,              # $/kW-month on the monthly maximum demand
+    'peak_demand_charge': 12.0,         # $/kW-month on the monthly maximum during on-peak hours
+    'enrolled_kw': 1000.0,              # Load committed to demand response
+    'dispatch_hours': 100,              # Demand response event hours called per year
+    'capacity_payment': 100.0,          # $/kW-year for enrolled load, scaled by delivered performance
+    'dispatch_payment': 1.0,            # $/kWh curtailed during events
+    'daily_variability': 0.25,          # Coefficient of variation of day-to-day demand
+}
+
+# Cases simulated per block; bounds memory at a few (cases, 8760) arrays
+CHUNK_SIZE = 100
+
+
+def hourly_calendar() -> Dict[str, np.ndarray]:
+    """Hour of day, day of year, month and weekend flag for each hour of a 365-day year starting on a Monday"""
+    hours = np.arange(HOURS_PER_YEAR)
+    day = hours // 24
+    month = np.repeat(np.arange(12), DAYS_PER_MONTH * 24)
+    return {
+        'hour': hours % 24,
+        'day': day,
+        'month': month,
+        'weekend': day % 7 >= 5,
+        'summer': np.isin(month, SUMMER_MONTHS),
+    }
+
+
+def demand_profile(charger_type: str, calendar: Dict[str, np.ndarray]) -> np.ndarray:
+    """Hourly demand shape of a charger type, normalized to average 1 over the year"""
+    profiles = HOURLY_PROFILES[charger_type]
+    weekday = np.asarray(profiles['weekday'])[calendar['hour']]
+    weekend = np.asarray(profiles['weekend'])[calendar['hour']]
+    shape = np.where(calendar['weekend'], weekend, weekday)
+    return shape / shape.mean()
+
+
+def tou_periods(calendar: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Masks of the on-peak and super off-peak hours"""
+    hour = calendar['hour']
+    return {
+        'peak': (hour >= PEAK_HOURS[0]) & (hour < PEAK_HOURS[1]),
+        'super_off_peak': (hour >= SUPER_OFF_PEAK_HOURS[0]) & (hour < SUPER_OFF_PEAK_HOURS[1]),
+    }
+
+
+def _monthly(values: np.ndarray, starts: np.ndarray, reduce=np.add) -> np.ndarray:
+    return reduce.reduceat(values, starts, axis=1)
+
+
+def _simulate_chunk(case: Dict[str, np.ndarray], daily_factor: np.ndarray, calendar: Dict[str, np.ndarray],
+                    periods: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    def column(name: str) -> np.ndarray:
+        return case[name][:, np.newaxis]
+
+    hourly_factor = np.repeat(daily_factor, 24, axis=1)
+    load = {}
+    for charger in CHARGER_TYPES:
+        nameplate = column(f'{charger}_ports') * column(f'{charger}_power_kw')
+        expected = nameplate * column(f'{charger}_utilization') * demand_profile(charger, calendar)
+        load[charger] = np.minimum(expected * hourly_factor, nameplate)
+    total = load['dcfc'] + load['mcs']
+
+    # Demand response: the highest-load summer weekday on-peak hours, up to each case's
+    # dispatch_hours, curtail charging by up to the enrolled kW; curtailed sessions are lost
+    eligible = np.flatnonzero(periods['peak'] & calendar['summer'] & ~calendar['weekend'])
+    ranks = np.argsort(np.argsort(-total[:, eligible], axis=1, kind='stable'), axis=1)
+    events = np.zeros_like(total, dtype=bool)
+    events[:, eligible] = ranks < column('dispatch_hours')
+    curtailed = np.where(events, np.minimum(total, column('enrolled_kw')), 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        served = np.where(total > 0, 1 - curtailed / total, 1.0)
+    for charger in CHARGER_TYPES:
+        load[charger] = load[charger] * served
+    net_load = total - curtailed
+
+    multiplier = np.where(periods['peak'], column('peak_multiplier'),
+                          np.where(periods['super_off_peak'], column('super_off_peak_multiplier'), 1.0))
+    multiplier = multiplier * np.where(calendar['summer'], column('summer_multiplier'), 1.0)
+    energy_cost = net_load * column('electricity_rate') / 100 * multiplier
+
+    starts = np.concatenate([[0], np.cumsum(DAYS_PER_MONTH * 24)[:-1]])
+    peak_kw = _monthly(net_load, starts, np.maximum)
+    on_peak_kw = _monthly(np.where(periods['peak'], net_load, 0.0), starts, np.maximum)
+    demand_charges = peak_kw * column('demand_charge') + on_peak_kw * column('peak_demand_charge')
+
+    committed = case['enrolled_kw'] * case['dispatch_hours']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        performance = np.where(committed > 0, curtailed.sum(axis=1) / committed, 0.0)
+    capacity_revenue = case['enrolled_kw'] * case['capacity_payment'] * performance
+    dispatch_revenue = curtailed.sum(axis=1) * case['dispatch_payment']
+
+    result = {
+        'energy_cost': _monthly(energy_cost, starts),
+        'demand_charges': demand_charges,
+        'peak_kw': peak_kw,
+        'curtailed_kwh': _monthly(curtailed, starts),
+        'capacity_revenue': capacity_revenue,
+        'dispatch_revenue': dispatch_revenue,
+        'dispatch_performance': performance,
+        'load_factor': net_load.mean(axis=1) / np.maximum(net_load.max(axis=1), 1e-9),
+        'average_profile': net_load.reshape(len(net_load), -1, 24).mean(axis=1),
+    }
+    for charger in CHARGER_TYPES:
+        result[f'{charger}_kwh'] = _monthly(load[charger], starts)
+        result[f'{charger}_revenue'] = result[f'{charger}_kwh'] * column(f'{charger}_price')
+    return result
+
+
+def simulate_ev_charging(seed: Optional[int] = 0, chunk_size: int = CHUNK_SIZE, **drivers) -> Dict[str, Any]:
+    """One year of hourly charging load, tariffs, demand charges and demand response for every case
+
+    Keyword arguments override DEFAULTS and broadcast against each other; each resulting
+    case is one site or scenario. Each charger type's hourly load is its nameplate times
+    utilization, shaped by its weekday/weekend profile and a random daily demand factor
+    (mean 1, `daily_variability` CV, drawn from `seed`), capped at nameplate. Energy is
+    bought on a time-of-use tariff with a summer uplift; demand charges bill the monthly
+    peak and on-peak maximum. Cases are simulated in blocks of `chunk_size`.
+
+    Monthly results are (cases, 12) arrays; 'annual' holds per-case yearly totals.
+    """
+    unknown = set(drivers) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown EV charging drivers: {', '.join(sorted(unknown))}")
+    values = {name: np.atleast_1d(np.asarray(drivers.get(name, default), dtype=np.float64))
+              for name, default in DEFAULTS.items()}
+    names = list(values)
+    case = dict(zip(names, (np.array(array) for array in np.broadcast_arrays(*(values[name] for name in names)))))
+    if np.any(case['daily_variability'] < 0):
+        raise ValueError("daily_variability must be non-negative")
+
+    cases = len(case['electricity_rate'])
+    rng = np.random.default_rng(seed)
+    variance = case['daily_variability'][:, np.newaxis] ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        draws = rng.gamma(np.where(variance > 0, 1 / variance, 1.0), size=(cases, HOURS_PER_YEAR // 24)) * variance
+    daily_factor = np.where(variance > 0, draws, 1.0)
+
+    calendar = hourly_calendar()
+    periods = tou_periods(calendar)
+    parts = [
+        _simulate_chunk({name: array[start:start + chunk_size] for name, array in case.items()},
+                        daily_factor[start:start + chunk_size], calendar, periods)
+        for start in range(0, cases, chunk_size)
+    ]
+    result = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+    charging_revenue = sum(result[f'{charger}_revenue'] for charger in CHARGER_TYPES)
+    annual = {name: result[name].sum(axis=1) for name in (
+        'dcfc_kwh', 'dcfc_revenue', 'mcs_kwh', 'mcs_revenue', 'energy_cost', 'demand_charges', 'curtailed_kwh')}
+    annual['charging_revenue'] = charging_revenue.sum(axis=1)
+    annual['grid_services_revenue'] = result['capacity_revenue'] + result['dispatch_revenue']
+    annual['net_revenue'] = (annual['charging_revenue'] + annual['grid_services_revenue']
+                             - annual['energy_cost'] - annual['demand_charges'])
+    annual['peak_kw'] = result['peak_kw'].max(axis=1)
+    annual['load_factor'] = result['load_factor']
+    annual['dispatch_performance'] = result['dispatch_performance']
+
+    result['charging_revenue'] = charging_revenue
+    result['drivers'] = case
+    result['annual'] = annual
+    return result
+
+
+def case_table(result: Dict[str, Any], labels: Optional[list] = None) -> list:
+    """One JSON-ready row per case: its drivers and annual totals"""
+    rows = []
+    for index in range(len(result['annual']['net_revenue'])):
+        row = {'case': labels[index] if labels else index}
+        row.update({name: float(values[index]) for name, values in result['drivers'].items()})
+        row.update({name: round(float(values[index]), 4 if name in ('load_factor', 'dispatch_performance') else 2)
+                    for name, values in result['annual'].items()})
+        rows.append(row)
+    return rows
@@ -0,0 +1,271 @@
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+from loan_tape import LoanTape
+from models import ResolutionScenario
+from resolution_scenarios import DEFAULT_SCENARIOS, scenario_flows, validate_scenarios
+from returns import annualize, bracketed_newton, irr, moic, npv
+
+METRICS = ('irr', 'moic', 'dscr')
+VARIABLES = ('purchase_price', 'exit_cap_rate')
+
+# Drivers of one levered property deal; every one broadcasts, so a call solves many deals
+DEAL_DEFAULTS = {
+    'purchase_price': 30000000.0,       # Asking price; solved prices are reported against it
+    'noi': 2100000.0,                   # Year 1 net operating income
+    'noi_growth': 0.03,
+    'hold_years': 5,
+    'exit_cap_rate': 0.065,             # Applied to the NOI of the year after exit
+    'ltv': 0.60,                        # Acquisition loan as a share of purchase price
+    'loan_rate': 0.065,
+    'amortization_years': 30,           # 0 for interest only
+    'closing_costs': 0.01,
+    'disposition_cost': 0.02,
+}
+
+# Search brackets: purchase price as a multiple of the asking price (or of face for
+# notes), exit cap rate in absolute terms
+PRICE_BRACKET = (1e-3, 10.0)
+EXIT_CAP_BRACKET = (0.01, 0.50)
+CHUNK_SIZE = 25000
+
+
+def goal_seek(objective: Callable[[np.ndarray, np.ndarray], np.ndarray], low, high, guess=None,
+              tolerance: float = 1e-10, max_iterations: int = 100) -> np.ndarray:
+    """The x of each row where `objective(x, rows)` crosses zero inside [low, high]
+
+    `objective` takes trial values and the row indices they belong to. Each row is
+    oriented so its objective falls through the bracket and handed to the bracketed
+    Newton solver behind returns.irr, with slopes from a forward difference. Rows whose
+    objective does not change sign over the bracket are NaN.
+    """
+    low = np.asarray(low, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    rows = np.arange(len(low))
+    value_low = objective(low, rows)
+    value_high = objective(high, rows)
+    sign = np.where(value_low >= value_high, 1.0, -1.0)
+    solvable = (sign * value_low > 0) & (sign * value_high < 0)
+    if guess is None:
+        guess = (low + high) / 2
+
+    def evaluate(x: np.ndarray, indices: np.ndarray):
+        step = 1e-7 * np.maximum(np.abs(x), 1e-3)
+        value = objective(x, indices)
+        slope = (objective(x + step, indices) - value) / step
+        return sign[indices] * value, sign[indices] * slope
+
+    x = bracketed_newton(evaluate, low, high, np.clip(guess, low, high), solvable, tolerance, max_iterations)
+    return np.where(solvable, x, np.nan)
+
+
+def _target_objective(flows: Callable[[np.ndarray, np.ndarray], np.ndarray], metric: str, target,
+                      scale: np.ndarray, periods_per_year: int):
+    """Objective that is zero where the flows hit `target`, in units of `scale`
+
+    An IRR target is met where the flows' NPV at the target rate is zero, which is the
+    same root for flows that change sign once and avoids an IRR solve per trial; a
+    MOIC target where inflows less target times outflows is zero.
+    """
+    target = np.asarray(target, dtype=np.float64)
+    rate = (1 + target) ** (1 / periods_per_year) - 1
+
+    def objective(x: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        schedule = flows(x, rows)
+        if metric == 'irr':
+            return npv(schedule, np.broadcast_to(rate, scale.shape)[rows]) / scale[rows]
+        inflows = np.where(schedule > 0, schedule, 0).sum(axis=1)
+        outflows = -np.where(schedule < 0, schedule, 0).sum(axis=1)
+        return (inflows - np.broadcast_to(target, scale.shape)[rows] * outflows) / scale[rows]
+    return objective
+
+
+def _check(metric: str, variable: str):
+    if metric not in METRICS:
+        raise ValueError(f"Unknown target metric {metric!r}; expected one of {', '.join(METRICS)}")
+    if variable not in VARIABLES:
+        raise ValueError(f"Unknown goal-seek variable {variable!r}; expected one of {', '.join(VARIABLES)}")
+
+
+def deal_cases(**drivers) -> Dict[str, np.ndarray]:
+    """DEAL_DEFAULTS overridden by `drivers`, broadcast to one array per driver"""
+    unknown = set(drivers) - set(DEAL_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown deal drivers: {', '.join(sorted(unknown))}")
+    values = {name: np.atleast_1d(np.asarray(drivers.get(name, default), dtype=np.float64))
+              for name, default in DEAL_DEFAULTS.items()}
+    names = list(values)
+    case = dict(zip(names, (array.copy() for array in np.broadcast_arrays(*(values[name] for name in names)))))
+    case['hold_years'] = np.maximum(np.round(case['hold_years']), 1)
+    if np.any(case['loan_rate'] <= 0) or np.any(case['purchase_price'] <= 0) or np.any(case['exit_cap_rate'] <= 0):
+        raise ValueError("purchase_price, exit_cap_rate and loan_rate must be positive")
+    return case
+
+
+def deal_flows(case: Dict[str, np.ndarray], purchase_price, exit_cap_rate) -> Dict[str, np.ndarray]:
+    """Annual levered equity cash flows of every deal, (deals, max hold + 1), and year 1 DSCR
+
+    The loan is `ltv` of the purchase price with level annual payments (interest only
+    when amortization_years is 0). Year 0 is the equity check including closing costs;
+    each held year collects NOI less debt service; the exit year adds the sale at the
+    forward NOI over the exit cap, net of disposition costs, less the loan balance.
+    """
+    price = np.asarray(purchase_price, dtype=np.float64)
+    hold = case['hold_years'].astype(int)
+    years = np.arange(1, hold.max() + 1)
+    rate = case['loan_rate']
+    term = case['amortization_years']
+    loan = price * case['ltv']
+
+    amortizing = term > 0
+    payment = np.where(amortizing, loan * rate / (1 - (1 + rate) ** -np.where(amortizing, term, 1)), loan * rate)
+    # Paid off loans stop paying; balances never go negative
+    paying = ~amortizing[:, np.newaxis] | (years <= term[:, np.newaxis])
+    growth = (1 + rate) ** hold
+    balance = np.where(amortizing, np.maximum(loan * growth - payment * (growth - 1) / rate, 0), loan)
+
+    noi = case['noi'][:, np.newaxis] * (1 + case['noi_growth'][:, np.newaxis]) ** (years - 1)
+    held = years <= hold[:, np.newaxis]
+    flows = np.zeros((len(hold), len(years) + 1))
+    flows[:, 0] = -(price * (1 + case['closing_costs']) - loan)
+    flows[:, 1:] = np.where(held, noi - np.where(paying, payment[:, np.newaxis], 0), 0)
+    sale = case['noi'] * (1 + case['noi_growth']) ** hold / exit_cap_rate * (1 - case['disposition_cost'])
+    flows[np.arange(len(hold)), hold] += sale - balance
+    with np.errstate(divide='ignore'):
+        dscr = np.where(payment > 0, case['noi'] / payment, np.inf)
+    return {'flows': flows, 'dscr': dscr}
+
+
+def solve_deals(metric: str, target, variable: str = 'purchase_price', tolerance: float = 1e-10,
+                **drivers) -> Dict[str, Any]:
+    """Purchase price or exit cap rate of every deal that hits `target` IRR, MOIC or DSCR
+
+    Keyword arguments override DEAL_DEFAULTS and broadcast against each other and
+    `target`. The IRR is annual on levered equity flows; DSCR is year 1 NOI over debt
+    service and does not depend on the exit cap. Deals the target cannot be reached
+    for inside the search bracket are NaN. Returns the solved values, the price as a
+    discount to the asking price, and the metrics achieved at the solution.
+    """
+    _check(metric, variable)
+    target = np.asarray(target, dtype=np.float64)
+    case = deal_cases(**drivers)
+    count = np.broadcast_shapes(case['noi'].shape, target.shape)[0]
+    case = {name: np.broadcast_to(array, (count,)).copy() for name, array in case.items()}
+    ask = case['purchase_price']
+
+    def flows_at(x: np.ndarray, rows: np.ndarray) -> Dict[str, np.ndarray]:
+        subset = {name: array[rows] for name, array in case.items()}
+        if variable == 'purchase_price':
+            return deal_flows(subset, x * subset['purchase_price'], subset['exit_cap_rate'])
+        return deal_flows(subset, subset['purchase_price'], x)
+
+    if metric == 'dscr':
+        def objective(x: np.ndarray, rows: np.ndarray) -> np.ndarray:
+            return flows_at(x, rows)['dscr'] - np.broadcast_to(target, (count,))[rows]
+    else:
+        objective = _target_objective(lambda x, rows: flows_at(x, rows)['flows'], metric, target, ask, 1)
+
+    bracket = PRICE_BRACKET if variable == 'purchase_price' else EXIT_CAP_BRACKET
+    solved = goal_seek(objective, np.full(count, bracket[0]), np.full(count, bracket[1]),
+                       tolerance=tolerance)
+    price = solved * ask if variable == 'purchase_price' else ask
+    exit_cap = case['exit_cap_rate'] if variable == 'purchase_price' else solved
+
+    # Metrics at the solution (rows without one are evaluated at the asking terms)
+    fallback = np.where(np.isfinite(solved), solved, 1.0 if variable == 'purchase_price' else case['exit_cap_rate'])
+    achieved = flows_at(fallback, np.arange(count))
+    found = np.isfinite(solved)
+    return {
+        'metric': metric,
+        'variable': variable,
+        'target': np.broadcast_to(target, (count,)),
+        'purchase_price': np.where(found, price, np.nan),
+        'discount': np.where(found, 1 - price / ask, np.nan),
+        'exit_cap_rate': np.where(found, exit_cap, np.nan),
+        'irr': np.where(found, irr(achieved['flows']), np.nan),
+        'moic': np.where(found, moic(achieved['flows']), np.nan),
+        'dscr': np.where(found, achieved['dscr'], np.nan),
+        'drivers': case,
+    }
+
+
+def _expected_flows(tape: LoanTape, scenarios: Sequence[ResolutionScenario], closing_costs: float,
+                    disposition_cost: float) -> np.ndarray:
+    """Probability-weighted monthly flows of every loan bought at a price of zero"""
+    periods = max(scenario.timeline_months for scenario in scenarios) + 1
+    expected = np.zeros((len(tape), periods))
+    for scenario in scenarios:
+        flows = scenario_flows(tape, np.zeros(len(tape)), scenario, closing_costs, disposition_cost)
+        expected[:, :flows.shape[1]] += scenario.probability * flows
+    return expected
+
+
+def solve_tape_prices(tape: LoanTape, metric: str, target, scenarios: Sequence[ResolutionScenario] = DEFAULT_SCENARIOS,
+                      closing_costs: float = 0.01, disposition_cost: float = 0.05, tolerance: float = 1e-10,
+                      chunk_size: int = CHUNK_SIZE) -> Dict[str, np.ndarray]:
+    """Purchase price of every note that hits a target probability-weighted IRR or MOIC
+
+    Returns follow analyze_tape: the expected monthly flows over the resolution
+    scenarios, with the purchase and closing costs in month 0. The IRR target is
+    annual. Prices are solved as a share of face inside PRICE_BRACKET, `chunk_size`
+    notes at a time to bound memory; notes that cannot reach the target are NaN.
+    """
+    if metric not in ('irr', 'moic'):
+        raise ValueError("Note prices can be solved for an 'irr' or 'moic' target")
+    validate_scenarios(scenarios)
+    face = tape['unpaid_balance'] + tape['accrued_interest']
+    target = np.broadcast_to(np.asarray(target, dtype=np.float64), (len(tape),))
+    result = {name: np.full(len(tape), np.nan) for name in ('purchase_price', 'price_to_face', 'irr', 'moic')}
+
+    for start in range(0, len(tape), chunk_size):
+        window = slice(start, min(start + chunk_size, len(tape)))
+        base = _expected_flows(tape.slice(window.start, window.stop), scenarios, closing_costs, disposition_cost)
+        chunk_face = face[window]
+
+        def flows(x: np.ndarray, rows: np.ndarray) -> np.ndarray:
+            schedule = base[rows].copy()
+            schedule[:, 0] = -x * chunk_face[rows] * (1 + closing_costs)
+            return schedule
+
+        objective = _target_objective(flows, metric, target[window], chunk_face, 12)
+        count = window.stop - window.start
+        ratio = goal_seek(objective, np.full(count, PRICE_BRACKET[0]), np.full(count, PRICE_BRACKET[1]),
+                          tolerance=tolerance)
+        found = np.isfinite(ratio)
+        achieved = flows(np.where(found, ratio, 0.0), np.arange(count))
+        result['price_to_face'][window] = ratio
+        result['purchase_price'][window] = ratio * chunk_face
+        result['irr'][window] = np.where(found, annualize(irr(achieved)), np.nan)
+        result['moic'][window] = np.where(found, moic(achieved), np.nan)
+
+    result['discount'] = 1 - result['price_to_face']
+    return result
+
+
+DEAL_FIELDS = ('purchase_price', 'discount', 'exit_cap_rate', 'irr', 'moic', 'dscr')
+
+
+def deal_table(result: Dict[str, Any], labels: Optional[list] = None) -> list:
+    """One JSON-ready row per deal: its drivers, the solved value and the metrics at it"""
+    def finite(value: float, digits: int) -> Optional[float]:
+        return round(float(value), digits) if np.isfinite(value) else None
+
+    rows = []
+    for index in range(len(result['purchase_price'])):
+        row = {'case': labels[index] if labels else index, 'target': float(result['target'][index])}
+        row.update({name: float(values[index]) for name, values in result['drivers'].items()})
+        # Solved price and exit cap sit beside the asking terms they replace
+        row.update({f"solved_{name}" if name in row else name: finite(result[name][index], 2 if name == 'purchase_price' else 6)
+                    for name in DEAL_FIELDS})
+        rows.append(row)
+    return rows
+
+
+def tape_columns(tape: LoanTape, result: Dict[str, np.ndarray]) -> Dict[str, list]:
+    """Column-oriented, JSON-ready per-note results; unreachable targets become None"""
+    columns: Dict[str, list] = {'loan_id': tape.loan_ids.tolist()}
+    for name in ('purchase_price', 'price_to_face', 'discount', 'irr', 'moic'):
+        values = np.round(result[name], 2 if name == 'purchase_price' else 6)
+        columns[name] = np.where(np.isfinite(values), values, None).tolist()
+    return columns
@@ -0,0 +1,164 @@
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from ev_charging import HOURS_PER_YEAR, hourly_calendar
+
+# Heat offtake of the neighbouring buildings by month, as a share of peak (coastal California)
+HEATING_SEASON = np.array([1.0, 0.95, 0.8, 0.6, 0.45, 0.35, 0.3, 0.3, 0.35, 0.5, 0.75, 0.95])
+
+# Drivers of one case; every one broadcasts, so a call covers many sites and scenarios
+DEFAULTS = {
+    'it_capacity_mw': 8.5,
+    'occupancy': 0.85,
+    'load_factor': 0.70,                # Average draw of leased kW
+    'diurnal_swing': 0.10,              # IT load swing above and below average over the day
+    'pue': 1.35,                        # Facility power / IT power without heat recovery
+    'cooling_share': 0.70,              # Share of the PUE overhead that is cooling
+    'cooling_cop': 4.0,                 # kWh of heat rejected per kWh of chiller electricity
+    'recoverable_fraction': 0.70,       # Share of IT heat captured by the recovery loop
+    'thermal_demand_kw': 1500.0,        # Peak heat offtake (district loop, adjacent buildings)
+    'heat_price': 4.0,                  # cents/kWh thermal, priced against the gas it displaces
+    'conversion_efficiency': 0.08,      # Electricity per kWh of surplus heat (organic Rankine cycle)
+    'conversion_capacity_kw': 500.0,    # Generator electrical output limit
+    'electricity_rate': 18.5,           # cents/kWh, as commercial_electricity_rate is quoted
+    'om_rate': 0.3,                     # O&M, cents per kWh of heat recovered
+}
+
+# Cases simulated per block; bounds memory at a few (cases, 8760) arrays
+CHUNK_SIZE = 100
+
+
+def hourly_it_load(calendar: Dict[str, np.ndarray], it_capacity_mw, occupancy, load_factor,
+                   diurnal_swing) -> np.ndarray:
+    """Hourly IT load in kW, (cases, 8760): leased capacity at the load factor with a daily swing peaking mid-afternoon"""
+    average = (np.asarray(it_capacity_mw) * 1000 * np.asarray(occupancy) * np.asarray(load_factor))[:, np.newaxis]
+    shape = 1 + np.asarray(diurnal_swing)[:, np.newaxis] * np.cos(2 * np.pi * (calendar['hour'] - 15) / 24)
+    return average * shape
+
+
+def thermal_demand(calendar: Dict[str, np.ndarray], peak_kw) -> np.ndarray:
+    """Hourly heat offtake in kW thermal, (cases, 8760): seasonal, with morning and evening peaks"""
+    diurnal = 0.75 + 0.25 * np.cos(4 * np.pi * (calendar['hour'] - 7) / 24)
+    return np.asarray(peak_kw)[:, np.newaxis] * HEATING_SEASON[calendar['month']] * diurnal
+
+
+def _simulate_chunk(case: Dict[str, np.ndarray], it_load: Optional[np.ndarray],
+                    calendar: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    def column(name: str) -> np.ndarray:
+        return case[name][:, np.newaxis]
+
+    if it_load is None:
+        it_load = hourly_it_load(calendar, case['it_capacity_mw'], case['occupancy'], case['load_factor'],
+                                 case['diurnal_swing'])
+    rate = column('electricity_rate') / 100
+
+    # Nearly all IT power leaves as heat; the loop captures recoverable_fraction of it
+    recovered = it_load * column('recoverable_fraction')
+    heat_sold = np.minimum(recovered, thermal_demand(calendar, case['thermal_demand_kw']))
+    generated = np.minimum((recovered - heat_sold) * column('conversion_efficiency'),
+                           column('conversion_capacity_kw'))
+
+    # Heat leaving through the loop is heat the chillers no longer reject
+    cooling_load = it_load * (column('pue') - 1) * column('cooling_share')
+    cooling_avoided = np.minimum(recovered / column('cooling_cop'), cooling_load)
+
+    it_energy = it_load.sum(axis=1)
+    result = {
+        'it_energy_kwh': it_energy,
+        'recovered_heat_kwh': recovered.sum(axis=1),
+        'heat_sold_kwh': heat_sold.sum(axis=1),
+        'generated_kwh': generated.sum(axis=1),
+        'cooling_avoided_kwh': cooling_avoided.sum(axis=1),
+        'baseline_energy_cost': (it_load * column('pue') * rate).sum(axis=1),
+        'heat_revenue': heat_sold.sum(axis=1) * case['heat_price'] / 100,
+        'generation_avoided_cost': (generated * rate).sum(axis=1),
+        'cooling_avoided_cost': (cooling_avoided * rate).sum(axis=1),
+        'om_cost': recovered.sum(axis=1) * case['om_rate'] / 100,
+        'monthly_recovered_heat_kwh': np.add.reduceat(recovered, _month_starts(calendar), axis=1),
+    }
+    result['effective_pue'] = case['pue'] - (result['cooling_avoided_kwh'] + result['generated_kwh']) / it_energy
+    return result
+
+
+def _month_starts(calendar: Dict[str, np.ndarray]) -> np.ndarray:
+    return np.flatnonzero(np.diff(calendar['month'], prepend=-1))
+
+
+def run_heat_recovery(it_load_kw=None, chunk_size: int = CHUNK_SIZE, **drivers) -> Dict[str, Any]:
+    """A year of hourly heat recovery for every case: recovered heat, its uses, avoided cost and revenue
+
+    Keyword arguments override DEFAULTS and broadcast against each other. `it_load_kw`
+    is an hourly IT load, (8760,) or (cases, 8760), replacing the load built from
+    capacity, occupancy, load factor and diurnal swing. Recovered heat is sold to the
+    thermal offtaker first; the surplus runs the heat-to-power generator, whose output
+    offsets purchased electricity. Heat carried off by the loop also avoids chiller
+    electricity, bounded by the cooling share of the PUE overhead.
+
+    Returns per-case annual arrays plus 'operating_cost_reduction', the avoided cost and
+    heat revenue net of O&M as a share of the baseline facility energy bill.
+    """
+    unknown = set(drivers) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown heat recovery drivers: {', '.join(sorted(unknown))}")
+    values = {name: np.atleast_1d(np.asarray(drivers.get(name, default), dtype=np.float64))
+              for name, default in DEFAULTS.items()}
+    shapes = [array.shape for array in values.values()]
+    if it_load_kw is not None:
+        it_load_kw = np.atleast_2d(np.asarray(it_load_kw, dtype=np.float64))
+        if it_load_kw.shape[1] != HOURS_PER_YEAR:
+            raise ValueError(f"Hourly IT load must have {HOURS_PER_YEAR} hours, got {it_load_kw.shape[1]}")
+        shapes.append(it_load_kw.shape[:1])
+    cases = np.broadcast_shapes(*shapes)[0]
+    case = {name: np.broadcast_to(array, (cases,)).copy() for name, array in values.items()}
+    if it_load_kw is not None:
+        it_load_kw = np.broadcast_to(it_load_kw, (cases, HOURS_PER_YEAR))
+    if np.any(case['cooling_cop'] <= 0):
+        raise ValueError("cooling_cop must be positive")
+
+    calendar = hourly_calendar()
+    parts = [
+        _simulate_chunk({name: array[start:start + chunk_size] for name, array in case.items()},
+                        None if it_load_kw is None else it_load_kw[start:start + chunk_size], calendar)
+        for start in range(0, cases, chunk_size)
+    ]
+    result = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+    result['avoided_cost'] = result['generation_avoided_cost'] + result['cooling_avoided_cost']
+    result['net_benefit'] = result['avoided_cost'] + result['heat_revenue'] - result['om_cost']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['operating_cost_reduction'] = np.where(result['baseline_energy_cost'] > 0,
+                                                      result['net_benefit'] / result['baseline_energy_cost'], 0.0)
+    result['drivers'] = case
+    return result
+
+
+def annual_projection(result: Dict[str, Any], ramp, escalation: float = 0.03) -> Dict[str, np.ndarray]:
+    """Project the stabilized year over DCF years, (cases, years)
+
+    `ramp` is the share of stabilized IT load operating in each year (e.g. the data
+    center lease-up averaged by year); prices escalate at `escalation` a year.
+    """
+    ramp = np.asarray(ramp, dtype=np.float64)
+    growth = ramp * (1 + escalation) ** np.arange(len(ramp))
+    return {name: result[name][:, np.newaxis] * growth
+            for name in ('heat_revenue', 'avoided_cost', 'om_cost', 'net_benefit')}
+
+
+SUMMARY_FIELDS = (
+    'it_energy_kwh', 'recovered_heat_kwh', 'heat_sold_kwh', 'generated_kwh', 'cooling_avoided_kwh',
+    'baseline_energy_cost', 'heat_revenue', 'generation_avoided_cost', 'cooling_avoided_cost', 'avoided_cost',
+    'om_cost', 'net_benefit', 'operating_cost_reduction', 'effective_pue',
+)
+
+
+def case_table(result: Dict[str, Any], labels: Optional[list] = None) -> list:
+    """One JSON-ready row per case: its drivers and annual results"""
+    rows = []
+    for index in range(len(result['net_benefit'])):
+        row = {'case': labels[index] if labels else index}
+        row.update({name: float(values[index]) for name, values in result['drivers'].items()})
+        row.update({name: round(float(result[name][index]), 4 if name in ('operating_cost_reduction', 'effective_pue')
+                                else 2) for name in SUMMARY_FIELDS})
+        rows.append(row)
+    return rows
@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from metrics import COALESCED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+STATUS_IN_PROGRESS = 'in_progress'
+STATUS_COMPLETED = 'completed'
+
+
+def snapshot_key(real_time_data: Dict[str, Dict]) -> str:
+    """Fingerprint of a market data snapshot: the series values, ignoring fetch timestamps"""
+    values = sorted((name, data.get('value'), data.get('unit')) for name, data in real_time_data.items())
+    return hashlib.blake2b(json.dumps(values).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class RequestCoalescer:
+    """Shares one in-flight execution among concurrent callers asking for the same key
+
+    The first caller for a key starts the work; callers arriving while it runs await the
+    same task instead of repeating it. Nothing is cached once the task finishes, so only
+    genuinely concurrent requests are merged. A cancelled caller does not cancel the
+    shared work while others still wait for it; once every caller has gone, it does.
+    """
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return the result of `factory()` for `key` and whether it was shared"""
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if shared:
+            COALESCED_REQUESTS.inc(operation=self.operation, result='follower')
+        else:
+            COALESCED_REQUESTS.inc(operation=self.operation, result='leader')
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            if self._waiters.get(key) == 1 and not task.done():
+                # Last interested caller is gone; stop the abandoned work
+                task.cancel()
+            raise
+        finally:
+            if self._in_flight.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+            del self._waiters[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieved here so an exception nobody awaited is not reported as lost
+            logger.debug(f"Coalesced {self.operation} failed: {task.exception()}")
+
+
+class IdempotencyStore:
+    """Client-supplied idempotency keys and the responses they produced, kept in MongoDB
+
+    A key is claimed with an insert before any work starts, so the unique `_id` decides
+    which worker runs the request; retries after completion replay the stored response.
+    A claim is a lease of `lease_seconds`, renewed by `keep_alive` while its holder
+    works: if the worker holding it crashes, a retry after the lease runs out takes the
+    key over instead of waiting out the response TTL. Renewing, completing and releasing
+    only touch a claim this store still holds, so a holder that lost its lease cannot
+    overwrite the new holder's outcome. Completed responses are kept for `ttl_seconds`.
+    Both expire through a TTL index on `expires_at`.
+    """
+
+    def __init__(self, collection, ttl_seconds: int = 86400, lease_seconds: int = 60):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self._held: Dict[str, str] = {}
+
+    def ensure_indexes(self):
+        self.collection.create_index('expires_at', expireAfterSeconds=0)
+
+    def claim(self, key: str, operation: str) -> Optional[Dict[str, Any]]:
+        """Claim `key`; returns None if claimed, otherwise the existing record"""
+        now = datetime.now()
+        lease = {
+            'operation': operation,
+            'status': STATUS_IN_PROGRESS,
+            'holder': uuid.uuid4().hex,
+            'created_at': now,
+            'expires_at': now + timedelta(seconds=self.lease_seconds),
+        }
+        try:
+            self.collection.insert_one({'_id': key, **lease})
+            self._held[key] = lease['holder']
+            return None
+        except DuplicateKeyError:
+            # Take over a claim whose holder let the lease run out, most likely by crashing
+            taken = self.collection.find_one_and_update(
+                {'_id': key, 'operation': operation, 'status': STATUS_IN_PROGRESS, 'expires_at': {'$lte': now}},
+                {'$set': lease}
+            )
+            if taken is not None:
+                logger.warning(f"Took over expired idempotency claim {key} for {operation}")
+                self._held[key] = lease['holder']
+                return None
+            existing = self.collection.find_one({'_id': key})
+            if existing is None:
+                # Expired between the insert and the read; claim it again
+                return self.claim(key, operation)
+            return existing
+
+    def _owned(self, key: str) -> Dict[str, Any]:
+        return {'_id': key, 'status': STATUS_IN_PROGRESS, 'holder': self._held.get(key)}
+
+    def renew(self, key: str) -> bool:
+        """Extend a held claim by another lease; False if it was lost"""
+        result = self.collection.update_one(
+            self._owned(key), {'$set': {'expires_at': datetime.now() + timedelta(seconds=self.lease_seconds)}}
+        )
+        return bool(result.matched_count)
+
+    async def keep_alive(self, key: str):
+        """Renew a held claim every third of a lease until cancelled or the claim is lost"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = self.renew(key)
+            except Exception as e:
+                logger.error(f"Error renewing idempotency claim {key}: {e}")
+                continue
+            if not renewed:
+                logger.warning(f"Idempotency claim {key} lost its lease; it will not be renewed")
+                return
+
+    def complete(self, key: str, response: Dict[str, Any]) -> bool:
+        """Store the response of a held claim; False if another worker has taken it over"""
+        now = datetime.now()
+        result = self.collection.update_one(
+            self._owned(key),
+            {'$set': {'status': STATUS_COMPLETED, 'response': response, 'completed_at': now,
+                      'expires_at': now + timedelta(seconds=self.ttl_seconds)},
+             '$unset': {'holder': ''}}
+        )
+        self._held.pop(key, None)
+        if not result.matched_count:
+            logger.warning(f"Idempotency claim {key} lost its lease; its response is discarded")
+            return False
+        return True
+
+    def release(self, key: str):
+        """Forget a claim whose request failed, so the client can retry with the same key"""
+        self.collection.delete_one(self._owned(key))
+        self._held.pop(key, None)
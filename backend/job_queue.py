@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from metrics import BACKGROUND_JOBS, REFRESH_JOB_LATENCY
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_SUCCEEDED = 'succeeded'
+STATUS_FAILED = 'failed'
+
+
+class JobProgress:
+    """Progress reporter handed to job handlers; every report also renews the job's lease
+
+    Reports only land while this worker still owns the job, so a worker that lost its
+    lease cannot overwrite the progress of the attempt that replaced it.
+    """
+
+    def __init__(self, queue: 'JobQueue', job: Dict[str, Any]):
+        self.queue = queue
+        self.job_id = job['_id']
+        self._owned = queue._owned(job)
+
+    def report(self, current: int, total: int, message: str = ''):
+        self.queue.collection.update_one(
+            self._owned,
+            {'$set': {
+                'progress': {'current': current, 'total': total, 'message': message},
+                'heartbeat_at': datetime.now(),
+            }}
+        )
+
+
+JobHandler = Callable[[Dict[str, Any], JobProgress], Awaitable[Any]]
+# Checks a job's params before it is queued, raising ValueError if they are unusable
+ParamsValidator = Callable[[Dict[str, Any]], None]
+
+
+class JobQueue:
+    """Durable MongoDB-backed queue running long operations on a fixed pool of workers
+
+    Jobs are claimed atomically with find_one_and_update in priority order, so any number
+    of API processes can share one queue. Failed jobs are retried with exponential backoff
+    up to `max_attempts`; a running job whose worker stops heartbeating for
+    `lease_seconds` is put back on the queue, or failed once its attempts are used up.
+    Every update a worker makes to a claimed job is conditional on still owning that
+    attempt, so a worker whose lease expired cannot overwrite the job's new state.
+    """
+
+    def __init__(self, collection, handlers: Dict[str, JobHandler], concurrency: int = 2,
+                 max_attempts: int = 3, retry_backoff: float = 5.0, poll_interval: float = 1.0,
+                 lease_seconds: float = 300.0, validators: Optional[Dict[str, ParamsValidator]] = None):
+        self.collection = collection
+        self.handlers = handlers
+        self.validators = validators or {}
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def ensure_indexes(self):
+        self.collection.create_index([('status', 1), ('priority', -1), ('created_at', 1)])
+
+    # --- producers ------------------------------------------------------------------
+
+    def enqueue(self, job_type: str, params: Optional[Dict[str, Any]] = None, priority: int = 0,
+                max_attempts: Optional[int] = None) -> Dict[str, Any]:
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type {job_type!r}")
+        params = params or {}
+        validator = self.validators.get(job_type)
+        if validator:
+            validator(params)
+        now = datetime.now()
+        job = {
+            '_id': str(uuid.uuid4()),
+            'type': job_type,
+            'params': params,
+            'priority': priority,
+            'status': STATUS_QUEUED,
+            'attempts': 0,
+            'max_attempts': max_attempts or self.max_attempts,
+            'progress': None,
+            'result': None,
+            'error': None,
+            'created_at': now,
+            'available_at': now,
+            'started_at': None,
+            'finished_at': None,
+        }
+        self.collection.insert_one(job)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({'_id': job_id})
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            status: self.collection.count_documents({'status': status})
+            for status in (STATUS_QUEUED, STATUS_RUNNING, STATUS_SUCCEEDED, STATUS_FAILED)
+        }
+
+    # --- workers --------------------------------------------------------------------
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        logger.info(f"Started {self.concurrency} job workers as {self.worker_id}")
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.now()
+        return self.collection.find_one_and_update(
+            {'status': STATUS_QUEUED, 'available_at': {'$lte': now}},
+            {
+                '$set': {'status': STATUS_RUNNING, 'started_at': now, 'heartbeat_at': now, 'worker_id': self.worker_id},
+                '$inc': {'attempts': 1},
+            },
+            sort=[('priority', -1), ('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _owned(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Filter matching `job` only while this worker still runs the attempt it claimed"""
+        return {'_id': job['_id'], 'status': STATUS_RUNNING, 'worker_id': self.worker_id,
+                'attempts': job['attempts']}
+
+    def requeue_expired(self) -> int:
+        """Put back running jobs whose worker stopped heartbeating; returns how many
+
+        Jobs that have used up their attempts are failed instead of requeued, so a job
+        that keeps killing its worker does not run forever.
+        """
+        now = datetime.now()
+        expired = now - timedelta(seconds=self.lease_seconds)
+        stale = list(self.collection.find(
+            {'status': STATUS_RUNNING, 'heartbeat_at': {'$lt': expired}},
+            {'type': 1, 'attempts': 1, 'max_attempts': 1}
+        ))
+        requeued = failed = 0
+        for job in stale:
+            exhausted = job['attempts'] >= job['max_attempts']
+            if exhausted:
+                update = {'status': STATUS_FAILED, 'finished_at': now}
+            else:
+                update = {'status': STATUS_QUEUED, 'available_at': now}
+            result = self.collection.update_one(
+                {'_id': job['_id'], 'status': STATUS_RUNNING, 'attempts': job['attempts'],
+                 'heartbeat_at': {'$lt': expired}},
+                {'$set': {**update, 'error': 'Worker lease expired'}}
+            )
+            if not result.modified_count:
+                continue
+            if exhausted:
+                failed += 1
+                BACKGROUND_JOBS.inc(job=job['type'], outcome='failed')
+            else:
+                requeued += 1
+        if requeued or failed:
+            logger.warning(f"Jobs with expired leases: {requeued} requeued, {failed} failed after their last attempt")
+        return requeued + failed
+
+    async def _work(self):
+        while True:
+            try:
+                self.requeue_expired()
+                job = self._claim()
+            except Exception as e:
+                logger.error(f"Error claiming job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job)
+
+    async def _heartbeat(self, job: Dict[str, Any]):
+        """Renew the lease of a running job, even when its handler reports no progress"""
+        owned = self._owned(job)
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                result = self.collection.update_one(owned, {'$set': {'heartbeat_at': datetime.now()}})
+            except Exception as e:
+                logger.error(f"Error renewing lease of job {job['_id']}: {e}")
+                continue
+            if not result.matched_count:
+                logger.warning(f"Job {job['_id']} attempt {job['attempts']} lost its lease; it will not be renewed")
+                return
+
+    def _finish(self, job: Dict[str, Any], update: Dict[str, Any]) -> bool:
+        """Apply a worker's final update to `job`; False if another attempt has taken it over"""
+        result = self.collection.update_one(self._owned(job), {'$set': update})
+        if not result.matched_count:
+            logger.warning(f"Job {job['_id']} attempt {job['attempts']} lost its lease; its outcome is discarded")
+            return False
+        return True
+
+    async def _run(self, job: Dict[str, Any]):
+        job_id = job['_id']
+        handler = self.handlers[job['type']]
+        started = time.perf_counter()
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            result = await handler(job, JobProgress(self, job))
+        except asyncio.CancelledError:
+            # Shutting down: hand the job straight back instead of waiting for the lease
+            self.collection.update_one(
+                self._owned(job),
+                {'$set': {'status': STATUS_QUEUED, 'available_at': datetime.now()}, '$inc': {'attempts': -1}}
+            )
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} ({job['type']}) failed on attempt {job['attempts']}: {e}")
+            if job['attempts'] < job['max_attempts']:
+                delay = self.retry_backoff * 2 ** (job['attempts'] - 1)
+                update = {'status': STATUS_QUEUED, 'available_at': datetime.now() + timedelta(seconds=delay)}
+                outcome = 'retried'
+            else:
+                update = {'status': STATUS_FAILED, 'finished_at': datetime.now()}
+                outcome = 'failed'
+            if self._finish(job, {**update, 'error': str(e)}):
+                BACKGROUND_JOBS.inc(job=job['type'], outcome=outcome)
+            return
+        finally:
+            heartbeat.cancel()
+
+        if self._finish(job, {'status': STATUS_SUCCEEDED, 'result': result, 'error': None,
+                              'finished_at': datetime.now()}):
+            BACKGROUND_JOBS.inc(job=job['type'], outcome='succeeded')
+            REFRESH_JOB_LATENCY.observe(time.perf_counter() - started, job=job['type'])
@@ -0,0 +1,294 @@
+import logging
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from amortization import covenant_breaches, coverage_metrics, debt_service_schedule, noi_path, rate_paths
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ('unpaid_balance', 'note_rate', 'property_value', 'noi', 'remaining_term_months')
+# Optional columns and their defaults: amortization_months 0 means interest-only,
+# a missing purchase_price leaves the acquisition price to the caller
+OPTIONAL_COLUMNS = {'accrued_interest': 0.0, 'amortization_months': 0.0, 'purchase_price': np.nan}
+ID_COLUMN = 'loan_id'
+NUMERIC_COLUMNS = REQUIRED_COLUMNS + tuple(OPTIONAL_COLUMNS)
+
+RESULT_COLUMNS = (
+    'face_value', 'purchase_price', 'price_to_face', 'discount_to_face', 'implied_cap_rate',
+    'property_cap_rate', 'current_ltv', 'dscr', 'debt_yield', 'monthly_collection', 'recovery_at_maturity',
+)
+
+
+def _normalize(name: str) -> str:
+    return str(name).strip().lower()
+
+
+class LoanTape:
+    """A loan tape held as one numpy array per column"""
+
+    def __init__(self, loan_ids: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.loan_ids = loan_ids
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.loan_ids)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def slice(self, start: int, stop: int) -> 'LoanTape':
+        """Loans `start` to `stop`, sharing this tape's arrays"""
+        return LoanTape(self.loan_ids[start:stop], {name: values[start:stop] for name, values in self.columns.items()})
+
+    @classmethod
+    def from_batches(cls, batches: Iterable[Dict[str, np.ndarray]]) -> 'LoanTape':
+        """Concatenate column batches, filling optional columns and validating the result"""
+        parts: Dict[str, List[np.ndarray]] = {}
+        for batch in batches:
+            for name, values in batch.items():
+                parts.setdefault(name, []).append(values)
+
+        missing = [name for name in REQUIRED_COLUMNS if name not in parts]
+        if missing:
+            raise ValueError(f"Loan tape is missing columns: {', '.join(missing)}")
+
+        columns = {name: np.concatenate(parts[name]).astype(np.float64) for name in NUMERIC_COLUMNS if name in parts}
+        size = len(columns[REQUIRED_COLUMNS[0]])
+        for name, default in OPTIONAL_COLUMNS.items():
+            if name not in columns:
+                columns[name] = np.full(size, default)
+            else:
+                columns[name] = np.nan_to_num(columns[name], nan=default)
+
+        if ID_COLUMN in parts:
+            loan_ids = np.concatenate(parts[ID_COLUMN]).astype(str)
+        else:
+            loan_ids = np.array([f"LOAN-{index + 1:06d}" for index in range(size)])
+
+        invalid = np.zeros(size, dtype=bool)
+        for name in REQUIRED_COLUMNS:
+            invalid |= ~np.isfinite(columns[name])
+        invalid |= (columns['unpaid_balance'] <= 0) | (columns['property_value'] <= 0) | (columns['note_rate'] < 0)
+        if invalid.any():
+            rows = (np.flatnonzero(invalid)[:5] + 1).tolist()
+            raise ValueError(f"Loan tape has {int(invalid.sum())} invalid rows (first data rows: {rows})")
+
+        return cls(loan_ids, columns)
+
+
+def _csv_batches(source: Union[str, BinaryIO], chunk_size: int) -> Iterable[Dict[str, np.ndarray]]:
+    # pandas is imported here rather than at module level: it adds ~40 MB of RSS
+    # to every server process and only CSV ingestion needs its chunked reader
+    import pandas as pd
+
+    wanted = set(NUMERIC_COLUMNS) | {ID_COLUMN}
+    # Ids are read as text under whatever case the header uses, so 'Loan_ID' keeps leading zeros
+    start = source.tell() if not isinstance(source, str) else None
+    header = pd.read_csv(source, nrows=0).columns
+    if start is not None:
+        source.seek(start)
+    reader = pd.read_csv(
+        source,
+        usecols=lambda name: _normalize(name) in wanted,
+        dtype={name: str for name in header if _normalize(name) == ID_COLUMN},
+        chunksize=chunk_size,
+    )
+    for chunk in reader:
+        chunk.columns = [_normalize(name) for name in chunk.columns]
+        yield {
+            name: chunk[name].to_numpy(dtype=str if name == ID_COLUMN else np.float64)
+            for name in chunk.columns
+        }
+
+
+def _parquet_batches(source: Union[str, BinaryIO], chunk_size: int) -> Iterable[Dict[str, np.ndarray]]:
+    # Imported on first use for the same reason as pandas above
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(source)
+    wanted = set(NUMERIC_COLUMNS) | {ID_COLUMN}
+    names = [name for name in parquet_file.schema_arrow.names if _normalize(name) in wanted]
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=names):
+        yield {
+            _normalize(name): np.asarray(column.to_numpy(zero_copy_only=False))
+            for name, column in zip(batch.schema.names, batch.columns)
+        }
+
+
+def detect_format(filename: str) -> str:
+    """'parquet' for .parquet/.pq files, 'csv' otherwise"""
+    return 'parquet' if str(filename).lower().endswith(('.parquet', '.pq')) else 'csv'
+
+
+def read_loan_tape(source: Union[str, BinaryIO], file_format: Optional[str] = None,
+                   chunk_size: int = 50000) -> LoanTape:
+    """Stream a CSV or Parquet loan tape into columnar arrays, `chunk_size` rows at a time
+
+    `file_format` is 'csv' or 'parquet'; by default it is taken from the file extension.
+    Column names are matched case-insensitively and unknown columns are skipped unparsed.
+    """
+    if file_format is None:
+        file_format = detect_format(source if isinstance(source, str) else getattr(source, 'name', '') or '')
+    if file_format == 'csv':
+        return LoanTape.from_batches(_csv_batches(source, chunk_size))
+    if file_format == 'parquet':
+        return LoanTape.from_batches(_parquet_batches(source, chunk_size))
+    raise ValueError(f"Unsupported loan tape format {file_format!r}")
+
+
+def price_loan_tape(tape: LoanTape, target_yield: float = 0.15, disposition_cost: float = 0.05,
+                    value_growth: float = 0.0) -> Dict[str, np.ndarray]:
+    """Price every note on the tape at `target_yield` (annual, monthly compounding)
+
+    Each note collects the lesser of its contractual payment and the property's monthly
+    NOI until maturity (or full amortization), then recovers the lesser of its remaining
+    claim and the net sale proceeds of the collateral, grown at `value_growth` a year.
+    Purchase price is the present value of those cash flows, capped at face.
+    """
+    balance = tape['unpaid_balance']
+    accrued = tape['accrued_interest']
+    face = balance + accrued
+    noi = tape['noi']
+    property_value = tape['property_value']
+    amortization = tape['amortization_months']
+    rate = tape['note_rate'] / 12
+    monthly_yield = target_yield / 12
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # Contractual payment: level amortizing payment, or interest only
+        amortizing = amortization > 0
+        level = np.where(
+            rate > 0,
+            balance * rate / (1 - (1 + rate) ** -np.where(amortizing, amortization, 1)),
+            balance / np.where(amortizing, amortization, 1)
+        )
+        payment = np.where(amortizing, level, balance * rate)
+
+        months = np.maximum(tape['remaining_term_months'], 1)
+        months = np.where(amortizing, np.minimum(months, amortization), months)
+
+        collection = np.clip(np.minimum(payment, noi / 12), 0, None)
+
+        # Balance after `months` months of collections, with any shortfall accruing at the note rate
+        growth = (1 + rate) ** months
+        remaining = np.where(rate > 0, balance * growth - collection * (growth - 1) / rate, balance - collection * months)
+        claim = np.maximum(remaining, 0) + accrued
+        sale_value = property_value * (1 + value_growth) ** (months / 12) * (1 - disposition_cost)
+        recovery = np.minimum(claim, sale_value)
+
+        discount = (1 + monthly_yield) ** -months
+        annuity = (1 - discount) / monthly_yield if monthly_yield > 0 else months
+        price = np.minimum(collection * annuity + recovery * discount, face)
+
+        annual_debt_service = payment * 12
+        return {
+            'face_value': face,
+            'purchase_price': price,
+            'price_to_face': price / face,
+            'discount_to_face': 1 - price / face,
+            'implied_cap_rate': noi / price,
+            'property_cap_rate': noi / property_value,
+            'current_ltv': face / property_value,
+            'dscr': np.where(annual_debt_service > 0, noi / annual_debt_service, np.nan),
+            'debt_yield': noi / face,
+            'monthly_collection': collection,
+            'recovery_at_maturity': recovery,
+        }
+
+
+def summarize_pricing(tape: LoanTape, results: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Tape-level totals and face-weighted averages"""
+    face = results['face_value']
+    price = results['purchase_price']
+    total_face = float(face.sum())
+    total_price = float(price.sum())
+
+    def weighted(values: np.ndarray) -> Optional[float]:
+        finite = np.isfinite(values)
+        if not finite.any():
+            return None
+        return float(np.average(values[finite], weights=face[finite]))
+
+    return {
+        'loan_count': len(tape),
+        'total_face_value': total_face,
+        'total_purchase_price': total_price,
+        'price_to_face': total_price / total_face if total_face else None,
+        'discount_to_face': 1 - total_price / total_face if total_face else None,
+        'weighted_implied_cap_rate': weighted(results['implied_cap_rate']),
+        'weighted_current_ltv': weighted(results['current_ltv']),
+        'weighted_dscr': weighted(results['dscr']),
+        'loans_below_1x_dscr': int(np.sum(results['dscr'] < 1.0)),
+        'loans_over_100_ltv': int(np.sum(results['current_ltv'] > 1.0)),
+    }
+
+
+def pricing_columns(tape: LoanTape, results: Dict[str, np.ndarray]) -> Dict[str, List]:
+    """Column-oriented, JSON-ready per-loan results; undefined ratios become None"""
+    columns: Dict[str, List] = {'loan_id': tape.loan_ids.tolist()}
+    for name in RESULT_COLUMNS:
+        values = np.round(results[name], 6)
+        columns[name] = np.where(np.isfinite(values), values, None).tolist()
+    return columns
+
+
+DEBT_SERVICE_COLUMNS = (
+    'initial_payment', 'balloon', 'min_dscr', 'min_debt_yield', 'breach_months', 'first_breach_month',
+)
+
+
+def tape_debt_service(tape: LoanTape, index_value: Optional[float] = None, spread: float = 0.0,
+                      floor: Optional[float] = None, cap: Optional[float] = None, interest_only_months: int = 0,
+                      noi_growth: float = 0.0, min_dscr: float = 1.25, min_debt_yield: Optional[float] = None,
+                      chunk_size: int = 5000) -> Dict[str, Any]:
+    """Debt service, coverage and covenant tests for every loan on the tape
+
+    Loans accrue at their note_rate, or at `index_value` plus `spread` when an index is
+    given. Schedules run over each loan's remaining term, `chunk_size` loans at a time
+    to bound memory. Returns per-loan results and monthly portfolio totals.
+    """
+    months = int(max(tape['remaining_term_months'].max(initial=1), 1))
+    results = {name: np.empty(len(tape), dtype=int if name in ('breach_months', 'first_breach_month') else float)
+               for name in DEBT_SERVICE_COLUMNS}
+    portfolio = {name: np.zeros(months) for name in ('debt_service', 'balance', 'loans_in_breach')}
+    balloons_by_month = np.zeros(months)
+
+    for start in range(0, len(tape), chunk_size):
+        chunk = tape.slice(start, start + chunk_size)
+        count = len(chunk)
+        if index_value is None:
+            rates = rate_paths(count, months, fixed_rate=chunk['note_rate'])
+        else:
+            rates = rate_paths(count, months, index_path=index_value, spread=spread, floor=floor, cap=cap)
+        term = np.clip(chunk['remaining_term_months'], 1, months).astype(int)
+        schedule = debt_service_schedule(chunk['unpaid_balance'], rates, term,
+                                         chunk['amortization_months'].astype(int), interest_only_months)
+        metrics = coverage_metrics(schedule, noi_path(chunk['noi'], months, noi_growth))
+        breaches = covenant_breaches(metrics, min_dscr, min_debt_yield)
+
+        window = slice(start, start + count)
+        results['initial_payment'][window] = schedule['payment'][:, 0]
+        results['balloon'][window] = schedule['balloon']
+        # Matured months are NaN; a loan with no defined ratio at all reports NaN
+        results['min_dscr'][window] = np.fmin.reduce(metrics['dscr'], axis=1)
+        results['min_debt_yield'][window] = np.fmin.reduce(metrics['debt_yield'], axis=1)
+        results['breach_months'][window] = breaches['breach_months']
+        results['first_breach_month'][window] = breaches['first_breach_month']
+
+        portfolio['debt_service'] += schedule['payment'].sum(axis=0)
+        portfolio['balance'] += schedule['balance'].sum(axis=0)
+        portfolio['loans_in_breach'] += breaches['breach'].sum(axis=0)
+        balloons_by_month += np.bincount(term - 1, weights=schedule['balloon'], minlength=months)
+
+    portfolio['balloons'] = balloons_by_month
+    return {'loans': results, 'portfolio': portfolio, 'months': months}
+
+
+def debt_service_columns(tape: LoanTape, analysis: Dict[str, Any]) -> Dict[str, List]:
+    """Column-oriented, JSON-ready per-loan debt service results"""
+    columns: Dict[str, List] = {'loan_id': tape.loan_ids.tolist()}
+    for name in DEBT_SERVICE_COLUMNS:
+        values = np.round(analysis['loans'][name], 6)
+        columns[name] = np.where(np.isfinite(values), values, None).tolist()
+    return columns
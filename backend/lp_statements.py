@@ -0,0 +1,271 @@
+import io
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+import process_pool
+
+try:
+    import boto3
+except ImportError:  # pragma: no cover - boto3 is only needed for the S3 store
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('md', 'xlsx')
+CONTENT_TYPES = {
+    'md': 'text/markdown; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# LPs rendered per worker task: large enough to amortize pickling, small enough to balance the pool
+BATCH_SIZE = 25
+
+ACTIVITY = (
+    ('Contributions', 'paid_in', 1),
+    ('Distributions', 'distributions', -1),
+    ('Management Fees', 'management_fees', -1),
+    ('Carried Interest', 'carried_interest', -1),
+    ('Allocated Gains / (Losses)', 'allocations', 1),
+)
+
+
+class LocalStatementStore:
+    """Statements written under a local directory, one file per key"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        root = os.path.realpath(self.root)
+        path = os.path.realpath(os.path.join(root, key))
+        if os.path.commonpath([root, path]) != root or path == root:
+            raise ValueError(f"Statement key {key!r} points outside the statement directory")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as handle:
+            handle.write(data)
+        return path
+
+
+class S3StatementStore:
+    """Statements uploaded to an S3-compatible bucket
+
+    The client is created lazily in each process, so the store can be handed to pool
+    workers.
+    """
+
+    def __init__(self, bucket: str, prefix: str = '', endpoint_url: Optional[str] = None):
+        if boto3 is None:
+            raise RuntimeError("boto3 is required for the S3 statement store")
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.endpoint_url = endpoint_url
+        self._client = None
+
+    def __getstate__(self):
+        return {**self.__dict__, '_client': None}
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        if self._client is None:
+            self._client = boto3.client('s3', endpoint_url=self.endpoint_url)
+        key = f"{self.prefix}/{key}" if self.prefix else key
+        self._client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type)
+        return f"s3://{self.bucket}/{key}"
+
+
+def statement_data(history: Dict[str, Any], quarter: int) -> List[Dict[str, Any]]:
+    """Per-LP quarter and inception-to-date figures from a ledger history, as plain dicts
+
+    `history` is CapitalLedger.history through at least `quarter`.
+    """
+    metrics = history['metrics']
+
+    def at(name: str, index: int) -> np.ndarray:
+        return metrics[name][:, index] if index >= 0 else np.zeros(len(history['lp_ids']))
+
+    statements = []
+    for row, lp_id in enumerate(history['lp_ids']):
+        def value(name: str, index: int = quarter) -> Optional[float]:
+            number = float(at(name, index)[row])
+            return number if np.isfinite(number) else None
+
+        statements.append({
+            'lp_id': lp_id,
+            'quarter': quarter,
+            'beginning_balance': value('capital_account', quarter - 1),
+            'ending_balance': value('capital_account'),
+            'quarter_activity': {name: value(name) - value(name, quarter - 1) for _, name, _ in ACTIVITY},
+            'inception_activity': {name: value(name) for _, name, _ in ACTIVITY},
+            'committed': value('committed'),
+            'paid_in': value('paid_in'),
+            'unfunded': value('unfunded'),
+            'dpi': value('dpi'),
+            'rvpi': value('rvpi'),
+            'tvpi': value('tvpi'),
+        })
+    return statements
+
+
+def _money(value: float) -> str:
+    value = round(value, 2) + 0.0  # No negative zero
+    return f"(${-value:,.2f})" if value < 0 else f"${value:,.2f}"
+
+
+def _multiple(value: Optional[float]) -> str:
+    return f"{value:.2f}x" if value is not None else 'n/a'
+
+
+def render_markdown(statement: Dict[str, Any], fund_name: str) -> str:
+    """One LP's quarterly capital account statement as markdown"""
+    lines = [
+        f"# {fund_name}",
+        f"## Capital Account Statement - {statement['lp_id']}",
+        f"**Period:** Quarter {statement['quarter']}  ",
+        f"**Generated:** {datetime.now().strftime('%B %d, %Y')}",
+        "",
+        "### Capital Account",
+        "",
+        "| | Quarter | Inception to Date |",
+        "|---|---:|---:|",
+        f"| Beginning Balance | {_money(statement['beginning_balance'])} | $0.00 |",
+    ]
+    for label, name, sign in ACTIVITY:
+        lines.append(f"| {label} | {_money(sign * statement['quarter_activity'][name])} | "
+                     f"{_money(sign * statement['inception_activity'][name])} |")
+    lines += [
+        f"| **Ending Balance** | **{_money(statement['ending_balance'])}** | **{_money(statement['ending_balance'])}** |",
+        "",
+        "### Commitment",
+        "",
+        f"- Committed capital: {_money(statement['committed'])}",
+        f"- Paid-in capital: {_money(statement['paid_in'])}",
+        f"- Unfunded commitment: {_money(statement['unfunded'])}",
+        "",
+        "### Performance",
+        "",
+        f"- DPI: {_multiple(statement['dpi'])}",
+        f"- RVPI: {_multiple(statement['rvpi'])}",
+        f"- TVPI: {_multiple(statement['tvpi'])}",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def render_xlsx(statement: Dict[str, Any], fund_name: str) -> bytes:
+    """One LP's quarterly capital account statement as an xlsx workbook"""
+    # Imported here so the API process only loads openpyxl if it renders a workbook
+    # itself; normally only pool workers do
+    from openpyxl import Workbook
+    from openpyxl.styles import Border, Font, PatternFill, Side
+
+    workbook = Workbook()
+    ws = workbook.active
+    ws.title = 'Capital Account'
+    header_font = Font(name='Calibri', size=12, bold=True, color='FFFFFF')
+    header_fill = PatternFill(start_color='2F4F4F', end_color='2F4F4F', fill_type='solid')
+    border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'),
+                    bottom=Side(style='thin'))
+    currency_format = '"$"#,##0.00_);[Red]("$"#,##0.00)'
+
+    ws['A1'] = fund_name
+    ws['A1'].font = Font(name='Calibri', size=14, bold=True)
+    ws['A2'] = f"Capital Account Statement - {statement['lp_id']} - Quarter {statement['quarter']}"
+
+    rows = [['', 'Quarter', 'Inception to Date'],
+            ['Beginning Balance', statement['beginning_balance'], 0.0]]
+    rows += [[label, sign * statement['quarter_activity'][name], sign * statement['inception_activity'][name]]
+             for label, name, sign in ACTIVITY]
+    rows += [['Ending Balance', statement['ending_balance'], statement['ending_balance']],
+             [],
+             ['Committed Capital', statement['committed']],
+             ['Paid-in Capital', statement['paid_in']],
+             ['Unfunded Commitment', statement['unfunded']],
+             [],
+             ['DPI', statement['dpi']],
+             ['RVPI', statement['rvpi']],
+             ['TVPI', statement['tvpi']]]
+
+    for i, row_data in enumerate(rows, start=4):
+        for j, value in enumerate(row_data):
+            cell = ws.cell(row=i, column=1+j, value=value)
+            cell.border = border
+            if i == 4:
+                cell.font = header_font
+                cell.fill = header_fill
+            elif j > 0:
+                cell.number_format = '0.00"x"' if row_data[0] in ('DPI', 'RVPI', 'TVPI') else currency_format
+    ws.column_dimensions['A'].width = 28
+    ws.column_dimensions['B'].width = 20
+    ws.column_dimensions['C'].width = 20
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+RENDERERS = {'md': render_markdown, 'xlsx': render_xlsx}
+
+
+def statement_key(fund_id: str, quarter: int, lp_id: str, fmt: str) -> str:
+    return f"{fund_id}/Q{quarter}/{lp_id}.{fmt}"
+
+
+def _render_batch(statements: Sequence[Dict[str, Any]], fund_id: str, fund_name: str, formats: Sequence[str],
+                  store) -> Dict[str, Any]:
+    written = 0
+    size = 0
+    for statement in statements:
+        for fmt in formats:
+            rendered = RENDERERS[fmt](statement, fund_name)
+            data = rendered.encode('utf-8') if isinstance(rendered, str) else rendered
+            store.put(statement_key(fund_id, statement['quarter'], statement['lp_id'], fmt), data, CONTENT_TYPES[fmt])
+            written += 1
+            size += len(data)
+    return {'statements': len(statements), 'files': written, 'bytes': size}
+
+
+def generate_statements(statements: Sequence[Dict[str, Any]], fund_id: str, store, fund_name: str = 'Coastal Oak Capital',
+                        formats: Sequence[str] = FORMATS, workers: Optional[int] = None, batch_size: int = BATCH_SIZE,
+                        progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """Render and store every LP's statement in each format, batches of LPs per pool task,
+    at most `workers` (default and cap: the shared pool's size) at a time
+
+    Workers write straight to `store`, so rendered files never travel back to the
+    parent. Returns counts, bytes written, elapsed time and throughput; `progress` is
+    called with (statements done, total) as batches finish.
+    """
+    unknown = [fmt for fmt in formats if fmt not in RENDERERS]
+    if unknown:
+        raise ValueError(f"Unknown statement format {unknown[0]!r}; expected one of {', '.join(FORMATS)}")
+    started = time.perf_counter()
+    batches = [statements[start:start + batch_size] for start in range(0, len(statements), batch_size)]
+    workers = max(min(workers or process_pool.max_workers(), process_pool.max_workers(), len(batches)), 1)
+
+    totals = {'statements': 0, 'files': 0, 'bytes': 0}
+
+    def record(result: Dict[str, Any]):
+        for key in totals:
+            totals[key] += result[key]
+        if progress:
+            progress(totals['statements'], len(statements))
+
+    if workers > 1:
+        tasks = ((batch, fund_id, fund_name, formats, store) for batch in batches)
+        for _, result in process_pool.run_bounded(_render_batch, tasks, workers):
+            record(result)
+    else:
+        for batch in batches:
+            record(_render_batch(batch, fund_id, fund_name, formats, store))
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Rendered {totals['files']} statement files for {totals['statements']} LPs in {elapsed:.2f}s")
+    return {
+        **totals,
+        'workers': workers,
+        'elapsed_seconds': round(elapsed, 3),
+        'statements_per_second': round(totals['statements'] / elapsed, 1) if elapsed > 0 else None,
+        'megabytes_per_second': round(totals['bytes'] / elapsed / 1e6, 2) if elapsed > 0 else None,
+    }
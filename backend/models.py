@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional, Dict, Any
 from datetime import datetime
 import uuid
 
@@ -57,6 +57,183 @@ class UpdateRequest(BaseModel):
     force_refresh: bool = False
 
 
+class JobRequest(BaseModel):
+    type: str  # 'refresh_all', 'create_document', 'export_xlsx' or 'lp_statements'
+    params: Dict[str, Any] = {}
+    priority: int = 0  # Higher runs first
+
+
+class ResolutionScenario(BaseModel):
+    name: str
+    probability: float = Field(ge=0, le=1)
+    timeline_months: int = Field(ge=1, le=360)  # Months from purchase to resolution
+    recovery_rate: float = Field(ge=0)  # Resolution proceeds as a share of note face value
+    coupon_share: float = Field(default=0.0, ge=0)  # Share of contractual interest collected meanwhile
+    noi_share: float = Field(default=0.0, ge=0)  # Share of property NOI collected meanwhile
+    cost_rate: float = Field(default=0.0, ge=0)  # Annual legal and carry costs as a share of face
+
+
+class ConstructionBudgetLine(BaseModel):
+    name: str
+    amount: float = Field(ge=0)
+    start_month: int = Field(default=0, ge=0)  # Month of the first draw; 0 is loan closing
+    duration_months: int = Field(default=1, ge=1)
+    curve: str = 'straight'  # 'straight' or 's_curve' spending over the duration
+
+
+class ConstructionScenarioRequest(BaseModel):
+    budget: Optional[List[ConstructionBudgetLine]] = None  # Defaults to the pro forma cost breakdown
+    cost_factors: List[float] = [1.0]  # Budget multipliers, e.g. 1.10 for a 10% overrun
+    construction_rates: List[float] = [0.085]  # Annual construction loan rates
+    loan_to_cost: float = Field(default=0.75, ge=0, lt=1)
+    origination_fee: float = Field(default=0.01, ge=0)
+    conversion_month: Optional[int] = Field(default=None, ge=1)  # Defaults to completion + 12 months
+    permanent_rate: float = Field(default=0.065, ge=0)
+    permanent_amortization_months: int = Field(default=360, ge=1)
+    permanent_max_ltv: float = Field(default=0.65, gt=0)
+    permanent_min_dscr: float = Field(default=1.25, gt=0)
+    stabilized_noi: float = Field(default=15789147, ge=0)
+    valuation_cap_rate: float = Field(default=0.065, gt=0)
+    include_schedules: bool = False
+
+
+class DataCenterSite(BaseModel):
+    name: str
+    # Unset drivers take the model defaults; an unset electricity_rate uses the live market rate
+    it_capacity_mw: Optional[float] = Field(default=None, gt=0)
+    pue: Optional[float] = Field(default=None, ge=1)
+    load_factor: Optional[float] = Field(default=None, ge=0, le=1)
+    stabilized_occupancy: Optional[float] = Field(default=None, ge=0, le=1)
+    lease_up_months: Optional[int] = Field(default=None, ge=1)
+    start_month: Optional[int] = Field(default=None, ge=0)
+    colocation_rate: Optional[float] = Field(default=None, ge=0)  # $/kW/month
+    power_services_rate: Optional[float] = Field(default=None, ge=0)  # $/kW/month
+    grid_services_rate: Optional[float] = Field(default=None, ge=0)  # $/kW/year
+    electricity_rate: Optional[float] = Field(default=None, ge=0)  # cents/kWh
+    energy_recovery: Optional[float] = Field(default=None, ge=0, le=1)
+    rate_escalation: Optional[float] = None
+
+
+class DataCenterModelRequest(BaseModel):
+    sites: List[DataCenterSite]
+    electricity_rate_factors: List[float] = [1.0]  # Power price scenarios, as multiples of each site's rate
+    pricing_factors: List[float] = [1.0]  # $/kW pricing scenarios, as multiples of each site's rates
+    months: int = Field(default=120, ge=1, le=600)
+    include_monthly: bool = False
+
+
+class EVChargingSite(BaseModel):
+    name: str
+    # Unset drivers take the simulation defaults; an unset electricity_rate uses the live market rate
+    dcfc_ports: Optional[int] = Field(default=None, ge=0)
+    dcfc_power_kw: Optional[float] = Field(default=None, gt=0)
+    dcfc_utilization: Optional[float] = Field(default=None, ge=0, le=1)
+    dcfc_price: Optional[float] = Field(default=None, ge=0)  # $/kWh
+    mcs_ports: Optional[int] = Field(default=None, ge=0)
+    mcs_power_kw: Optional[float] = Field(default=None, gt=0)
+    mcs_utilization: Optional[float] = Field(default=None, ge=0, le=1)
+    mcs_price: Optional[float] = Field(default=None, ge=0)  # $/kWh
+    electricity_rate: Optional[float] = Field(default=None, ge=0)  # cents/kWh off-peak
+    peak_multiplier: Optional[float] = Field(default=None, ge=0)
+    super_off_peak_multiplier: Optional[float] = Field(default=None, ge=0)
+    summer_multiplier: Optional[float] = Field(default=None, ge=0)
+    demand_charge: Optional[float] = Field(default=None, ge=0)  # $/kW-month
+    peak_demand_charge: Optional[float] = Field(default=None, ge=0)  # $/kW-month
+    enrolled_kw: Optional[float] = Field(default=None, ge=0)
+    dispatch_hours: Optional[int] = Field(default=None, ge=0, le=8760)
+    capacity_payment: Optional[float] = Field(default=None, ge=0)  # $/kW-year
+    dispatch_payment: Optional[float] = Field(default=None, ge=0)  # $/kWh curtailed
+    daily_variability: Optional[float] = Field(default=None, ge=0)
+
+
+class EVChargingRequest(BaseModel):
+    sites: List[EVChargingSite]
+    electricity_rate_factors: List[float] = [1.0]  # Power price scenarios, as multiples of each site's rate
+    utilization_factors: List[float] = [1.0]  # Demand scenarios, as multiples of each site's utilization
+    seed: Optional[int] = 0
+    include_monthly: bool = False
+
+
+class HeatRecoverySite(BaseModel):
+    name: str
+    # Unset drivers take the engine defaults; an unset electricity_rate uses the live market rate
+    it_capacity_mw: Optional[float] = Field(default=None, gt=0)
+    occupancy: Optional[float] = Field(default=None, ge=0, le=1)
+    load_factor: Optional[float] = Field(default=None, ge=0, le=1)
+    diurnal_swing: Optional[float] = Field(default=None, ge=0, le=1)
+    pue: Optional[float] = Field(default=None, ge=1)
+    cooling_share: Optional[float] = Field(default=None, ge=0, le=1)
+    cooling_cop: Optional[float] = Field(default=None, gt=0)
+    recoverable_fraction: Optional[float] = Field(default=None, ge=0, le=1)
+    thermal_demand_kw: Optional[float] = Field(default=None, ge=0)
+    heat_price: Optional[float] = Field(default=None, ge=0)  # cents/kWh thermal
+    conversion_efficiency: Optional[float] = Field(default=None, ge=0, le=1)
+    conversion_capacity_kw: Optional[float] = Field(default=None, ge=0)
+    electricity_rate: Optional[float] = Field(default=None, ge=0)  # cents/kWh
+    om_rate: Optional[float] = Field(default=None, ge=0)  # cents/kWh of heat recovered
+    hourly_it_load_kw: Optional[List[float]] = None  # 8760 metered hours; replaces capacity x occupancy x load factor
+
+
+class HeatRecoveryRequest(BaseModel):
+    sites: List[HeatRecoverySite]
+    electricity_rate_factors: List[float] = [1.0]  # Power price scenarios, as multiples of each site's rate
+    recovery_factors: List[float] = [1.0]  # Capture scenarios, as multiples of each site's recoverable fraction
+    include_monthly: bool = False
+
+
+class GoalSeekDeal(BaseModel):
+    name: str
+    # Unset drivers take the goal-seek defaults
+    purchase_price: Optional[float] = Field(default=None, gt=0)  # Asking price
+    noi: Optional[float] = None  # Year 1 NOI
+    noi_growth: Optional[float] = None
+    hold_years: Optional[int] = Field(default=None, ge=1, le=30)
+    exit_cap_rate: Optional[float] = Field(default=None, gt=0)
+    ltv: Optional[float] = Field(default=None, ge=0, lt=1)
+    loan_rate: Optional[float] = Field(default=None, gt=0)
+    amortization_years: Optional[int] = Field(default=None, ge=0)  # 0 for interest only
+    closing_costs: Optional[float] = Field(default=None, ge=0)
+    disposition_cost: Optional[float] = Field(default=None, ge=0, lt=1)
+
+
+class GoalSeekRequest(BaseModel):
+    deals: List[GoalSeekDeal]
+    metric: str = 'irr'  # 'irr', 'moic' or 'dscr'
+    targets: List[float] = [0.185]  # Every deal is solved for every target
+    solve_for: str = 'purchase_price'  # or 'exit_cap_rate'
+
+
+# Fund and LP ids name statement files and object keys, so they are single path segments
+# that cannot start with a dot ('.', '..' or a hidden file)
+SAFE_ID_PATTERN = r'^[A-Za-z0-9_-][A-Za-z0-9_.-]{0,127}$'
+
+
+# Capital ledger event types. Commitments set what an LP may be called for; every other
+# event moves the capital account (see capital_accounts.ACCOUNT_SIGNS).
+EVENT_TYPES = ('commitment', 'contribution', 'distribution', 'management_fee', 'carried_interest', 'allocation')
+# The only event type whose amount may be negative (an allocated loss)
+SIGNED_EVENT_TYPES = ('allocation',)
+# Last ledger quarter (50 years); ledger reads allocate one column per quarter up to the one asked for
+MAX_QUARTER = 199
+
+
+class CapitalEvent(BaseModel):
+    lp_id: str = Field(pattern=SAFE_ID_PATTERN)
+    quarter: int = Field(ge=0, le=MAX_QUARTER)  # Quarters since the fund's first close
+    type: Literal[EVENT_TYPES]
+    amount: float  # Never negative, except an allocated loss
+
+    @model_validator(mode='after')
+    def check_sign(self):
+        if self.amount < 0 and self.type not in SIGNED_EVENT_TYPES:
+            raise ValueError(f"{self.type} amounts cannot be negative")
+        return self
+
+
+class CapitalEventBatch(BaseModel):
+    events: List[CapitalEvent]
+
+
 class RealTimeDataResponse(BaseModel):
     success: bool
     data: Dict[str, Any]
@@ -0,0 +1,68 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Size of the shared pool; 0 or unset uses one process per CPU
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", "0")) or (os.cpu_count() or 1)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def max_workers() -> int:
+    return PROCESS_POOL_WORKERS
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """The process-wide pool for CPU-bound batch work, created on first use
+
+    Workers are spawned rather than forked: forking a server that runs an event loop,
+    a Mongo client and worker threads copies their locks in whatever state they are
+    in. The pool lives until `shutdown`, so interpreter start-up and imports are paid
+    once per worker instead of once per request.
+    """
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PROCESS_POOL_WORKERS,
+                                        mp_context=multiprocessing.get_context('spawn'))
+            logger.info(f"Started process pool with {PROCESS_POOL_WORKERS} workers")
+        return _pool
+
+
+def shutdown(wait: bool = True):
+    """Stop the shared pool; a later `get_pool` starts a fresh one"""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def run_bounded(fn: Callable[..., Any], arguments: Iterable[Tuple], workers: int) -> Iterator[Tuple[int, Any]]:
+    """Run `fn(*args)` for each argument tuple on the shared pool, `workers` at a time
+
+    Yields (index, result) as calls finish. Only `workers` calls are submitted at once,
+    so a caller limited to fewer processes than the pool has leaves the rest free for
+    others. Arguments are consumed lazily.
+    """
+    pool = get_pool()
+    pending = {}
+    arguments = enumerate(arguments)
+    for index, args in arguments:
+        pending[pool.submit(fn, *args)] = index
+        if len(pending) >= workers:
+            break
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = pending.pop(future)
+            for next_index, args in arguments:
+                pending[pool.submit(fn, *args)] = next_index
+                break
+            yield index, future.result()
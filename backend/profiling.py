@@ -0,0 +1,270 @@
+import cProfile
+import hmac
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cprofile', 'sampling')
+
+
+def valid_token(provided: Optional[str], expected: Optional[str]) -> bool:
+    """Constant-time comparison of an admin token; False when either side is missing"""
+    if not provided or not expected:
+        return False
+    return hmac.compare_digest(provided.encode('utf-8'), expected.encode('utf-8'))
+
+
+class ProfileRecord:
+    """One captured request profile and its serialized artifacts"""
+
+    def __init__(self, mode: str, method: str, path: str, trigger: str):
+        self.id = str(uuid.uuid4())
+        self.mode = mode
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.started_at = datetime.now()
+        self.duration_ms = 0.0
+        self.status_code: Optional[int] = None
+        self.pstats: Optional[bytes] = None
+        self.summary: Optional[str] = None
+        self.speedscope: Optional[Dict] = None
+
+    def to_dict(self) -> Dict:
+        formats = ['pstats', 'text'] if self.mode == 'cprofile' else ['speedscope']
+        return {
+            'id': self.id,
+            'mode': self.mode,
+            'method': self.method,
+            'path': self.path,
+            'trigger': self.trigger,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round(self.duration_ms, 2),
+            'status_code': self.status_code,
+            'formats': formats,
+        }
+
+
+class ProfileStore:
+    """Bounded in-memory store of recent profiles, optionally mirrored to disk"""
+
+    def __init__(self, max_profiles: int = 50, output_dir: Optional[str] = None):
+        self.max_profiles = max_profiles
+        self.output_dir = output_dir
+        self._profiles: 'OrderedDict[str, ProfileRecord]' = OrderedDict()
+        self._lock = threading.Lock()
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+    def add(self, record: ProfileRecord):
+        with self._lock:
+            self._profiles[record.id] = record
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+        if self.output_dir:
+            try:
+                self._write(record)
+            except OSError as e:
+                logger.error(f"Error writing profile {record.id}: {e}")
+
+    def _write(self, record: ProfileRecord):
+        base = os.path.join(self.output_dir, record.id)
+        if record.pstats is not None:
+            with open(f"{base}.pstats", 'wb') as f:
+                f.write(record.pstats)
+        if record.speedscope is not None:
+            with open(f"{base}.speedscope.json", 'w') as f:
+                json.dump(record.speedscope, f)
+
+    def get(self, profile_id: str) -> Optional[ProfileRecord]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[ProfileRecord]:
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+
+class SamplingProfiler:
+    """Samples the call stack of one thread from a background thread
+
+    Produces a speedscope "sampled" profile. Unlike cProfile it adds no per-call
+    overhead to the profiled code, at the cost of statistical rather than exact counts.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self._frames: List[Dict] = []
+        self._frame_index: Dict[tuple, int] = {}
+        self._samples: List[List[int]] = []
+        self._weights: List[float] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+        self._started = 0.0
+        self._elapsed = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._elapsed = time.perf_counter() - self._started
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is not None:
+                self._samples.append(self._stack(frame))
+                self._weights.append(now - last)
+            last = now
+
+    def _stack(self, frame) -> List[int]:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_filename, code.co_name, code.co_firstlineno)
+            index = self._frame_index.get(key)
+            if index is None:
+                index = len(self._frames)
+                self._frame_index[key] = index
+                self._frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+            stack.append(index)
+            frame = frame.f_back
+        # speedscope expects stacks ordered root first
+        stack.reverse()
+        return stack
+
+    def to_speedscope(self, name: str) -> Dict:
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': self._frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': self._elapsed,
+                'samples': self._samples,
+                'weights': self._weights,
+            }],
+            'name': name,
+            'activeProfileIndex': 0,
+            'exporter': 'coastal-oak-profiling',
+        }
+
+
+class ProfilingMiddleware:
+    """ASGI middleware capturing a profile of individual requests on demand
+
+    A request is profiled when it carries the admin token in the `X-Admin-Token` header
+    together with `X-Profile-Request: <mode>` (or `profile=<mode>`), or when it is
+    picked by random sampling at `sample_rate`. The token is never read from the query
+    string, where it would end up in access logs and browser history.
+    Only one request is profiled at a time; requests arriving meanwhile run normally.
+    Note that other coroutines interleaved on the event loop show up in the profile.
+
+    Install this middleware only when profiling is configured, so it costs nothing
+    when off.
+    """
+
+    def __init__(self, app, store: ProfileStore, admin_token: Optional[str] = None,
+                 sample_rate: float = 0.0, default_mode: str = 'cprofile', sampling_interval: float = 0.001):
+        if default_mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profiling mode {default_mode!r}, expected one of {PROFILE_MODES}")
+        self.app = app
+        self.store = store
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.default_mode = default_mode
+        self.sampling_interval = sampling_interval
+        self._busy = threading.Lock()
+
+    def _requested_mode(self, scope) -> Optional[tuple]:
+        """Return (mode, trigger) if this request should be profiled"""
+        if self.admin_token:
+            headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+            query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+            mode = headers.get('x-profile-request') or query.get('profile', [None])[0]
+            if mode and valid_token(headers.get('x-admin-token'), self.admin_token):
+                return (mode if mode in PROFILE_MODES else self.default_mode), 'admin'
+
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return self.default_mode, 'sampled'
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        requested = self._requested_mode(scope)
+        if requested is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        mode, trigger = requested
+        record = ProfileRecord(mode, scope['method'], scope['path'], trigger)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                record.status_code = message['status']
+                headers = list(message.get('headers', []))
+                headers.append((b'x-profile-id', record.id.encode('latin-1')))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            if mode == 'cprofile':
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    profiler.disable()
+                    record.duration_ms = (time.perf_counter() - started) * 1000
+                    self._store_cprofile(record, profiler)
+            else:
+                sampler = SamplingProfiler(threading.get_ident(), self.sampling_interval)
+                sampler.start()
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    sampler.stop()
+                    record.duration_ms = (time.perf_counter() - started) * 1000
+                    record.speedscope = sampler.to_speedscope(f"{record.method} {record.path}")
+                    self.store.add(record)
+        finally:
+            self._busy.release()
+
+        logger.info(f"Profiled {record.method} {record.path} ({mode}, {trigger}) in "
+                    f"{record.duration_ms:.1f}ms as {record.id}")
+
+    def _store_cprofile(self, record: ProfileRecord, profiler: cProfile.Profile):
+        stats = pstats.Stats(profiler)
+        # Same format as pstats.Stats.dump_stats, loadable with pstats/snakeviz
+        record.pstats = marshal.dumps(stats.stats)
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(40)
+        record.summary = stream.getvalue()
+        self.store.add(record)
@@ -0,0 +1,227 @@
+import calendar
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from loan_tape import LoanTape
+from models import ResolutionScenario
+import process_pool
+from returns import annualize, irr, moic, npv
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCENARIOS = [
+    ResolutionScenario(name='Loan Modification', probability=0.25, timeline_months=18, recovery_rate=0.95,
+                       coupon_share=0.75, cost_rate=0.002),
+    ResolutionScenario(name='Discounted Payoff', probability=0.35, timeline_months=12, recovery_rate=0.88,
+                       cost_rate=0.004),
+    ResolutionScenario(name='Foreclosure → Own', probability=0.30, timeline_months=24, recovery_rate=1.10,
+                       noi_share=0.5, cost_rate=0.02),
+    ResolutionScenario(name='Deed-in-Lieu', probability=0.10, timeline_months=9, recovery_rate=0.78,
+                       noi_share=0.25, cost_rate=0.004),
+]
+
+PROBABILITY_WEIGHTED = 'Probability Weighted'
+DEFAULT_PRICE_TO_FACE = 0.70
+# Tapes larger than one chunk are split and analyzed on a process pool
+CHUNK_SIZE = 25000
+
+
+def validate_scenarios(scenarios: Sequence[ResolutionScenario]):
+    if not scenarios:
+        raise ValueError("At least one resolution scenario is required")
+    total = sum(scenario.probability for scenario in scenarios)
+    if abs(total - 1.0) > 1e-6:
+        raise ValueError(f"Scenario probabilities must sum to 1 (got {total:.4f})")
+
+
+def purchase_prices(tape: LoanTape, price_to_face: float = DEFAULT_PRICE_TO_FACE) -> np.ndarray:
+    """The tape's purchase_price column, falling back to `price_to_face` of face value"""
+    face = tape['unpaid_balance'] + tape['accrued_interest']
+    return np.where(np.isfinite(tape['purchase_price']), tape['purchase_price'], face * price_to_face)
+
+
+def recoveries(tape: LoanTape, scenario: ResolutionScenario, disposition_cost: float = 0.05) -> np.ndarray:
+    """Resolution proceeds per loan: `recovery_rate` of face, capped at net collateral value"""
+    face = tape['unpaid_balance'] + tape['accrued_interest']
+    return np.minimum(face * scenario.recovery_rate, tape['property_value'] * (1 - disposition_cost))
+
+
+def scenario_flows(tape: LoanTape, price: np.ndarray, scenario: ResolutionScenario,
+                   closing_costs: float = 0.01, disposition_cost: float = 0.05) -> np.ndarray:
+    """Monthly cash flows of every loan under one scenario, one row per loan
+
+    Month 0 is the purchase plus closing costs. Each month until resolution collects the
+    scenario's share of contractual interest and property NOI, less legal and carry
+    costs; resolution returns the loan's `recoveries`.
+    """
+    face = tape['unpaid_balance'] + tape['accrued_interest']
+    months = scenario.timeline_months
+    monthly = (face * tape['note_rate'] * scenario.coupon_share + tape['noi'] * scenario.noi_share
+               - face * scenario.cost_rate) / 12
+
+    flows = np.empty((len(tape), months + 1))
+    flows[:, 0] = -price * (1 + closing_costs)
+    flows[:, 1:] = monthly[:, np.newaxis]
+    flows[:, months] += recoveries(tape, scenario, disposition_cost)
+    return flows
+
+
+def _pad(flows: np.ndarray, periods: int) -> np.ndarray:
+    return np.pad(flows, ((0, 0), (0, periods - flows.shape[1])))
+
+
+def _analyze_chunk(tape: LoanTape, price: np.ndarray, scenarios: Sequence[ResolutionScenario],
+                   monthly_discount: float, closing_costs: float, disposition_cost: float) -> Dict[str, Any]:
+    periods = max(scenario.timeline_months for scenario in scenarios) + 1
+    face = tape['unpaid_balance'] + tape['accrued_interest']
+    expected = np.zeros((len(tape), periods))
+    per_scenario = []
+    for scenario in scenarios:
+        flows = scenario_flows(tape, price, scenario, closing_costs, disposition_cost)
+        expected += scenario.probability * _pad(flows, periods)
+        per_scenario.append({
+            'irr': annualize(irr(flows)),
+            'moic': moic(flows),
+            'npv': npv(flows, monthly_discount),
+            'recovery_rate': recoveries(tape, scenario, disposition_cost) / face,
+            'portfolio_flows': flows.sum(axis=0),
+        })
+    return {
+        'scenarios': per_scenario,
+        'irr': annualize(irr(expected)),
+        'moic': moic(expected),
+        'npv': npv(expected, monthly_discount),
+        'portfolio_flows': expected.sum(axis=0),
+    }
+
+
+def _combine(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if len(parts) == 1:
+        return parts[0]
+    combined = {
+        'scenarios': [],
+        'portfolio_flows': sum(part['portfolio_flows'] for part in parts),
+    }
+    for key in ('irr', 'moic', 'npv'):
+        combined[key] = np.concatenate([part[key] for part in parts])
+    for index in range(len(parts[0]['scenarios'])):
+        chunks = [part['scenarios'][index] for part in parts]
+        scenario = {key: np.concatenate([chunk[key] for chunk in chunks])
+                    for key in ('irr', 'moic', 'npv', 'recovery_rate')}
+        scenario['portfolio_flows'] = sum(chunk['portfolio_flows'] for chunk in chunks)
+        combined['scenarios'].append(scenario)
+    return combined
+
+
+def _row(name: str, probability: float, timeline: float, recovery_rate: float, flows: np.ndarray,
+         monthly_discount: float) -> Dict[str, Any]:
+    def finite(value) -> Optional[float]:
+        return float(value) if np.isfinite(value) else None
+
+    return {
+        'scenario': name,
+        'probability': probability,
+        'timeline_months': timeline,
+        'recovery_rate': finite(recovery_rate),
+        'irr': finite(annualize(irr(flows))),
+        'moic': finite(moic(flows)),
+        'npv': float(npv(flows, monthly_discount)),
+    }
+
+
+def cash_flow_dates(as_of: date, periods: int) -> List[str]:
+    """ISO dates of monthly periods 0..periods-1, period 0 being `as_of`
+
+    Period n is `as_of` plus n months, clamped to the last day of shorter months.
+    """
+    dates = []
+    for months in range(periods):
+        year, month = divmod(as_of.month - 1 + months, 12)
+        year += as_of.year
+        day = min(as_of.day, calendar.monthrange(year, month + 1)[1])
+        dates.append(date(year, month + 1, day).isoformat())
+    return dates
+
+
+def analyze_tape(tape: LoanTape, price: Optional[np.ndarray] = None,
+                 scenarios: Sequence[ResolutionScenario] = DEFAULT_SCENARIOS, discount_rate: float = 0.12,
+                 closing_costs: float = 0.01, disposition_cost: float = 0.05, as_of: Optional[date] = None,
+                 workers: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    """Resolution scenario analysis of every loan on a tape and of the tape as a portfolio
+
+    Each loan gets IRR, MOIC and NPV (at annual `discount_rate`) under every scenario
+    and under the probability-weighted expected cash flows. The portfolio table sums
+    cash flows across loans; its Probability Weighted row solves IRR and MOIC on the
+    expected cash flows rather than averaging the scenario returns. Chunks of
+    `chunk_size` loans run on at most `workers` processes of the shared pool.
+    """
+    validate_scenarios(scenarios)
+    if price is None:
+        price = purchase_prices(tape)
+    monthly_discount = (1 + discount_rate) ** (1 / 12) - 1
+    args = (scenarios, monthly_discount, closing_costs, disposition_cost)
+
+    bounds = [(start, min(start + chunk_size, len(tape))) for start in range(0, len(tape), chunk_size)] or [(0, 0)]
+    workers = min(workers or process_pool.max_workers(), process_pool.max_workers(), len(bounds))
+    if workers > 1:
+        parts = [None] * len(bounds)
+        chunks = ((tape.slice(start, stop), price[start:stop], *args) for start, stop in bounds)
+        for index, part in process_pool.run_bounded(_analyze_chunk, chunks, workers):
+            parts[index] = part
+    else:
+        parts = [_analyze_chunk(tape.slice(start, stop), price[start:stop], *args) for start, stop in bounds]
+    result = _combine(parts)
+
+    face = tape['unpaid_balance'] + tape['accrued_interest']
+    total_face = float(face.sum())
+    table = []
+    for scenario, outcome in zip(scenarios, result['scenarios']):
+        recovered = float(np.sum(outcome['recovery_rate'] * face))
+        table.append(_row(scenario.name, scenario.probability, scenario.timeline_months,
+                          recovered / total_face if total_face else np.nan,
+                          outcome['portfolio_flows'], monthly_discount))
+    table.append(_row(
+        PROBABILITY_WEIGHTED,
+        round(sum(scenario.probability for scenario in scenarios), 6),
+        round(sum(scenario.probability * scenario.timeline_months for scenario in scenarios), 6),
+        sum(scenario.probability * (row['recovery_rate'] or 0.0) for scenario, row in zip(scenarios, table)),
+        result['portfolio_flows'], monthly_discount
+    ))
+
+    as_of = as_of or datetime.now().date()
+    cash_flows = {'dates': cash_flow_dates(as_of, len(result['portfolio_flows']))}
+    for scenario, outcome in zip(scenarios, result['scenarios']):
+        cash_flows[scenario.name] = outcome['portfolio_flows'].round(2).tolist()
+    cash_flows[PROBABILITY_WEIGHTED] = result['portfolio_flows'].round(2).tolist()
+
+    return {
+        'loan_count': len(tape),
+        'total_face_value': total_face,
+        'total_purchase_price': float(price.sum()),
+        'discount_rate': discount_rate,
+        'table': table,
+        'cash_flows': cash_flows,
+        'loans': result,
+    }
+
+
+def loan_columns(tape: LoanTape, analysis: Dict[str, Any],
+                 scenarios: Sequence[ResolutionScenario] = DEFAULT_SCENARIOS) -> Dict[str, List]:
+    """Column-oriented, JSON-ready per-loan results; unsolvable IRRs become None"""
+    def column(values: np.ndarray) -> List:
+        values = np.round(values, 6)
+        return np.where(np.isfinite(values), values, None).tolist()
+
+    loans = analysis['loans']
+    columns: Dict[str, List] = {
+        'loan_id': tape.loan_ids.tolist(),
+        'expected_irr': column(loans['irr']),
+        'expected_moic': column(loans['moic']),
+        'expected_npv': column(loans['npv']),
+    }
+    for scenario, outcome in zip(scenarios, loans['scenarios']):
+        columns[f"{scenario.name} irr"] = column(outcome['irr'])
+    return columns
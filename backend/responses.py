@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+from fastapi.responses import JSONResponse
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'application/xml')
+
+
+def _orjson_default(value: Any):
+    # ObjectId and similar BSON scalars only appear in ad-hoc projections
+    return str(value)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson
+
+    Return it directly from a handler with plain `model_dump()` output: datetimes and
+    nested dicts are encoded natively, skipping FastAPI's jsonable_encoder pass, which
+    dominates serialization time for full decks.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def negotiate_encoding(accept_encoding: str, brotli_enabled: bool = True) -> Optional[str]:
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, honouring q-values"""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token] = quality
+
+    wildcard = accepted.get('*', 0.0)
+    candidates: List[Tuple[float, int, str]] = []
+    if brotli_enabled and brotli is not None:
+        candidates.append((accepted.get('br', wildcard), 1, 'br'))
+    candidates.append((accepted.get('gzip', wildcard), 0, 'gzip'))
+
+    quality, _, encoding = max(candidates)
+    return encoding if quality > 0 else None
+
+
+class _Compressor:
+    """Incremental gzip or brotli compressor with a common interface"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits 16 + MAX_WBITS produces a gzip container
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with brotli or gzip per Accept-Encoding
+
+    Responses smaller than `minimum_size`, already encoded, or of a non-text content
+    type are passed through untouched. Single-message bodies are compressed in one
+    shot; streamed bodies are compressed incrementally.
+
+    Hot documents are served as the same bytes over and over, so one-shot results are
+    kept in an LRU of up to `cache_max_bytes` compressed bytes, keyed by a digest of
+    the body: hashing a deck costs a tenth of compressing it.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4,
+                 brotli_enabled: bool = True, cache_max_bytes: int = 16 * 1024 * 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.brotli_enabled = brotli_enabled
+        self.cache_max_bytes = cache_max_bytes
+        self._cache: 'OrderedDict[Tuple[str, bytes], bytes]' = OrderedDict()
+        self._cache_bytes = 0
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        """`body` compressed in one shot, from the cache when it has been seen before"""
+        key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+        compressed = self._cache.get(key)
+        if compressed is not None:
+            self._cache.move_to_end(key)
+            return compressed
+
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level)
+        if len(compressed) <= self.cache_max_bytes:
+            self._cache[key] = compressed
+            self._cache_bytes += len(compressed)
+            while self._cache_bytes > self.cache_max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+        return compressed
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ''
+        for key, value in scope.get('headers', []):
+            if key == b'accept-encoding':
+                accept_encoding = value.decode('latin-1')
+                break
+
+        encoding = negotiate_encoding(accept_encoding, self.brotli_enabled) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, send, encoding: str, config: CompressionMiddleware):
+        self._send = send
+        self.encoding = encoding
+        self.config = config
+        self.start_message: Optional[Dict] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    def _compressible(self, headers: List[Tuple[bytes, bytes]]) -> bool:
+        content_type = ''
+        for key, value in headers:
+            if key.lower() == b'content-encoding':
+                return False
+            if key.lower() == b'content-type':
+                content_type = value.decode('latin-1').lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _headers(self, length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        headers = [(k, v) for k, v in self.start_message.get('headers', []) if k.lower() != b'content-length']
+        headers.append((b'content-encoding', self.encoding.encode('latin-1')))
+        headers.append((b'vary', b'Accept-Encoding'))
+        if length is not None:
+            headers.append((b'content-length', str(length).encode('latin-1')))
+        return headers
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.start_message = message
+            self.passthrough = not self._compressible(message.get('headers', []))
+            if self.passthrough:
+                await self._send(message)
+            return
+
+        if message['type'] != 'http.response.body' or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self.compressor is None and not more_body:
+            # Whole body in one message: compress in one shot or skip if small
+            if len(body) < self.config.minimum_size:
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+            compressed = self.config.compress(body, self.encoding)
+            await self._send({**self.start_message, 'headers': self._headers(len(compressed))})
+            await self._send({'type': 'http.response.body', 'body': compressed})
+            return
+
+        if self.compressor is None:
+            self.compressor = _Compressor(self.encoding, self.config.gzip_level, self.config.brotli_quality)
+            await self._send({**self.start_message, 'headers': self._headers(None)})
+
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.flush()
+        await self._send({'type': 'http.response.body', 'body': chunk, 'more_body': more_body})
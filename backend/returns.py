@@ -0,0 +1,121 @@
+import numpy as np
+
+# Per-period rate bracket for IRR: -99% to +1000% covers any return a deal can post
+IRR_LOWER = -0.99
+IRR_UPPER = 10.0
+
+
+def _as_rows(flows) -> np.ndarray:
+    rows = np.asarray(flows, dtype=np.float64)
+    return rows[np.newaxis, :] if rows.ndim == 1 else rows
+
+
+def _npv_and_slope(rows: np.ndarray, rate: np.ndarray):
+    """NPV of each row at its rate and the NPV's derivative in the rate
+
+    Evaluated by Horner's rule in the discount factor, one column at a time, which
+    avoids a power per cash flow.
+    """
+    factor = 1 / (1 + rate)
+    value = rows[:, -1].copy()
+    derivative = np.zeros_like(value)
+    for column in range(rows.shape[1] - 2, -1, -1):
+        derivative = derivative * factor + value
+        value = value * factor + rows[:, column]
+    # d(factor)/d(rate) = -factor ** 2
+    return value, -derivative * factor ** 2
+
+
+def npv(flows, rate):
+    """Present value of periodic cash flows (column 0 is undiscounted) at a per-period rate
+
+    `flows` is one schedule or a 2-D array of schedules, one per row; `rate` is a
+    scalar or one rate per row. Returns a scalar for a single schedule.
+    """
+    rows = _as_rows(flows)
+    rates = np.broadcast_to(np.asarray(rate, dtype=np.float64), (rows.shape[0],))
+    value, _ = _npv_and_slope(rows, rates)
+    return value[0] if np.ndim(flows) == 1 else value
+
+
+def bracketed_newton(evaluate, low: np.ndarray, high: np.ndarray, guess: np.ndarray, active: np.ndarray,
+                     tolerance: float = 1e-10, max_iterations: int = 100) -> np.ndarray:
+    """Root of a falling function per row, solved for every `active` row together
+
+    `evaluate(x, rows)` returns the function value and slope at `x` for the row indices
+    `rows`; each active row's function must be positive at `low` and negative at
+    `high`. Every row keeps that bracket; a Newton step that leaves it, or shrinks it
+    slower than halving, is replaced by bisection, so every row converges even where
+    Newton would stall. Inactive rows are returned at their guess.
+    """
+    low = np.array(low, dtype=np.float64)
+    high = np.array(high, dtype=np.float64)
+    x = np.array(guess, dtype=np.float64)
+    last_step = high - low
+    active = np.array(active, dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for _ in range(max_iterations):
+            if not active.any():
+                break
+            indices = np.flatnonzero(active)
+            current = x[indices]
+            value, slope = evaluate(current, indices)
+            lo = np.where(value > 0, current, low[indices])
+            hi = np.where(value > 0, high[indices], current)
+            step = current - value / slope
+            newton = np.isfinite(step) & (step > lo) & (step < hi) & (
+                np.abs(step - current) < 0.5 * last_step[indices])
+            solved = np.abs(value) < tolerance
+            candidate = np.where(solved, current, np.where(newton, step, (lo + hi) / 2))
+
+            converged = solved | (np.abs(candidate - current) < tolerance)
+            last_step[indices] = np.abs(candidate - current)
+            low[indices], high[indices], x[indices] = lo, hi, candidate
+            active[indices[converged]] = False
+    return x
+
+
+def irr(flows, tolerance: float = 1e-10, max_iterations: int = 100):
+    """Per-period IRR of every schedule in `flows`, solved together by bracketed Newton
+
+    Rows whose NPV does not change sign inside [IRR_LOWER, IRR_UPPER] (no outflow, no
+    inflow, or unconventional flows without a root there) are NaN.
+    """
+    rows = _as_rows(flows)
+    count = rows.shape[0]
+    low = np.full(count, IRR_LOWER)
+    high = np.full(count, IRR_UPPER)
+    value_low, _ = _npv_and_slope(rows, low)
+    value_high, _ = _npv_and_slope(rows, high)
+
+    # Orient each row so NPV falls with the rate (an investment); flip financings
+    sign = np.where(value_low >= value_high, 1.0, -1.0)
+    solvable = (sign * value_low > 0) & (sign * value_high < 0)
+    oriented = rows * sign[:, np.newaxis]
+
+    # Start from the rate that turns total outflows into total inflows over the horizon
+    inflows = np.where(oriented > 0, oriented, 0).sum(axis=1)
+    outflows = -np.where(oriented < 0, oriented, 0).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        guess = (inflows / outflows) ** (1 / max(rows.shape[1] - 1, 1)) - 1
+    guess = np.clip(np.nan_to_num(guess, nan=0.01), IRR_LOWER / 2, IRR_UPPER / 2)
+
+    rate = bracketed_newton(lambda rate, indices: _npv_and_slope(oriented[indices], rate),
+                            low, high, guess, solvable, tolerance, max_iterations)
+    result = np.where(solvable, rate, np.nan)
+    return result[0] if np.ndim(flows) == 1 else result
+
+
+def annualize(monthly_rate):
+    """Effective annual rate of a monthly rate"""
+    return (1 + np.asarray(monthly_rate)) ** 12 - 1
+
+
+def moic(flows):
+    """Multiple on invested capital: total inflows over total outflows (NaN without outflows)"""
+    rows = _as_rows(flows)
+    inflows = np.where(rows > 0, rows, 0).sum(axis=1)
+    outflows = -np.where(rows < 0, rows, 0).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.where(outflows > 0, inflows / outflows, np.nan)
+    return result[0] if np.ndim(flows) == 1 else result
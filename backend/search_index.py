@@ -0,0 +1,426 @@
+import html
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from blob_store import CHUNK_SEPARATOR, content_hash
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'[A-Za-z0-9]+')
+QUERY_PATTERN = re.compile(r'"([^"]+)"|(\S+)')
+# Too common to rank or highlight on their own; inside phrases they still have to match
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is', 'it', 'its', 'of', 'on', 'or',
+    'that', 'the', 'this', 'to', 'was', 'were', 'will', 'with',
+))
+
+SectionKey = Tuple[str, str]
+
+
+def tokenize(text: str) -> List[str]:
+    return [token.lower() for token in TOKEN_PATTERN.findall(text)]
+
+
+def parse_query(query: str) -> List[List[str]]:
+    """Split a query into clauses; each clause is a term or a phrase (list of terms)
+
+    Quoted text and hyphenated words ("heat-to-energy") are phrases; every clause must
+    match for a section to be returned. Bare stopwords are dropped unless the query has
+    nothing else.
+    """
+    clauses = []
+    for quoted, bare in QUERY_PATTERN.findall(query):
+        terms = tokenize(quoted or bare)
+        if terms:
+            clauses.append(terms)
+    content = [clause for clause in clauses if len(clause) > 1 or clause[0] not in STOPWORDS]
+    return content or clauses
+
+
+def scoring_units(clauses: List[List[str]]) -> List[Tuple[str, ...]]:
+    """What a query is ranked on: each term, plus each phrase as a whole
+
+    A phrase scores its own terms like an unquoted query would and then the phrase
+    match on top, so quoting words never ranks a section lower than leaving them bare.
+    """
+    units: Dict[Tuple[str, ...], None] = {}
+    for clause in clauses:
+        if len(clause) > 1:
+            for term in clause:
+                if term not in STOPWORDS:
+                    units[(term,)] = None
+        units[tuple(clause)] = None
+    return list(units)
+
+
+class _Section:
+    __slots__ = ('document_id', 'document_title', 'section_id', 'title', 'order', 'last_updated',
+                 'chunks', 'chunk_counts', 'title_terms', 'length')
+
+    def __init__(self, document_id: str, document_title: str, section: Dict[str, Any], chunks: List[str],
+                 chunk_lengths: Dict[str, int]):
+        self.document_id = document_id
+        self.document_title = document_title
+        self.section_id = section['id']
+        self.title = section.get('title', '')
+        self.order = section.get('order', 0)
+        self.last_updated = section.get('last_updated')
+        self.chunks = tuple(chunks)
+        self.chunk_counts = Counter(chunks)
+        self.title_terms = tokenize(self.title)
+        self.length = sum(chunk_lengths[chunk] for chunk in chunks) + len(self.title_terms)
+
+
+class SearchIndex:
+    """In-process inverted index over section titles and content
+
+    Postings are kept per unique content chunk (the same paragraph hashes the blob store
+    uses) rather than per section, so identical prose shared by thousands of decks is
+    tokenized and stored once; sections point at their chunks. Sections are ranked with
+    BM25 plus a boost for title matches. The index is updated incrementally as documents
+    are written and can catch up with writes from other workers via `sync`.
+    """
+
+    def __init__(self, text_loader: Callable[[List[str]], Dict[str, str]], k1: float = 1.2, b: float = 0.75,
+                 title_boost: float = 2.0, sync_overlap: float = 300.0):
+        self.text_loader = text_loader
+        self.k1 = k1
+        self.b = b
+        self.title_boost = title_boost
+        self.sync_overlap = sync_overlap
+        self.ready = False
+        self.last_synced: Optional[datetime] = None
+        self._lock = threading.RLock()
+        self._chunk_positions: Dict[str, Dict[str, List[int]]] = {}
+        self._chunk_lengths: Dict[str, int] = {}
+        self._chunk_sections: Dict[str, Set[SectionKey]] = {}
+        self._term_chunks: Dict[str, Set[str]] = {}
+        self._title_sections: Dict[str, Set[SectionKey]] = {}
+        self._sections: Dict[SectionKey, _Section] = {}
+        self._document_sections: Dict[str, List[SectionKey]] = {}
+        self._total_length = 0
+
+    # --- indexing -------------------------------------------------------------------
+
+    def _section_chunks(self, section: Dict[str, Any], inline_text: Dict[str, str]) -> List[str]:
+        if 'content_chunks' in section:
+            return list(section['content_chunks'])
+        # Documents stored before the blob store keep their content inline
+        chunks = []
+        for text in section.get('content', '').split(CHUNK_SEPARATOR):
+            digest = content_hash(text)
+            inline_text[digest] = text
+            chunks.append(digest)
+        return chunks
+
+    def _add_chunk(self, digest: str, text: str):
+        positions: Dict[str, List[int]] = {}
+        terms = tokenize(text)
+        for position, term in enumerate(terms):
+            positions.setdefault(term, []).append(position)
+        self._chunk_positions[digest] = positions
+        self._chunk_lengths[digest] = len(terms)
+        self._chunk_sections[digest] = set()
+        for term in positions:
+            self._term_chunks.setdefault(term, set()).add(digest)
+
+    def _drop_chunk(self, digest: str):
+        for term in self._chunk_positions.pop(digest, {}):
+            chunks = self._term_chunks.get(term)
+            if chunks is not None:
+                chunks.discard(digest)
+                if not chunks:
+                    del self._term_chunks[term]
+        self._chunk_lengths.pop(digest, None)
+        self._chunk_sections.pop(digest, None)
+
+    def _flatten(self, sections: Iterable[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+        for section in sections:
+            yield section
+            yield from self._flatten(section.get('subsections', []))
+
+    def index_document(self, doc_dict: Dict[str, Any]):
+        """Add or replace a document, given in stored (dehydrated) or plain form"""
+        document_id = doc_dict.get('_id') or doc_dict['id']
+        inline_text: Dict[str, str] = {}
+        sections = [(section, self._section_chunks(section, inline_text))
+                    for section in self._flatten(doc_dict.get('sections', []))]
+
+        all_chunks = {chunk for _, chunks in sections for chunk in chunks}
+        with self._lock:
+            self._remove_document(document_id)
+            unknown = [chunk for chunk in all_chunks if chunk not in self._chunk_positions]
+
+        # Load text for new chunks outside the lock; it may hit MongoDB
+        texts = dict(inline_text)
+        missing = [chunk for chunk in unknown if chunk not in texts]
+        if missing:
+            texts.update(self.text_loader(missing))
+
+        with self._lock:
+            # A concurrent write of this document may have re-added it, and another
+            # writer may have dropped a shared chunk in the meantime
+            self._remove_document(document_id)
+            dropped = [chunk for chunk in all_chunks if chunk not in self._chunk_positions and chunk not in texts]
+            if dropped:
+                texts.update(self.text_loader(dropped))
+            for chunk in all_chunks:
+                if chunk not in self._chunk_positions:
+                    self._add_chunk(chunk, texts[chunk])
+
+            keys = []
+            for section, chunks in sections:
+                entry = _Section(document_id, doc_dict.get('title', ''), section, chunks, self._chunk_lengths)
+                key = (document_id, entry.section_id)
+                self._sections[key] = entry
+                self._total_length += entry.length
+                for chunk in entry.chunk_counts:
+                    self._chunk_sections[chunk].add(key)
+                for term in set(entry.title_terms):
+                    self._title_sections.setdefault(term, set()).add(key)
+                keys.append(key)
+            self._document_sections[document_id] = keys
+
+    def remove_document(self, document_id: str):
+        with self._lock:
+            self._remove_document(document_id)
+
+    def _remove_document(self, document_id: str):
+        for key in self._document_sections.pop(document_id, []):
+            entry = self._sections.pop(key, None)
+            if entry is None:
+                continue
+            self._total_length -= entry.length
+            for term in set(entry.title_terms):
+                sections = self._title_sections.get(term)
+                if sections is not None:
+                    sections.discard(key)
+                    if not sections:
+                        del self._title_sections[term]
+            for chunk in entry.chunk_counts:
+                sections = self._chunk_sections.get(chunk)
+                if sections is not None:
+                    sections.discard(key)
+                    if not sections:
+                        self._drop_chunk(chunk)
+
+    def rebuild(self, documents: Iterable[Dict[str, Any]]):
+        started = datetime.now()
+        count = 0
+        for doc_dict in documents:
+            try:
+                self.index_document(doc_dict)
+                count += 1
+            except Exception as e:
+                logger.error(f"Error indexing document {doc_dict.get('_id', 'unknown')}: {e}")
+        self.ready = True
+        self.last_synced = started
+        logger.info(f"Search index built over {count} documents and {len(self._chunk_positions)} unique chunks")
+
+    def sync(self, collection):
+        """Catch up with writes (possibly by other workers) since the last sync
+
+        Documents written since then are re-indexed; documents deleted from the
+        collection are dropped. Only documents indexed before the id scan started are
+        candidates for removal, so a document created meanwhile is never dropped.
+
+        `last_updated` is stamped when a deck is rendered, before it is written, so a
+        write can land after a sync that started later than its stamp. Each sync
+        therefore reaches back `sync_overlap` seconds (at least the longest request)
+        before the previous one started.
+        """
+        started = datetime.now()
+        with self._lock:
+            indexed = set(self._document_sections)
+        stored = {doc['_id'] for doc in collection.find({}, {'_id': 1})}
+        for document_id in indexed - stored:
+            self.remove_document(document_id)
+
+        since = self.last_synced - timedelta(seconds=self.sync_overlap) if self.last_synced else None
+        query = {'last_updated': {'$gte': since}} if since else {}
+        for doc_dict in collection.find(query):
+            self.index_document(doc_dict)
+        self.last_synced = started
+
+    # --- querying -------------------------------------------------------------------
+
+    def _sections_with(self, term: str) -> Set[SectionKey]:
+        sections = set(self._title_sections.get(term, ()))
+        for chunk in self._term_chunks.get(term, ()):
+            sections.update(self._chunk_sections[chunk])
+        return sections
+
+    @staticmethod
+    def _phrase_positions(positions: Dict[str, List[int]], phrase: List[str]) -> List[int]:
+        """Start positions of `phrase` among a chunk's term positions"""
+        if any(term not in positions for term in phrase):
+            return []
+        rest = [set(positions[term]) for term in phrase[1:]]
+        return [start for start in positions[phrase[0]]
+                if all(start + offset + 1 in later for offset, later in enumerate(rest))]
+
+    def _phrase_chunks(self, phrase: List[str]) -> Set[str]:
+        candidates = set.intersection(*(self._term_chunks.get(term, set()) for term in phrase))
+        return {chunk for chunk in candidates if self._phrase_positions(self._chunk_positions[chunk], phrase)}
+
+    def _clause_matches(self, clause: List[str]) -> Tuple[Set[str], Set[SectionKey]]:
+        """Chunks containing a term or phrase, and the sections containing it in content or title"""
+        if len(clause) == 1:
+            return self._term_chunks.get(clause[0], set()), self._sections_with(clause[0])
+        chunks = self._phrase_chunks(clause)
+        sections = set()
+        for chunk in chunks:
+            sections.update(self._chunk_sections[chunk])
+        for key in set.intersection(*(self._title_sections.get(term, set()) for term in clause)):
+            if self._title_has_phrase(self._sections[key].title_terms, clause):
+                sections.add(key)
+        return chunks, sections
+
+    @staticmethod
+    def _term_frequency(chunk_counts: Counter, hits: Dict[str, int]) -> int:
+        if len(hits) < len(chunk_counts):
+            return sum(chunk_counts.get(chunk, 0) * count for chunk, count in hits.items())
+        return sum(count * hits.get(chunk, 0) for chunk, count in chunk_counts.items())
+
+    @staticmethod
+    def _title_has_phrase(title_terms: List[str], phrase: List[str]) -> bool:
+        size = len(phrase)
+        return any(title_terms[i:i + size] == phrase for i in range(len(title_terms) - size + 1))
+
+    def search(self, query: str, page: int = 1, page_size: int = 10,
+               highlight: Tuple[str, str] = ('<mark>', '</mark>'), snippet_chars: int = 200) -> Dict[str, Any]:
+        clauses = parse_query(query)
+        if not clauses:
+            return {'total': 0, 'results': []}
+
+        with self._lock:
+            section_count = max(len(self._sections), 1)
+            average_length = self._total_length / section_count if self._sections else 0.0
+
+            candidates: Optional[Set[SectionKey]] = None
+            clause_chunks: List[Set[str]] = []
+            unit_stats: Dict[Tuple[str, ...], Tuple[Set[str], Set[SectionKey]]] = {}
+            for clause in clauses:
+                chunks, sections = self._clause_matches(clause)
+                unit_stats[tuple(clause)] = (chunks, sections)
+                clause_chunks.append(chunks)
+                candidates = sections if candidates is None else candidates & sections
+                if not candidates:
+                    return {'total': 0, 'results': []}
+
+            units = scoring_units(clauses)
+            unit_idf: List[float] = []
+            unit_hits: List[Dict[str, int]] = []
+            for unit in units:
+                if unit not in unit_stats:
+                    unit_stats[unit] = self._clause_matches(list(unit))
+                chunks, sections = unit_stats[unit]
+                frequency = len(sections)
+                unit_idf.append(math.log(1 + (section_count - frequency + 0.5) / (frequency + 0.5)))
+                # Per-chunk hit counts once per unit; sections sharing identical content
+                # (the common case across decks) then share one term-frequency computation
+                if len(unit) == 1:
+                    unit_hits.append({chunk: len(self._chunk_positions[chunk][unit[0]]) for chunk in chunks})
+                else:
+                    unit_hits.append({
+                        chunk: len(self._phrase_positions(self._chunk_positions[chunk], list(unit))) for chunk in chunks
+                    })
+
+            tf_cache: Dict[Tuple[str, ...], List[int]] = {}
+            scored = []
+            for key in candidates:
+                entry = self._sections[key]
+                tfs = tf_cache.get(entry.chunks)
+                if tfs is None:
+                    tfs = [self._term_frequency(entry.chunk_counts, hits) for hits in unit_hits]
+                    tf_cache[entry.chunks] = tfs
+                normalizer = self.k1 * (1 - self.b + self.b * entry.length / average_length) if average_length else self.k1
+                score = 0.0
+                for unit, tf, idf in zip(units, tfs, unit_idf):
+                    if tf:
+                        score += idf * tf * (self.k1 + 1) / (tf + normalizer)
+                    in_title = (unit[0] in entry.title_terms if len(unit) == 1
+                                else self._title_has_phrase(entry.title_terms, list(unit)))
+                    if in_title:
+                        score += self.title_boost * idf
+                scored.append((score, entry.last_updated or datetime.min, key))
+
+            scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+            total = len(scored)
+            start = (max(page, 1) - 1) * page_size
+            page_entries = [self._sections[key] for _, _, key in scored[start:start + page_size]]
+            page_scores = [score for score, _, _ in scored[start:start + page_size]]
+            snippet_chunks = [self._snippet_chunk(entry, clause_chunks) for entry in page_entries]
+
+        texts = self.text_loader([chunk for chunk in set(snippet_chunks) if chunk])
+        terms = {term for clause in clauses for term in clause}
+        terms = (terms - STOPWORDS) or terms
+        results = []
+        for entry, score, chunk in zip(page_entries, page_scores, snippet_chunks):
+            results.append({
+                'document_id': entry.document_id,
+                'document_title': entry.document_title,
+                'section_id': entry.section_id,
+                'section_title': _highlight(entry.title, terms, highlight),
+                'order': entry.order,
+                'score': round(score, 4),
+                'snippet': _snippet(texts.get(chunk, ''), terms, highlight, snippet_chars) if chunk else '',
+            })
+        return {'total': total, 'results': results}
+
+    @staticmethod
+    def _snippet_chunk(entry: _Section, clause_chunks: List[Set[str]]) -> Optional[str]:
+        """The first chunk of a section matching the most clauses"""
+        best, best_matches = None, 0
+        for chunk in entry.chunks:
+            matches = sum(1 for chunks in clause_chunks if chunk in chunks)
+            if matches > best_matches:
+                best, best_matches = chunk, matches
+                if matches == len(clause_chunks):
+                    break
+        return best
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'documents': len(self._document_sections),
+                'sections': len(self._sections),
+                'unique_chunks': len(self._chunk_positions),
+                'terms': len(self._term_chunks),
+                'last_synced': self.last_synced.isoformat() if self.last_synced else None,
+            }
+
+
+def _highlight(text: str, terms: Set[str], tags: Tuple[str, str]) -> str:
+    """HTML-escaped `text` with `terms` wrapped in the highlight tags"""
+    opening, closing = tags
+    parts = []
+    last = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        if match.group(0).lower() in terms:
+            parts.append(html.escape(text[last:match.start()]))
+            parts.append(f"{opening}{match.group(0)}{closing}")
+            last = match.end()
+    parts.append(html.escape(text[last:]))
+    return ''.join(parts)
+
+
+def _snippet(text: str, terms: Set[str], tags: Tuple[str, str], snippet_chars: int) -> str:
+    """A window of `text` around the first query term, with query terms highlighted"""
+    text = ' '.join(text.split())
+    first = next((match.start() for match in TOKEN_PATTERN.finditer(text) if match.group(0).lower() in terms), 0)
+    start = max(0, first - snippet_chars // 4)
+    end = min(len(text), start + snippet_chars)
+    # Widen to word boundaries so highlighting never splits a word
+    while start > 0 and text[start - 1].isalnum():
+        start -= 1
+    while end < len(text) and text[end].isalnum():
+        end += 1
+    snippet = _highlight(text[start:end], terms, tags)
+    return ('…' if start > 0 else '') + snippet + ('…' if end < len(text) else '')
@@ -1,17 +1,54 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Path, Query, Request, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, PlainTextResponse, FileResponse
 from pymongo import MongoClient
 from bson import ObjectId
 import os
+import asyncio
+import importlib.util
+import json
 import logging
+import re
+import time
+import numpy as np
 from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, Any
+from typing import Annotated, Dict, Any, List, Optional, Tuple
 
 # Import our models and services - using absolute imports
-from models import LiveDocument, UpdateRequest, RealTimeDataResponse
+from models import (LiveDocument, DocumentSection, UpdateRequest, RealTimeDataResponse, JobRequest, ResolutionScenario,
+                    ConstructionScenarioRequest, DataCenterModelRequest, EVChargingRequest, HeatRecoveryRequest,
+                    CapitalEventBatch, GoalSeekRequest, MAX_QUARTER, SAFE_ID_PATTERN)
 from enhanced_document_service import EnhancedDocumentService
+from database import InstrumentedDatabase
+from blob_store import SectionBlobStore, CHUNK_SEPARATOR
+from compression import ContentCodec
+from document_history import DocumentHistory, VersionConflict
+from search_index import SearchIndex
+from document_cache import DocumentCache
+from loan_tape import (read_loan_tape, price_loan_tape, summarize_pricing, pricing_columns, detect_format,
+                       tape_debt_service, debt_service_columns)
+from amortization import index_rate, RATE_INDICES
+from data_center_model import run_data_center_model, case_table, electricity_rate, DEFAULTS as DATA_CENTER_DEFAULTS
+from ev_charging import (simulate_ev_charging, case_table as ev_case_table, hourly_calendar, CHARGER_TYPES,
+                         HOURS_PER_YEAR, DEFAULTS as EV_CHARGING_DEFAULTS)
+from capital_accounts import CapitalLedger, EVENT_TYPES, check_quarter
+from lp_statements import generate_statements, statement_data, LocalStatementStore, S3StatementStore, FORMATS
+from heat_recovery import (run_heat_recovery, hourly_it_load, case_table as heat_case_table,
+                           DEFAULTS as HEAT_RECOVERY_DEFAULTS)
+from goal_seek import (solve_deals, solve_tape_prices, deal_table, tape_columns, DEAL_DEFAULTS, METRICS,
+                       VARIABLES)
+from construction_loan import run_construction_scenarios, scenario_table, DEFAULT_BUDGET
+from resolution_scenarios import (analyze_tape, loan_columns, purchase_prices, validate_scenarios, DEFAULT_SCENARIOS,
+                                  DEFAULT_PRICE_TO_FACE)
+from cancellation import (CancellationToken, RequestCancelled, run_cancellable, run_checkpointed,
+                          REASON_DISCONNECTED)
+from job_queue import JobQueue, JobProgress, STATUS_SUCCEEDED
+from idempotency import IdempotencyStore, RequestCoalescer, snapshot_key, STATUS_COMPLETED
+from metrics import registry, monitor_event_loop_lag, RequestLatencyMiddleware, REFRESH_JOB_LATENCY
+from profiling import ProfilingMiddleware, ProfileStore, valid_token
+from responses import FastJSONResponse, CompressionMiddleware
+import process_pool
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,18 +57,140 @@ logger = logging.getLogger(__name__)
 # Database connection
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 client = MongoClient(MONGO_URL)
-db = client.coastal_oak_db
+
+# Section bodies are stored once per unique chunk, zstd-compressed with a dictionary trained
+# on our decks, and referenced by hash from documents
+CONTENT_COMPRESSION_LEVEL = int(os.getenv("CONTENT_COMPRESSION_LEVEL", "6"))
+# How often a worker checks for a dictionary trained by another worker
+CONTENT_DICTIONARY_RELOAD_INTERVAL = float(os.getenv("CONTENT_DICTIONARY_RELOAD_INTERVAL", "60"))
+
+# Append-only version history: a snapshot every HISTORY_SNAPSHOT_INTERVAL versions, deltas between
+HISTORY_SNAPSHOT_INTERVAL = int(os.getenv("HISTORY_SNAPSHOT_INTERVAL", "10"))
+
+# In-process full-text index over section titles and content, kept current on writes and
+# re-synced every SEARCH_SYNC_INTERVAL seconds to pick up other workers' writes
+SEARCH_SYNC_INTERVAL = float(os.getenv("SEARCH_SYNC_INTERVAL", "30"))
+# How far each sync reaches back before the previous one: at least the longest write path
+SEARCH_SYNC_OVERLAP = float(os.getenv("SEARCH_SYNC_OVERLAP", "300"))
+
+# Deck creation: Idempotency-Key replays kept for IDEMPOTENCY_KEY_TTL seconds, and
+# concurrent creates from the same market data snapshot share one build. A running build
+# renews its claim; one left by a crashed worker blocks retries for at most IDEMPOTENCY_LEASE_SECONDS
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+create_coalescer = RequestCoalescer("document_create")
+MASTER_DECK_TEMPLATE = "master_deck"
+
+# Background jobs: JOB_WORKERS concurrent workers per process, retried up to JOB_MAX_ATTEMPTS times
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "5"))
+JOB_OUTPUT_DIR = os.getenv("JOB_OUTPUT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "job_output"))
+EXCEL_MODEL_SCRIPT = os.getenv(
+    "EXCEL_MODEL_SCRIPT",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "create_excel_model_fixed.py")
+)
+
+# Expensive requests are abandoned after REQUEST_DEADLINE seconds (0 disables) or when the
+# client disconnects; clients may ask for a shorter deadline with X-Request-Timeout
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "60"))
+
+# Read-through cache of hot documents and their GET response bytes, invalidated on writes
+# and by the documents change stream (or a last_updated check when change streams are unavailable)
+DOCUMENT_CACHE_MAX_BYTES = int(os.getenv("DOCUMENT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+DOCUMENT_CACHE_REVALIDATE_SECONDS = float(os.getenv("DOCUMENT_CACHE_REVALIDATE_SECONDS", "1"))
+
+# Event-sourced LP capital accounts, snapshotted at every quarter close
+MAX_LEDGER_EVENTS_PER_REQUEST = int(os.getenv("MAX_LEDGER_EVENTS_PER_REQUEST", "100000"))
+
+# Quarterly LP statements are rendered on at most STATEMENT_WORKERS processes of the shared
+# pool (sized by PROCESS_POOL_WORKERS; 0: the whole pool) and uploaded to STATEMENT_S3_BUCKET
+# when set, otherwise written under STATEMENT_OUTPUT_DIR
+STATEMENT_WORKERS = int(os.getenv("STATEMENT_WORKERS", "0")) or None
+STATEMENT_OUTPUT_DIR = os.getenv("STATEMENT_OUTPUT_DIR", os.path.join(JOB_OUTPUT_DIR, "statements"))
+STATEMENT_S3_BUCKET = os.getenv("STATEMENT_S3_BUCKET")
+STATEMENT_S3_PREFIX = os.getenv("STATEMENT_S3_PREFIX", "lp-statements")
+STATEMENT_S3_ENDPOINT_URL = os.getenv("STATEMENT_S3_ENDPOINT_URL")
+
+# Resolution scenario analysis splits tapes over at most RESOLUTION_WORKERS processes of the
+# shared pool (0: the whole pool)
+RESOLUTION_WORKERS = int(os.getenv("RESOLUTION_WORKERS", "0")) or None
+
+# Construction scenario grids (cost factors x construction rates) and data center screens
+# (sites x power price x pricing scenarios) are capped at this many scenarios
+MAX_CONSTRUCTION_SCENARIOS = int(os.getenv("MAX_CONSTRUCTION_SCENARIOS", "10000"))
+MAX_DATA_CENTER_CASES = int(os.getenv("MAX_DATA_CENTER_CASES", "10000"))
+MAX_EV_CHARGING_CASES = int(os.getenv("MAX_EV_CHARGING_CASES", "2000"))
+MAX_HEAT_RECOVERY_CASES = int(os.getenv("MAX_HEAT_RECOVERY_CASES", "2000"))
+MAX_GOAL_SEEK_CASES = int(os.getenv("MAX_GOAL_SEEK_CASES", "100000"))
+
+# Serve documents this service wrote itself straight from BSON, validating only on writes
+TRUSTED_READS = os.getenv("TRUSTED_READS", "true").lower() == "true"
+
+# Response compression for large decks
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Token guarding /api/admin endpoints
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# On-demand request profiling - opt-in, the middleware is only installed when one of these
+# is set; ADMIN_TOKEN alone does not enable it
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_MODE = os.getenv("PROFILING_MODE", "cprofile")
+PROFILING_OUTPUT_DIR = os.getenv("PROFILING_OUTPUT_DIR")
+PROFILING_ENABLED = bool(PROFILING_ADMIN_TOKEN) or PROFILING_SAMPLE_RATE > 0
+profile_store = ProfileStore(output_dir=PROFILING_OUTPUT_DIR) if PROFILING_ENABLED else None
 
 # Initialize document service
 document_service = EnhancedDocumentService()
 
+async def _maintain_search_index():
+    """Build the search index off the event loop, then keep it in sync with MongoDB"""
+    try:
+        await asyncio.to_thread(search_index.rebuild, db.documents.find({}))
+    except Exception as e:
+        logger.error(f"Error building search index: {e}")
+    while True:
+        await asyncio.sleep(SEARCH_SYNC_INTERVAL)
+        try:
+            await asyncio.to_thread(search_index.sync, db.documents)
+        except Exception as e:
+            logger.error(f"Error syncing search index: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up Coastal Oak Capital Live Document System...")
+    try:
+        document_history.ensure_indexes()
+        idempotency_keys.ensure_indexes()
+        job_queue.ensure_indexes()
+        capital_ledger.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating indexes: {e}")
+    try:
+        dictionary_id = content_codec.load_active_dictionary()
+        if dictionary_id:
+            logger.info(f"Using zstd content dictionary {dictionary_id}")
+    except Exception as e:
+        logger.error(f"Error loading content compression dictionary: {e}")
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    document_cache.watch(db.documents)
+    search_sync = asyncio.create_task(_maintain_search_index())
+    if JOB_WORKERS > 0:
+        job_queue.start()
     yield
     # Shutdown
     logger.info("Shutting down...")
+    lag_monitor.cancel()
+    search_sync.cancel()
+    document_cache.stop()
+    await job_queue.stop()
+    await asyncio.to_thread(process_pool.shutdown)
 
 app = FastAPI(
     lifespan=lifespan,
@@ -49,6 +208,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    gzip_level=COMPRESSION_GZIP_LEVEL,
+    brotli_quality=COMPRESSION_BROTLI_QUALITY,
+    cache_max_bytes=COMPRESSION_CACHE_MAX_BYTES
+)
+
+app.add_middleware(RequestLatencyMiddleware)
+
+if PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        admin_token=PROFILING_ADMIN_TOKEN,
+        sample_rate=PROFILING_SAMPLE_RATE,
+        default_mode=PROFILING_MODE
+    )
+
 from fastapi import APIRouter
 router = APIRouter(prefix="/api")
 
@@ -69,6 +247,7 @@ async def status():
             "status": "healthy", 
             "database": "connected",
             "system": "Coastal Oak Capital Live Document System",
+            "document_cache": document_cache.stats(),
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
@@ -80,63 +259,255 @@ async def status():
             "timestamp": datetime.now().isoformat()
         }
 
-@router.post("/document/create", response_model=Dict[str, Any])
-async def create_document():
-    """Create the comprehensive Coastal Oak Capital master deck with real-time data and all integrated content"""
-    try:
-        logger.info("Creating comprehensive Coastal Oak Capital master deck with all integrated content...")
-        
-        # Create the enhanced document with all integrated content
-        document = await document_service.create_comprehensive_master_deck()
-        
-        # Store in database
-        doc_dict = document.model_dump()
-        doc_dict['_id'] = document.id
-        
-        # Store in MongoDB
-        collection = db.documents
-        collection.replace_one(
-            {"_id": document.id}, 
-            doc_dict, 
-            upsert=True
+@router.get("/metrics")
+async def metrics():
+    """Prometheus-style metrics for scraping"""
+    return Response(content=registry.render(), media_type=registry.CONTENT_TYPE)
+
+def _require_profiling_admin(admin_token: Optional[str]):
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not valid_token(admin_token, PROFILING_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.get("/admin/profiles")
+async def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    """List captured request profiles, newest first"""
+    _require_profiling_admin(x_admin_token)
+    profiles = [record.to_dict() for record in profile_store.list()]
+    return {
+        "success": True,
+        "profiles": profiles,
+        "count": len(profiles),
+        "sample_rate": PROFILING_SAMPLE_RATE,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = "text", x_admin_token: Optional[str] = Header(None)):
+    """Download a captured profile as a text summary, raw pstats or speedscope JSON"""
+    _require_profiling_admin(x_admin_token)
+    record = profile_store.get(profile_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if format == "text" and record.summary is not None:
+        return PlainTextResponse(record.summary)
+    if format == "pstats" and record.pstats is not None:
+        return Response(
+            content=record.pstats,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{record.id}.pstats"'}
+        )
+    if format == "speedscope" and record.speedscope is not None:
+        return JSONResponse(
+            content=record.speedscope,
+            headers={"Content-Disposition": f'attachment; filename="{record.id}.speedscope.json"'}
         )
+    raise HTTPException(status_code=400, detail=f"Format '{format}' not available, use one of {record.to_dict()['formats']}")
+
+def _require_admin(admin_token: Optional[str]):
+    if not valid_token(admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.post("/admin/compression/train")
+async def train_compression_dictionary(dict_size: int = 16384, x_admin_token: Optional[str] = Header(None)):
+    """Train a zstd dictionary on stored section content and use it for new blobs"""
+    _require_admin(x_admin_token)
+    try:
+        if not content_codec.available:
+            raise HTTPException(status_code=501, detail="zstandard is not installed")
         
-        logger.info(f"Comprehensive master deck created successfully with ID: {document.id}")
+        samples = await asyncio.to_thread(section_blobs.sample_content)
+        if not samples:
+            # Nothing stored yet - train on a freshly rendered deck
+            document = await document_service.create_comprehensive_master_deck()
+            samples = [
+                chunk for section in document.sections
+                for chunk in section.content.split(CHUNK_SEPARATOR)
+            ]
         
+        # Training takes seconds on a large corpus; keep it off the event loop
+        result = await asyncio.to_thread(content_codec.train, samples, dict_size=dict_size)
         return {
             "success": True,
-            "document_id": document.id,
-            "title": document.title,
-            "sections_count": len(document.sections),
-            "data_sources_count": len(document.data_sources),
-            "last_updated": document.last_updated.isoformat(),
-            "version": document.version,
-            "message": "Comprehensive Coastal Oak Capital master deck created with all integrated content and live market data"
+            **result,
+            "timestamp": datetime.now().isoformat(),
+            "message": "Compression dictionary trained; new section blobs will use it"
         }
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error training compression dictionary: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to train compression dictionary: {str(e)}")
+
+def _request_timeout(requested: Optional[float], default: Optional[float] = None) -> Optional[float]:
+    """Deadline for a request: the client's X-Request-Timeout, capped at the server default"""
+    limit = default if default else None
+    if requested and requested > 0:
+        return min(requested, limit) if limit else requested
+    return limit
+
+def _cancelled(error: RequestCancelled) -> HTTPException:
+    # 499 (client closed request) is never seen by the client, but shows up in metrics and logs
+    status_code = 499 if error.reason == REASON_DISCONNECTED else 504
+    logger.warning(str(error))
+    return HTTPException(status_code=status_code, detail=str(error))
+
+async def _build_master_deck(real_time_data: Dict[str, Dict]) -> Dict[str, Any]:
+    """Render, store and index one master deck from a market data snapshot"""
+    logger.info("Creating comprehensive Coastal Oak Capital master deck with all integrated content...")
+    
+    # Create the enhanced document with all integrated content
+    document = await document_service.create_comprehensive_master_deck(real_time_data)
+    
+    # Store in database
+    doc_dict = section_blobs.dehydrate(document.model_dump())
+    doc_dict['_id'] = document.id
+    
+    # Store in MongoDB
+    history_version = document_history.save(db.documents, doc_dict)
+    search_index.index_document(doc_dict)
+    document_cache.invalidate(document.id)
+    
+    logger.info(f"Comprehensive master deck created successfully with ID: {document.id}")
+    
+    return {
+        "success": True,
+        "document_id": document.id,
+        "title": document.title,
+        "sections_count": len(document.sections),
+        "data_sources_count": len(document.data_sources),
+        "last_updated": document.last_updated.isoformat(),
+        "version": document.version,
+        "history_version": history_version,
+        "message": "Comprehensive Coastal Oak Capital master deck created with all integrated content and live market data"
+    }
+
+async def _create_master_deck(cancellation: Optional[CancellationToken] = None) -> Tuple[Dict[str, Any], bool]:
+    """Build a master deck, joining a concurrent build from the same data snapshot if one is running"""
+    real_time_data, _ = await create_coalescer.run("fetch_all_data", document_service.data_manager.fetch_all_data)
+    if cancellation:
+        await cancellation.poll()
+    return await create_coalescer.run(
+        (MASTER_DECK_TEMPLATE, snapshot_key(real_time_data)),
+        lambda: _build_master_deck(real_time_data)
+    )
+
+async def _create_master_deck_once(idempotency_key: str) -> Dict[str, Any]:
+    """Build a master deck at most once per idempotency key, replaying the first response"""
+    existing = idempotency_keys.claim(idempotency_key, "document_create")
+    if existing:
+        if existing.get("operation") != "document_create":
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different operation")
+        if existing["status"] != STATUS_COMPLETED:
+            lease_left = (existing["expires_at"] - datetime.now()).total_seconds() if existing.get("expires_at") else 0
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress",
+                                headers={"Retry-After": str(max(1, int(lease_left)))})
+        return {**existing["response"], "idempotent_replay": True}
+    
+    # Renewed while the build runs, so a slow build keeps its claim and only a crashed one lets it go
+    heartbeat = asyncio.create_task(idempotency_keys.keep_alive(idempotency_key))
+    try:
+        response, _ = await _create_master_deck()
+    except BaseException:
+        idempotency_keys.release(idempotency_key)
+        raise
+    finally:
+        heartbeat.cancel()
+    idempotency_keys.complete(idempotency_key, response)
+    return response
+
+@router.post("/document/create", response_model=Dict[str, Any])
+async def create_document(request: Request, idempotency_key: Optional[str] = Header(None),
+                          x_request_timeout: Optional[float] = Header(None)):
+    """Create the comprehensive Coastal Oak Capital master deck with real-time data and all integrated content"""
+    try:
+        async def work(cancellation: CancellationToken) -> Tuple[Dict[str, Any], bool]:
+            if idempotency_key:
+                return await create_coalescer.run(
+                    ("idempotency", idempotency_key),
+                    lambda: _create_master_deck_once(idempotency_key)
+                )
+            return await _create_master_deck(cancellation)
+        
+        # Cancelled outright rather than at checkpoints: the build waits on the upstream fetch,
+        # and the coalescer stops the shared fetch and render once no caller is left waiting
+        response, coalesced = await run_cancellable(
+            request, work, _request_timeout(x_request_timeout, REQUEST_DEADLINE), "create_document"
+        )
+        
+        return {**response, "coalesced": coalesced}
+        
+    except RequestCancelled as e:
+        raise _cancelled(e)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating comprehensive document: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to create comprehensive document: {str(e)}")
 
-@router.get("/document/{document_id}")
-async def get_document(document_id: str):
-    """Retrieve a document with its current real-time data"""
+# Table of contents: section metadata without bodies, projected by MongoDB
+TOC_SECTION_FIELDS = ("id", "title", "order", "data_dependencies", "last_updated")
+TOC_PROJECTION = {
+    "title": 1, "description": 1, "last_updated": 1, "version": 1,
+    **{f"sections.{field}": 1 for field in TOC_SECTION_FIELDS},
+    **{f"sections.subsections.{field}": 1 for field in TOC_SECTION_FIELDS},
+}
+
+def _document_projection(fields: str) -> Dict[str, int]:
+    """Turn a comma-separated field list such as 'title,sections.title' into a MongoDB projection"""
+    projection = {}
+    for field in filter(None, (name.strip() for name in fields.split(","))):
+        top, _, sub = field.partition(".")
+        if top not in LiveDocument.model_fields or (sub and (top != "sections" or sub not in DocumentSection.model_fields)):
+            raise HTTPException(status_code=400, detail=f"Unknown field: {field}")
+        # Section bodies are stored as blob hashes under content_chunks, or inline in
+        # documents written before blob storage; project both so either is hydrated
+        if top == "sections" and sub == "content":
+            projection["sections.content_chunks"] = 1
+        projection[field] = 1
+    if not projection:
+        raise HTTPException(status_code=400, detail="fields must name at least one field")
+    # A parent path subsumes its children; MongoDB rejects the overlap
+    return {path: 1 for path in projection if not any(path.startswith(f"{other}.") for other in projection)}
+
+@router.get("/document/{document_id}", response_class=FastJSONResponse)
+async def get_document(document_id: str, fields: Optional[str] = None):
+    """Retrieve a document with its current real-time data, optionally only the listed fields"""
     try:
+        projection = _document_projection(fields) if fields else None
         collection = db.documents
-        doc_data = collection.find_one({"_id": document_id})
+        if projection is None:
+            cached = document_cache.get(document_id, collection)
+            if cached:
+                return Response(content=cached.body, media_type="application/json")
+            ticket = document_cache.ticket()
+        doc_data = collection.find_one({"_id": document_id}, projection)
         
         if not doc_data:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        # Convert MongoDB document back to Pydantic model
-        document = LiveDocument(**doc_data)
+        doc_data = section_blobs.hydrate(doc_data)
         
-        return {
+        if TRUSTED_READS or projection:
+            # Stored documents are model_dump() output, so they serialize as-is; partial
+            # documents cannot be validated as a whole anyway
+            doc_data.pop('_id', None)
+            document_data = doc_data
+        else:
+            document_data = LiveDocument(**doc_data).model_dump()
+        
+        response = FastJSONResponse({
             "success": True,
-            "document": document.model_dump(),
+            "document": document_data,
             "export_formats": ["markdown", "json"],
             "real_time_data_age": "Live data as of request time"
-        }
+        })
+        if projection is None:
+            document_cache.put(document_id, document_data, response.body, ticket)
+        return response
         
     except HTTPException:
         raise
@@ -144,75 +515,277 @@ async def get_document(document_id: str):
         logger.error(f"Error retrieving document: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve document: {str(e)}")
 
-@router.post("/document/{document_id}/update")
-async def update_document(document_id: str, request: UpdateRequest):
-    """Update a document with the latest real-time data"""
+@router.get("/document/{document_id}/toc", response_class=FastJSONResponse)
+async def get_document_toc(document_id: str):
+    """Retrieve a document's table of contents without any section bodies"""
     try:
-        collection = db.documents
-        doc_data = collection.find_one({"_id": document_id})
+        doc_data = db.documents.find_one({"_id": document_id}, TOC_PROJECTION)
         
         if not doc_data:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        # Convert to Pydantic model
-        document = LiveDocument(**doc_data)
+        doc_data.pop('_id', None)
+        sections = sorted(doc_data.pop('sections', []), key=lambda section: section.get('order', 0))
         
-        # Update with latest data
-        updated_document = await document_service.update_document(document, request.force_refresh)
+        return FastJSONResponse({
+            "success": True,
+            "document_id": document_id,
+            **doc_data,
+            "sections": sections,
+            "sections_count": len(sections)
+        })
         
-        # Save back to database
-        doc_dict = updated_document.model_dump()
-        doc_dict['_id'] = updated_document.id
-        collection.replace_one({"_id": document_id}, doc_dict)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving document table of contents: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve table of contents: {str(e)}")
+
+@router.get("/document/{document_id}/sections/{section_id}", response_class=FastJSONResponse)
+async def get_document_section(document_id: str, section_id: str):
+    """Retrieve a single top-level section of a document"""
+    try:
+        doc_data = db.documents.find_one(
+            {"_id": document_id},
+            {"last_updated": 1, "sections": {"$elemMatch": {"id": section_id}}}
+        )
         
-        logger.info(f"Document {document_id} updated successfully")
+        if not doc_data:
+            raise HTTPException(status_code=404, detail="Document not found")
+        if not doc_data.get('sections'):
+            raise HTTPException(status_code=404, detail="Section not found")
         
-        return RealTimeDataResponse(
-            success=True,
-            data=updated_document.model_dump(),
-            sources_updated=list(updated_document.data_sources.keys()),
-            timestamp=datetime.now(),
-            message="Document updated with latest real-time market data"
-        )
+        section = section_blobs.hydrate(doc_data)['sections'][0]
+        
+        return FastJSONResponse({
+            "success": True,
+            "document_id": document_id,
+            "document_last_updated": doc_data.get('last_updated'),
+            "section": section
+        })
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving document section: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve document section: {str(e)}")
+
+@router.post("/document/{document_id}/update", response_class=FastJSONResponse)
+async def update_document(document_id: str, request: UpdateRequest, http_request: Request,
+                          x_request_timeout: Optional[float] = Header(None)):
+    """Update a document with the latest real-time data"""
+    try:
+        async def work(cancellation: CancellationToken) -> Dict[str, Any]:
+            collection = db.documents
+            doc_data = collection.find_one({"_id": document_id})
+            
+            if not doc_data:
+                raise HTTPException(status_code=404, detail="Document not found")
+            
+            stored = dict(doc_data)
+            doc_data = section_blobs.hydrate(doc_data)
+            
+            # Convert to Pydantic model
+            document = LiveDocument(**doc_data)
+            
+            # Update with latest data
+            updated_document = await document_service.update_document(document, request.force_refresh, cancellation)
+            
+            # Save back to database, unless the client has given up in the meantime
+            await cancellation.poll()
+            document_data = updated_document.model_dump()
+            doc_dict = {**section_blobs.dehydrate(document_data), '_id': updated_document.id}
+            try:
+                document_history.save(collection, doc_dict, read=stored)
+            except VersionConflict:
+                raise HTTPException(status_code=409, detail="Document was updated by another request; retry the update",
+                                    headers={"Retry-After": "1"})
+            search_index.index_document(doc_dict)
+            document_cache.invalidate(document_id)
+            
+            logger.info(f"Document {document_id} updated successfully")
+            
+            return RealTimeDataResponse(
+                success=True,
+                data=document_data,
+                sources_updated=list(updated_document.data_sources.keys()),
+                timestamp=datetime.now(),
+                message="Document updated with latest real-time market data"
+            ).model_dump()
+        
+        return FastJSONResponse(await run_checkpointed(
+            http_request, work, _request_timeout(x_request_timeout, REQUEST_DEADLINE), "update_document"
+        ))
+        
+    except RequestCancelled as e:
+        raise _cancelled(e)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error updating document: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to update document: {str(e)}")
 
-@router.get("/document/{document_id}/export/markdown")
-async def export_markdown(document_id: str):
+@router.get("/document/{document_id}/export/markdown", response_class=FastJSONResponse)
+async def export_markdown(document_id: str, request: Request, x_request_timeout: Optional[float] = Header(None)):
     """Export document as markdown format"""
     try:
-        collection = db.documents
-        doc_data = collection.find_one({"_id": document_id})
+        async def work(cancellation: CancellationToken) -> Dict[str, Any]:
+            cached = document_cache.get(document_id, db.documents)
+            if cached:
+                document = cached.model()
+            else:
+                doc_data = db.documents.find_one({"_id": document_id})
+                
+                if not doc_data:
+                    raise HTTPException(status_code=404, detail="Document not found")
+                
+                document = LiveDocument(**section_blobs.hydrate(doc_data))
+            markdown_content = document_service.export_to_markdown(document, cancellation)
+            
+            return {
+                "success": True,
+                "format": "markdown",
+                "content": markdown_content,
+                "title": document.title,
+                "last_updated": document.last_updated.isoformat()
+            }
         
-        if not doc_data:
-            raise HTTPException(status_code=404, detail="Document not found")
+        return FastJSONResponse(await run_checkpointed(
+            request, work, _request_timeout(x_request_timeout, REQUEST_DEADLINE), "export_markdown"
+        ))
         
-        document = LiveDocument(**doc_data)
-        markdown_content = document_service.export_to_markdown(document)
+    except RequestCancelled as e:
+        raise _cancelled(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error exporting document: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to export document: {str(e)}")
+
+@router.get("/document/{document_id}/versions")
+async def list_document_versions(document_id: str):
+    """List the recorded versions of a document"""
+    try:
+        versions = document_history.list_versions(document_id)
+        if not versions:
+            raise HTTPException(status_code=404, detail="Document history not found")
         
         return {
             "success": True,
-            "format": "markdown",
-            "content": markdown_content,
-            "title": document.title,
-            "last_updated": document.last_updated.isoformat()
+            "document_id": document_id,
+            "versions": versions,
+            "count": len(versions),
+            "snapshot_interval": document_history.snapshot_interval
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error exporting document: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to export document: {str(e)}")
+        logger.error(f"Error listing document versions: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to list document versions: {str(e)}")
+
+@router.get("/document/{document_id}/versions/{version}", response_class=FastJSONResponse)
+async def get_document_version(document_id: str, version: int):
+    """Retrieve a document as it was at a given history version"""
+    try:
+        doc_data = document_history.get_version(document_id, version)
+        
+        if not doc_data:
+            raise HTTPException(status_code=404, detail="Document version not found")
+        
+        return FastJSONResponse({
+            "success": True,
+            "version": version,
+            "document": section_blobs.hydrate(doc_data)
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving document version: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve document version: {str(e)}")
+
+@router.get("/document/{document_id}/diff", response_class=FastJSONResponse)
+async def diff_document_versions(document_id: str, from_version: int, to_version: int):
+    """Summarize what changed between two history versions of a document"""
+    try:
+        changes = document_history.diff(document_id, from_version, to_version)
+        
+        if changes is None:
+            raise HTTPException(status_code=404, detail="Document version not found")
+        
+        return FastJSONResponse({
+            "success": True,
+            "document_id": document_id,
+            "from_version": from_version,
+            "to_version": to_version,
+            "changes": changes
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error diffing document versions: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to diff document versions: {str(e)}")
+
+@router.get("/document/{document_id}/changes", response_class=FastJSONResponse)
+async def get_document_changes(document_id: str, since_version: Optional[int] = None, since: Optional[str] = None):
+    """Return only what changed since a history version (`since_version`) or an ISO timestamp (`since`)"""
+    try:
+        if (since_version is None) == (since is None):
+            raise HTTPException(status_code=400, detail="Pass exactly one of since_version or since")
+        if since_version is not None and since_version < 0:
+            raise HTTPException(status_code=400, detail="since_version must not be negative")
+        
+        # The head version is read first and the document rebuilt from it, so the changes
+        # returned are exactly those up to the version they are labelled with
+        head_version = document_history.head_version(document_id)
+        if head_version:
+            doc_data = document_history.get_version(document_id, head_version)
+        else:
+            doc_data = db.documents.find_one({"_id": document_id})
+        
+        if not doc_data:
+            raise HTTPException(status_code=404, detail="Document not found")
+        
+        if since is not None:
+            try:
+                since_version = document_history.version_at(document_id, datetime.fromisoformat(since))
+            except ValueError:
+                raise HTTPException(status_code=400, detail="since must be an ISO timestamp; use since_version for history versions")
+        
+        if since_version > head_version:
+            raise HTTPException(status_code=404, detail="Document version not found")
+        
+        doc_data.pop('_id', None)
+        changes = document_history.changes_since(document_id, doc_data, since_version)
+        if changes is None:
+            raise HTTPException(status_code=404, detail="Document version not found")
+        changes['sections'] = section_blobs.hydrate({'sections': changes['sections']})['sections']
+        
+        return FastJSONResponse({
+            "success": True,
+            "document_id": document_id,
+            "since_version": since_version,
+            "version": head_version,
+            "changes": changes,
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing document changes: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to compute document changes: {str(e)}")
 
 @router.get("/data/live")
-async def get_live_data():
+async def get_live_data(request: Request, x_request_timeout: Optional[float] = Header(None)):
     """Get current real-time market data"""
     try:
-        real_time_data = await document_service.data_manager.fetch_all_data()
+        real_time_data = await run_cancellable(
+            request, document_service.data_manager.fetch_all_data,
+            _request_timeout(x_request_timeout, REQUEST_DEADLINE), "live_data"
+        )
         
         return {
             "success": True,
@@ -222,10 +795,668 @@ async def get_live_data():
             "message": "Real-time market data retrieved successfully"
         }
         
+    except RequestCancelled as e:
+        raise _cancelled(e)
     except Exception as e:
         logger.error(f"Error fetching live data: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch live data: {str(e)}")
 
+@router.post("/loan-tape/price", response_class=FastJSONResponse)
+async def price_loan_tape_upload(file: UploadFile = File(...), target_yield: float = 0.15,
+                                 disposition_cost: float = 0.05, value_growth: float = 0.0,
+                                 include_loans: bool = True):
+    """Price every note on an uploaded CSV or Parquet loan tape at a target yield"""
+    try:
+        if not 0 < target_yield < 1 or not 0 <= disposition_cost < 1:
+            raise HTTPException(status_code=400, detail="target_yield must be in (0, 1) and disposition_cost in [0, 1)")
+        
+        def price():
+            started = time.perf_counter()
+            tape = read_loan_tape(file.file, file_format=detect_format(file.filename or ""))
+            results = price_loan_tape(tape, target_yield, disposition_cost, value_growth)
+            return tape, results, time.perf_counter() - started
+        
+        # Parsing and pricing are CPU-bound; keep them off the event loop
+        tape, results, elapsed = await asyncio.to_thread(price)
+        
+        return FastJSONResponse({
+            "success": True,
+            "assumptions": {
+                "target_yield": target_yield,
+                "disposition_cost": disposition_cost,
+                "value_growth": value_growth
+            },
+            "summary": summarize_pricing(tape, results),
+            "loans": pricing_columns(tape, results) if include_loans else None,
+            "pricing_ms": round(elapsed * 1000, 1),
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except HTTPException:
+        raise
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid loan tape: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error pricing loan tape: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to price loan tape: {str(e)}")
+
+@router.post("/loan-tape/debt-service", response_class=FastJSONResponse)
+async def loan_tape_debt_service(file: UploadFile = File(...), rate_index: Optional[str] = None,
+                                 spread: float = 0.0, index_rate_override: Optional[float] = None,
+                                 rate_floor: Optional[float] = None, rate_cap: Optional[float] = None,
+                                 interest_only_months: int = 0, noi_growth: float = 0.0,
+                                 min_dscr: float = 1.25, min_debt_yield: Optional[float] = None,
+                                 include_loans: bool = True):
+    """Monthly debt service, DSCR and debt yield paths and covenant breaches for an uploaded loan tape
+    
+    Loans accrue at their note_rate unless `rate_index` (fed_funds_rate or 10_year_treasury)
+    is given; then they float at the index plus `spread`, using the live market value unless
+    `index_rate_override` is supplied.
+    """
+    try:
+        if rate_index is not None and rate_index not in RATE_INDICES:
+            raise HTTPException(status_code=400, detail=f"rate_index must be one of {', '.join(RATE_INDICES)}")
+        
+        index_value = None
+        if rate_index is not None:
+            if index_rate_override is not None:
+                index_value = index_rate_override
+            else:
+                real_time_data, _ = await create_coalescer.run("fetch_all_data", document_service.data_manager.fetch_all_data)
+                index_value = index_rate(real_time_data, rate_index)
+        
+        def analyze():
+            started = time.perf_counter()
+            tape = read_loan_tape(file.file, file_format=detect_format(file.filename or ""))
+            analysis = tape_debt_service(tape, index_value, spread, rate_floor, rate_cap, interest_only_months,
+                                         noi_growth, min_dscr, min_debt_yield)
+            return tape, analysis, time.perf_counter() - started
+        
+        # Schedules for thousands of loans are CPU-bound; keep them off the event loop
+        tape, analysis, elapsed = await asyncio.to_thread(analyze)
+        
+        portfolio = analysis["portfolio"]
+        return FastJSONResponse({
+            "success": True,
+            "assumptions": {
+                "rate_index": rate_index,
+                "index_rate": index_value,
+                "spread": spread,
+                "rate_floor": rate_floor,
+                "rate_cap": rate_cap,
+                "interest_only_months": interest_only_months,
+                "noi_growth": noi_growth,
+                "min_dscr": min_dscr,
+                "min_debt_yield": min_debt_yield
+            },
+            "loan_count": len(tape),
+            "loans_breached": int(np.count_nonzero(analysis["loans"]["breach_months"])),
+            "portfolio": {name: values.round(2).tolist() for name, values in portfolio.items()},
+            "loans": debt_service_columns(tape, analysis) if include_loans else None,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except HTTPException:
+        raise
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid loan tape: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error computing loan tape debt service: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to compute debt service: {str(e)}")
+
+@router.post("/loan-tape/resolution", response_class=FastJSONResponse)
+async def analyze_loan_tape_resolution(file: UploadFile = File(...), scenarios: Optional[str] = Form(None),
+                                       discount_rate: float = 0.12, price_to_face: float = DEFAULT_PRICE_TO_FACE,
+                                       closing_costs: float = 0.01, disposition_cost: float = 0.05,
+                                       include_loans: bool = True, include_cash_flows: bool = False):
+    """Probability-weighted resolution scenario returns for every note on an uploaded loan tape
+    
+    `scenarios` is an optional JSON list of resolution scenarios replacing the defaults;
+    notes without a purchase_price column are bought at `price_to_face`.
+    """
+    try:
+        try:
+            scenario_list: List[ResolutionScenario] = (
+                [ResolutionScenario(**item) for item in json.loads(scenarios)] if scenarios else DEFAULT_SCENARIOS
+            )
+            validate_scenarios(scenario_list)
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid scenarios: {str(e)}")
+        
+        def analyze():
+            started = time.perf_counter()
+            tape = read_loan_tape(file.file, file_format=detect_format(file.filename or ""))
+            analysis = analyze_tape(tape, purchase_prices(tape, price_to_face), scenario_list, discount_rate,
+                                    closing_costs, disposition_cost, workers=RESOLUTION_WORKERS)
+            return tape, analysis, time.perf_counter() - started
+        
+        # Cash flow generation and IRR solving are CPU-bound; keep them off the event loop
+        tape, analysis, elapsed = await asyncio.to_thread(analyze)
+        
+        return FastJSONResponse({
+            "success": True,
+            "loan_count": analysis["loan_count"],
+            "total_face_value": analysis["total_face_value"],
+            "total_purchase_price": analysis["total_purchase_price"],
+            "discount_rate": discount_rate,
+            "scenarios": analysis["table"],
+            "cash_flows": analysis["cash_flows"] if include_cash_flows else None,
+            "loans": loan_columns(tape, analysis, scenario_list) if include_loans else None,
+            "analysis_ms": round(elapsed * 1000, 1),
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except HTTPException:
+        raise
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid loan tape: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error analyzing loan tape resolutions: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to analyze loan tape: {str(e)}")
+
+@router.post("/loan-tape/goal-seek", response_class=FastJSONResponse)
+async def goal_seek_loan_tape(file: UploadFile = File(...), metric: str = "irr", target: float = 0.185,
+                              scenarios: Optional[str] = Form(None), closing_costs: float = 0.01,
+                              disposition_cost: float = 0.05, include_loans: bool = True):
+    """Purchase price of every note on an uploaded loan tape that hits a target probability-weighted IRR or MOIC
+    
+    `target` is an annual IRR or a multiple; `scenarios` is an optional JSON list of
+    resolution scenarios replacing the defaults. Notes that cannot reach the target
+    at any price are reported without one.
+    """
+    try:
+        try:
+            scenario_list: List[ResolutionScenario] = (
+                [ResolutionScenario(**item) for item in json.loads(scenarios)] if scenarios else DEFAULT_SCENARIOS
+            )
+            validate_scenarios(scenario_list)
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid scenarios: {str(e)}")
+        
+        def solve():
+            started = time.perf_counter()
+            tape = read_loan_tape(file.file, file_format=detect_format(file.filename or ""))
+            result = solve_tape_prices(tape, metric, target, scenario_list, closing_costs, disposition_cost)
+            return tape, result, time.perf_counter() - started
+        
+        tape, result, elapsed = await asyncio.to_thread(solve)
+        
+        face = tape["unpaid_balance"] + tape["accrued_interest"]
+        solved = np.isfinite(result["purchase_price"])
+        total_price = float(result["purchase_price"][solved].sum())
+        solved_face = float(face[solved].sum())
+        return FastJSONResponse({
+            "success": True,
+            "metric": metric,
+            "target": target,
+            "loan_count": len(tape),
+            "solved_count": int(solved.sum()),
+            "total_face_value": float(face.sum()),
+            "total_purchase_price": total_price,
+            "price_to_face": total_price / solved_face if solved_face else None,
+            "loans": tape_columns(tape, result) if include_loans else None,
+            "solve_ms": round(elapsed * 1000, 1),
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except HTTPException:
+        raise
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid goal-seek inputs: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error solving loan tape prices: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to solve loan tape prices: {str(e)}")
+
+@router.post("/goal-seek/deals", response_class=FastJSONResponse)
+async def goal_seek_deals(request: GoalSeekRequest):
+    """Purchase price or exit cap rate of every deal that hits each target IRR, MOIC or DSCR"""
+    try:
+        if request.metric not in METRICS or request.solve_for not in VARIABLES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"metric must be one of {', '.join(METRICS)} and solve_for one of {', '.join(VARIABLES)}"
+            )
+        case_count = len(request.deals) * len(request.targets)
+        if case_count == 0 or case_count > MAX_GOAL_SEEK_CASES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Between 1 and {MAX_GOAL_SEEK_CASES} cases are supported, got {case_count}"
+            )
+        
+        def solve():
+            started = time.perf_counter()
+            deal_index, targets = (grid.ravel() for grid in np.meshgrid(np.arange(len(request.deals)),
+                                                                         request.targets, indexing="ij"))
+            drivers = {}
+            for name, default in DEAL_DEFAULTS.items():
+                per_deal = np.array([
+                    getattr(deal, name) if getattr(deal, name) is not None else default for deal in request.deals
+                ], dtype=float)
+                drivers[name] = per_deal[deal_index]
+            result = solve_deals(request.metric, targets, request.solve_for, **drivers)
+            labels = [f"{request.deals[index].name} | {request.metric} {target:g}"
+                      for index, target in zip(deal_index, targets)]
+            return result, labels, time.perf_counter() - started
+        
+        result, labels, elapsed = await asyncio.to_thread(solve)
+        
+        return FastJSONResponse({
+            "success": True,
+            "metric": request.metric,
+            "solve_for": request.solve_for,
+            "cases": deal_table(result, labels),
+            "solve_ms": round(elapsed * 1000, 1),
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid goal-seek inputs: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error solving deal goal seek: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to solve deal goal seek: {str(e)}")
+
+@router.post("/construction/scenarios", response_class=FastJSONResponse)
+async def construction_scenarios(request: ConstructionScenarioRequest):
+    """Draw schedule, construction loan and permanent takeout for a grid of cost and rate scenarios"""
+    try:
+        scenario_count = len(request.cost_factors) * len(request.construction_rates)
+        if scenario_count == 0 or scenario_count > MAX_CONSTRUCTION_SCENARIOS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Between 1 and {MAX_CONSTRUCTION_SCENARIOS} scenarios are supported, got {scenario_count}"
+            )
+        
+        def run():
+            started = time.perf_counter()
+            factors, rates = np.meshgrid(request.cost_factors, request.construction_rates, indexing="ij")
+            result = run_construction_scenarios(
+                request.budget or DEFAULT_BUDGET,
+                cost_factors=factors.ravel(),
+                construction_rates=rates.ravel(),
+                loan_to_cost=request.loan_to_cost,
+                origination_fee=request.origination_fee,
+                conversion_month=request.conversion_month,
+                permanent_rate=request.permanent_rate,
+                permanent_amortization_months=request.permanent_amortization_months,
+                permanent_max_ltv=request.permanent_max_ltv,
+                permanent_min_dscr=request.permanent_min_dscr,
+                stabilized_noi=request.stabilized_noi,
+                valuation_cap_rate=request.valuation_cap_rate
+            )
+            return result, time.perf_counter() - started
+        
+        result, elapsed = await asyncio.to_thread(run)
+        
+        schedules = None
+        if request.include_schedules:
+            schedules = {
+                name: result[name].round(2).tolist()
+                for name in ("cost_draws", "equity_draws", "loan_draws", "interest", "balance")
+            }
+        
+        return FastJSONResponse({
+            "success": True,
+            "completion_month": result["completion_month"],
+            "conversion_month": result["conversion_month"],
+            "stabilized_value": result["stabilized_value"],
+            "scenarios": scenario_table(result),
+            "schedules": schedules,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid construction inputs: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error running construction scenarios: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to run construction scenarios: {str(e)}")
+
+@router.post("/data-center/model", response_class=FastJSONResponse)
+async def data_center_model(request: DataCenterModelRequest):
+    """Monthly capacity, power and revenue model for candidate sites across power price and pricing scenarios"""
+    try:
+        case_count = len(request.sites) * len(request.electricity_rate_factors) * len(request.pricing_factors)
+        if case_count == 0 or case_count > MAX_DATA_CENTER_CASES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Between 1 and {MAX_DATA_CENTER_CASES} cases are supported, got {case_count}"
+            )
+        
+        live_rate = None
+        if any(site.electricity_rate is None for site in request.sites):
+            real_time_data, _ = await create_coalescer.run("fetch_all_data", document_service.data_manager.fetch_all_data)
+            live_rate = electricity_rate(real_time_data)
+        
+        def run():
+            started = time.perf_counter()
+            sites = np.arange(len(request.sites))
+            site_index, power_factor, price_factor = (
+                grid.ravel() for grid in np.meshgrid(sites, request.electricity_rate_factors, request.pricing_factors,
+                                                     indexing="ij")
+            )
+            drivers = {}
+            for name, default in DATA_CENTER_DEFAULTS.items():
+                fallback = live_rate if name == "electricity_rate" else default
+                per_site = np.array([
+                    getattr(site, name) if getattr(site, name) is not None else fallback for site in request.sites
+                ], dtype=float)
+                drivers[name] = per_site[site_index]
+            drivers["electricity_rate"] = drivers["electricity_rate"] * power_factor
+            for name in ("colocation_rate", "power_services_rate", "grid_services_rate"):
+                drivers[name] = drivers[name] * price_factor
+            
+            result = run_data_center_model(request.months, **drivers)
+            labels = [
+                f"{request.sites[index].name} | power x{power:g} | pricing x{price:g}"
+                for index, power, price in zip(site_index, power_factor, price_factor)
+            ]
+            return result, labels, time.perf_counter() - started
+        
+        result, labels, elapsed = await asyncio.to_thread(run)
+        
+        monthly = None
+        if request.include_monthly:
+            monthly = {
+                name: result[name].round(2).tolist()
+                for name in ("occupancy", "leased_kw", "facility_energy_kwh", "energy_cost", "revenue", "net_of_energy")
+            }
+        
+        return FastJSONResponse({
+            "success": True,
+            "live_electricity_rate": live_rate,
+            "cases": case_table(result, labels),
+            "monthly": monthly,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid data center inputs: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error running data center model: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to run data center model: {str(e)}")
+
+@router.post("/ev-charging/simulate", response_class=FastJSONResponse)
+async def ev_charging_simulation(request: EVChargingRequest):
+    """8760-hour charging load, time-of-use energy cost, demand charges and demand response for candidate sites"""
+    try:
+        case_count = len(request.sites) * len(request.electricity_rate_factors) * len(request.utilization_factors)
+        if case_count == 0 or case_count > MAX_EV_CHARGING_CASES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Between 1 and {MAX_EV_CHARGING_CASES} cases are supported, got {case_count}"
+            )
+        
+        live_rate = None
+        if any(site.electricity_rate is None for site in request.sites):
+            real_time_data, _ = await create_coalescer.run("fetch_all_data", document_service.data_manager.fetch_all_data)
+            live_rate = electricity_rate(real_time_data)
+        
+        def run():
+            started = time.perf_counter()
+            sites = np.arange(len(request.sites))
+            site_index, power_factor, demand_factor = (
+                grid.ravel() for grid in np.meshgrid(sites, request.electricity_rate_factors, request.utilization_factors,
+                                                     indexing="ij")
+            )
+            drivers = {}
+            for name, default in EV_CHARGING_DEFAULTS.items():
+                fallback = live_rate if name == "electricity_rate" else default
+                per_site = np.array([
+                    getattr(site, name) if getattr(site, name) is not None else fallback for site in request.sites
+                ], dtype=float)
+                drivers[name] = per_site[site_index]
+            drivers["electricity_rate"] = drivers["electricity_rate"] * power_factor
+            for charger in CHARGER_TYPES:
+                drivers[f"{charger}_utilization"] = np.minimum(drivers[f"{charger}_utilization"] * demand_factor, 1.0)
+            
+            result = simulate_ev_charging(seed=request.seed, **drivers)
+            labels = [
+                f"{request.sites[index].name} | power x{power:g} | demand x{demand:g}"
+                for index, power, demand in zip(site_index, power_factor, demand_factor)
+            ]
+            return result, labels, time.perf_counter() - started
+        
+        result, labels, elapsed = await asyncio.to_thread(run)
+        
+        monthly = None
+        if request.include_monthly:
+            monthly = {
+                name: result[name].round(2).tolist()
+                for name in ("dcfc_kwh", "mcs_kwh", "charging_revenue", "energy_cost", "demand_charges", "peak_kw",
+                             "curtailed_kwh")
+            }
+            monthly["average_profile_kw"] = result["average_profile"].round(2).tolist()
+        
+        return FastJSONResponse({
+            "success": True,
+            "live_electricity_rate": live_rate,
+            "cases": ev_case_table(result, labels),
+            "monthly": monthly,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid EV charging inputs: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error running EV charging simulation: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to run EV charging simulation: {str(e)}")
+
+@router.post("/heat-recovery/model", response_class=FastJSONResponse)
+async def heat_recovery_model(request: HeatRecoveryRequest):
+    """Hourly heat-to-energy recovery for candidate sites: recovered heat, avoided cost and revenue"""
+    try:
+        case_count = len(request.sites) * len(request.electricity_rate_factors) * len(request.recovery_factors)
+        if case_count == 0 or case_count > MAX_HEAT_RECOVERY_CASES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Between 1 and {MAX_HEAT_RECOVERY_CASES} cases are supported, got {case_count}"
+            )
+        for site in request.sites:
+            if site.hourly_it_load_kw is not None and len(site.hourly_it_load_kw) != HOURS_PER_YEAR:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Site {site.name!r} hourly IT load has {len(site.hourly_it_load_kw)} hours, expected {HOURS_PER_YEAR}"
+                )
+        
+        live_rate = None
+        if any(site.electricity_rate is None for site in request.sites):
+            real_time_data, _ = await create_coalescer.run("fetch_all_data", document_service.data_manager.fetch_all_data)
+            live_rate = electricity_rate(real_time_data)
+        
+        def run():
+            started = time.perf_counter()
+            sites = np.arange(len(request.sites))
+            site_index, power_factor, recovery_factor = (
+                grid.ravel() for grid in np.meshgrid(sites, request.electricity_rate_factors, request.recovery_factors,
+                                                     indexing="ij")
+            )
+            site_drivers = {}
+            for name, default in HEAT_RECOVERY_DEFAULTS.items():
+                fallback = live_rate if name == "electricity_rate" else default
+                site_drivers[name] = np.array([
+                    getattr(site, name) if getattr(site, name) is not None else fallback for site in request.sites
+                ], dtype=float)
+            drivers = {name: values[site_index] for name, values in site_drivers.items()}
+            drivers["electricity_rate"] = drivers["electricity_rate"] * power_factor
+            drivers["recoverable_fraction"] = np.minimum(drivers["recoverable_fraction"] * recovery_factor, 1.0)
+            
+            # Metered hourly loads replace the modelled load site by site
+            it_load = None
+            if any(site.hourly_it_load_kw is not None for site in request.sites):
+                it_load = hourly_it_load(hourly_calendar(), site_drivers["it_capacity_mw"], site_drivers["occupancy"],
+                                         site_drivers["load_factor"], site_drivers["diurnal_swing"])
+                for index, site in enumerate(request.sites):
+                    if site.hourly_it_load_kw is not None:
+                        it_load[index] = site.hourly_it_load_kw
+                it_load = it_load[site_index]
+            
+            result = run_heat_recovery(it_load, **drivers)
+            labels = [
+                f"{request.sites[index].name} | power x{power:g} | recovery x{recovery:g}"
+                for index, power, recovery in zip(site_index, power_factor, recovery_factor)
+            ]
+            return result, labels, time.perf_counter() - started
+        
+        result, labels, elapsed = await asyncio.to_thread(run)
+        
+        monthly = None
+        if request.include_monthly:
+            monthly = {"recovered_heat_kwh": result["monthly_recovered_heat_kwh"].round(2).tolist()}
+        
+        return FastJSONResponse({
+            "success": True,
+            "live_electricity_rate": live_rate,
+            "cases": heat_case_table(result, labels),
+            "monthly": monthly,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid heat recovery inputs: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error running heat recovery model: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to run heat recovery model: {str(e)}")
+
+def _ledger_columns(metrics: Dict[str, np.ndarray]) -> Dict[str, list]:
+    """Metric arrays as JSON lists; multiples are None until capital is paid in"""
+    return {name: np.where(np.isfinite(values), np.round(values, 6), None).tolist() for name, values in metrics.items()}
+
+# Fund ids become statement paths and object keys, so they must be one safe path segment
+FundId = Annotated[str, Path(pattern=SAFE_ID_PATTERN)]
+
+@router.post("/funds/{fund_id}/ledger/events", response_class=FastJSONResponse)
+async def append_ledger_events(fund_id: FundId, batch: CapitalEventBatch):
+    """Append capital account events to a fund's ledger"""
+    try:
+        if not batch.events or len(batch.events) > MAX_LEDGER_EVENTS_PER_REQUEST:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Between 1 and {MAX_LEDGER_EVENTS_PER_REQUEST} events are supported per request"
+            )
+        sequences = await asyncio.to_thread(
+            capital_ledger.append, fund_id, [event.model_dump() for event in batch.events]
+        )
+        return FastJSONResponse({
+            "success": True,
+            "fund_id": fund_id,
+            "count": len(sequences),
+            "first_sequence": sequences[0],
+            "last_sequence": sequences[-1]
+        })
+        
+    except HTTPException:
+        raise
+    except TimeoutError as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "1"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error appending ledger events: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to append ledger events: {str(e)}")
+
+@router.post("/funds/{fund_id}/ledger/fees/{quarter}", response_class=FastJSONResponse)
+async def accrue_management_fees(fund_id: FundId, quarter: int):
+    """Charge every LP the quarter's management fee: 2.0% on committed capital in the commitment period, 1.5% on invested capital after"""
+    try:
+        fees = await asyncio.to_thread(capital_ledger.accrue_management_fees, fund_id, quarter)
+        return FastJSONResponse({
+            "success": True,
+            "fund_id": fund_id,
+            "quarter": quarter,
+            "total": round(sum(fees.values()), 2),
+            "fees": fees
+        })
+        
+    except TimeoutError as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "1"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error accruing management fees: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to accrue management fees: {str(e)}")
+
+@router.post("/funds/{fund_id}/ledger/close/{quarter}", response_class=FastJSONResponse)
+async def close_ledger_quarter(fund_id: FundId, quarter: int):
+    """Close the books through a quarter, snapshotting every LP's capital account"""
+    try:
+        written = await asyncio.to_thread(capital_ledger.close_quarter, fund_id, quarter)
+        return FastJSONResponse({
+            "success": True,
+            "fund_id": fund_id,
+            "closed_quarter": capital_ledger.closed_quarter(fund_id),
+            "snapshots_written": written
+        })
+        
+    except TimeoutError as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": "1"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error closing ledger quarter: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to close ledger quarter: {str(e)}")
+
+@router.get("/funds/{fund_id}/ledger/balances", response_class=FastJSONResponse)
+async def ledger_balances(fund_id: FundId, quarter: Annotated[int, Query(ge=0, le=MAX_QUARTER)],
+                          lp_ids: Optional[str] = None):
+    """LP capital accounts, DPI and TVPI as of a quarter end; `lp_ids` is comma-separated"""
+    try:
+        selected = [lp_id.strip() for lp_id in lp_ids.split(",") if lp_id.strip()] if lp_ids else None
+        accounts = await asyncio.to_thread(capital_ledger.balances, fund_id, quarter, selected)
+        return FastJSONResponse({
+            "success": True,
+            "fund_id": fund_id,
+            "quarter": quarter,
+            "closed_quarter": capital_ledger.closed_quarter(fund_id),
+            "lp_ids": accounts["lp_ids"],
+            "accounts": _ledger_columns(accounts["metrics"])
+        })
+        
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reading ledger balances: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to read ledger balances: {str(e)}")
+
+@router.get("/funds/{fund_id}/ledger/history", response_class=FastJSONResponse)
+async def ledger_history(fund_id: FundId, through_quarter: Annotated[int, Query(ge=0, le=MAX_QUARTER)]):
+    """Every LP's capital account, DPI and TVPI at every quarter end, as (LPs x quarters) grids"""
+    try:
+        history = await asyncio.to_thread(capital_ledger.history, fund_id, through_quarter)
+        if not history["lp_ids"]:
+            raise HTTPException(status_code=404, detail="No ledger events for this fund")
+        return FastJSONResponse({
+            "success": True,
+            "fund_id": fund_id,
+            "quarters": history["quarters"],
+            "lp_ids": history["lp_ids"],
+            "event_types": list(EVENT_TYPES),
+            "accounts": _ledger_columns(history["metrics"])
+        })
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reading ledger history: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to read ledger history: {str(e)}")
+
 @router.get("/documents/list")
 async def list_documents():
     """List all available documents"""
@@ -250,46 +1481,280 @@ async def list_documents():
         logger.error(f"Error listing documents: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to list documents: {str(e)}")
 
+@router.get("/search", response_class=FastJSONResponse)
+async def search_documents(q: str, page: int = 1, page_size: int = 10):
+    """Ranked full-text search over section titles and content across all documents"""
+    try:
+        if not q.strip():
+            raise HTTPException(status_code=400, detail="Query must not be empty")
+        if page < 1 or not 1 <= page_size <= 100:
+            raise HTTPException(status_code=400, detail="page must be >= 1 and page_size between 1 and 100")
+        if not search_index.ready:
+            raise HTTPException(status_code=503, detail="Search index is still building")
+
+        results = search_index.search(q, page=page, page_size=page_size)
+
+        return FastJSONResponse({
+            "success": True,
+            "query": q,
+            "total": results["total"],
+            "page": page,
+            "page_size": page_size,
+            "results": results["results"],
+            "index": search_index.stats(),
+            "timestamp": datetime.now().isoformat()
+        })
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching documents: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to search documents: {str(e)}")
+
+async def _refresh_documents(progress: Optional[JobProgress] = None,
+                             cancellation: Optional[CancellationToken] = None) -> Tuple[int, int]:
+    """Refresh every stored document with the latest data; returns (refreshed, total)"""
+    collection = db.documents
+    documents = list(collection.find({}))
+    
+    refreshed_count = 0
+    for index, doc_data in enumerate(documents):
+        # Documents already refreshed stay refreshed; stop before starting the next one
+        if cancellation:
+            cancellation.check()
+        try:
+            # Convert to Pydantic model
+            stored = dict(doc_data)
+            document = LiveDocument(**section_blobs.hydrate(doc_data))
+            
+            # Update with latest data
+            updated_document = await document_service.update_document(document, force_refresh=True,
+                                                                       cancellation=cancellation)
+            
+            # Save back to database
+            doc_dict = section_blobs.dehydrate(updated_document.model_dump())
+            doc_dict['_id'] = updated_document.id
+            document_history.save(collection, doc_dict, read=stored)
+            search_index.index_document(doc_dict)
+            document_cache.invalidate(updated_document.id)
+            
+            refreshed_count += 1
+            logger.info(f"Refreshed document: {updated_document.title}")
+            
+        except RequestCancelled:
+            raise
+        except VersionConflict:
+            logger.warning(f"Skipped refreshing document {doc_data.get('_id', 'unknown')}: another request updated it meanwhile")
+        except Exception as doc_error:
+            logger.error(f"Error refreshing document {doc_data.get('_id', 'unknown')}: {doc_error}")
+        
+        if progress:
+            progress.report(index + 1, len(documents), f"{refreshed_count} documents refreshed")
+    
+    return refreshed_count, len(documents)
+
 @router.post("/system/refresh-all")
-async def refresh_all_documents():
+async def refresh_all_documents(request: Request, x_request_timeout: Optional[float] = Header(None)):
     """Refresh all documents with latest real-time data - Daily auto-refresh endpoint"""
     try:
         logger.info("Starting daily refresh of all documents...")
         
-        collection = db.documents
-        documents = list(collection.find({}))
-        
-        refreshed_count = 0
-        for doc_data in documents:
-            try:
-                # Convert to Pydantic model
-                document = LiveDocument(**doc_data)
-                
-                # Update with latest data
-                updated_document = await document_service.update_document(document, force_refresh=True)
-                
-                # Save back to database
-                doc_dict = updated_document.model_dump()
-                doc_dict['_id'] = updated_document.id
-                collection.replace_one({"_id": updated_document.id}, doc_dict)
-                
-                refreshed_count += 1
-                logger.info(f"Refreshed document: {updated_document.title}")
-                
-            except Exception as doc_error:
-                logger.error(f"Error refreshing document {doc_data.get('_id', 'unknown')}: {doc_error}")
-                continue
+        # No server default deadline: the refresh legitimately takes as long as the collection needs
+        job_started = time.perf_counter()
+        refreshed_count, total_documents = await run_cancellable(
+            request, lambda cancellation: _refresh_documents(cancellation=cancellation),
+            _request_timeout(x_request_timeout), "refresh_all"
+        )
+        REFRESH_JOB_LATENCY.observe(time.perf_counter() - job_started, job="refresh_all")
         
         return {
             "success": True,
             "refreshed_count": refreshed_count,
-            "total_documents": len(documents),
+            "total_documents": total_documents,
             "timestamp": datetime.now().isoformat(),
             "message": f"Daily refresh completed - {refreshed_count} documents updated with latest market data"
         }
         
+    except RequestCancelled as e:
+        raise _cancelled(e)
     except Exception as e:
         logger.error(f"Error during daily refresh: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to refresh documents: {str(e)}")
 
+async def _refresh_all_job(job: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+    refreshed_count, total_documents = await _refresh_documents(progress)
+    return {"refreshed_count": refreshed_count, "total_documents": total_documents}
+
+async def _create_document_job(job: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+    progress.report(0, 1, "Building master deck")
+    response, _ = await _create_master_deck()
+    return response
+
+def _generate_workbook(filename: str):
+    """Build the fund model workbook with the Excel model generator script"""
+    spec = importlib.util.spec_from_file_location("create_excel_model", EXCEL_MODEL_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.CoastalOakFinancialModel().generate_model(filename)
+
+async def _export_xlsx_job(job: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+    progress.report(0, 1, "Generating fund model workbook")
+    os.makedirs(JOB_OUTPUT_DIR, exist_ok=True)
+    filename = os.path.join(JOB_OUTPUT_DIR, f"{job['_id']}.xlsx")
+    await asyncio.to_thread(_generate_workbook, filename)
+    return {"filename": os.path.basename(filename), "size": os.path.getsize(filename)}
+
+def _statement_store():
+    if STATEMENT_S3_BUCKET:
+        return S3StatementStore(STATEMENT_S3_BUCKET, STATEMENT_S3_PREFIX, STATEMENT_S3_ENDPOINT_URL)
+    return LocalStatementStore(STATEMENT_OUTPUT_DIR)
+
+async def _lp_statements_job(job: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+    params = job["params"]
+    fund_id = params["fund_id"]
+    quarter = int(params["quarter"])
+    formats = params.get("formats") or list(FORMATS)
+    
+    progress.report(0, 1, "Loading capital accounts")
+    history = await asyncio.to_thread(capital_ledger.history, fund_id, quarter)
+    if not history["lp_ids"]:
+        raise ValueError(f"No ledger events for fund {fund_id} through quarter {quarter}")
+    statements = statement_data(history, quarter)
+    
+    store = _statement_store()
+    result = await asyncio.to_thread(
+        generate_statements, statements, fund_id, store, params.get("fund_name", "Coastal Oak Capital"), formats,
+        STATEMENT_WORKERS, progress=lambda done, total: progress.report(done, total, f"{done} of {total} LP statements")
+    )
+    location = f"s3://{store.bucket}/{store.prefix}" if STATEMENT_S3_BUCKET else store.root
+    return {"fund_id": fund_id, "quarter": quarter, "formats": formats, "location": location, **result}
+
+def _check_lp_statements_params(params: Dict[str, Any]):
+    if not params.get("fund_id"):
+        raise ValueError("lp_statements requires a fund_id")
+    if not isinstance(params["fund_id"], str) or not re.match(SAFE_ID_PATTERN, params["fund_id"]):
+        raise ValueError("fund_id may only contain letters, digits, '_', '.' and '-', and cannot start with '.'")
+    try:
+        quarter = int(params["quarter"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("lp_statements requires an integer quarter")
+    check_quarter(quarter)
+    unknown = [fmt for fmt in params.get("formats") or [] if fmt not in FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown statement format {unknown[0]!r}; expected one of {', '.join(FORMATS)}")
+
+def configure_storage(database):
+    """Build every MongoDB-backed component on `database`, as configured above
+
+    Runs once at import against MONGO_URL; the benchmark calls it again to point the
+    app at its own database.
+    """
+    global db, content_codec, section_blobs, document_history, search_index, idempotency_keys
+    global document_cache, capital_ledger, job_queue
+    db = InstrumentedDatabase(database)
+    content_codec = ContentCodec(db.compression_dictionaries, level=CONTENT_COMPRESSION_LEVEL,
+                                 reload_interval=CONTENT_DICTIONARY_RELOAD_INTERVAL)
+    section_blobs = SectionBlobStore(db.section_blobs, codec=content_codec)
+    document_history = DocumentHistory(db.document_versions, snapshot_interval=HISTORY_SNAPSHOT_INTERVAL)
+    search_index = SearchIndex(section_blobs.get_many, sync_overlap=SEARCH_SYNC_OVERLAP)
+    idempotency_keys = IdempotencyStore(db.idempotency_keys, ttl_seconds=IDEMPOTENCY_KEY_TTL,
+                                        lease_seconds=IDEMPOTENCY_LEASE_SECONDS)
+    document_cache = DocumentCache(max_bytes=DOCUMENT_CACHE_MAX_BYTES, revalidate_after=DOCUMENT_CACHE_REVALIDATE_SECONDS)
+    capital_ledger = CapitalLedger(db.capital_events, db.capital_snapshots, db.capital_ledger_heads)
+    job_queue = JobQueue(
+        db.jobs,
+        handlers={
+            "refresh_all": _refresh_all_job,
+            "create_document": _create_document_job,
+            "export_xlsx": _export_xlsx_job,
+            "lp_statements": _lp_statements_job,
+        },
+        validators={
+            "lp_statements": _check_lp_statements_params,
+        },
+        concurrency=JOB_WORKERS,
+        max_attempts=JOB_MAX_ATTEMPTS,
+        retry_backoff=JOB_RETRY_BACKOFF
+    )
+
+configure_storage(client.coastal_oak_db)
+
+def _job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": job["_id"], **{key: value for key, value in job.items() if key != "_id"}}
+
+@router.post("/jobs", status_code=202)
+async def create_job(request: JobRequest):
+    """Queue a long-running operation (refresh_all, create_document, export_xlsx, lp_statements) for a background worker"""
+    try:
+        if request.type not in job_queue.handlers:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown job type: {request.type}. Expected one of {sorted(job_queue.handlers)}"
+            )
+        
+        try:
+            job = job_queue.enqueue(request.type, request.params, priority=request.priority)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"Invalid {request.type} params: {str(e)}")
+        
+        return {
+            "success": True,
+            "job_id": job["_id"],
+            "type": job["type"],
+            "status": job["status"],
+            "priority": job["priority"],
+            "status_url": f"/api/jobs/{job['_id']}",
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error queuing job: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to queue job: {str(e)}")
+
+@router.get("/jobs/{job_id}", response_class=FastJSONResponse)
+async def get_job(job_id: str):
+    """Retrieve the status, progress and result of a background job"""
+    try:
+        job = job_queue.get(job_id)
+        
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        
+        return FastJSONResponse({"success": True, "job": _job_response(job)})
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving job: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve job: {str(e)}")
+
+@router.get("/jobs/{job_id}/download")
+async def download_job_output(job_id: str):
+    """Download the workbook produced by a finished export_xlsx job"""
+    try:
+        job = job_queue.get(job_id)
+        
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job["type"] != "export_xlsx" or job["status"] != STATUS_SUCCEEDED:
+            raise HTTPException(status_code=409, detail="Job has no downloadable output")
+        
+        path = os.path.join(JOB_OUTPUT_DIR, job["result"]["filename"])
+        if not os.path.exists(path):
+            raise HTTPException(status_code=410, detail="Job output is no longer available")
+        
+        return FileResponse(
+            path,
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            filename="Coastal_Oak_Capital_Fund_Model.xlsx"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error downloading job output: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to download job output: {str(e)}")
+
 app.include_router(router)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Endpoint Load Testing and Latency Benchmark for Coastal Oak Capital Live Document System
+Runs the FastAPI app in process against MongoDB (or an in-memory stand-in) and a stub FRED
+server, drives concurrent load at the main routes, reports p50/p95/p99 latency, RPS and
+memory, and compares the run against a stored baseline so regressions fail the run
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import httpx
+from aiohttp import web
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+import server  # noqa: E402
+from idempotency import RequestCoalescer  # noqa: E402
+
+# Per-request INFO logging would dominate the measurements
+logging.getLogger().setLevel(logging.WARNING)
+
+DEFAULT_BASELINE = os.path.join(BASE_DIR, 'backend_benchmark_baseline.json')
+DEFAULT_RESULTS = os.path.join(BASE_DIR, 'backend_benchmark_results.json')
+
+# Observations served by the stub FRED endpoint, keyed by series id
+STUB_FRED_SERIES = {
+    'FEDFUNDS': ['5.33'],
+    'GS10': ['4.21'],
+    'CPIAUCSL': ['314.5', '313.2'],
+    'WPUSI012011': ['287.9'],
+    'ELCPCA': ['19.1'],
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(usage / divisor, 2)
+
+
+class UncoalescedRequests(RequestCoalescer):
+    """Runs every call on its own, so each measured create pays for a full build
+
+    Creates in the benchmark all see the same stub market data, so the server would
+    otherwise merge concurrent ones into a single build and report its latency many times.
+    """
+
+    async def run(self, key, factory):
+        return await factory(), False
+
+
+class CoastalOakBenchmark:
+    def __init__(self, requests_per_route: int, concurrency: int, seed_documents: int,
+                 mongo_url: Optional[str] = None):
+        self.requests_per_route = requests_per_route
+        self.concurrency = concurrency
+        self.seed_documents = seed_documents
+        self.mongo_url = mongo_url
+        self.results = {}
+        self.document_id = None
+        self.database = None
+        self._stub_runner = None
+
+    async def _start_stub_fred(self) -> str:
+        """Start a local FRED stand-in and return its observations URL"""
+        async def observations(request: web.Request) -> web.Response:
+            values = STUB_FRED_SERIES.get(request.query.get('series_id'), [])
+            return web.json_response({
+                'observations': [
+                    {'date': datetime.now().strftime('%Y-%m-%d'), 'value': value}
+                    for value in values
+                ]
+            })
+
+        app = web.Application()
+        app.router.add_get('/fred/series/observations', observations)
+        self._stub_runner = web.AppRunner(app, access_log=None)
+        await self._stub_runner.setup()
+        site = web.TCPSite(self._stub_runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/fred/series/observations"
+
+    def _configure_app(self, fred_url: str):
+        """Point the app at the benchmark database and the stub FRED server"""
+        if self.mongo_url:
+            from pymongo import MongoClient
+            self.database = MongoClient(self.mongo_url).coastal_oak_benchmark
+        else:
+            import mongomock
+            self.database = mongomock.MongoClient().coastal_oak_benchmark
+        server.configure_storage(self.database)
+        server.create_coalescer = UncoalescedRequests("document_create")
+
+        data_manager = server.document_service.data_manager
+        data_manager.fred_api_key = 'benchmark'
+        for config in data_manager.sources.values():
+            config['url'] = fred_url
+            config['params']['api_key'] = 'benchmark'
+
+    async def _reset_database(self, client: httpx.AsyncClient):
+        """Start every route from the same collection size so runs are comparable"""
+        self.database.documents.delete_many({})
+        self.database.document_versions.delete_many({})
+        # Fresh search index and document cache over the emptied collections
+        server.configure_storage(self.database)
+        server.search_index.rebuild([])
+        for _ in range(self.seed_documents):
+            response = await client.post('/api/document/create')
+            response.raise_for_status()
+            self.document_id = response.json()['document_id']
+
+    async def run_route(self, client: httpx.AsyncClient, name: str, method: str, route: str,
+                        requests: int) -> Dict[str, Any]:
+        """Drive `requests` calls at one route with bounded concurrency"""
+        await self._reset_database(client)
+        path = route.format(id=self.document_id)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        latencies = []
+        errors = 0
+
+        async def one_request():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.request(method, path)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        result = {
+            'route': f"{method} {route}",
+            'requests': requests,
+            'concurrency': self.concurrency,
+            'errors': errors,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'rps': round(requests / elapsed, 2) if elapsed > 0 else 0.0,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+        self.results[name] = result
+
+        status = "✅" if errors == 0 else "❌"
+        print(f"{status} {name:<16} p50={result['p50_ms']:>8.2f}ms  p95={result['p95_ms']:>8.2f}ms  "
+              f"p99={result['p99_ms']:>8.2f}ms  rps={result['rps']:>8.2f}  rss={result['peak_rss_mb']}MB  "
+              f"errors={errors}")
+        return result
+
+    async def run_all(self) -> Dict[str, Any]:
+        """Run the full benchmark suite"""
+        fred_url = await self._start_stub_fred()
+        self._configure_app(fred_url)
+
+        print("🚀 Starting Coastal Oak Capital Endpoint Benchmark")
+        print(f"Requests per route: {self.requests_per_route}, concurrency: {self.concurrency}, "
+              f"seed documents: {self.seed_documents}")
+        print("=" * 80)
+
+        transport = httpx.ASGITransport(app=server.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url='http://benchmark',
+                                         timeout=60) as client:
+                routes = [
+                    ('create_document', 'POST', '/api/document/create', self.requests_per_route),
+                    ('get_document', 'GET', '/api/document/{id}', self.requests_per_route),
+                    ('export_markdown', 'GET', '/api/document/{id}/export/markdown',
+                     self.requests_per_route),
+                    ('search', 'GET', '/api/search?q=heat-to-energy', self.requests_per_route),
+                    ('live_data', 'GET', '/api/data/live', self.requests_per_route),
+                    # refresh-all touches every document, so it gets a smaller share of the load
+                    ('refresh_all', 'POST', '/api/system/refresh-all', max(1, self.requests_per_route // 10)),
+                ]
+                for name, method, route, requests in routes:
+                    await self.run_route(client, name, method, route, requests)
+        finally:
+            await self._stub_runner.cleanup()
+
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'database': 'mongodb' if self.mongo_url else 'mongomock',
+            'requests_per_route': self.requests_per_route,
+            'concurrency': self.concurrency,
+            'seed_documents': self.seed_documents,
+            'routes': self.results,
+        }
+
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+                        min_delta_ms: float = 5.0) -> List[str]:
+    """Return a description of every metric that regressed beyond the tolerance
+
+    Latency changes smaller than `min_delta_ms` are ignored, since sub-millisecond routes
+    would otherwise fail on scheduler noise alone.
+    """
+    regressions = []
+    for name, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if not previous:
+            continue
+
+        if current['errors'] > previous.get('errors', 0):
+            regressions.append(f"{name}: errors {previous.get('errors', 0)} -> {current['errors']}")
+
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'peak_rss_mb'):
+            limit = previous[metric] * (1 + tolerance)
+            if metric.endswith('_ms'):
+                limit = max(limit, previous[metric] + min_delta_ms)
+            if current[metric] > limit:
+                regressions.append(f"{name}: {metric} {previous[metric]} -> {current[metric]} "
+                                   f"(limit {limit:.2f})")
+
+        # Throughput only compares at the same number of requests in flight: two
+        # overlapping requests finish no faster per request than five do
+        in_flight = min(current['requests'], current['concurrency'])
+        if in_flight != min(previous['requests'], previous['concurrency']):
+            continue
+        limit = previous['rps'] * (1 - tolerance)
+        if current['rps'] < limit:
+            regressions.append(f"{name}: rps {previous['rps']} -> {current['rps']} (limit {limit:.2f})")
+
+    return regressions
+
+
+def main():
+    """Main benchmark execution"""
+    parser = argparse.ArgumentParser(description="Coastal Oak Capital endpoint benchmark")
+    parser.add_argument('--requests', type=int, default=50, help="Requests per route")
+    parser.add_argument('--concurrency', type=int, default=10, help="Concurrent in-flight requests")
+    parser.add_argument('--seed-documents', type=int, default=5, help="Documents in the collection per route")
+    parser.add_argument('--mongo-url', default=os.getenv('BENCHMARK_MONGO_URL'),
+                        help="Benchmark against a real MongoDB instead of the in-memory stand-in")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline results file")
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="Allowed relative regression before the run fails (0.5 = 50%%)")
+    parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                        help="Ignore latency regressions smaller than this many milliseconds")
+    parser.add_argument('--update-baseline', action='store_true', help="Store this run as the new baseline")
+    args = parser.parse_args()
+
+    benchmark = CoastalOakBenchmark(args.requests, args.concurrency, args.seed_documents, args.mongo_url)
+    results = asyncio.run(benchmark.run_all())
+
+    with open(DEFAULT_RESULTS, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📊 Detailed results saved to: {DEFAULT_RESULTS}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📌 Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"⚠️  No baseline found at {args.baseline}, run with --update-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare_to_baseline(results, baseline, args.tolerance, args.min_delta_ms)
+    print("\n" + "=" * 80)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) against baseline:")
+        for regression in regressions:
+            print(f"   {regression}")
+        return 1
+
+    print("✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -10,14 +10,89 @@ from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.formatting.rule import ColorScaleRule
 from openpyxl.utils.dataframe import dataframe_to_rows
+import argparse
 import os
+import sys
 from datetime import datetime, timedelta
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from loan_tape import LoanTape, RESULT_COLUMNS, price_loan_tape, read_loan_tape, summarize_pricing  # noqa: E402
+from construction_loan import annual_totals, permanent_schedule, run_construction_scenarios  # noqa: E402
+from data_center_model import run_data_center_model  # noqa: E402
+from ev_charging import simulate_ev_charging  # noqa: E402
+from heat_recovery import annual_projection, run_heat_recovery  # noqa: E402
+from resolution_scenarios import analyze_tape  # noqa: E402
+from goal_seek import solve_tape_prices  # noqa: E402
+from capital_accounts import EVENT_TYPES, account_metrics, event_totals, management_fees  # noqa: E402
+from returns import irr, moic, npv  # noqa: E402
+
+# Larger tapes are summarized in full but only their first loans are listed on the sheet
+MAX_SHEET_LOANS = 5000
+
+
+def sample_note_tape():
+    """The sample note from the distressed debt sheet as a one-loan tape"""
+    return LoanTape(np.array(['SAMPLE-NOTE']), {
+        'unpaid_balance': np.array([24000000.0]),
+        'accrued_interest': np.array([1000000.0]),
+        'note_rate': np.array([0.06]),
+        'property_value': np.array([30000000.0]),
+        'noi': np.array([2100000.0]),
+        'remaining_term_months': np.array([24.0]),
+        'amortization_months': np.array([0.0]),
+        'purchase_price': np.array([17500000.0]),
+    })
+
+def sample_lp_ledger(lp_count=49, quarters=21, committed=245000000, called=147000000,
+                     distributed=279000000, call_quarters=12):
+    """Capital account events of the fund's LPs through a year 5 exit
+
+    Each LP commits an equal share. Management fees accrue quarterly on commitments
+    and are called with the investment calls, which are spread evenly over
+    `call_quarters` so total paid-in matches `called`. At exit the gains are allocated
+    and everything is distributed, leaving every capital account at zero.
+    """
+    lp_ids = [f"LP-{index + 1:03d}" for index in range(lp_count)]
+    commitment = np.full(lp_count, committed / lp_count)
+    fee_quarters = np.arange(1, quarters)
+    fees = management_fees(commitment[:, np.newaxis], 0.0, fee_quarters)
+    investment_calls = (called / lp_count - fees.sum(axis=1)) / call_quarters
+    exit_quarter = quarters - 1
+    
+    events = {name: [] for name in ('lp_index', 'quarter', 'type', 'amount')}
+    
+    def post(kind, quarter, amounts):
+        events['lp_index'].append(np.arange(lp_count))
+        events['quarter'].append(np.full(lp_count, quarter))
+        events['type'].append(np.full(lp_count, EVENT_TYPES.index(kind)))
+        events['amount'].append(np.broadcast_to(amounts, (lp_count,)))
+    
+    post('commitment', 0, commitment)
+    for offset, quarter in enumerate(fee_quarters):
+        calls = fees[:, offset] + (investment_calls if quarter <= call_quarters else 0.0)
+        post('contribution', quarter, calls)
+        post('management_fee', quarter, fees[:, offset])
+    post('allocation', exit_quarter, distributed / lp_count - (called / lp_count - fees.sum(axis=1)))
+    post('distribution', exit_quarter, distributed / lp_count)
+    
+    arrays = {name: np.concatenate(parts) for name, parts in events.items()}
+    totals = event_totals(arrays['lp_index'], arrays['quarter'], arrays['type'], arrays['amount'], lp_count, quarters)
+    
+    # LP net cash flows: contributions out, distributions in
+    quarterly = np.diff(totals, axis=2, prepend=0)
+    flows = (quarterly[EVENT_TYPES.index('distribution')] - quarterly[EVENT_TYPES.index('contribution')]).sum(axis=0)
+    return lp_ids, account_metrics(totals), flows
+
+
 class CoastalOakFinancialModel:
     def __init__(self):
         self.wb = Workbook()
         self.wb.remove(self.wb.active)  # Remove default sheet
         
+        # Base-case draw schedule and financing shared by the pro forma and DCF sheets
+        self.construction = run_construction_scenarios()
+        
         # Styling configurations
         self.header_font = Font(name='Calibri', size=12, bold=True, color='FFFFFF')
         self.header_fill = PatternFill(start_color='2F4F4F', end_color='2F4F4F', fill_type='solid')
@@ -208,22 +283,23 @@ class CoastalOakFinancialModel:
         ws['F3'].fill = self.header_fill
         ws.merge_cells('F3:L3')
         
-        scenarios = [
-            ['Scenario', 'Probability', 'Timeline (Months)', 'Recovery Rate', 'IRR', 'MOIC', 'NPV'],
-            ['Loan Modification', 0.25, 18, 0.95, 0.152, 1.8, 2625000],
-            ['Discounted Payoff', 0.35, 12, 0.88, 0.187, 2.1, 3150000],
-            ['Foreclosure → Own', 0.30, 24, 1.10, 0.223, 2.4, 4200000],
-            ['Deed-in-Lieu', 0.10, 9, 0.78, 0.128, 1.6, 1890000],
-            ['', '', '', '', '', '', ''],
-            ['Probability Weighted', 1.00, 16.8, 0.968, 0.185, 2.1, 3251250]
-        ]
+        # Scenario cash flows, returns and the probability-weighted row come from the engine
+        analysis = analyze_tape(sample_note_tape())
+        scenarios = [['Scenario', 'Probability', 'Timeline (Months)', 'Recovery Rate', 'IRR', 'MOIC', 'NPV']]
+        for row in analysis['table'][:-1]:
+            scenarios.append([row['scenario'], row['probability'], row['timeline_months'], row['recovery_rate'],
+                              row['irr'], row['moic'], row['npv']])
+        weighted = analysis['table'][-1]
+        scenarios.append(['', '', '', '', '', '', ''])
+        scenarios.append([weighted['scenario'], weighted['probability'], round(weighted['timeline_months'], 1),
+                          weighted['recovery_rate'], weighted['irr'], weighted['moic'], weighted['npv']])
         
         for i, row_data in enumerate(scenarios, start=4):
             for j, value in enumerate(row_data):
                 cell = ws.cell(row=i, column=6+j, value=value)
-                if i == 4 or i == 10:  # Header and summary rows
+                if i == 4 or i == 3 + len(scenarios):  # Header and summary rows
                     cell.font = self.header_font
-                    if i == 10:
+                    if i == 3 + len(scenarios):
                         cell.fill = PatternFill(start_color='90EE90', end_color='90EE90', fill_type='solid')
                     else:
                         cell.fill = PatternFill(start_color='4F6F8F', end_color='4F6F8F', fill_type='solid')
@@ -233,6 +309,8 @@ class CoastalOakFinancialModel:
                 # Format specific columns
                 if j in [1, 3, 4] and isinstance(value, (float, int)) and value <= 2:
                     cell.number_format = self.percent_format
+                elif j == 5 and isinstance(value, float):
+                    cell.number_format = '0.00"x"'
                 elif j == 6 and isinstance(value, (int, float)):
                     cell.number_format = self.currency_format
                     
@@ -282,10 +360,11 @@ class CoastalOakFinancialModel:
             ['Purchase Price / Face Value', '70.0%', '50-75%', 'Within Range'],
             ['Current DSCR', '1.45x', '>1.25x', 'Strong'],
             ['LTV at Purchase', '58.3%', '<70%', 'Conservative'],
-            ['Breakeven Timeline', '16.8 months', '<24 months', 'Acceptable'],
-            ['Probability-Weighted IRR', '18.5%', '>15%', 'Strong'],
+            ['Breakeven Timeline', f"{weighted['timeline_months']:.1f} months", '<24 months',
+             'Acceptable' if weighted['timeline_months'] < 24 else 'Extended'],
+            ['Probability-Weighted IRR', f"{weighted['irr']:.1%}", '>15%', 'Strong' if weighted['irr'] > 0.15 else 'Below Target'],
             ['Downside Protection', '22%', '>15%', 'Adequate'],
-            ['Expected MOIC', '2.1x', '>1.8x', 'Target Met']
+            ['Expected MOIC', f"{weighted['moic']:.2f}x", '>1.8x', 'Target Met' if weighted['moic'] > 1.8 else 'Below Target']
         ]
         
         for i, row_data in enumerate(metrics_summary, start=27):
@@ -298,6 +377,38 @@ class CoastalOakFinancialModel:
                     cell.font = self.data_font
                 cell.border = self.border
         
+        # Bid prices that hit target probability-weighted returns, solved rather than keyed in
+        ws['F26'] = 'GOAL SEEK: PRICE FOR TARGET RETURN'
+        ws['F26'].font = self.header_font
+        ws['F26'].fill = self.header_fill
+        ws.merge_cells('F26:K26')
+        
+        note = sample_note_tape()
+        goal_seek = [['Target', 'Purchase Price', 'Price / Face', 'Discount to Face', 'Weighted IRR', 'MOIC']]
+        for metric, targets in (('irr', [0.15, 0.185, 0.20, 0.25]), ('moic', [1.25])):
+            for target in targets:
+                solved = solve_tape_prices(note, metric, target)
+                label = f"{target:.1%} IRR" if metric == 'irr' else f"{target:.2f}x MOIC"
+                goal_seek.append([label, round(float(solved['purchase_price'][0])),
+                                  float(solved['price_to_face'][0]), float(solved['discount'][0]),
+                                  float(solved['irr'][0]), float(solved['moic'][0])])
+        
+        for i, row_data in enumerate(goal_seek, start=27):
+            for j, value in enumerate(row_data):
+                cell = ws.cell(row=i, column=6+j, value=value)
+                if i == 27:  # Header row
+                    cell.font = self.header_font
+                    cell.fill = PatternFill(start_color='4F6F8F', end_color='4F6F8F', fill_type='solid')
+                else:
+                    cell.font = self.data_font
+                    if j == 1:
+                        cell.number_format = self.currency_format
+                    elif j in (2, 3, 4):
+                        cell.number_format = self.percent_format
+                    elif j == 5:
+                        cell.number_format = '0.00"x"'
+                cell.border = self.border
+        
         self.auto_fit_columns(ws)
     
     def create_development_model(self):
@@ -406,17 +517,44 @@ class CoastalOakFinancialModel:
         ws['A26'].fill = self.header_fill
         ws.merge_cells('A26:L26')
         
-        revenue_data = [
-            ['Revenue Stream', 'Units', 'Rate', 'Occupancy', 'Annual Revenue', 'Notes'],
-            ['Data Center Colocation', '8.5 MW', '$175/kW/month', 0.85, 15157500, 'Hyperscale rates'],
-            ['Data Center Power Services', '8.5 MW', '$25/kW/month', 0.85, 2165000, 'Utility markup'],
-            ['EV DC Fast Charging', '40 units', '$0.45/kWh avg', 0.60, 2628000, '150 kWh/day avg'],
-            ['EV MCS Charging', '20 units', '$0.35/kWh avg', 0.40, 2190000, '500 kWh/day avg'],
-            ['Grid Services Revenue', '8.5 MW', '$100/kW/year', 1.00, 850000, 'Demand response'],
-            ['Ancillary Services', '', '', '', 425000, 'Parking, security, etc.'],
-            ['TOTAL GROSS REVENUE', '', '', '', 23415500, ''],
-            ['Less: Vacancy Loss (5%)', '', '', '', -1170775, ''],
-            ['EFFECTIVE GROSS INCOME', '', '', '', 22244725, '']
+        # Data center lines are the stabilized run-rate of the capacity and power model
+        data_center = run_data_center_model()
+        drivers = {name: float(values[0]) for name, values in data_center['drivers'].items()}
+        stabilized = {name: float(values[0]) for name, values in data_center['stabilized'].items()}
+        capacity = f"{drivers['it_capacity_mw']:g} MW"
+        
+        # EV lines are a year of hourly charging load from the 8760-hour simulation
+        ev = simulate_ev_charging()
+        ev_drivers = {name: float(values[0]) for name, values in ev['drivers'].items()}
+        ev_annual = {name: float(values[0]) for name, values in ev['annual'].items()}
+        
+        def chargers(prefix):
+            return f"{ev_drivers[prefix + '_ports']:g} x {ev_drivers[prefix + '_power_kw']:g} kW"
+        
+        def daily_kwh(prefix):
+            return f"{ev_annual[prefix + '_kwh'] / 365 / ev_drivers[prefix + '_ports']:,.0f} kWh/day/port"
+        
+        revenue_lines = [
+            ['Data Center Colocation', capacity, f"${drivers['colocation_rate']:g}/kW/month",
+             drivers['stabilized_occupancy'], round(stabilized['colocation_revenue']), 'Hyperscale rates'],
+            ['Data Center Power Services', capacity, f"${drivers['power_services_rate']:g}/kW/month",
+             drivers['stabilized_occupancy'], round(stabilized['power_services_revenue']), 'Utility markup'],
+            ['EV DC Fast Charging', chargers('dcfc'), f"${ev_drivers['dcfc_price']:.2f}/kWh avg",
+             ev_drivers['dcfc_utilization'], round(ev_annual['dcfc_revenue']), daily_kwh('dcfc')],
+            ['EV MCS Charging', chargers('mcs'), f"${ev_drivers['mcs_price']:.2f}/kWh avg",
+             ev_drivers['mcs_utilization'], round(ev_annual['mcs_revenue']), daily_kwh('mcs')],
+            ['Grid Services Revenue', capacity, f"${drivers['grid_services_rate']:g}/kW/year", 1.00,
+             round(stabilized['grid_services_revenue']), 'Demand response'],
+            ['Ancillary Services', '', '', '', 425000, 'Parking, security, etc.']
+        ]
+        gross_revenue = sum(line[4] for line in revenue_lines)
+        vacancy_loss = -round(gross_revenue * 0.05)
+        effective_gross_income = gross_revenue + vacancy_loss
+        
+        revenue_data = [['Revenue Stream', 'Units', 'Rate', 'Occupancy', 'Annual Revenue', 'Notes']] + revenue_lines + [
+            ['TOTAL GROSS REVENUE', '', '', '', gross_revenue, ''],
+            ['Less: Vacancy Loss (5%)', '', '', '', vacancy_loss, ''],
+            ['EFFECTIVE GROSS INCOME', '', '', '', effective_gross_income, '']
         ]
         
         for i, row_data in enumerate(revenue_data, start=27):
@@ -455,8 +593,9 @@ class CoastalOakFinancialModel:
             ['Professional Services', 222447, 2.62, 0.010, 'Legal, accounting, etc.'],
             ['Security', 425000, 5.00, 0.019, '24/7 monitoring'],
             ['Other Operating Expenses', 334671, 3.94, 0.015, 'Miscellaneous'],
-            ['TOTAL OPERATING EXPENSES', 6455578, 75.95, 0.290, ''],
-            ['NET OPERATING INCOME', 15789147, 185.75, 0.710, '']
+            ['TOTAL OPERATING EXPENSES', 6455578, 75.95, round(6455578 / effective_gross_income, 3), ''],
+            ['NET OPERATING INCOME', effective_gross_income - 6455578,
+             round((effective_gross_income - 6455578) / 85000, 2), round(1 - 6455578 / effective_gross_income, 3), '']
         ]
         
         for i, row_data in enumerate(expense_data, start=39):
@@ -481,6 +620,132 @@ class CoastalOakFinancialModel:
                     
                 cell.border = self.border
         
+        # Power side of the data center model
+        ws['H38'] = 'DATA CENTER POWER MODEL (STABILIZED)'
+        ws['H38'].font = self.header_font
+        ws['H38'].fill = self.header_fill
+        ws.merge_cells('H38:J38')
+        
+        power_data = [
+            ['Driver', 'Value', 'Notes'],
+            ['Leased IT Load (kW)', round(stabilized['leased_kw']), f"{drivers['stabilized_occupancy']:.0%} of {capacity}"],
+            ['PUE', drivers['pue'], 'Facility power / IT power'],
+            ['IT Load Factor', drivers['load_factor'], 'Average draw of leased kW'],
+            ['Electricity Rate (¢/kWh)', drivers['electricity_rate'], 'Commercial rate, California'],
+            ['Facility Energy Cost', round(stabilized['energy_cost']), 'Annual, at stabilization'],
+            ['Billed Through to Tenants', round(stabilized['energy_recovery']), f"{drivers['energy_recovery']:.0%} recovery"],
+            ['Lease-up (Months)', int(drivers['lease_up_months']), 'S-curve to stabilization']
+        ]
+        
+        for i, row_data in enumerate(power_data, start=39):
+            for j, value in enumerate(row_data):
+                cell = ws.cell(row=i, column=8+j, value=value)
+                if i == 39:  # Header row
+                    cell.font = self.header_font
+                    cell.fill = PatternFill(start_color='4F6F8F', end_color='4F6F8F', fill_type='solid')
+                else:
+                    cell.font = self.data_font
+                    if j == 1 and row_data[0] in ('Facility Energy Cost', 'Billed Through to Tenants'):
+                        cell.number_format = self.currency_format
+                    elif j == 1 and row_data[0] == 'IT Load Factor':
+                        cell.number_format = self.percent_format
+                cell.border = self.border
+        
+        # Hourly EV charging simulation: energy bought on time-of-use rates, demand charges and demand response
+        ws['H51'] = 'EV CHARGING SIMULATION (8760-HOUR)'
+        ws['H51'].font = self.header_font
+        ws['H51'].fill = self.header_fill
+        ws.merge_cells('H51:J51')
+        
+        ev_data = [
+            ['Item', 'Annual', 'Notes'],
+            ['Energy Delivered (kWh)', round(ev_annual['dcfc_kwh'] + ev_annual['mcs_kwh']), 'DC fast + MCS'],
+            ['Charging Revenue', round(ev_annual['charging_revenue']), 'Net of demand response curtailment'],
+            ['Energy Cost (TOU)', -round(ev_annual['energy_cost']),
+             f"{ev_drivers['electricity_rate']:g}¢/kWh off-peak, x{ev_drivers['peak_multiplier']:g} on-peak"],
+            ['Demand Charges', -round(ev_annual['demand_charges']), f"Peak {ev_annual['peak_kw']:,.0f} kW"],
+            ['Demand Response Revenue', round(ev_annual['grid_services_revenue']),
+             f"{ev_drivers['enrolled_kw']:,.0f} kW enrolled, {ev_drivers['dispatch_hours']:g} event hours"],
+            ['Net Charging Margin', round(ev_annual['net_revenue']), 'Before site operating expenses'],
+            ['Load Factor', ev_annual['load_factor'], 'Average / peak demand']
+        ]
+        
+        for i, row_data in enumerate(ev_data, start=52):
+            for j, value in enumerate(row_data):
+                cell = ws.cell(row=i, column=8+j, value=value)
+                if i == 52:  # Header row
+                    cell.font = self.header_font
+                    cell.fill = PatternFill(start_color='4F6F8F', end_color='4F6F8F', fill_type='solid')
+                else:
+                    cell.font = self.data_font
+                    if j == 1 and row_data[0] == 'Load Factor':
+                        cell.number_format = self.percent_format
+                    elif j == 1 and row_data[0] != 'Energy Delivered (kWh)':
+                        cell.number_format = self.currency_format
+                cell.border = self.border
+        
+        # Construction draws and financing come from the construction loan engine
+        financing = self.construction
+        ws['A51'] = 'CONSTRUCTION FINANCING'
+        ws['A51'].font = self.header_font
+        ws['A51'].fill = self.header_fill
+        ws.merge_cells('A51:D51')
+        
+        financing_data = [
+            ['Item', 'Value', 'Notes'],
+            ['Total Cost incl. Financing', financing['total_cost'][0], 'Budget + origination fee + capitalized interest'],
+            ['Construction Loan Commitment', financing['loan_commitment'][0], '75% loan-to-cost'],
+            ['Sponsor Equity', financing['equity'][0], 'Funded first, before any loan draw'],
+            ['Origination Fee', financing['origination_fee'][0], '1.0% of commitment'],
+            ['Interest Reserve', financing['interest_reserve'][0], f"Capitalized at 8.5% through month {financing['conversion_month']}"],
+            ['Peak Loan Balance', financing['balance'][0].max(), 'Payoff at conversion'],
+            ['Permanent Loan', financing['permanent_loan'][0], '6.5%, 30-year amortization'],
+            ['Conversion Paydown', financing['conversion_paydown'][0], 'Equity needed to close the takeout'],
+            ['Annual Debt Service', financing['permanent_annual_debt_service'][0], 'Permanent loan'],
+            ['Stabilized DSCR', financing['stabilized_dscr'][0], 'Stabilized NOI / debt service']
+        ]
+        
+        for i, row_data in enumerate(financing_data, start=52):
+            for j, value in enumerate(row_data):
+                cell = ws.cell(row=i, column=1+j, value=value)
+                if i == 52:  # Header row
+                    cell.font = self.header_font
+                    cell.fill = PatternFill(start_color='4F6F8F', end_color='4F6F8F', fill_type='solid')
+                else:
+                    cell.font = self.data_font
+                    if j == 1 and row_data[0] == 'Stabilized DSCR':
+                        cell.number_format = '0.00"x"'
+                    elif j == 1:
+                        cell.number_format = self.currency_format
+                cell.border = self.border
+        
+        ws['A64'] = 'MONTHLY DRAW SCHEDULE'
+        ws['A64'].font = self.header_font
+        ws['A64'].fill = self.header_fill
+        ws.merge_cells('A64:L64')
+        
+        months = ['Month'] + [f'M{month}' for month in range(financing['months'])]
+        for j, month in enumerate(months):
+            cell = ws.cell(row=65, column=1+j, value=month)
+            cell.font = self.header_font
+            cell.fill = PatternFill(start_color='4F6F8F', end_color='4F6F8F', fill_type='solid')
+            cell.border = self.border
+        
+        schedule_rows = [
+            ('Cost Draws', financing['cost_draws'][0]),
+            ('Equity Funding', financing['equity_draws'][0]),
+            ('Loan Funding', financing['loan_draws'][0]),
+            ('Capitalized Interest', financing['interest'][0]),
+            ('Loan Balance', financing['balance'][0])
+        ]
+        
+        for i, (label, values) in enumerate(schedule_rows, start=66):
+            ws.cell(row=i, column=1, value=label).font = Font(bold=True)
+            for j, value in enumerate(values, start=2):
+                cell = ws.cell(row=i, column=j, value=round(float(value), 2))
+                cell.number_format = self.currency_format
+                cell.border = self.border
+        
         self.auto_fit_columns(ws)
     
     def create_dcf_model(self):
@@ -521,6 +786,46 @@ class CoastalOakFinancialModel:
                         cell.number_format = self.percent_format
                 cell.border = self.border
         
+        # Heat-to-energy recovery: one simulated stabilized year, ramped with data center lease-up
+        heat = run_heat_recovery()
+        heat_drivers = {name: float(values[0]) for name, values in heat['drivers'].items()}
+        lease_up = run_data_center_model(months=120, start_month=self.construction['completion_month'])
+        ramp = lease_up['leased_kw'][0].reshape(10, 12).mean(axis=1) / lease_up['stabilized']['leased_kw'][0]
+        heat_years = annual_projection(heat, ramp, escalation=0.03)
+        
+        ws['F3'] = 'HEAT RECOVERY (STABILIZED YEAR)'
+        ws['F3'].font = self.header_font
+        ws['F3'].fill = self.header_fill
+        ws.merge_cells('F3:I3')
+        
+        heat_data = [
+            ['Item', 'Value', 'Notes'],
+            ['Heat Recovered (kWh th)', round(float(heat['recovered_heat_kwh'][0])),
+             f"{heat_drivers['recoverable_fraction']:.0%} of IT heat"],
+            ['Heat Sales', round(float(heat['heat_revenue'][0])), f"{heat_drivers['heat_price']:g}¢/kWh thermal"],
+            ['Heat-to-Power Avoided Cost', round(float(heat['generation_avoided_cost'][0])),
+             f"{heat_drivers['conversion_efficiency']:.0%} conversion efficiency"],
+            ['Cooling Avoided Cost', round(float(heat['cooling_avoided_cost'][0])),
+             f"Chiller COP {heat_drivers['cooling_cop']:g}"],
+            ['Recovery O&M', -round(float(heat['om_cost'][0])), f"{heat_drivers['om_rate']:g}¢/kWh recovered"],
+            ['Energy Cost Reduction', float(heat['operating_cost_reduction'][0]), 'Net benefit / facility energy bill'],
+            ['Effective PUE', round(float(heat['effective_pue'][0]), 3), f"From {heat_drivers['pue']:g} without recovery"]
+        ]
+        
+        for i, row_data in enumerate(heat_data, start=4):
+            for j, value in enumerate(row_data):
+                cell = ws.cell(row=i, column=6+j, value=value)
+                if i == 4:  # Header row
+                    cell.font = self.header_font
+                    cell.fill = PatternFill(start_color='4F6F8F', end_color='4F6F8F', fill_type='solid')
+                else:
+                    cell.font = self.data_font
+                    if j == 1 and row_data[0] == 'Energy Cost Reduction':
+                        cell.number_format = self.percent_format
+                    elif j == 1 and row_data[0] not in ('Heat Recovered (kWh th)', 'Effective PUE'):
+                        cell.number_format = self.currency_format
+                cell.border = self.border
+        
         # 10-Year Cash Flow Projection
         ws['A13'] = '10-YEAR CASH FLOW PROJECTION'
         ws['A13'].font = self.header_font
@@ -535,19 +840,54 @@ class CoastalOakFinancialModel:
             cell.fill = PatternFill(start_color='4F6F8F', end_color='4F6F8F', fill_type='solid')
             cell.border = self.border
         
-        # Sample cash flow data (simplified)
+        # Operating cash flows (simplified)
+        effective_gross_income = [6673418, 15573363, 22244725, 22912027, 23619388, 23367170, 24548065, 25284707, 26043208, 26824324]
+        operating_expenses = [-5342134, -6128081, -6455578, -6616967, -6781891, -6950938, -7124211, -7301816, -7483861, -7670558]
+        capital_reserves = [-133472, -311467, -444895, -458241, -472388, -467334, -490961, -505694, -520864, -536486]
+        recurring_capex = [0, 0, -473674, -488881, -504512, -520577, -537088, -554054, -571489, -589403]
+        discount_rate, terminal_cap_rate, rent_growth = 0.12, 0.065, 0.03
+        
+        # Development equity and permanent debt service from the construction loan engine
+        financing = self.construction
+        development_equity = -annual_totals(financing['equity_draws'], 10)[0]
+        permanent_months = np.zeros((1, 10 * 12 + 1))
+        permanent_months[0, financing['conversion_month'] + 1:] = financing['permanent_monthly_debt_service'][0]
+        debt_service = -annual_totals(permanent_months, 10)[0]
+        development_equity[max(financing['conversion_month'] - 1, 0) // 12] -= financing['conversion_paydown'][0]
+        
+        heat_revenue = [round(float(value)) for value in heat_years['heat_revenue'][0]]
+        heat_savings = [round(float(value)) for value in heat_years['avoided_cost'][0] - heat_years['om_cost'][0]]
+        
+        net_operating_income = [egi + opex + revenue + savings for egi, opex, revenue, savings
+                                in zip(effective_gross_income, operating_expenses, heat_revenue, heat_savings)]
+        before_debt = [noi + reserves for noi, reserves in zip(net_operating_income, capital_reserves)]
+        after_debt = [cash + service for cash, service in zip(before_debt, debt_service)]
+        capital = [equity + capex for equity, capex in zip(development_equity, recurring_capex)]
+        to_equity = [cash + capex for cash, capex in zip(after_debt, capital)]
+        
+        # Exit at the end of Year 10 on forward (Year 11) NOI; the permanent loan is repaid from the proceeds
+        exit_value = round(net_operating_income[-1] * (1 + rent_growth) / terminal_cap_rate)
+        amortized_months = 10 * 12 - financing['conversion_month']
+        loan_payoff = -round(float(permanent_schedule(financing, term_months=amortized_months)['balloon'][0]))
+        terminal_value = [0] * 9 + [exit_value]
+        exit_payoff = [0] * 9 + [loan_payoff]
+        total = [cash + terminal + payoff for cash, terminal, payoff in zip(to_equity, terminal_value, exit_payoff)]
+        
         cash_flow_data = [
-            ['Effective Gross Income', 6673418, 15573363, 22244725, 22912027, 23619388, 23367170, 24548065, 25284707, 26043208, 26824324],
-            ['Operating Expenses', -5342134, -6128081, -6455578, -6616967, -6781891, -6950938, -7124211, -7301816, -7483861, -7670558],
-            ['Net Operating Income', 1331284, 9445282, 15789147, 16295060, 16837497, 16416232, 17423854, 17982891, 18559347, 19153766],
-            ['Capital Reserves', -133472, -311467, -444895, -458241, -472388, -467334, -490961, -505694, -520864, -536486],
-            ['Cash Flow Before Debt Service', 1197812, 9133815, 15344252, 15836819, 16365109, 15948898, 16932893, 17477197, 18038483, 18617280],
-            ['Debt Service', 0, 0, -2186782, -2186782, -2186782, -2186782, -2186782, -2186782, -2186782, -2186782],
-            ['Cash Flow After Debt Service', 1197812, 9133815, 13157470, 13650037, 14178327, 13762116, 14746111, 15290415, 15851701, 16430498],
-            ['Capital Expenditures', -25500000, -17000000, -473674, -488881, -504512, -520577, -537088, -554054, -571489, -589403],
-            ['Net Cash Flow to Equity', -24302188, -7866185, 12683796, 13161156, 13673815, 13241539, 14209023, 14736361, 15280212, 15841095],
-            ['Terminal Value', 0, 0, 0, 0, 0, 0, 0, 0, 0, 24275604],
-            ['Total Cash Flow', -24302188, -7866185, 12683796, 13161156, 13673815, 13241539, 14209023, 14736361, 15280212, 40116699]
+            ['Effective Gross Income'] + effective_gross_income,
+            ['Operating Expenses'] + operating_expenses,
+            ['Heat Recovery Revenue'] + heat_revenue,
+            ['Heat Recovery Energy Savings'] + heat_savings,
+            ['Net Operating Income'] + net_operating_income,
+            ['Capital Reserves'] + capital_reserves,
+            ['Cash Flow Before Debt Service'] + before_debt,
+            ['Debt Service'] + [round(float(value)) for value in debt_service],
+            ['Cash Flow After Debt Service'] + [round(float(value)) for value in after_debt],
+            ['Equity Funding & Capital Expenditures'] + [round(float(value)) for value in capital],
+            ['Net Cash Flow to Equity'] + [round(float(value)) for value in to_equity],
+            ['Terminal Value'] + terminal_value,
+            ['Loan Payoff at Exit'] + exit_payoff,
+            ['Total Cash Flow'] + [round(float(value)) for value in total]
         ]
         
         for i, row_data in enumerate(cash_flow_data, start=15):
@@ -567,38 +907,55 @@ class CoastalOakFinancialModel:
                     cell.fill = PatternFill(start_color='F0F0F0', end_color='F0F0F0', fill_type='solid')
         
         # Investment Summary
-        ws['A27'] = 'INVESTMENT SUMMARY'
-        ws['A27'].font = self.header_font
-        ws['A27'].fill = self.header_fill
-        ws.merge_cells('A27:D27')
-        
-        # Calculate key metrics (simplified)
-        total_equity = 42500000 * 0.25  # 25% equity
+        ws['A29'] = 'INVESTMENT SUMMARY'
+        ws['A29'].font = self.header_font
+        ws['A29'].fill = self.header_fill
+        ws.merge_cells('A29:D29')
+        
+        # Key metrics from the annual cash flow rows; Year 1 is the undiscounted first period
+        total_equity = float(financing['equity'][0])  # Development equity + conversion paydown
+        development_cost = annual_totals(financing['cost_draws'], 10)[0]
+        unlevered = [cash + capex - cost + terminal for cash, capex, cost, terminal
+                     in zip(before_debt, recurring_capex, development_cost, terminal_value)]
+        cumulative = np.cumsum(total)
+        recovered = np.flatnonzero((cumulative >= 0) & (np.arange(10) > 0))
+        if len(recovered):
+            year = int(recovered[0])
+            payback = f'{year + (-cumulative[year - 1]) / total[year]:.1f} years'
+        else:
+            payback = 'Beyond Year 10'
+        self.dcf_returns = {
+            'unlevered_irr': float(irr(unlevered)),
+            'levered_irr': float(irr(total)),
+            'moic': float(moic(total)),
+            'npv': float(npv(total, discount_rate)),
+        }
         
         summary_data = [
             ['Metric', 'Value', 'Formula/Notes'],
             ['Total Equity Investment', total_equity, 'Initial + Development Equity'],
-            ['Year 10 Terminal Value', 24275604, 'NOI / Terminal Cap Rate'],
-            ['Gross IRR (Unlevered)', 0.118, 'Property-level returns'],
-            ['Levered IRR to Equity', 0.214, 'Equity investor returns'],
-            ['Equity Multiple (MOIC)', 2.3, 'Total Cash / Initial Equity'],
-            ['Cash-on-Cash (Stabilized)', 0.142, 'Annual CF / Initial Equity'],
-            ['NPV @ 12% Discount', 2847593, 'Excess value creation'],
-            ['Payback Period', '6.2 years', 'Time to recover equity']
+            ['Year 10 Terminal Value', exit_value, 'Year 11 NOI / Terminal Cap Rate'],
+            ['Loan Payoff at Exit', loan_payoff, 'Permanent loan balance after Year 10'],
+            ['Gross IRR (Unlevered)', self.dcf_returns['unlevered_irr'], 'Property-level returns'],
+            ['Levered IRR to Equity', self.dcf_returns['levered_irr'], 'Equity investor returns'],
+            ['Equity Multiple (MOIC)', round(self.dcf_returns['moic'], 2), 'Total Cash / Total Equity'],
+            ['Cash-on-Cash (Stabilized)', float(after_debt[2]) / total_equity, 'Year 3 CF After Debt / Total Equity'],
+            [f'NPV @ {discount_rate:.0%} Discount', round(self.dcf_returns['npv']), 'Excess value creation'],
+            ['Payback Period', payback, 'Time to recover equity']
         ]
         
-        for i, row_data in enumerate(summary_data, start=28):
+        for i, row_data in enumerate(summary_data, start=30):
             for j, value in enumerate(row_data):
                 cell = ws.cell(row=i, column=1+j, value=value)
-                if i == 28:  # Header row
+                if i == 30:  # Header row
                     cell.font = self.header_font
                     cell.fill = PatternFill(start_color='4F6F8F', end_color='4F6F8F', fill_type='solid')
                 else:
                     cell.font = self.data_font
                     if j == 1 and isinstance(value, (int, float)):
-                        if value > 1000:
+                        if abs(value) > 1000:
                             cell.number_format = self.currency_format
-                        elif value <= 1:
+                        elif 'IRR' in row_data[0] or 'Cash-on-Cash' in row_data[0]:
                             cell.number_format = self.percent_format
                 cell.border = self.border
         
@@ -640,7 +997,7 @@ class CoastalOakFinancialModel:
             cell.border = self.border
         
         # Sensitivity matrix (IRR values)
-        base_irr = 0.214  # 21.4% base case
+        base_irr = self.dcf_returns['levered_irr']  # Base case from the DCF sheet
         
         for i, cap_rate in enumerate(terminal_cap_rates):
             cell = ws.cell(row=7+i, column=1, value=cap_rate)
@@ -867,16 +1224,24 @@ class CoastalOakFinancialModel:
         ws['A24'].fill = self.header_fill
         ws.merge_cells('A24:F24')
         
+        # LP figures roll up the capital account ledger of every LP
+        lp_ids, accounts, lp_flows = sample_lp_ledger()
+        exit_quarter = accounts['paid_in'].shape[1] - 1
+        fund = {name: round(float(values[:, exit_quarter].sum())) for name, values in accounts.items()
+                if name not in ('dpi', 'rvpi', 'tvpi')}
+        lp_net_irr = float((1 + irr(lp_flows)) ** 4 - 1)
+        
         lp_return_data = [
             ['Metric', 'Amount', 'Calculation'],
-            ['LP Capital Committed', 245000000, 'Total fund size × 98%'],
-            ['LP Capital Called', 147000000, 'Actual capital deployed'],
-            ['LP Distributions Received', 279000000, 'From waterfall analysis'],
-            ['LP Net IRR', 0.221, 'Based on cash flows and timing'],
-            ['LP Equity Multiple (DPI)', 1.90, 'Distributions / Capital Called'],
-            ['LP Total Multiple (TVPI)', 1.90, 'Total Value / Capital Called'],
+            ['LP Capital Committed', fund['committed'], 'Total fund size × 98%'],
+            ['LP Capital Called', fund['paid_in'], 'Investment calls + management fees'],
+            ['LP Distributions Received', fund['distributions'], 'From waterfall analysis'],
+            ['LP Net IRR', round(lp_net_irr, 3), 'Quarterly LP cash flows, annualized'],
+            ['LP Equity Multiple (DPI)', round(fund['distributions'] / fund['paid_in'], 2), 'Distributions / Capital Called'],
+            ['LP Total Multiple (TVPI)', round((fund['distributions'] + fund['capital_account']) / fund['paid_in'], 2),
+             'Total Value / Capital Called'],
             ['Preferred Return Earned', 0.08, 'Fully achieved'],
-            ['Excess Return Over Pref', 0.141, 'Net IRR - Preferred Return']
+            ['Excess Return Over Pref', round(lp_net_irr - 0.08, 3), 'Net IRR - Preferred Return']
         ]
         
         for i, row_data in enumerate(lp_return_data, start=25):
@@ -894,9 +1259,124 @@ class CoastalOakFinancialModel:
                             cell.number_format = self.percent_format
                 cell.border = self.border
         
+        # Fund-level capital account at each year end
+        ws['H24'] = f'LP CAPITAL ACCOUNTS ({len(lp_ids)} LPs, YEAR END)'
+        ws['H24'].font = self.header_font
+        ws['H24'].fill = self.header_fill
+        ws.merge_cells('H24:N24')
+        
+        headers = ['Year', 'Paid-in', 'Mgmt Fees', 'Distributions', 'Capital Account', 'DPI', 'TVPI']
+        for j, header in enumerate(headers):
+            cell = ws.cell(row=25, column=8+j, value=header)
+            cell.font = self.header_font
+            cell.fill = PatternFill(start_color='4F6F8F', end_color='4F6F8F', fill_type='solid')
+            cell.border = self.border
+        
+        for i, quarter in enumerate(range(4, exit_quarter + 1, 4), start=26):
+            paid_in = round(float(accounts['paid_in'][:, quarter].sum()))
+            distributions = round(float(accounts['distributions'][:, quarter].sum()))
+            balance = round(float(accounts['capital_account'][:, quarter].sum()))
+            row_data = [f'Year {quarter // 4}', paid_in, round(float(accounts['management_fees'][:, quarter].sum())),
+                        distributions, balance, distributions / paid_in, (distributions + balance) / paid_in]
+            for j, value in enumerate(row_data):
+                cell = ws.cell(row=i, column=8+j, value=value)
+                cell.font = self.data_font
+                if 1 <= j <= 4:
+                    cell.number_format = self.currency_format
+                elif j >= 5:
+                    cell.number_format = '0.00"x"'
+                cell.border = self.border
+        
         self.auto_fit_columns(ws)
     
-    def generate_model(self):
+    def create_loan_tape_pricing(self, loan_tape=None):
+        """Price a loan tape note by note; defaults to the sample note from the distressed debt sheet"""
+        ws = self.wb.create_sheet("Loan Tape Pricing")
+
+        if loan_tape is None:
+            tape = sample_note_tape()
+            source = 'Sample note (Distressed Debt Analysis)'
+        else:
+            tape = read_loan_tape(loan_tape)
+            source = os.path.basename(loan_tape)
+
+        target_yield = 0.15
+        disposition_cost = 0.05
+        results = price_loan_tape(tape, target_yield=target_yield, disposition_cost=disposition_cost)
+        summary = summarize_pricing(tape, results)
+
+        # Title
+        ws['A1'] = 'LOAN TAPE PRICING'
+        ws['A1'].font = Font(name='Calibri', size=14, bold=True)
+        ws.merge_cells('A1:L1')
+
+        ws['A3'] = 'TAPE SUMMARY'
+        ws['A3'].font = self.header_font
+        ws['A3'].fill = self.header_fill
+        ws.merge_cells('A3:D3')
+
+        summary_data = [
+            ['Source', source],
+            ['Target Yield', target_yield],
+            ['Disposition Cost', disposition_cost],
+            ['Loan Count', summary['loan_count']],
+            ['Total Face Value', summary['total_face_value']],
+            ['Total Purchase Price', summary['total_purchase_price']],
+            ['Price to Face', summary['price_to_face']],
+            ['Weighted Implied Cap Rate', summary['weighted_implied_cap_rate']],
+            ['Weighted Current LTV', summary['weighted_current_ltv']],
+            ['Weighted DSCR', summary['weighted_dscr']],
+            ['Loans Below 1.0x DSCR', summary['loans_below_1x_dscr']],
+            ['Loans Over 100% LTV', summary['loans_over_100_ltv']],
+        ]
+        percent_rows = {'Target Yield', 'Disposition Cost', 'Price to Face', 'Weighted Implied Cap Rate',
+                        'Weighted Current LTV'}
+
+        for i, (label, value) in enumerate(summary_data, start=4):
+            ws.cell(row=i, column=1, value=label).font = self.data_font
+            cell = ws.cell(row=i, column=2, value=value)
+            cell.font = self.data_font
+            cell.border = self.border
+            if label in percent_rows:
+                cell.number_format = self.percent_format
+            elif label == 'Weighted DSCR':
+                cell.number_format = '0.00"x"'
+            elif isinstance(value, float):
+                cell.number_format = self.currency_format
+
+        # Per-loan results
+        start_row = 5 + len(summary_data)
+        ws.cell(row=start_row, column=1, value='LOAN-LEVEL PRICING').font = self.header_font
+        ws.cell(row=start_row, column=1).fill = self.header_fill
+        ws.merge_cells(start_row=start_row, start_column=1, end_row=start_row, end_column=len(RESULT_COLUMNS) + 1)
+
+        headers = ['Loan ID'] + [name.replace('_', ' ').title() for name in RESULT_COLUMNS]
+        for j, header in enumerate(headers):
+            cell = ws.cell(row=start_row + 1, column=1 + j, value=header)
+            cell.font = self.header_font
+            cell.fill = PatternFill(start_color='4F6F8F', end_color='4F6F8F', fill_type='solid')
+
+        listed = min(len(tape), MAX_SHEET_LOANS)
+        for i in range(listed):
+            row = start_row + 2 + i
+            ws.cell(row=row, column=1, value=str(tape.loan_ids[i]))
+            for j, name in enumerate(RESULT_COLUMNS):
+                value = float(results[name][i])
+                cell = ws.cell(row=row, column=2 + j, value=value if np.isfinite(value) else None)
+                if name in ('face_value', 'purchase_price', 'monthly_collection', 'recovery_at_maturity'):
+                    cell.number_format = self.currency_format
+                elif name == 'dscr':
+                    cell.number_format = '0.00"x"'
+                else:
+                    cell.number_format = self.percent_format
+
+        if listed < len(tape):
+            ws.cell(row=start_row + 2 + listed, column=1,
+                    value=f'First {listed:,} of {len(tape):,} loans shown; summary covers the full tape').font = Font(italic=True)
+
+        self.auto_fit_columns(ws)
+
+    def generate_model(self, filename="/app/Coastal_Oak_Capital_Fund_Model.xlsx", loan_tape=None):
         """Generate the complete financial model"""
         print("Creating Executive Summary...")
         self.create_executive_summary()
@@ -916,19 +1396,26 @@ class CoastalOakFinancialModel:
         print("Creating Fund Waterfall...")
         self.create_fund_waterfall()
         
+        print("Creating Loan Tape Pricing...")
+        self.create_loan_tape_pricing(loan_tape)
+        
         # Save the workbook
-        filename = "/app/Coastal_Oak_Capital_Fund_Model.xlsx"
         self.wb.save(filename)
         print(f"Financial model saved as: {filename}")
         
         return filename
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the Coastal Oak Capital fund model workbook")
+    parser.add_argument('--output', default="/app/Coastal_Oak_Capital_Fund_Model.xlsx", help="Workbook path")
+    parser.add_argument('--loan-tape', help="CSV or Parquet loan tape to price on the Loan Tape Pricing sheet")
+    args = parser.parse_args()
+
     # Create the model
     model = CoastalOakFinancialModel()
-    filename = model.generate_model()
+    filename = model.generate_model(args.output, loan_tape=args.loan_tape)
     
     print(f"\n✅ INSTITUTIONAL-GRADE FINANCIAL MODEL COMPLETED!")
     print(f"📊 File: {filename}")
-    print(f"📈 Contains 6 comprehensive worksheets with professional-grade calculations")
+    print(f"📈 Contains 7 comprehensive worksheets with professional-grade calculations")
     print(f"💼 Ready for institutional investor presentation")
\ No newline at end of file
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Loan Tape Pricing Benchmark for Coastal Oak Capital Live Document System
+Generates a synthetic loan tape and times streaming it in and pricing every note,
+failing when a tape of the target size takes longer than the latency budget
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+from loan_tape import pricing_columns, price_loan_tape, read_loan_tape, summarize_pricing  # noqa: E402
+from resolution_scenarios import analyze_tape  # noqa: E402
+
+logging.getLogger().setLevel(logging.ERROR)
+
+DEFAULT_RESULTS = os.path.join(BASE_DIR, 'loan_tape_benchmark_results.json')
+
+
+def synthetic_tape(loans: int, seed: int = 7) -> bytes:
+    """CSV bytes of a tape of transitional CRE loans, a share of them under water"""
+    rng = np.random.default_rng(seed)
+    property_value = rng.uniform(2e6, 80e6, loans)
+    balance = property_value * rng.uniform(0.5, 1.1, loans)
+    frame = pd.DataFrame({
+        'loan_id': [f"BENCH-{index:07d}" for index in range(loans)],
+        'unpaid_balance': balance.round(2),
+        'accrued_interest': (balance * rng.uniform(0, 0.08, loans)).round(2),
+        'note_rate': rng.uniform(0.035, 0.09, loans).round(4),
+        'property_value': property_value.round(2),
+        'noi': (property_value * rng.uniform(0.03, 0.08, loans)).round(2),
+        'remaining_term_months': rng.integers(1, 120, loans),
+        'amortization_months': rng.choice([0, 300, 360], loans),
+    })
+    return frame.to_csv(index=False).encode('utf-8')
+
+
+def main():
+    """Main benchmark execution"""
+    parser = argparse.ArgumentParser(description="Loan tape pricing benchmark")
+    parser.add_argument('--loans', type=int, default=50000, help="Loans on the synthetic tape")
+    parser.add_argument('--budget', type=float, default=1.0, help="Seconds allowed to read and price the tape")
+    args = parser.parse_args()
+
+    tape_bytes = synthetic_tape(args.loans)
+
+    print("🚀 Coastal Oak Capital Loan Tape Pricing Benchmark")
+    print(f"Loans: {args.loans:,}, tape size: {len(tape_bytes) / 1e6:.1f} MB, budget: {args.budget:.2f}s")
+    print("=" * 80)
+
+    started = time.perf_counter()
+    tape = read_loan_tape(io.BytesIO(tape_bytes), file_format='csv')
+    read_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = price_loan_tape(tape)
+    summary = summarize_pricing(tape, results)
+    price_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    pricing_columns(tape, results)
+    columns_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    analysis = analyze_tape(tape)
+    resolution_seconds = time.perf_counter() - started
+
+    total_seconds = read_seconds + price_seconds
+    print(f"read       {read_seconds * 1000:>9.1f} ms")
+    print(f"price      {price_seconds * 1000:>9.1f} ms  ({price_seconds / args.loans * 1e6:.2f} µs/loan)")
+    print(f"columns    {columns_seconds * 1000:>9.1f} ms")
+    print(f"resolution {resolution_seconds * 1000:>9.1f} ms  (4 scenarios, IRR/MOIC/NPV per loan)")
+    print(f"Price to face {summary['price_to_face']:.1%}, {summary['loans_below_1x_dscr']:,} loans below 1.0x DSCR")
+
+    passed = total_seconds <= args.budget
+    print("\n" + "=" * 80)
+    print(f"{'🏁' if passed else '❌'} Read and priced {args.loans:,} loans in {total_seconds:.3f}s")
+
+    with open(DEFAULT_RESULTS, 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'loans': args.loans,
+            'budget_seconds': args.budget,
+            'read_seconds': round(read_seconds, 4),
+            'price_seconds': round(price_seconds, 4),
+            'columns_seconds': round(columns_seconds, 4),
+            'resolution_seconds': round(resolution_seconds, 4),
+            'passed': passed,
+            'summary': summary,
+            'resolution': analysis['table'],
+        }, f, indent=2)
+    print(f"📊 Detailed results saved to: {DEFAULT_RESULTS}")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    exit(main())
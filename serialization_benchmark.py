@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Serialization and Compression Benchmark for Coastal Oak Capital Live Document System
+Measures encoding time and payload size of a full LiveDocument under the stock FastAPI
+JSON path, Pydantic's JSON encoder and orjson, the CPU cost of the validated versus
+trusted read paths, and the size/time trade-off of gzip and brotli compression
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, Any
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+import bson  # noqa: E402
+import orjson  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from enhanced_document_service import EnhancedDocumentService  # noqa: E402
+from models import LiveDocument  # noqa: E402
+from responses import FastJSONResponse, brotli  # noqa: E402
+
+logging.getLogger().setLevel(logging.ERROR)
+
+DEFAULT_RESULTS = os.path.join(BASE_DIR, 'serialization_benchmark_results.json')
+
+
+def time_call(func: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    """Mean and best wall-clock time of `func` in milliseconds"""
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {'mean_ms': round(sum(timings) / len(timings), 3), 'best_ms': round(min(timings), 3)}
+
+
+def main():
+    """Main benchmark execution"""
+    parser = argparse.ArgumentParser(description="LiveDocument serialization benchmark")
+    parser.add_argument('--iterations', type=int, default=200, help="Timed iterations per encoder")
+    args = parser.parse_args()
+
+    document = asyncio.run(EnhancedDocumentService().create_comprehensive_master_deck())
+    payload = {
+        "success": True,
+        "document": document.model_dump(),
+        "export_formats": ["markdown", "json"],
+        "real_time_data_age": "Live data as of request time"
+    }
+
+    print("🚀 Coastal Oak Capital LiveDocument Serialization Benchmark")
+    print(f"Sections: {len(document.sections)}, data sources: {len(document.data_sources)}, "
+          f"iterations: {args.iterations}")
+    print("=" * 80)
+
+    encoders = {
+        # What FastAPI does for a plain dict returned from a handler
+        'fastapi_default': lambda: json.dumps(jsonable_encoder(document.model_dump())).encode('utf-8'),
+        'pydantic_model_dump_json': lambda: document.model_dump_json().encode('utf-8'),
+        'orjson_model_dump': lambda: orjson.dumps(document.model_dump()),
+        'fast_json_response': lambda: FastJSONResponse(payload).body,
+    }
+
+    serialization = {}
+    for name, encoder in encoders.items():
+        encoder()  # warm up
+        result = time_call(encoder, args.iterations)
+        result['bytes'] = len(encoder())
+        serialization[name] = result
+        print(f"{name:<28} mean={result['mean_ms']:>8.3f}ms  best={result['best_ms']:>8.3f}ms  "
+              f"size={result['bytes']:>9,} B")
+
+    # Read path: a stored document as pymongo hands it back, through each GET strategy
+    stored = bson.decode(bson.encode({**document.model_dump(), '_id': document.id}))
+    read_paths = {
+        'validated_model': lambda: orjson.dumps(LiveDocument(**stored).model_dump()),
+        'trusted_raw_passthrough': lambda: orjson.dumps({k: v for k, v in stored.items() if k != '_id'}),
+    }
+
+    print("\n" + "-" * 80)
+    read_path = {}
+    for name, reader in read_paths.items():
+        reader()
+        result = time_call(reader, args.iterations)
+        read_path[name] = result
+        print(f"{name:<28} mean={result['mean_ms']:>8.3f}ms  best={result['best_ms']:>8.3f}ms")
+
+    body = FastJSONResponse(payload).body
+    compressors = {
+        'gzip_6': lambda: gzip.compress(body, compresslevel=6),
+        'gzip_9': lambda: gzip.compress(body, compresslevel=9),
+    }
+    if brotli is not None:
+        compressors['brotli_4'] = lambda: brotli.compress(body, quality=4)
+        compressors['brotli_11'] = lambda: brotli.compress(body, quality=11)
+
+    print("\n" + "-" * 80)
+    compression = {'identity': {'bytes': len(body), 'ratio': 1.0}}
+    print(f"{'identity':<28} size={len(body):>9,} B")
+    for name, compressor in compressors.items():
+        iterations = max(1, args.iterations // 10) if name == 'brotli_11' else args.iterations
+        result = time_call(compressor, iterations)
+        result['bytes'] = len(compressor())
+        result['ratio'] = round(len(body) / result['bytes'], 2)
+        compression[name] = result
+        print(f"{name:<28} mean={result['mean_ms']:>8.3f}ms  size={result['bytes']:>9,} B  "
+              f"ratio={result['ratio']:.2f}x")
+
+    baseline = serialization['fastapi_default']['mean_ms']
+    fast = serialization['orjson_model_dump']['mean_ms']
+    print("\n" + "=" * 80)
+    print(f"🏁 orjson speedup over FastAPI default encoding: {baseline / fast:.1f}x")
+    validated = read_path['validated_model']['mean_ms']
+    print(f"🏁 Trusted raw read speedup over validated read: "
+          f"{validated / read_path['trusted_raw_passthrough']['mean_ms']:.1f}x")
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'iterations': args.iterations,
+        'serialization': serialization,
+        'read_path': read_path,
+        'compression': compression,
+    }
+    with open(DEFAULT_RESULTS, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"📊 Detailed results saved to: {DEFAULT_RESULTS}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from amortization import (amortization_schedule, coverage_metrics, covenant_breaches, debt_service_schedule,
+                          level_payment, noi_path, rate_paths)
+
+
+def test_level_payments_match_textbook_values():
+    # $100,000 at 6% over 30 years pays $599.55; $200,000 at 6.5% pays $1,264.14
+    np.testing.assert_allclose(level_payment([100000, 200000], [0.06, 0.065], 360), [599.55, 1264.14], atol=0.005)
+    assert level_payment(120000, 0.0, 120) == pytest.approx(1000)
+
+
+def test_schedules_repay_principal_and_leave_the_closed_form_balloon():
+    schedule = amortization_schedule([100000, 100000], 0.06, 360, 360)
+    np.testing.assert_allclose(schedule['principal'].sum(axis=1), 100000)
+    np.testing.assert_allclose(schedule['payment'], 599.55, atol=0.005)
+    np.testing.assert_allclose(schedule['balloon'], 0, atol=1e-6)
+    assert schedule['interest'][0, 0] == pytest.approx(500)
+
+    # After 10 years the balance is the present value of the remaining 240 payments
+    ten_year = amortization_schedule(100000, 0.06, 360, 120)
+    payment = level_payment(100000, 0.06, 360)
+    assert ten_year['balloon'][0] == pytest.approx(payment * (1 - 1.005 ** -240) / 0.005)
+
+
+def test_fixed_rate_debt_service_matches_the_level_schedule():
+    rates = rate_paths(1, 120, fixed_rate=0.06)
+    schedule = debt_service_schedule(100000, rates, 120, 360)
+    closed = amortization_schedule(100000, 0.06, 360, 120)
+    np.testing.assert_allclose(schedule['payment'], closed['payment'])
+    np.testing.assert_allclose(schedule['balloon'], closed['balloon'])
+    assert schedule['balance'][0, -1] == 0
+
+
+def test_interest_only_loans_pay_coupon_and_repay_at_maturity():
+    rates = rate_paths(2, 24, index_path=0.05, spread=[0.01, 0.03], cap=0.07)
+    np.testing.assert_allclose(rates[:, 0], [0.06, 0.07])
+    schedule = debt_service_schedule(1200000, rates, [12, 24], amortization_months=0)
+    np.testing.assert_allclose(schedule['payment'][:, 0], [6000, 7000])
+    np.testing.assert_allclose(schedule['balloon'], 1200000)
+    assert schedule['payment'][0, 12:].sum() == 0
+
+    metrics = coverage_metrics(schedule, noi_path(96000, 24))
+    np.testing.assert_allclose(metrics['dscr'][:, 11], [8000 / 6000, 8000 / 7000])
+    assert np.isnan(metrics['dscr'][0, 12])
+    breaches = covenant_breaches(metrics, min_dscr=1.2)
+    assert breaches['breached'].tolist() == [False, True]
+    assert breaches['first_breach_month'][1] == 1
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from cancellation import (CancellationToken, RequestCancelled, run_cancellable, run_checkpointed,
+                          REASON_DEADLINE, REASON_DISCONNECTED)
+from idempotency import RequestCoalescer
+
+
+class FakeRequest:
+    """Enough of a Starlette request for the cancellation helpers"""
+
+    def __init__(self, disconnected: bool = False):
+        self.disconnected = disconnected
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+    async def receive(self):
+        while not self.disconnected:
+            await asyncio.sleep(0.001)
+        return {'type': 'http.disconnect'}
+
+
+def test_deadline_fires_from_the_clock():
+    token = CancellationToken(timeout=0.001)
+    asyncio.run(asyncio.sleep(0.005))
+    with pytest.raises(RequestCancelled) as raised:
+        token.check()
+    assert raised.value.reason == REASON_DEADLINE
+
+
+def test_checkpointed_work_runs_in_the_calling_task():
+    caller = None
+
+    async def work(token):
+        assert asyncio.current_task() is caller
+        await token.poll()
+        return 'done'
+
+    async def main():
+        nonlocal caller
+        caller = asyncio.current_task()
+        return await run_checkpointed(FakeRequest(), work, None, 'test')
+
+    assert asyncio.run(main()) == 'done'
+
+
+def test_checkpointed_work_stops_at_the_next_poll_after_a_disconnect():
+    request = FakeRequest()
+    steps = []
+
+    async def work(token):
+        steps.append('read')
+        request.disconnected = True
+        await token.poll()
+        steps.append('write')
+
+    with pytest.raises(RequestCancelled) as raised:
+        asyncio.run(run_checkpointed(request, work, None, 'test'))
+    assert raised.value.reason == REASON_DISCONNECTED
+    assert steps == ['read']
+
+
+def test_checkpointed_work_is_not_started_for_a_gone_client():
+    async def work(token):
+        raise AssertionError("should not run")
+
+    with pytest.raises(RequestCancelled):
+        asyncio.run(run_checkpointed(FakeRequest(disconnected=True), work, None, 'test'))
+
+
+def test_cancellable_work_is_interrupted_by_a_disconnect():
+    request = FakeRequest()
+
+    async def work(token):
+        await asyncio.sleep(0.01)
+        request.disconnected = True
+        await asyncio.sleep(10)
+
+    with pytest.raises(RequestCancelled) as raised:
+        asyncio.run(run_cancellable(request, work, None, 'test'))
+    assert raised.value.reason == REASON_DISCONNECTED
+
+
+def test_cancellable_work_is_interrupted_by_its_deadline():
+    async def work(token):
+        await asyncio.sleep(10)
+
+    with pytest.raises(RequestCancelled) as raised:
+        asyncio.run(run_cancellable(FakeRequest(), work, 0.01, 'test'))
+    assert raised.value.reason == REASON_DEADLINE
+
+
+def test_deadline_stops_coalesced_work_once_no_caller_is_waiting():
+    coalescer = RequestCoalescer('test')
+    stopped = []
+
+    async def fetch():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            stopped.append(True)
+            raise
+
+    async def work(token):
+        return await coalescer.run('fetch', fetch)
+
+    async def main():
+        with pytest.raises(RequestCancelled):
+            await run_cancellable(FakeRequest(), work, 0.01, 'test')
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert stopped == [True]
@@ -0,0 +1,115 @@
+import threading
+from datetime import datetime, timedelta
+
+import mongomock
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from capital_accounts import CapitalLedger
+from models import CapitalEvent, MAX_QUARTER
+
+
+def ledger(**options) -> CapitalLedger:
+    db = mongomock.MongoClient().db
+    store = CapitalLedger(db.capital_events, db.capital_snapshots, db.capital_ledger_heads, **options)
+    store.ensure_indexes()
+    return store
+
+
+def funded(store: CapitalLedger) -> CapitalLedger:
+    store.append('F1', [
+        {'lp_id': 'A', 'quarter': 0, 'type': 'commitment', 'amount': 1000000},
+        {'lp_id': 'B', 'quarter': 0, 'type': 'commitment', 'amount': 3000000},
+        {'lp_id': 'A', 'quarter': 0, 'type': 'contribution', 'amount': 250000},
+        {'lp_id': 'B', 'quarter': 1, 'type': 'contribution', 'amount': 750000},
+        {'lp_id': 'A', 'quarter': 2, 'type': 'allocation', 'amount': -10000},
+    ])
+    return store
+
+
+def test_closed_quarters_match_replay_and_reject_new_events():
+    store = funded(ledger())
+    replayed = store.balances('F1', 1)
+    assert store.close_quarter('F1', 1) == 2
+    snapshot = store.balances('F1', 1)
+    assert snapshot['lp_ids'] == replayed['lp_ids'] == ['A', 'B']
+    np.testing.assert_allclose(snapshot['metrics']['capital_account'], [250000, 750000])
+    np.testing.assert_allclose(store.balances('F1', 2)['metrics']['capital_account'], [240000, 750000])
+
+    with pytest.raises(ValueError, match='Quarter 1 is closed'):
+        store.append('F1', [{'lp_id': 'A', 'quarter': 1, 'type': 'contribution', 'amount': 1}])
+    assert store.close_quarter('F1', 1) == 0
+
+
+def test_management_fees_are_charged_once_per_quarter():
+    store = funded(ledger())
+    assert store.accrue_management_fees('F1', 1) == {'A': 5000.0, 'B': 15000.0}
+    with pytest.raises(ValueError, match='already posted'):
+        store.accrue_management_fees('F1', 1)
+    assert store.events.count_documents({'type': 'management_fee'}) == 2
+    np.testing.assert_allclose(store.balances('F1', 1)['metrics']['management_fees'], [5000, 15000])
+
+
+def test_negative_amounts_are_rejected_except_allocations():
+    store = ledger()
+    with pytest.raises(ValueError, match='distribution amounts cannot be negative'):
+        store.append('F1', [{'lp_id': 'A', 'quarter': 0, 'type': 'distribution', 'amount': -1}])
+    with pytest.raises(ValueError, match='Unknown ledger event type'):
+        store.append('F1', [{'lp_id': 'A', 'quarter': 0, 'type': 'fee', 'amount': 1}])
+    assert store.events.count_documents({}) == 0
+
+    with pytest.raises(ValidationError):
+        CapitalEvent(lp_id='A', quarter=0, type='contribution', amount=-1)
+    with pytest.raises(ValidationError):
+        CapitalEvent(lp_id='A', quarter=0, type='fee', amount=1)
+    assert CapitalEvent(lp_id='A', quarter=0, type='allocation', amount=-1).amount == -1
+
+
+def test_writers_wait_for_the_lease_and_take_over_expired_ones():
+    store = funded(ledger(lock_timeout=0.1))
+    with store._writing('F1'):
+        with pytest.raises(TimeoutError, match='busy'):
+            store.append('F1', [{'lp_id': 'A', 'quarter': 3, 'type': 'contribution', 'amount': 1}])
+        with pytest.raises(TimeoutError):
+            store.close_quarter('F1', 0)
+
+    # A writer that died holding the lease blocks others only until it expires
+    store.heads.update_one({'_id': 'F1'}, {'$set': {'lock': {'token': 'dead', 'expires_at': datetime.now() - timedelta(seconds=1)}}})
+    assert store.append('F1', [{'lp_id': 'A', 'quarter': 3, 'type': 'contribution', 'amount': 1}]) == [6]
+    assert 'lock' not in store.heads.find_one({'_id': 'F1'})
+
+
+def test_concurrent_appends_never_land_in_a_closed_quarter():
+    store = ledger()
+    accepted = []
+
+    def contribute():
+        for _ in range(20):
+            try:
+                store.append('F1', [{'lp_id': 'A', 'quarter': 0, 'type': 'contribution', 'amount': 1}])
+                accepted.append(1)
+            except ValueError:
+                return
+
+    writers = [threading.Thread(target=contribute) for _ in range(4)]
+    for writer in writers:
+        writer.start()
+    store.close_quarter('F1', 0)
+    for writer in writers:
+        writer.join()
+
+    assert store.events.count_documents({'quarter': 0}) == len(accepted)
+    assert store.balances('F1', 0)['metrics']['paid_in'].sum() == len(accepted)
+
+
+def test_quarters_are_bounded_before_anything_is_allocated():
+    store = funded(ledger())
+    for read in (store.history, store.balances, store.close_quarter, store.accrue_management_fees):
+        with pytest.raises(ValueError, match=f'at most {MAX_QUARTER}'):
+            read('F1', 100000000)
+    with pytest.raises(ValueError, match=f'at most {MAX_QUARTER}'):
+        store.append('F1', [{'lp_id': 'A', 'quarter': MAX_QUARTER + 1, 'type': 'contribution', 'amount': 1}])
+    with pytest.raises(ValidationError):
+        CapitalEvent(lp_id='A', quarter=MAX_QUARTER + 1, type='contribution', amount=1)
+    assert store.history('F1', MAX_QUARTER)['quarters'] == MAX_QUARTER + 1
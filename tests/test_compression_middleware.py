@@ -0,0 +1,99 @@
+import gzip
+
+import brotli
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from responses import CompressionMiddleware, FastJSONResponse, negotiate_encoding
+
+BODY = {'sections': [{'title': f"Section {index}", 'content': 'Coastal Oak ' * 200} for index in range(10)]}
+
+
+def build(**options):
+    async def deck(request):
+        return FastJSONResponse(BODY)
+
+    async def small(request):
+        return PlainTextResponse('ok')
+
+    async def image(request):
+        return Response(b'\x89PNG' * 1000, media_type='image/png')
+
+    async def stream(request):
+        async def chunks():
+            for _ in range(5):
+                yield 'Coastal Oak ' * 500
+        return StreamingResponse(chunks(), media_type='text/plain')
+
+    app = Starlette(routes=[Route('/deck', deck), Route('/small', small), Route('/image', image),
+                            Route('/stream', stream)])
+    middleware = CompressionMiddleware(app, **options)
+    return middleware, TestClient(middleware)
+
+
+def test_negotiation_honours_quality_values():
+    assert negotiate_encoding('gzip, br') == 'br'
+    assert negotiate_encoding('br;q=0.5, gzip') == 'gzip'
+    assert negotiate_encoding('br', brotli_enabled=False) is None
+    assert negotiate_encoding('*') == 'br'
+    assert negotiate_encoding('identity') is None
+    assert negotiate_encoding('gzip;q=0') is None
+
+
+def test_gzip_response_round_trips_with_headers():
+    _, client = build()
+    response = client.get('/deck', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['vary'] == 'Accept-Encoding'
+    raw = FastJSONResponse(BODY).body
+    assert int(response.headers['content-length']) < len(raw)
+    assert response.json() == BODY
+
+
+def test_brotli_is_preferred_when_accepted():
+    _, client = build()
+    response = client.get('/deck', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['content-encoding'] == 'br'
+    assert response.json() == BODY
+
+
+def test_small_unencodable_and_binary_responses_pass_through():
+    _, client = build()
+    assert 'content-encoding' not in client.get('/small', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'content-encoding' not in client.get('/deck', headers={'Accept-Encoding': 'identity'}).headers
+    assert 'content-encoding' not in client.get('/image', headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_streamed_bodies_are_compressed_incrementally():
+    _, client = build()
+    response = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert 'content-length' not in response.headers
+    assert response.text == 'Coastal Oak ' * 2500
+
+
+def test_repeated_bodies_are_compressed_once():
+    middleware, client = build()
+    calls = []
+    original = brotli.compress
+    try:
+        brotli.compress = lambda *args, **kwargs: calls.append(1) or original(*args, **kwargs)
+        first = client.get('/deck', headers={'Accept-Encoding': 'br'})
+        second = client.get('/deck', headers={'Accept-Encoding': 'br'})
+    finally:
+        brotli.compress = original
+    assert len(calls) == 1
+    assert first.content == second.content
+    # A different encoding of the same body is a separate entry
+    assert gzip.decompress(middleware.compress(FastJSONResponse(BODY).body, 'gzip')) == FastJSONResponse(BODY).body
+    assert len(middleware._cache) == 2
+
+
+def test_compressed_cache_is_bounded():
+    middleware, _ = build(cache_max_bytes=600)
+    for index in range(20):
+        middleware.compress(f"{index} ".encode() * 2000, 'gzip')
+    assert middleware._cache_bytes <= 600
+    assert len(middleware._cache) < 20
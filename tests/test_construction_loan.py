@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from construction_loan import annual_totals, draw_schedule, run_construction_scenarios, scenario_table
+from models import ConstructionBudgetLine
+
+BUDGET = [
+    ConstructionBudgetLine(name='Land', amount=4000000, start_month=0, duration_months=1),
+    ConstructionBudgetLine(name='Build', amount=6000000, start_month=1, duration_months=10, curve='s_curve'),
+]
+
+
+def test_draw_curves_spend_each_line_in_full():
+    schedule = draw_schedule(BUDGET)
+    assert schedule.shape == (2, 11)
+    np.testing.assert_allclose(schedule.sum(axis=1), [4000000, 6000000])
+    # The S-curve is symmetric and peaks mid-build
+    build = schedule[1, 1:]
+    np.testing.assert_allclose(build, build[::-1])
+    assert build.argmax() in (4, 5)
+    with pytest.raises(ValueError, match='draws past month 5'):
+        draw_schedule(BUDGET, months=6)
+
+
+def test_draws_fund_budget_and_fee_and_the_loan_converts_at_its_commitment():
+    result = run_construction_scenarios(BUDGET, cost_factors=[1.0, 1.1], construction_rates=0.08,
+                                        loan_to_cost=0.7, origination_fee=0.01, conversion_month=14)
+    fee = result['origination_fee']
+    np.testing.assert_allclose(result['cost_draws'].sum(axis=1), np.array([10e6, 11e6]) + fee)
+    np.testing.assert_allclose(result['equity_draws'] + result['loan_draws'], result['cost_draws'])
+    np.testing.assert_allclose(fee, 0.01 * result['loan_commitment'])
+
+    # Capitalized interest fills the commitment exactly at conversion
+    np.testing.assert_allclose(result['balance'][:, 14], result['loan_commitment'], rtol=1e-8)
+    np.testing.assert_allclose(result['loan_draws'].sum(axis=1) + result['interest_reserve'],
+                               result['loan_commitment'], rtol=1e-8)
+    np.testing.assert_allclose(result['loan_commitment'], 0.7 * result['total_cost'], rtol=1e-8)
+
+
+def test_without_interest_the_loan_is_loan_to_cost_of_budget_and_fee():
+    result = run_construction_scenarios(BUDGET, construction_rates=0.0, loan_to_cost=0.6, origination_fee=0.02,
+                                        conversion_month=10)
+    commitment = 0.6 * 10e6 / (1 - 0.6 * 0.02)
+    np.testing.assert_allclose(result['loan_commitment'], commitment)
+    np.testing.assert_allclose(result['construction_payoff'], commitment)
+    assert result['interest_reserve'][0] == 0
+    # Equity goes in first: the loan draws nothing until equity is spent
+    first_loan_month = np.flatnonzero(result['loan_draws'][0])[0]
+    np.testing.assert_allclose(result['equity_draws'][0, first_loan_month + 1:], 0, atol=1e-6)
+
+    row, = scenario_table(result)
+    assert row['peak_balance'] == pytest.approx(commitment, abs=0.01)
+
+
+def test_annual_totals_fold_closing_into_year_one():
+    monthly = np.arange(25, dtype=float)[np.newaxis, :]
+    np.testing.assert_allclose(annual_totals(monthly, 2), [[sum(range(13)), sum(range(13, 25))]])
@@ -0,0 +1,25 @@
+import mongomock
+
+from compression import CODEC_ZSTD, CODEC_ZSTD_DICT_PREFIX, ContentCodec
+
+SAMPLES = [f"Coastal Oak Capital acquired parcel {index} with a cap rate of {5 + index % 7 / 10:.1f}% and "
+           f"a stabilized NOI of ${index * 1000:,} across {index % 13} data halls." for index in range(400)]
+
+
+def test_workers_adopt_a_dictionary_trained_elsewhere():
+    dictionaries = mongomock.MongoClient().db.compression_dictionaries
+    trainer = ContentCodec(dictionaries)
+    polling = ContentCodec(dictionaries, reload_interval=0)
+    reading = ContentCodec(dictionaries, reload_interval=3600)
+    assert reading.encode(SAMPLES[0])[0] == CODEC_ZSTD
+
+    dictionary_id = trainer.train(SAMPLES, dict_size=4096)['dictionary_id']
+    expected = f"{CODEC_ZSTD_DICT_PREFIX}{dictionary_id}"
+    # Checked on the next write once the reload interval has passed
+    assert polling.encode(SAMPLES[1])[0] == expected
+
+    # Within the interval, but reading a body written with it reveals the new dictionary
+    assert reading.encode(SAMPLES[1])[0] == CODEC_ZSTD
+    codec, body = trainer.encode(SAMPLES[2])
+    assert reading.decode(codec, body) == SAMPLES[2]
+    assert reading.encode(SAMPLES[3])[0] == expected
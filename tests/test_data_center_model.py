@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from data_center_model import HOURS_PER_MONTH, case_table, lease_up_curve, run_data_center_model
+
+
+def test_stabilized_revenue_is_leased_kw_times_rate_times_twelve():
+    result = run_data_center_model(it_capacity_mw=[8.5, 10.0], stabilized_occupancy=0.8, colocation_rate=175.0,
+                                   power_services_rate=25.0, grid_services_rate=100.0, electricity_rate=20.0,
+                                   load_factor=0.5, pue=1.5)
+    stabilized = result['stabilized']
+    leased_kw = np.array([6800.0, 8000.0])
+    np.testing.assert_allclose(stabilized['leased_kw'], leased_kw)
+    np.testing.assert_allclose(stabilized['colocation_revenue'], leased_kw * 175 * 12)
+    np.testing.assert_allclose(stabilized['power_services_revenue'], leased_kw * 25 * 12)
+    np.testing.assert_allclose(stabilized['grid_services_revenue'], [850000, 1000000])
+    energy_cost = leased_kw * 0.5 * 8760 * 1.5 * 0.20
+    np.testing.assert_allclose(stabilized['energy_cost'], energy_cost)
+    np.testing.assert_allclose(stabilized['net_of_energy'],
+                               leased_kw * 200 * 12 + np.array([850000, 1000000]))
+
+
+def test_monthly_revenue_reaches_the_stabilized_run_rate():
+    result = run_data_center_model(months=24, lease_up_months=6, rate_escalation=0.0)
+    stabilized = result['stabilized']
+    # Once leased up, twelve months of billing equal the run-rate
+    np.testing.assert_allclose(result['revenue'][:, 12:].sum(axis=1), stabilized['total_revenue'])
+    np.testing.assert_allclose(result['it_energy_kwh'][:, -1], stabilized['leased_kw'] * 0.70 * HOURS_PER_MONTH)
+
+    row, = case_table(result, ['base'])
+    assert row['case'] == 'base'
+    assert row['stabilized_total_revenue'] == pytest.approx(float(stabilized['total_revenue'][0]), abs=0.01)
+
+
+def test_lease_up_starts_at_delivery_and_escalation_steps_yearly():
+    occupancy = lease_up_curve(12, start_month=3, lease_up_months=4, stabilized_occupancy=0.9)
+    np.testing.assert_allclose(occupancy[0, :3], 0)
+    assert occupancy[0, 4] == pytest.approx(0.45)
+    np.testing.assert_allclose(occupancy[0, 6:], 0.9)
+
+    result = run_data_center_model(months=24, lease_up_months=1, rate_escalation=0.05)
+    colocation = result['colocation_revenue'][0]
+    assert colocation[12] == pytest.approx(colocation[11] * 1.05)
+    with pytest.raises(ValueError, match='Unknown data center drivers: rent'):
+        run_data_center_model(rent=1.0)
@@ -0,0 +1,161 @@
+import mongomock
+import pytest
+
+from document_history import VERSION_FIELD, DocumentHistory, VersionConflict, apply_delta, compute_delta
+
+
+def stored(title: str, bodies: dict, **fields) -> dict:
+    """A document in its stored form: sections keyed by id, bodies as chunk hash lists"""
+    return {
+        '_id': 'doc',
+        'title': title,
+        'sections': [{'id': section_id, 'title': section_id.title(), 'content_chunks': chunks}
+                     for section_id, chunks in bodies.items()],
+        'data_sources': {'fred': {'value': fields.pop('rate', 5.0), 'unit': '%'}},
+        **fields,
+    }
+
+
+def history(interval: int = 4) -> DocumentHistory:
+    store = DocumentHistory(mongomock.MongoClient().db.document_versions, interval)
+    store.ensure_indexes()
+    return store
+
+
+def strip_id(document: dict) -> dict:
+    return {key: value for key, value in document.items() if key != '_id'}
+
+
+def test_delta_round_trips_adds_removals_and_reordering():
+    old = stored('Deck', {'summary': ['a'], 'market': ['b'], 'risks': ['c']})
+    new = stored('Deck v2', {'risks': ['c'], 'summary': ['a', 'd'], 'returns': ['e']}, rate=5.25)
+    delta = compute_delta(old, new)
+    assert delta['sections']['market'] is None
+    assert delta['sections']['summary'] == {'content_chunks': ['a', 'd']}
+    assert delta['section_order'] == ['risks', 'summary', 'returns']
+    assert apply_delta(old, delta) == new
+
+
+def test_every_version_is_rebuilt_across_snapshots():
+    store = history(interval=3)
+    versions = [stored('Deck', {'summary': [f'chunk-{index}'], 'market': ['m']}, rate=5.0 + index)
+                for index in range(8)]
+    previous = None
+    for number, document in enumerate(versions, start=1):
+        assert store.record('doc', document, previous) == number
+        previous = document
+
+    kinds = [entry['kind'] for entry in store.list_versions('doc')]
+    assert kinds == ['snapshot', 'delta', 'delta', 'snapshot', 'delta', 'delta', 'snapshot', 'delta']
+    for number, document in enumerate(versions, start=1):
+        assert store.get_version('doc', number) == strip_id(document)
+    assert store.get_version('doc', 9) is None
+
+
+def test_delta_is_taken_against_the_head_not_a_stale_previous():
+    store = history()
+    original = stored('Deck', {'summary': ['a'], 'market': ['b']})
+    store.record('doc', original)
+
+    # Two writers read `original`; the second records after the first has already moved the head
+    first = stored('Deck', {'summary': ['a'], 'market': ['b2']})
+    second = stored('Deck renamed', {'summary': ['a'], 'market': ['b']})
+    store.record('doc', first, previous=original)
+    store.record('doc', second, previous=original)
+
+    assert store.get_version('doc', 3) == strip_id(second)
+
+
+def test_documents_without_history_record_previous_first():
+    store = history()
+    before = stored('Deck', {'summary': ['a']})
+    after = stored('Deck', {'summary': ['b']})
+    assert store.record('doc', after, previous=before) == 2
+    assert store.get_version('doc', 1) == strip_id(before)
+    assert store.get_version('doc', 2) == strip_id(after)
+
+
+def test_changes_since_returns_only_changed_fields():
+    store = history()
+    original = stored('Deck', {'summary': ['a'], 'market': ['b'], 'risks': ['c']}, rate=5.0)
+    store.record('doc', original)
+    current = stored('Deck', {'summary': ['a'], 'market': ['b2'], 'returns': ['d']}, rate=5.0)
+    current['sections'][0]['title'] = 'Executive Summary'
+    current['data_sources']['fred']['value'] = 5.25
+    current['data_sources']['bls'] = {'value': 3.1, 'unit': '%'}
+    store.record('doc', current)
+
+    changes = store.changes_since('doc', strip_id(current), 1)
+    assert changes['fields'] == {}
+    assert changes['data_sources'] == {'fred': {'value': 5.25}, 'bls': {'value': 3.1, 'unit': '%'}}
+    assert changes['deleted_data_sources'] == []
+    sections = {section['id']: section for section in changes['sections']}
+    # A retitled section does not resend its unchanged body
+    assert sections['summary'] == {'id': 'summary', 'title': 'Executive Summary'}
+    assert sections['market'] == {'id': 'market', 'content_chunks': ['b2']}
+    assert sections['returns'] == {'id': 'returns', 'title': 'Returns', 'content_chunks': ['d']}
+    assert changes['deleted_sections'] == ['risks']
+    assert changes['section_order'] == ['summary', 'market', 'returns']
+
+    assert store.changes_since('doc', strip_id(current), 2)['sections'] == []
+    assert len(store.changes_since('doc', strip_id(current), 0)['sections']) == 3
+    assert store.changes_since('doc', strip_id(current), 5) is None
+
+
+def test_removed_fields_data_sources_and_section_fields_are_recorded():
+    store = history()
+    old = stored('Deck', {'summary': ['a'], 'market': ['b']}, subtitle='Q1')
+    old['data_sources']['bls'] = {'value': 3.1, 'unit': '%', 'note': 'prelim'}
+    old['sections'][0]['content'] = 'legacy inline body'
+    new = stored('Deck', {'summary': ['a'], 'market': ['b']})
+    new['data_sources']['bls'] = {'value': 3.1, 'unit': '%'}
+
+    delta = compute_delta(old, new)
+    assert delta['removed_fields'] == ['subtitle']
+    assert apply_delta(old, delta) == new
+
+    store.record('doc', old)
+    store.record('doc', new)
+    assert store.get_version('doc', 2) == strip_id(new)
+    diff = store.diff('doc', 1, 2)
+    assert diff['fields'] == {'subtitle': {'from': 'Q1', 'to': None}}
+    assert diff['sections']['summary']['changed_fields'] == ['content']
+    changes = store.changes_since('doc', strip_id(new), 1)
+    assert changes['deleted_fields'] == ['subtitle']
+    assert changes['data_sources'] == {'bls': {'deleted_fields': ['note']}}
+    assert changes['sections'] == [{'id': 'summary', 'deleted_fields': ['content']}]
+
+
+def test_saves_compare_and_swap_on_the_version_read():
+    store = history()
+    documents = mongomock.MongoClient().db.documents
+    original = stored('Deck', {'summary': ['a']})
+    assert store.save(documents, original) == 1
+    read = documents.find_one({'_id': 'doc'})
+    assert read[VERSION_FIELD] == 1
+
+    # Two writers read version 1; only the first lands, and only it is recorded
+    first = stored('Deck', {'summary': ['b']})
+    second = stored('Deck renamed', {'summary': ['a']})
+    assert store.save(documents, first, read=read) == 2
+    with pytest.raises(VersionConflict):
+        store.save(documents, second, read=read)
+    assert documents.find_one({'_id': 'doc'})['title'] == 'Deck'
+    assert store.head_version('doc') == 2
+    assert store.get_version('doc', 2) == strip_id(first)
+    with pytest.raises(VersionConflict):
+        store.save(documents, original)
+
+
+def test_documents_written_before_versioning_are_matched_by_its_absence():
+    store = history()
+    documents = mongomock.MongoClient().db.documents
+    legacy = stored('Deck', {'summary': ['a']})
+    documents.insert_one(dict(legacy))
+
+    updated = stored('Deck', {'summary': ['b']})
+    assert store.save(documents, updated, read=legacy) == 2
+    assert store.get_version('doc', 1) == strip_id(legacy)
+    assert documents.find_one({'_id': 'doc'})[VERSION_FIELD] == 2
+    with pytest.raises(VersionConflict):
+        store.save(documents, stored('Deck', {'summary': ['c']}), read=legacy)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from ev_charging import HOURS_PER_YEAR, case_table, demand_profile, hourly_calendar, simulate_ev_charging
+
+
+def test_steady_demand_charges_ports_times_power_times_utilization_all_year():
+    result = simulate_ev_charging(daily_variability=0.0, dispatch_hours=0, dcfc_ports=[40, 10], dcfc_power_kw=150.0,
+                                  dcfc_utilization=0.1, mcs_ports=20, mcs_power_kw=1000.0, mcs_utilization=0.05)
+    annual = result['annual']
+    np.testing.assert_allclose(annual['dcfc_kwh'], np.array([40, 10]) * 150 * 0.1 * 8760)
+    np.testing.assert_allclose(annual['mcs_kwh'], 20 * 1000 * 0.05 * 8760)
+    np.testing.assert_allclose(annual['dcfc_revenue'], annual['dcfc_kwh'] * 0.45)
+    np.testing.assert_allclose(annual['curtailed_kwh'], 0)
+    assert result['dcfc_kwh'].shape == (2, 12)
+
+
+def test_a_flat_tariff_bills_energy_at_the_base_rate():
+    result = simulate_ev_charging(daily_variability=0.0, dispatch_hours=0, peak_multiplier=1.0,
+                                  super_off_peak_multiplier=1.0, summer_multiplier=1.0, electricity_rate=20.0,
+                                  peak_demand_charge=0.0)
+    annual = result['annual']
+    np.testing.assert_allclose(annual['energy_cost'], (annual['dcfc_kwh'] + annual['mcs_kwh']) * 0.20)
+    # Demand charges bill each month's peak
+    np.testing.assert_allclose(annual['demand_charges'], result['peak_kw'].sum(axis=1) * 18.0)
+    assert np.all(result['peak_kw'] <= 40 * 150 + 20 * 1000)
+
+
+def test_demand_response_curtails_at_most_the_enrolled_load_for_the_dispatched_hours():
+    result = simulate_ev_charging(daily_variability=0.0, enrolled_kw=500.0, dispatch_hours=[0, 50, 100])
+    annual = result['annual']
+    assert annual['curtailed_kwh'][0] == 0
+    assert np.all(annual['curtailed_kwh'] <= np.array([0, 50, 100]) * 500 + 1e-6)
+    assert np.all(np.diff(annual['charging_revenue']) < 0)
+    np.testing.assert_allclose(result['dispatch_revenue'], annual['curtailed_kwh'])
+
+    rows = case_table(result, ['none', 'half', 'full'])
+    assert [row['case'] for row in rows] == ['none', 'half', 'full']
+    with pytest.raises(ValueError, match='non-negative'):
+        simulate_ev_charging(daily_variability=-0.1)
+
+
+def test_demand_profiles_average_one_over_the_year():
+    calendar = hourly_calendar()
+    assert len(calendar['hour']) == HOURS_PER_YEAR and calendar['month'][-1] == 11
+    for charger in ('dcfc', 'mcs'):
+        assert demand_profile(charger, calendar).mean() == pytest.approx(1.0)
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from goal_seek import deal_cases, deal_flows, deal_table, goal_seek, solve_deals, solve_tape_prices, tape_columns
+from loan_tape import LoanTape
+from returns import irr, moic
+
+
+def tape(count: int = 3) -> LoanTape:
+    balances = np.linspace(10e6, 30e6, count)
+    return LoanTape(np.array([f'NOTE-{index}' for index in range(count)]), {
+        'unpaid_balance': balances,
+        'accrued_interest': balances * 0.04,
+        'note_rate': np.full(count, 0.06),
+        'property_value': balances * 1.25,
+        'noi': balances * 0.0875,
+        'remaining_term_months': np.full(count, 24.0),
+        'amortization_months': np.zeros(count),
+        'purchase_price': np.full(count, np.nan),
+    })
+
+
+def test_goal_seek_finds_roots_and_marks_unbracketed_rows_nan():
+    targets = np.array([2.0, 9.0, 200.0])
+    roots = goal_seek(lambda x, rows: x ** 2 - targets[rows], np.zeros(3), np.full(3, 10.0))
+    np.testing.assert_allclose(roots[:2], [np.sqrt(2), 3.0], rtol=1e-9)
+    assert np.isnan(roots[2])
+
+    # Rising and falling objectives are both oriented
+    falling = goal_seek(lambda x, rows: 5.0 - x, np.zeros(1), np.full(1, 10.0))
+    np.testing.assert_allclose(falling, [5.0])
+
+
+@pytest.mark.parametrize('variable', ['purchase_price', 'exit_cap_rate'])
+def test_solved_deals_hit_their_irr_targets(variable):
+    targets = np.array([0.08, 0.12, 0.18])
+    result = solve_deals('irr', targets, variable)
+    np.testing.assert_allclose(result['irr'], targets, atol=1e-8)
+
+    # Achieved metrics are those of the flows at the solved terms
+    case = deal_cases(purchase_price=result['purchase_price'], exit_cap_rate=result['exit_cap_rate'])
+    flows = deal_flows(case, result['purchase_price'], result['exit_cap_rate'])['flows']
+    np.testing.assert_allclose(irr(flows), targets, atol=1e-8)
+    np.testing.assert_allclose(moic(flows), result['moic'])
+    # A higher target needs a lower price or a lower exit cap
+    assert np.all(np.diff(result[variable]) < 0)
+
+
+def test_moic_and_dscr_targets_broadcast_against_drivers():
+    result = solve_deals('moic', 1.8, noi=[1.8e6, 2.1e6, 2.4e6])
+    np.testing.assert_allclose(result['moic'], 1.8, atol=1e-8)
+    assert np.all(np.diff(result['purchase_price']) > 0)
+
+    result = solve_deals('dscr', 1.25, hold_years=[5, 7])
+    np.testing.assert_allclose(result['dscr'], 1.25, atol=1e-8)
+    np.testing.assert_allclose(result['purchase_price'][0], result['purchase_price'][1])
+
+
+def test_unreachable_targets_are_none_in_tables():
+    # Year 1 DSCR does not depend on the exit cap rate, so no exit cap reaches it
+    result = solve_deals('dscr', [1.25, 99.0], 'exit_cap_rate')
+    assert np.all(np.isnan(result['exit_cap_rate']))
+    rows = deal_table(result, ['a', 'b'])
+    assert [row['case'] for row in rows] == ['a', 'b']
+    assert rows[0]['solved_exit_cap_rate'] is None and rows[0]['exit_cap_rate'] == 0.065
+
+
+def test_unknown_metrics_variables_and_drivers_are_rejected():
+    with pytest.raises(ValueError, match='target metric'):
+        solve_deals('yield', 0.1)
+    with pytest.raises(ValueError, match='goal-seek variable'):
+        solve_deals('irr', 0.1, 'ltv')
+    with pytest.raises(ValueError, match='Unknown deal drivers'):
+        solve_deals('irr', 0.1, rent=1.0)
+    with pytest.raises(ValueError, match="'irr' or 'moic'"):
+        solve_tape_prices(tape(), 'dscr', 1.25)
+
+
+def test_tape_prices_hit_targets_across_chunks():
+    notes = tape(5)
+    targets = np.array([0.10, 0.15, 0.20, 0.25, 0.30])
+    whole = solve_tape_prices(notes, 'irr', targets)
+    np.testing.assert_allclose(whole['irr'], targets, atol=1e-8)
+    np.testing.assert_allclose(whole['discount'], 1 - whole['price_to_face'])
+
+    chunked = solve_tape_prices(notes, 'irr', targets, chunk_size=2)
+    np.testing.assert_allclose(chunked['purchase_price'], whole['purchase_price'])
+
+    priced = solve_tape_prices(notes, 'moic', 1.5)
+    np.testing.assert_allclose(priced['moic'], 1.5, atol=1e-8)
+    columns = tape_columns(notes, priced)
+    assert columns['loan_id'] == list(notes.loan_ids)
+    assert all(value is not None for value in columns['purchase_price'])
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from ev_charging import HOURS_PER_YEAR, hourly_calendar
+from heat_recovery import annual_projection, case_table, run_heat_recovery, thermal_demand
+
+
+def test_heat_sold_never_exceeds_thermal_demand_or_recovered_heat():
+    demand = np.array([0.0, 500.0, 1500.0, 1e6])
+    result = run_heat_recovery(thermal_demand_kw=demand)
+    offtake = thermal_demand(hourly_calendar(), demand).sum(axis=1)
+    assert np.all(result['heat_sold_kwh'] <= offtake + 1e-6)
+    assert np.all(result['heat_sold_kwh'] <= result['recovered_heat_kwh'] + 1e-6)
+    assert result['heat_sold_kwh'][0] == 0
+    # An offtaker larger than the loop takes all of it, leaving nothing to generate with
+    assert result['heat_sold_kwh'][-1] == pytest.approx(result['recovered_heat_kwh'][-1])
+    assert result['generated_kwh'][-1] == 0
+    assert np.all(np.diff(result['heat_sold_kwh']) >= 0)
+
+
+def test_a_flat_load_recovers_its_share_and_generates_from_the_surplus():
+    result = run_heat_recovery(it_load_kw=np.full(HOURS_PER_YEAR, 4000.0), recoverable_fraction=0.5,
+                               thermal_demand_kw=0.0, conversion_efficiency=0.1,
+                               conversion_capacity_kw=[1000.0, 150.0], electricity_rate=20.0, om_rate=0.0)
+    recovered = 4000 * 0.5 * HOURS_PER_YEAR
+    np.testing.assert_allclose(result['recovered_heat_kwh'], recovered)
+    np.testing.assert_allclose(result['generated_kwh'], [recovered * 0.1, 150 * HOURS_PER_YEAR])
+    np.testing.assert_allclose(result['generation_avoided_cost'], result['generated_kwh'] * 0.20)
+    np.testing.assert_allclose(result['baseline_energy_cost'], 4000 * 1.35 * HOURS_PER_YEAR * 0.20)
+
+    # Chillers can avoid no more than the cooling share of the PUE overhead
+    cooling = 4000 * 0.35 * 0.70 * HOURS_PER_YEAR
+    np.testing.assert_allclose(result['cooling_avoided_kwh'], min(recovered / 4.0, cooling))
+    np.testing.assert_allclose(result['effective_pue'],
+                               1.35 - (result['cooling_avoided_kwh'] + result['generated_kwh']) / (4000 * HOURS_PER_YEAR))
+
+
+def test_projections_scale_the_stabilized_year():
+    result = run_heat_recovery(it_capacity_mw=[5.0, 8.5])
+    projection = annual_projection(result, [0.5, 1.0, 1.0], escalation=0.03)
+    np.testing.assert_allclose(projection['net_benefit'][:, 0], result['net_benefit'] * 0.5)
+    np.testing.assert_allclose(projection['net_benefit'][:, 2], result['net_benefit'] * 1.03 ** 2)
+    assert [row['case'] for row in case_table(result, ['small', 'large'])] == ['small', 'large']
+
+    with pytest.raises(ValueError, match='8760 hours'):
+        run_heat_recovery(it_load_kw=np.ones(100))
+    with pytest.raises(ValueError, match='cooling_cop'):
+        run_heat_recovery(cooling_cop=0.0)
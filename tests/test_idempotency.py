@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import mongomock
+
+from idempotency import IdempotencyStore, RequestCoalescer, STATUS_COMPLETED, STATUS_IN_PROGRESS
+
+
+def store(ttl_index: bool = True, **options) -> IdempotencyStore:
+    keys = IdempotencyStore(mongomock.MongoClient().db.idempotency_keys, **options)
+    if ttl_index:
+        keys.ensure_indexes()
+    return keys
+
+
+def test_first_claim_wins_and_completed_responses_replay():
+    keys = store()
+    assert keys.claim('key-1', 'document_create') is None
+    assert keys.claim('key-1', 'document_create')['status'] == STATUS_IN_PROGRESS
+
+    keys.complete('key-1', {'document_id': 'doc'})
+    existing = keys.claim('key-1', 'document_create')
+    assert existing['status'] == STATUS_COMPLETED
+    assert existing['response'] == {'document_id': 'doc'}
+    assert existing['expires_at'] - existing['completed_at'] == timedelta(seconds=keys.ttl_seconds)
+
+
+def test_expired_lease_is_taken_over_but_a_live_one_is_not():
+    # Without the TTL index, as in the window before MongoDB's TTL monitor deletes the claim
+    keys = store(ttl_index=False, lease_seconds=30)
+    keys.claim('key-1', 'document_create')
+    claimed = keys.collection.find_one({'_id': 'key-1'})
+    assert claimed['expires_at'] - claimed['created_at'] == timedelta(seconds=30)
+    assert keys.claim('key-1', 'document_create') is not None
+
+    # The worker holding the claim crashed and its lease ran out
+    keys.collection.update_one({'_id': 'key-1'}, {'$set': {'expires_at': datetime.now() - timedelta(seconds=1)}})
+    assert keys.claim('key-1', 'other_operation') is not None
+    assert keys.claim('key-1', 'document_create') is None
+    assert keys.collection.find_one({'_id': 'key-1'})['expires_at'] > datetime.now()
+
+
+def test_completed_keys_are_never_taken_over_and_release_frees_a_claim():
+    keys = store(ttl_index=False)
+    keys.claim('done', 'document_create')
+    keys.complete('done', {'ok': True})
+    keys.collection.update_one({'_id': 'done'}, {'$set': {'expires_at': datetime.now() - timedelta(seconds=1)}})
+    assert keys.claim('done', 'document_create')['status'] == STATUS_COMPLETED
+
+    keys.claim('failed', 'document_create')
+    keys.release('failed')
+    assert keys.claim('failed', 'document_create') is None
+
+
+def test_coalescer_shares_one_execution_among_concurrent_callers():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'deck'
+
+    async def main():
+        coalescer = RequestCoalescer('test')
+        results = await asyncio.gather(*(coalescer.run('snapshot', work) for _ in range(3)))
+        later = await coalescer.run('snapshot', work)
+        return results, later
+
+    results, later = asyncio.run(main())
+    assert sorted(results) == [('deck', False), ('deck', True), ('deck', True)]
+    assert later == ('deck', False)
+    assert len(calls) == 2
+
+
+def test_ttl_index_drops_an_abandoned_claim():
+    keys = store(lease_seconds=30)
+    keys.claim('key-1', 'document_create')
+    keys.collection.update_one({'_id': 'key-1'}, {'$set': {'expires_at': datetime.now() - timedelta(seconds=1)}})
+    assert keys.claim('key-1', 'document_create') is None
+
+
+def test_keep_alive_renews_the_lease_while_the_holder_works():
+    keys = store(ttl_index=False, lease_seconds=0.3)
+    keys.claim('key-1', 'document_create')
+
+    async def slow_build():
+        heartbeat = asyncio.create_task(keys.keep_alive('key-1'))
+        try:
+            await asyncio.sleep(0.6)
+            # Two leases have passed, yet the claim is still live
+            return keys.claim('key-1', 'document_create')
+        finally:
+            heartbeat.cancel()
+
+    assert asyncio.run(slow_build())['status'] == STATUS_IN_PROGRESS
+    assert keys.complete('key-1', {'ok': True})
+
+
+def test_a_holder_that_lost_its_lease_cannot_overwrite_the_new_one():
+    first, second = store(ttl_index=False), store(ttl_index=False)
+    second.collection = first.collection
+    first.claim('key-1', 'document_create')
+    first.collection.update_one({'_id': 'key-1'}, {'$set': {'expires_at': datetime.now() - timedelta(seconds=1)}})
+    assert second.claim('key-1', 'document_create') is None
+
+    assert not first.renew('key-1')
+    assert not first.complete('key-1', {'stale': True})
+    first.release('key-1')
+    assert second.complete('key-1', {'fresh': True})
+    assert first.claim('key-1', 'document_create')['response'] == {'fresh': True}
@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+
+from job_queue import JobProgress, JobQueue, STATUS_FAILED, STATUS_QUEUED, STATUS_RUNNING, STATUS_SUCCEEDED
+
+
+def queue(handlers, **options) -> JobQueue:
+    options.setdefault('retry_backoff', 0.0)
+    options.setdefault('poll_interval', 0.01)
+    return JobQueue(mongomock.MongoClient().db.jobs, handlers, **options)
+
+
+async def wait_for(jobs: JobQueue, job_id: str, status: str, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while jobs.get(job_id)['status'] != status:
+        assert asyncio.get_running_loop().time() < deadline, jobs.get(job_id)
+        await asyncio.sleep(0.01)
+    return jobs.get(job_id)
+
+
+def test_validators_reject_unusable_params_before_queueing():
+    def require_fund(params):
+        if not params.get('fund_id'):
+            raise ValueError("requires a fund_id")
+
+    jobs = queue({'statements': None}, validators={'statements': require_fund})
+    with pytest.raises(ValueError, match='fund_id'):
+        jobs.enqueue('statements', {})
+    with pytest.raises(ValueError, match='Unknown job type'):
+        jobs.enqueue('missing')
+    assert jobs.collection.count_documents({}) == 0
+    assert jobs.enqueue('statements', {'fund_id': 'F1'})['status'] == STATUS_QUEUED
+
+
+def test_jobs_run_in_priority_order_and_report_progress():
+    order = []
+
+    async def handler(job, progress):
+        order.append(job['params']['name'])
+        progress.report(1, 1, 'done')
+        return {'name': job['params']['name']}
+
+    async def main():
+        jobs = queue({'work': handler}, concurrency=1)
+        low = jobs.enqueue('work', {'name': 'low'})
+        high = jobs.enqueue('work', {'name': 'high'}, priority=5)
+        jobs.start()
+        try:
+            finished = await wait_for(jobs, low['_id'], STATUS_SUCCEEDED)
+        finally:
+            await jobs.stop()
+        return finished, jobs.get(high['_id'])
+
+    low, high = asyncio.run(main())
+    assert order == ['high', 'low']
+    assert low['result'] == {'name': 'low'}
+    assert high['progress'] == {'current': 1, 'total': 1, 'message': 'done'}
+
+
+def test_failing_jobs_retry_then_fail():
+    attempts = []
+
+    async def handler(job, progress):
+        attempts.append(job['attempts'])
+        raise RuntimeError("upstream down")
+
+    async def main():
+        jobs = queue({'work': handler}, max_attempts=2)
+        job = jobs.enqueue('work')
+        jobs.start()
+        try:
+            return await wait_for(jobs, job['_id'], STATUS_FAILED)
+        finally:
+            await jobs.stop()
+
+    failed = asyncio.run(main())
+    assert attempts == [1, 2]
+    assert failed['error'] == 'upstream down'
+
+
+def test_worker_that_lost_its_lease_cannot_overwrite_the_new_attempt():
+    first = queue({'work': None})
+    second = JobQueue(first.collection, {'work': None})
+    second.worker_id = 'other-host:1'
+    job = first.enqueue('work')
+
+    stale = first._claim()
+    first.collection.update_one({'_id': job['_id']}, {'$set': {'heartbeat_at': datetime.now() - timedelta(hours=1)}})
+    assert first.requeue_expired() == 1
+    current = second._claim()
+    assert current['attempts'] == 2
+
+    # The stale worker's heartbeat, progress and final outcome are all ignored
+    assert not first._finish(stale, {'status': STATUS_SUCCEEDED, 'result': 'stale'})
+    JobProgress(first, stale).report(9, 9, 'stale')
+    stored = first.get(job['_id'])
+    assert stored['status'] == STATUS_RUNNING
+    assert stored['worker_id'] == 'other-host:1'
+    assert stored['progress'] is None
+
+    assert second._finish(current, {'status': STATUS_SUCCEEDED, 'result': 'fresh'})
+    assert first.get(job['_id'])['result'] == 'fresh'
+
+
+def test_heartbeat_stops_once_the_job_is_taken_over():
+    async def main():
+        jobs = queue({'work': None}, lease_seconds=0.03)
+        jobs.enqueue('work')
+        claimed = jobs._claim()
+        jobs.collection.update_one({'_id': claimed['_id']}, {'$set': {'worker_id': 'other-host:1'}})
+        await asyncio.wait_for(jobs._heartbeat(claimed), timeout=1.0)
+
+    asyncio.run(main())
+
+
+def test_expired_leases_fail_jobs_that_used_up_their_attempts():
+    jobs = queue({'work': None}, max_attempts=2)
+    retry = jobs.enqueue('work')
+    last = jobs.enqueue('work', max_attempts=1)
+    for _ in range(2):
+        jobs._claim()
+    jobs.collection.update_many({}, {'$set': {'heartbeat_at': datetime.now() - timedelta(hours=1)}})
+
+    assert jobs.requeue_expired() == 2
+    assert jobs.get(retry['_id'])['status'] == STATUS_QUEUED
+    exhausted = jobs.get(last['_id'])
+    assert exhausted['status'] == STATUS_FAILED
+    assert exhausted['error'] == 'Worker lease expired'
+    assert jobs.requeue_expired() == 0
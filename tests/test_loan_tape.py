@@ -0,0 +1,71 @@
+import io
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from loan_tape import LoanTape, price_loan_tape, read_loan_tape, summarize_pricing
+
+CSV = (
+    "Loan_ID,Unpaid_Balance,Note_Rate,Property_Value,NOI,Remaining_Term_Months,Servicer\n"
+    "00123,1000000,0.06,2000000,240000,12,Acme\n"
+    "00456,2000000,0.05,1500000,60000,24,Acme\n"
+)
+
+
+def test_csv_headers_match_case_insensitively_and_ids_keep_leading_zeros():
+    tape = read_loan_tape(io.BytesIO(CSV.encode()), file_format='csv', chunk_size=1)
+    assert tape.loan_ids.tolist() == ['00123', '00456']
+    np.testing.assert_array_equal(tape['unpaid_balance'], [1000000, 2000000])
+    # Optional columns are filled, unknown ones skipped
+    np.testing.assert_array_equal(tape['accrued_interest'], [0, 0])
+    assert 'servicer' not in tape.columns
+
+
+def test_parquet_tapes_read_like_csv(tmp_path):
+    expected = read_loan_tape(io.BytesIO(CSV.encode()), file_format='csv')
+    table = pa.table({'Loan_ID': ['00123', '00456'], **{name.upper(): expected[name]
+                      for name in ('unpaid_balance', 'note_rate', 'property_value', 'noi', 'remaining_term_months')}})
+    path = str(tmp_path / 'tape.parquet')
+    pq.write_table(table, path)
+
+    tape = read_loan_tape(path, chunk_size=1)
+    assert tape.loan_ids.tolist() == ['00123', '00456']
+    for name, values in expected.columns.items():
+        np.testing.assert_array_equal(tape[name], values)
+
+
+def test_missing_columns_and_invalid_rows_are_rejected():
+    with pytest.raises(ValueError, match='missing columns: noi'):
+        read_loan_tape(io.BytesIO(b"unpaid_balance,note_rate,property_value,remaining_term_months\n1,0.05,2,12\n"), 'csv')
+    with pytest.raises(ValueError, match=r'1 invalid rows \(first data rows: \[2\]\)'):
+        read_loan_tape(io.BytesIO(CSV.replace('2000000,0.05', '-5,0.05').encode()), 'csv')
+
+
+def test_interest_only_note_prices_at_the_present_value_of_its_flows():
+    tape = LoanTape(np.array(['A', 'B']), {
+        'unpaid_balance': np.array([1000000.0, 1000000.0]),
+        'accrued_interest': np.array([0.0, 50000.0]),
+        'note_rate': np.array([0.06, 0.06]),
+        'property_value': np.array([2000000.0, 600000.0]),
+        'noi': np.array([240000.0, 36000.0]),
+        'remaining_term_months': np.array([12.0, 12.0]),
+        'amortization_months': np.zeros(2),
+        'purchase_price': np.full(2, np.nan),
+    })
+    result = price_loan_tape(tape, target_yield=0.12, disposition_cost=0.05)
+
+    discount = 1.01 ** -12
+    annuity = (1 - discount) / 0.01
+    # A: pays its 5,000 coupon and is repaid in full
+    # B: NOI covers 3,000 a month; the shortfall accrues and the sale recovers less than the claim
+    np.testing.assert_allclose(result['monthly_collection'], [5000, 3000])
+    recovery_b = 600000 * 0.95
+    np.testing.assert_allclose(result['purchase_price'],
+                               [5000 * annuity + 1000000 * discount, 3000 * annuity + recovery_b * discount])
+    np.testing.assert_allclose(result['dscr'], [4.0, 0.6])
+
+    summary = summarize_pricing(tape, result)
+    assert summary['loan_count'] == 2 and summary['loans_below_1x_dscr'] == 1
+    assert summary['total_face_value'] == 2050000
@@ -0,0 +1,69 @@
+import os
+
+import mongomock
+import pytest
+from pydantic import ValidationError
+
+import process_pool
+from capital_accounts import CapitalLedger
+from lp_statements import LocalStatementStore, generate_statements, render_markdown, statement_data
+from models import CapitalEvent
+
+
+def statements(quarter: int = 1):
+    db = mongomock.MongoClient().db
+    ledger = CapitalLedger(db.capital_events, db.capital_snapshots, db.capital_ledger_heads)
+    ledger.append('F1', [
+        {'lp_id': 'LP-001', 'quarter': 0, 'type': 'commitment', 'amount': 1000000},
+        {'lp_id': 'LP-002', 'quarter': 0, 'type': 'commitment', 'amount': 2000000},
+        {'lp_id': 'LP-001', 'quarter': 0, 'type': 'contribution', 'amount': 400000},
+        {'lp_id': 'LP-002', 'quarter': 1, 'type': 'contribution', 'amount': 500000},
+        {'lp_id': 'LP-001', 'quarter': 1, 'type': 'distribution', 'amount': 100000},
+    ])
+    return statement_data(ledger.history('F1', quarter), quarter)
+
+
+def test_statement_data_splits_quarter_and_inception_activity():
+    first, second = statements()
+    assert first['beginning_balance'] == 400000
+    assert first['ending_balance'] == 300000
+    assert first['quarter_activity']['distributions'] == 100000
+    assert first['inception_activity']['paid_in'] == 400000
+    assert first['dpi'] == pytest.approx(0.25)
+    assert second['beginning_balance'] == 0 and second['unfunded'] == 1500000
+    assert '## Capital Account Statement - LP-001' in render_markdown(first, 'Fund')
+
+
+def test_statements_are_written_under_their_keys(tmp_path):
+    result = generate_statements(statements(), 'F1', LocalStatementStore(str(tmp_path)), workers=1)
+    assert result['statements'] == 2 and result['files'] == 4
+    written = sorted(os.path.relpath(os.path.join(root, name), tmp_path)
+                     for root, _, names in os.walk(tmp_path) for name in names)
+    assert written == ['F1/Q1/LP-001.md', 'F1/Q1/LP-001.xlsx', 'F1/Q1/LP-002.md', 'F1/Q1/LP-002.xlsx']
+    assert sum(os.path.getsize(tmp_path / name) for name in written) == result['bytes']
+
+
+def test_keys_cannot_leave_the_statement_directory(tmp_path):
+    store = LocalStatementStore(str(tmp_path / 'statements'))
+    with pytest.raises(ValueError, match='outside the statement directory'):
+        store.put('F1/Q1/../../../escaped.md', b'x', 'text/markdown')
+    assert not (tmp_path / 'escaped.md').exists()
+
+    for lp_id in ('../../../etc/x', '..', '.hidden', 'a/b', ''):
+        with pytest.raises(ValidationError):
+            CapitalEvent(lp_id=lp_id, quarter=0, type='contribution', amount=1)
+    assert CapitalEvent(lp_id='LP-001.a_b', quarter=0, type='contribution', amount=1).lp_id == 'LP-001.a_b'
+
+
+def test_pool_rendering_is_limited_to_the_workers_asked_for(tmp_path, monkeypatch):
+    process_pool.shutdown()
+    monkeypatch.setattr(process_pool, 'PROCESS_POOL_WORKERS', 3)
+    try:
+        many = statements() * 4
+        result = generate_statements(many, 'F1', LocalStatementStore(str(tmp_path)), formats=['md'], workers=2,
+                                     batch_size=1)
+    finally:
+        process_pool.shutdown()
+    assert result['workers'] == 2 and result['files'] == 8
+    assert sorted(os.listdir(tmp_path / 'F1' / 'Q1')) == ['LP-001.md', 'LP-002.md']
+    assert generate_statements(many, 'F1', LocalStatementStore(str(tmp_path)), workers=8)['workers'] == 1
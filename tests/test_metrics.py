@@ -0,0 +1,65 @@
+import mongomock
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from database import InstrumentedDatabase
+from metrics import Histogram, MetricsRegistry, RequestLatencyMiddleware, MONGO_OPERATION_LATENCY
+
+
+def sample(histogram: Histogram, suffix: str, **labels) -> float:
+    """The value of one exposition line, or 0 when the label set was never observed"""
+    wanted = ','.join(f'{name}="{labels[name]}"' for name in histogram.labelnames)
+    for line in histogram._samples():
+        if line.startswith(f"{histogram.name}_{suffix}{{{wanted}}} "):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+def test_request_latency_is_labelled_by_route_template():
+    histogram = Histogram('test_request_seconds', 'Test', ('method', 'route', 'status'))
+
+    app = FastAPI()
+
+    @app.get('/document/{document_id}')
+    async def document(document_id: str):
+        return {'id': document_id}
+
+    @app.get('/failing')
+    async def failing():
+        raise RuntimeError("boom")
+
+    client = TestClient(RequestLatencyMiddleware(app, histogram), raise_server_exceptions=False)
+
+    for document_id in ('a', 'b', 'c'):
+        assert client.get(f'/document/{document_id}').status_code == 200
+    assert client.get('/failing').status_code == 500
+    assert client.get('/missing').status_code == 404
+
+    assert sample(histogram, 'count', method='GET', route='/document/{document_id}', status='200') == 3
+    assert sample(histogram, 'count', method='GET', route='/failing', status='500') == 1
+    assert sample(histogram, 'count', method='GET', route='unmatched', status='404') == 1
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    counter = registry.counter('test_events_total', 'Events seen', ('kind',))
+    counter.inc(kind='a')
+    counter.inc(2, kind='a')
+    text = registry.render()
+    assert '# TYPE test_events_total counter' in text
+    assert 'test_events_total{kind="a"} 3' in text
+
+
+def test_find_returns_a_chainable_cursor_timed_once_exhausted():
+    db = InstrumentedDatabase(mongomock.MongoClient().db)
+    db.positions.insert_many([{'_id': index, 'quarter': index % 4} for index in range(10)])
+    before = sample(MONGO_OPERATION_LATENCY, 'count', collection='positions', operation='find')
+
+    cursor = db.positions.find({'quarter': {'$gte': 1}}).sort('_id', -1).skip(1).limit(3)
+    assert sample(MONGO_OPERATION_LATENCY, 'count', collection='positions', operation='find') == before
+    assert [doc['_id'] for doc in cursor] == [7, 6, 5]
+    assert sample(MONGO_OPERATION_LATENCY, 'count', collection='positions', operation='find') == before + 1
+
+    with db.positions.find({}) as cursor:
+        next(cursor)
+    assert sample(MONGO_OPERATION_LATENCY, 'count', collection='positions', operation='find') == before + 2
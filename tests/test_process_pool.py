@@ -0,0 +1,30 @@
+import time
+
+import pytest
+
+import process_pool
+
+
+def span(index: int):
+    started = time.time()
+    time.sleep(0.2)
+    return index, started, time.time()
+
+
+@pytest.fixture
+def pool_of_three(monkeypatch):
+    process_pool.shutdown()
+    monkeypatch.setattr(process_pool, 'PROCESS_POOL_WORKERS', 3)
+    yield
+    process_pool.shutdown()
+
+
+def test_run_bounded_keeps_at_most_workers_calls_in_flight(pool_of_three):
+    results = dict(process_pool.run_bounded(span, ((index,) for index in range(6)), workers=2))
+    assert sorted(results) == list(range(6))
+    assert all(results[index][0] == index for index in results)
+
+    intervals = [(started, ended) for _, started, ended in results.values()]
+    # Calls running when each one started
+    in_flight = max(sum(1 for other in intervals if other[0] <= started < other[1]) for started, _ in intervals)
+    assert in_flight <= 2
@@ -0,0 +1,62 @@
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from profiling import ProfileStore, ProfilingMiddleware, valid_token
+
+TOKEN = 'profiling-secret'
+
+
+def build(**options):
+    async def hello(request):
+        return PlainTextResponse('hello')
+
+    store = ProfileStore()
+    app = ProfilingMiddleware(Starlette(routes=[Route('/hello', hello)]), store, **options)
+    return store, TestClient(app)
+
+
+def test_valid_token_rejects_missing_and_wrong_tokens():
+    assert valid_token(TOKEN, TOKEN)
+    assert not valid_token('wrong', TOKEN)
+    assert not valid_token(None, TOKEN)
+    assert not valid_token('', '')
+    assert not valid_token(TOKEN, None)
+    assert not valid_token('tökén', TOKEN)
+
+
+def test_admin_token_in_header_profiles_the_request():
+    store, client = build(admin_token=TOKEN)
+    response = client.get('/hello', headers={'X-Admin-Token': TOKEN, 'X-Profile-Request': 'cprofile'})
+    assert response.text == 'hello'
+    record = store.get(response.headers['x-profile-id'])
+    assert record.trigger == 'admin'
+    assert record.status_code == 200
+    assert 'function calls' in record.summary
+
+
+def test_admin_token_in_query_string_is_ignored():
+    store, client = build(admin_token=TOKEN)
+    response = client.get(f'/hello?profile=cprofile&admin_token={TOKEN}')
+    assert response.text == 'hello'
+    assert 'x-profile-id' not in response.headers
+    assert store.list() == []
+
+
+def test_wrong_token_or_no_token_configured_never_profiles():
+    store, client = build(admin_token=TOKEN)
+    client.get('/hello', headers={'X-Admin-Token': 'guess', 'X-Profile-Request': 'cprofile'})
+    assert store.list() == []
+
+    store, client = build()
+    client.get('/hello', headers={'X-Admin-Token': '', 'X-Profile-Request': 'cprofile'})
+    assert store.list() == []
+
+
+def test_sampling_profiles_without_a_token():
+    store, client = build(sample_rate=1.0, default_mode='sampling')
+    response = client.get('/hello')
+    record = store.get(response.headers['x-profile-id'])
+    assert record.trigger == 'sampled'
+    assert record.speedscope['$schema'].startswith('https://www.speedscope.app')
@@ -0,0 +1,76 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from loan_tape import LoanTape
+from models import ResolutionScenario
+from resolution_scenarios import PROBABILITY_WEIGHTED, analyze_tape, cash_flow_dates, scenario_flows
+from returns import annualize, irr, moic, npv
+
+
+def tape(count: int = 3) -> LoanTape:
+    balances = np.linspace(1e6, 3e6, count)
+    return LoanTape(np.array([f'NOTE-{index}' for index in range(count)]), {
+        'unpaid_balance': balances,
+        'accrued_interest': np.zeros(count),
+        'note_rate': np.full(count, 0.06),
+        'property_value': balances * 2,
+        'noi': balances * 0.08,
+        'remaining_term_months': np.full(count, 24.0),
+        'amortization_months': np.zeros(count),
+        'purchase_price': np.full(count, np.nan),
+    })
+
+
+def test_irr_round_trips_through_npv():
+    assert irr([-100.0, 110.0]) == pytest.approx(0.10)
+    # A bond bought at par yields its coupon
+    assert irr([-1000.0] + [50.0] * 9 + [1050.0]) == pytest.approx(0.05)
+
+    flows = np.array([[-1000.0, 300, 400, 500], [-500.0, 0, 0, 800], [1000.0, -400, -400, -400]])
+    rates = irr(flows)
+    np.testing.assert_allclose(npv(flows, rates), 0, atol=1e-6)
+    assert npv([-100.0, 110.0], 0.10) == pytest.approx(0)
+    np.testing.assert_allclose(moic(flows[:2]), [1.2, 1.6])
+    assert np.isnan(irr([100.0, 100.0]))
+    assert annualize(0.01) == pytest.approx(1.01 ** 12 - 1)
+
+
+def test_a_note_bought_at_par_and_repaid_returns_its_coupon():
+    notes = tape()
+    at_par = ResolutionScenario(name='Payoff', probability=1.0, timeline_months=12, recovery_rate=1.0, coupon_share=1.0)
+    face = notes['unpaid_balance']
+    flows = scenario_flows(notes, face, at_par, closing_costs=0.0)
+    np.testing.assert_allclose(flows[:, 0], -face)
+    np.testing.assert_allclose(flows[:, 1], face * 0.005)
+    np.testing.assert_allclose(flows[:, 12], face * 1.005)
+
+    analysis = analyze_tape(notes, face, [at_par], discount_rate=annualize(0.005), closing_costs=0.0, workers=1)
+    np.testing.assert_allclose(analysis['loans']['irr'], annualize(0.005))
+    np.testing.assert_allclose(analysis['loans']['npv'], 0, atol=1e-6)
+    np.testing.assert_allclose(analysis['loans']['moic'], 1.06)
+    weighted = analysis['table'][-1]
+    assert weighted['scenario'] == PROBABILITY_WEIGHTED and weighted['recovery_rate'] == pytest.approx(1.0)
+
+
+def test_weighted_flows_are_the_probability_mix_and_chunks_agree():
+    notes = tape(5)
+    whole = analyze_tape(notes, workers=1, as_of=date(2024, 1, 31))
+    chunked = analyze_tape(notes, workers=1, chunk_size=2, as_of=date(2024, 1, 31))
+    np.testing.assert_allclose(chunked['loans']['irr'], whole['loans']['irr'])
+    for split, row in zip(chunked['table'], whole['table']):
+        assert split == pytest.approx(row)
+
+    flows = whole['cash_flows']
+    mix = sum(row['probability'] * np.pad(flows[row['scenario']], (0, 25 - len(flows[row['scenario']])))
+              for row in whole['table'][:-1])
+    np.testing.assert_allclose(flows[PROBABILITY_WEIGHTED], mix, atol=0.05)
+    assert flows['dates'][:3] == ['2024-01-31', '2024-02-29', '2024-03-31']
+    assert cash_flow_dates(date(2024, 1, 31), 2) == flows['dates'][:2]
+
+
+def test_probabilities_must_sum_to_one():
+    with pytest.raises(ValueError, match='must sum to 1'):
+        analyze_tape(tape(), scenarios=[ResolutionScenario(name='Half', probability=0.5, timeline_months=6,
+                                                           recovery_rate=1.0)])
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import mongomock
+
+from blob_store import content_hash
+from search_index import SearchIndex, parse_query, scoring_units
+
+
+def build(*documents):
+    texts = {}
+
+    def stored(document_id, title, paragraphs):
+        chunks = []
+        for paragraph in paragraphs:
+            texts[content_hash(paragraph)] = paragraph
+            chunks.append(content_hash(paragraph))
+        return {'_id': document_id, 'title': 'Deck', 'last_updated': datetime.now(),
+                'sections': [{'id': 'body', 'title': title, 'content_chunks': chunks}]}
+
+    index = SearchIndex(lambda chunks: {chunk: texts[chunk] for chunk in chunks if chunk in texts})
+    docs = [stored(*document) for document in documents]
+    index.rebuild(docs)
+    return index, docs
+
+
+CORPUS = (
+    ('recovery', 'Heat recovery', ['We convert heat to energy at scale.', 'Waste heat is sold to the district.']),
+    ('pumps', 'Energy', ['Energy prices rose. Heat pumps are used to move heat.']),
+    ('markup', 'Other <b>notes</b>', ['Data center <script>alert(1)</script> & co.']),
+)
+
+
+def test_parse_query_drops_bare_stopwords_but_keeps_them_in_phrases():
+    assert parse_query('heat to energy') == [['heat'], ['energy']]
+    assert parse_query('heat-to-energy') == [['heat', 'to', 'energy']]
+    assert parse_query('"the"') == [['the']]
+    assert scoring_units([['heat', 'to', 'energy']]) == [('heat',), ('energy',), ('heat', 'to', 'energy')]
+
+
+def test_phrase_ranks_at_least_as_high_as_its_bare_terms():
+    index, _ = build(*CORPUS)
+    bare = {hit['document_id']: hit['score'] for hit in index.search('heat to energy')['results']}
+    quoted = index.search('"heat to energy"')['results']
+    assert [hit['document_id'] for hit in quoted] == ['recovery']
+    assert quoted[0]['score'] > bare['recovery']
+    assert index.search('heat-to-energy')['results'][0]['score'] == quoted[0]['score']
+
+
+def test_highlights_skip_stopwords():
+    index, _ = build(*CORPUS)
+    snippet = index.search('"heat to energy"')['results'][0]['snippet']
+    assert snippet == 'We convert <mark>heat</mark> to <mark>energy</mark> at scale.'
+
+
+def test_highlighted_text_is_html_escaped():
+    index, _ = build(*CORPUS)
+    hit = index.search('script')['results'][0]
+    assert hit['snippet'] == 'Data center &lt;<mark>script</mark>&gt;alert(1)&lt;/<mark>script</mark>&gt; &amp; co.'
+    assert index.search('notes')['results'][0]['section_title'] == 'Other &lt;b&gt;<mark>notes</mark>&lt;/b&gt;'
+
+
+def test_sync_drops_deleted_documents_and_indexes_new_ones():
+    index, docs = build(*CORPUS)
+    collection = mongomock.MongoClient().db.documents
+    collection.insert_many(docs)
+    index.last_synced = datetime.now()
+
+    collection.delete_one({'_id': 'pumps'})
+    added = dict(docs[0], _id='copy', last_updated=datetime.now())
+    collection.insert_one(added)
+    index.sync(collection)
+
+    assert {hit['document_id'] for hit in index.search('heat')['results']} == {'recovery', 'copy'}
+    assert index.stats()['documents'] == 3
+
+
+def test_sync_picks_up_writes_stamped_before_the_previous_sync():
+    index, docs = build(*CORPUS[:1])
+    collection = mongomock.MongoClient().db.documents
+    collection.insert_many(docs)
+
+    # Rendered (and stamped) before this sync started, but written after its scan
+    late = dict(docs[0], _id='late', last_updated=datetime.now() - timedelta(seconds=1))
+    index.sync(collection)
+    collection.insert_one(late)
+    index.sync(collection)
+    assert 'late' in {hit['document_id'] for hit in index.search('heat')['results']}